@@ -0,0 +1,312 @@
+"""
+# -*- coding: utf-8 -*-
+# ===============================================================================
+#
+# Copyright (C) 2013/2025 Laurent Labatut / Laurent Champagnac
+#
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ===============================================================================
+"""
+import atexit
+import logging
+
+import gevent
+from gevent import queue
+from gevent.event import Event
+from pysolbase.SolBase import SolBase
+from pysolmeters.Meters import Meters
+
+from pysolmysql.Mysql.MysqlApi import MysqlApi
+from pysolmysql.Mysql.MysqlInsert import MysqlInsert
+from pysolmysql.Pool.latency_meters import LatencyMeters
+
+logger = logging.getLogger(__name__)
+
+
+class BufferedWriter(object):
+    """
+    Write-behind writer : rows are enqueued (put) and flushed by a background greenlet as multi-row INSERTs,
+    when max_rows rows are pending or every flush_interval_ms.
+
+    Backpressure : when queue_max rows are pending, put waits for a flush (up to put_timeout_ms), then raises.
+    When an INSERT fails (connection lost, server unavailable...), draining stops and its rows are retried first, with an exponential backoff
+    (retry_backoff_ms, doubled per retry), so that the queue fills up (and backpressure engages) during a mysql outage.
+    Rows are logged and lost (k.db_api.bw.lost) only once retry_max retries failed.
+    An INSERT rejected by the server (bad value, duplicate key without ignore...) is not retried : its rows are sent one by one,
+    and only the rejected ones are logged and lost (k.db_api.bw.rejected).
+    Pending rows are flushed by stop (and by stop_all, registered at exit).
+    """
+
+    # Started writers
+    L_WRITER = list()
+
+    def __init__(self, conf_dict, table, columns, name=None, max_rows=1000, flush_interval_ms=1000, queue_max=100000, put_timeout_ms=None, ignore=False, retry_max=5, retry_backoff_ms=500):
+        """
+        Init
+        :param conf_dict: MysqlApi configuration dict
+        :type conf_dict: dict
+        :param table: table (or db.table)
+        :type table: str
+        :param columns: column names
+        :type columns: list,tuple
+        :param name: writer name, for meters (default : table)
+        :type name: str,None
+        :param max_rows: flush when this number of rows is pending (also max rows per INSERT)
+        :type max_rows: int
+        :param flush_interval_ms: flush pending rows at least every flush_interval_ms
+        :type flush_interval_ms: int
+        :param queue_max: max pending rows
+        :type queue_max: int
+        :param put_timeout_ms: max put wait when the queue is full (None : wait, 0 : do not wait)
+        :type put_timeout_ms: int,None
+        :param ignore: If true, INSERT IGNORE
+        :type ignore: bool
+        :param retry_max: max retries of a failed INSERT before its rows are lost (0 : no retry)
+        :type retry_max: int
+        :param retry_backoff_ms: wait before the first retry, doubled for each next one
+        :type retry_backoff_ms: int
+        """
+
+        self.conf_dict = conf_dict
+        self.table = table
+        self.column_count = len(columns)
+        self.prefix = MysqlInsert.prefix(table, columns, ignore=ignore)
+        self.max_rows = max_rows
+        self.flush_interval_ms = flush_interval_ms
+        self.put_timeout_ms = put_timeout_ms
+        self.retry_max = retry_max
+        self.retry_backoff_ms = retry_backoff_ms
+        self.meters_tags = {"writer": name or table}
+
+        self.queue = queue.Queue(maxsize=queue_max)
+        self.wake_event = Event()
+        self.is_stopping = False
+        self.greenlet = None
+
+        # Rows of the failed INSERT, retried (before the queue) from retry_next_ms
+        self.ar_retry = list()
+        self.retry_count = 0
+        self.retry_next_ms = 0
+
+    def start(self):
+        """
+        Start the flush greenlet (done by the first put)
+        """
+
+        if self.greenlet is None:
+            self.is_stopping = False
+            self.greenlet = gevent.spawn(self._run)
+            BufferedWriter.L_WRITER.append(self)
+
+    def stop(self, timeout_ms=30000):
+        """
+        Stop, flushing pending rows
+        :param timeout_ms: max wait for the flush greenlet
+        :type timeout_ms: int
+        """
+
+        if self.greenlet is None:
+            return
+        self.is_stopping = True
+        self.wake_event.set()
+        self.greenlet.join(timeout=timeout_ms / 1000.0)
+        if not self.greenlet.dead:
+            logger.warning("Flush greenlet still running, killing it, writer=%s, pending=%s", self.meters_tags["writer"], self.pending())
+            self.greenlet.kill()
+        self.greenlet = None
+        if self in BufferedWriter.L_WRITER:
+            BufferedWriter.L_WRITER.remove(self)
+
+    @classmethod
+    def stop_all(cls):
+        """
+        Stop all writers, flushing pending rows
+        """
+
+        for w in list(cls.L_WRITER):
+            # noinspection PyBroadException
+            try:
+                w.stop()
+            except Exception as e:
+                logger.warning("Stop failed, writer=%s, ex=%s", w.meters_tags["writer"], SolBase.extostr(e))
+
+    def put(self, row):
+        """
+        Enqueue a row (returns immediately unless the queue is full)
+        :param row: row values (columns order)
+        :type row: list,tuple
+        """
+
+        if len(row) != self.column_count:
+            raise Exception("Invalid row len, expecting=%s, having=%s" % (self.column_count, len(row)))
+        if self.greenlet is None:
+            self.start()
+
+        try:
+            if self.put_timeout_ms == 0:
+                self.queue.put_nowait(row)
+            else:
+                self.queue.put(row, timeout=None if self.put_timeout_ms is None else self.put_timeout_ms / 1000.0)
+        except queue.Full:
+            Meters.aii("k.db_api.bw.full", tags=self.meters_tags)
+            raise Exception("BufferedWriter queue full, writer=%s, pending=%s" % (self.meters_tags["writer"], self.queue.qsize()))
+
+        Meters.ai("k.db_api.bw.queue", tags=self.meters_tags).set(self.queue.qsize())
+        if self.queue.qsize() >= self.max_rows:
+            self.wake_event.set()
+
+    def pending(self):
+        """
+        Pending rows
+        :return int
+        :rtype int
+        """
+
+        return self.queue.qsize() + len(self.ar_retry)
+
+    def _run(self):
+        """
+        Flush loop
+        """
+
+        while not self.is_stopping:
+            self.wake_event.wait(timeout=self.flush_interval_ms / 1000.0)
+            self.wake_event.clear()
+            # noinspection PyBroadException
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning("Flush failed, writer=%s, ex=%s", self.meters_tags["writer"], SolBase.extostr(e))
+
+        # Shutdown : retry failed rows until sent or retries exhausted
+        self.flush()
+        while self.ar_retry:
+            SolBase.sleep(max(0, self.retry_next_ms - SolBase.mscurrent()))
+            self.flush()
+
+    def flush(self):
+        """
+        Flush all pending rows (by batch of max_rows).
+        Failed rows are retried first, once their backoff is elapsed. Draining stops on failure.
+        """
+
+        if self.ar_retry:
+            if SolBase.mscurrent() < self.retry_next_ms:
+                return
+            ar_row = self.ar_retry
+            self.ar_retry = list()
+            if not self._flush_rows(ar_row):
+                return
+
+        while self.queue.qsize() > 0:
+            ar_row = list()
+            while len(ar_row) < self.max_rows:
+                try:
+                    ar_row.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not self._flush_rows(ar_row):
+                return
+
+    def _flush_rows(self, ar_row):
+        """
+        Insert rows. On failure, unsent rows are kept for retry (or lost if retries are exhausted).
+        A statement rejected by the server (bad value, duplicate key...) is not retried : its rows are sent one by one, rejected rows are lost.
+        :param ar_row: rows
+        :type ar_row: list
+        :return bool : True if draining may go on (rows sent or lost), False if rows are kept for retry
+        :rtype bool
+        """
+
+        ms_start = SolBase.mscurrent()
+        # Rows done (sent or rejected)
+        pos = 0
+        count_ok = 0
+        go_on = True
+        try:
+            for statement, count in MysqlInsert.iter_statements(self.prefix, ar_row, self.column_count, max_rows=self.max_rows):
+                try:
+                    MysqlApi.exec_0(self.conf_dict, statement)
+                    count_ok += count
+                    pos += count
+                    continue
+                except Exception as e:
+                    if not self._is_rejected(e):
+                        raise
+                    if count == 1:
+                        self._rejected(ar_row[pos], e)
+                        pos += 1
+                        continue
+                    logger.warning("Insert rejected, sending rows one by one, writer=%s, rows=%s, ex=%s", self.meters_tags["writer"], count, SolBase.extostr(e))
+
+                # Rejected : rows sent one by one, the rejected ones are lost
+                for row_statement, _ in MysqlInsert.iter_statements(self.prefix, ar_row[pos:pos + count], self.column_count, max_rows=1):
+                    try:
+                        MysqlApi.exec_0(self.conf_dict, row_statement)
+                        count_ok += 1
+                    except Exception as e:
+                        if not self._is_rejected(e):
+                            raise
+                        self._rejected(ar_row[pos], e)
+                    pos += 1
+            self.retry_count = 0
+        except Exception as e:
+            Meters.aii("k.db_api.bw.flush_ex", tags=self.meters_tags)
+            self.retry_count += 1
+            if self.retry_count > self.retry_max:
+                self.retry_count = 0
+                Meters.aii("k.db_api.bw.lost", increment_value=len(ar_row) - pos, tags=self.meters_tags)
+                logger.error("Flush failed, retries exhausted, rows lost, writer=%s, lost=%s, ex=%s", self.meters_tags["writer"], len(ar_row) - pos, SolBase.extostr(e))
+            else:
+                Meters.aii("k.db_api.bw.retry", tags=self.meters_tags)
+                self.ar_retry = ar_row[pos:]
+                self.retry_next_ms = SolBase.mscurrent() + self.retry_backoff_ms * 2 ** (self.retry_count - 1)
+                logger.warning("Flush failed, rows kept for retry, writer=%s, rows=%s, retry=%s/%s, ex=%s", self.meters_tags["writer"], len(self.ar_retry), self.retry_count, self.retry_max, SolBase.extostr(e))
+                go_on = False
+
+        LatencyMeters.put("k.db_api.bw.flush_ms", SolBase.msdiff(ms_start), tags=self.meters_tags)
+        Meters.aii("k.db_api.bw.flush", tags=self.meters_tags)
+        Meters.aii("k.db_api.bw.rows", increment_value=count_ok, tags=self.meters_tags)
+        Meters.ai("k.db_api.bw.queue", tags=self.meters_tags).set(self.queue.qsize())
+        return go_on
+
+    def _is_rejected(self, e):
+        """
+        Check if an INSERT failure is caused by its rows (rejected by the server), not by the connection or the server state
+        :param e: Exception
+        :type e: Exception
+        :return bool
+        :rtype bool
+        """
+
+        return MysqlApi._get_pool(self.conf_dict).driver.is_statement_error(e)
+
+    def _rejected(self, row, e):
+        """
+        Row rejected by the server : lost, not retried
+        :param row: row values
+        :type row: list,tuple
+        :param e: Exception
+        :type e: Exception
+        """
+
+        Meters.aii("k.db_api.bw.rejected", tags=self.meters_tags)
+        Meters.aii("k.db_api.bw.lost", tags=self.meters_tags)
+        logger.error("Row rejected, lost, writer=%s, row=%s, ex=%s", self.meters_tags["writer"], repr(row)[:200], SolBase.extostr(e))
+
+# Flush on shutdown
+atexit.register(BufferedWriter.stop_all)
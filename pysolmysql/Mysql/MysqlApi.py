@@ -24,12 +24,26 @@
 
 # noinspection PyUnresolvedReferences
 import ujson
+import itertools
 import logging
+import os
+import time
 from contextlib import closing
 
-from threading import Lock
+import gevent
+from gevent.lock import Semaphore
+from pysolbase.SolBase import SolBase
 from pysolmeters.Meters import Meters
 
+from pysolmysql.Mysql.MysqlExport import MysqlExport
+from pysolmysql.Mysql.MysqlFingerprint import MysqlFingerprint
+from pysolmysql.Mysql.MysqlInsert import MysqlInsert
+from pysolmysql.Mysql.MysqlLoadData import MysqlLoadData
+from pysolmysql.Mysql.MysqlRow import MysqlRow
+from pysolmysql.Mysql.MysqlScan import MysqlScan
+from pysolmysql.Mysql.MysqlSlowQuery import MysqlSlowQuery
+from pysolmysql.Pool.connection_budget import ConnectionBudget
+from pysolmysql.Pool.hooks import Hooks
 from pysolmysql.Pool.mysql_pool import MysqlConnectionPool
 
 logger = logging.getLogger(__name__)
@@ -40,12 +54,80 @@ class MysqlApi(object):
     Mysql Api
     """
 
-    # Lock
-    POOL_LOCK = Lock()
+    # Lock (gevent aware : pool eviction closes connections while holding it)
+    POOL_LOCK = Semaphore()
 
     # Static pool instances (hash from config dict => MysqlConnectionPool)
     D_POOL_INSTANCES = dict()
 
+    # Pid owning D_POOL_INSTANCES (fork detection)
+    POOL_PID = os.getpid()
+
+    # Process wide connection budget across pools (None : unlimited), see set_connection_budget
+    CONNECTION_BUDGET = None
+
+    # Pools without connection in use and unused since this delay are evicted (None : never)
+    POOL_IDLE_EVICT_SEC = 600
+
+    @classmethod
+    def set_connection_budget(cls, max_connections):
+        """
+        Set the process wide connection budget, shared across all pools
+        :param max_connections: max connections across all pools (None : unlimited)
+        :type max_connections: int,None
+        """
+
+        with cls.POOL_LOCK:
+            if cls.CONNECTION_BUDGET:
+                for pool in list(cls.CONNECTION_BUDGET.pools):
+                    cls.CONNECTION_BUDGET.unregister(pool)
+            cls.CONNECTION_BUDGET = None
+            if max_connections:
+                cls.CONNECTION_BUDGET = ConnectionBudget(max_connections)
+                for pool in cls.D_POOL_INSTANCES.values():
+                    cls.CONNECTION_BUDGET.register(pool)
+
+    @classmethod
+    def _evict_idle_pools(cls):
+        """
+        Evict pools without connection in use and unused since POOL_IDLE_EVICT_SEC, closing their connections.
+        POOL_LOCK must be held.
+        """
+
+        if not cls.POOL_IDLE_EVICT_SEC:
+            return
+
+        now = time.time()
+        for s_hash, pool in list(cls.D_POOL_INSTANCES.items()):
+            # In use : acquired, or being acquired (pool lock held : ping, connect)
+            if pool.pool_lock.locked() or pool.size - pool.pool.qsize() > 0 or now - pool.last_used <= cls.POOL_IDLE_EVICT_SEC:
+                continue
+            # Out of the registry before closing (closing yields) : not fetched by _get_pool meanwhile
+            logger.info("Evicting idle pool, s_hash=%s", s_hash)
+            del cls.D_POOL_INSTANCES[s_hash]
+            pool.close_all()
+            if pool.budget:
+                pool.budget.unregister(pool)
+            Meters.aii("k.db_pool.hash.cur", increment_value=-1)
+            Meters.aii("k.db_pool.hash.evict")
+
+    @classmethod
+    def _reset_after_fork(cls):
+        """
+        Drop pools inherited from the parent process, they will be re-allocated lazily.
+        Connections are forgotten, not closed : sockets are shared with the parent process, a COM_QUIT would kill its sessions.
+        """
+
+        cls.POOL_LOCK = Semaphore()
+        for s_hash, pool in cls.D_POOL_INSTANCES.items():
+            logger.info("Forgetting inherited pool, s_hash=%s", s_hash)
+            pool.forget_all()
+        cls.D_POOL_INSTANCES = dict()
+        if cls.CONNECTION_BUDGET:
+            cls.CONNECTION_BUDGET = ConnectionBudget(cls.CONNECTION_BUDGET.max_connections)
+        cls.POOL_PID = os.getpid()
+        Meters.aii("k.db_pool.hash.fork_reset")
+
     @classmethod
     def reset_pools(cls):
         """
@@ -56,8 +138,21 @@ class MysqlApi(object):
             for s_hash, pool in cls.D_POOL_INSTANCES.items():
                 logger.info("Closing pool, s_hash=%s", s_hash)
                 pool.close_all()
+                if pool.budget:
+                    pool.budget.unregister(pool)
             cls.D_POOL_INSTANCES = dict()
 
+    @classmethod
+    def pool_stats(cls):
+        """
+        Get stats snapshot of all pools
+        :return dict (hash from config dict => dict)
+        :rtype dict
+        """
+
+        with cls.POOL_LOCK:
+            return {s_hash: pool.stats() for s_hash, pool in cls.D_POOL_INSTANCES.items()}
+
     @classmethod
     def _get_pool_hash(cls, conf_dict):
         """
@@ -81,19 +176,32 @@ class MysqlApi(object):
         :rtype pysolmysql.Pool.mysql_pool.MysqlConnectionPool
         """
 
+        # Forked without at-fork handlers (should not occur), do not share the parent connections
+        if cls.POOL_PID != os.getpid():
+            cls._reset_after_fork()
+
         # Hash
         s_hash = cls._get_pool_hash(conf_dict)
 
         # Alloc if needed
-        if s_hash not in cls.D_POOL_INSTANCES:
+        pool = cls.D_POOL_INSTANCES.get(s_hash)
+        if pool is None:
             with cls.POOL_LOCK:
-                if s_hash not in cls.D_POOL_INSTANCES:
-                    cls.D_POOL_INSTANCES[s_hash] = MysqlConnectionPool(conf_dict)
+                pool = cls.D_POOL_INSTANCES.get(s_hash)
+                if pool is None:
+                    cls._evict_idle_pools()
+                    pool = MysqlConnectionPool(conf_dict)
+                    if cls.CONNECTION_BUDGET:
+                        cls.CONNECTION_BUDGET.register(pool)
+                    cls.D_POOL_INSTANCES[s_hash] = pool
                     logger.info("Allocated pool, s_hash=%s, pool.len=%s", s_hash, len(cls.D_POOL_INSTANCES))
                     Meters.aii("k.db_pool.hash.cur")
 
+        # Fetched : not idle (not evicted while the caller is about to acquire)
+        pool.last_used = time.time()
+
         # Over
-        return cls.D_POOL_INSTANCES[s_hash]
+        return pool
 
     @classmethod
     def _fix_type(cls, data):
@@ -107,28 +215,182 @@ class MysqlApi(object):
             return data
 
     @classmethod
-    def exec_0(cls, conf_dict, statement):
+    def _fix_rows(cls, rows, fix_types):
+        """
+        Fix rows types (in place)
+        :param rows: list of dict
+        :type rows: list,tuple
+        :param fix_types: If true, fix data type
+        :type fix_types: bool
+        """
+
+        for row in rows:
+            logger.debug("row=%s", row)
+            for k, v in row.items():
+                logger.debug("k=%s, %s, %s", k, type(v), v)
+                if fix_types:
+                    row[k] = MysqlApi._fix_type(v)
+
+    @classmethod
+    def _execute(cls, conf_dict, ar_statement, fetch, fix_types=True, lazy=False, timeout_ms=None, retry=0, priority=None):
+        """
+        Execute statement(s) on a pooled connection, recording per fingerprint meters.
+        On timeout, the query is killed server side (KILL QUERY) and the connection is discarded.
+        On connection loss, the connection is discarded and, if retry allows it (and the pool retry budget), the host is deactivated and statement(s) re-run.
+        :param conf_dict: configuration dict
+        :type conf_dict: dict
+        :param ar_statement: list of statements to execute
+        :type ar_statement: list,tuple
+        :param fetch: If true, fetch and return rows of the last statement, otherwise return its rowcount
+        :type fetch: bool
+        :param fix_types: If true, fix data type
+        :type fix_types: bool
+        :param lazy: If true, fetch MysqlRow (types fixed on column access) instead of dict
+        :type lazy: bool
+        :param timeout_ms: timeout for all statements, retries included (None : pool query_timeout_ms, 0 : no timeout)
+        :type timeout_ms: int,float,None
+        :param retry: max retries on connection loss (statements must be idempotent)
+        :type retry: int
+        :param priority: pool priority class (None : default class), see pool_priorities
+        :type priority: str,None
+        :return list,tuple,int
+        :rtype list,tuple,int
+        """
+
+        pool = cls._get_pool(conf_dict)
+        if timeout_ms is None:
+            timeout_ms = pool.query_timeout_ms
+        timer = gevent.Timeout(timeout_ms / 1000.0) if timeout_ms else None
+        cnx = None
+        statement = None
+        attempt = 0
+        try:
+            while True:
+                cnx = pool.connection_acquire(priority)
+                if timer and not timer.pending:
+                    timer.start()
+                ms_call = SolBase.mscurrent()
+                try:
+                    with closing(pool.driver.cursor(cnx, dict_rows=not lazy)) as cur:
+                        out = None
+                        for statement in ar_statement:
+                            d_event = Hooks.execute_before(pool.pool_name, pool.connection_host(cnx), statement) if Hooks.EXECUTE else None
+                            ms_start = SolBase.mscurrent()
+                            try:
+                                cur.execute(statement)
+                                if fetch and lazy:
+                                    out = MysqlRow.from_rows(cur.fetchall(), cur.description, fix_types)
+                                    rows = len(out)
+                                elif fetch:
+                                    out = cur.fetchall()
+                                    cls._fix_rows(out, fix_types)
+                                    rows = len(out)
+                                else:
+                                    out = rows = cur.rowcount
+                            except (Exception, gevent.Timeout) as e:
+                                MysqlFingerprint.meters_put(statement, SolBase.msdiff(ms_start), 0, e)
+                                if d_event is not None:
+                                    Hooks.execute_after(d_event, SolBase.msdiff(ms_start), None, e)
+                                raise
+                            ms = SolBase.msdiff(ms_start)
+                            if d_event is not None:
+                                Hooks.execute_after(d_event, ms, rows, None)
+                            fp = MysqlFingerprint.meters_put(statement, ms, rows, None)
+                            MysqlSlowQuery.check(conf_dict, pool, statement, fp, ms, pool.connection_host(cnx), rows)
+                except Exception as e:
+                    if not pool.driver.is_connection_error(e):
+                        raise
+                    # Connection lost : never put it back
+                    host = pool.connection_host(cnx)
+                    pool.host_record(host, SolBase.msdiff(ms_call), False)
+                    pool.connection_discard(cnx)
+                    cnx = None
+                    if attempt >= retry:
+                        raise
+                    if not pool.retry_withdraw():
+                        Meters.aii("k.db_api.retry.budget_exhausted", tags=pool.meters_tags)
+                        raise
+                    attempt += 1
+                    Meters.aii("k.db_api.retry", tags={"pool": pool.pool_name, "host": str(host)})
+                    logger.warning("Connection lost, retrying, attempt=%s/%s, pool=%s, host=%s, ex=%s", attempt, retry, pool.pool_name, host, SolBase.extostr(e))
+                    pool.host_prison(host)
+                    continue
+                pool.host_record(pool.connection_host(cnx), SolBase.msdiff(ms_call), True)
+                if retry > 0:
+                    pool.retry_deposit()
+                return out
+        except gevent.Timeout as t:
+            if t is not timer:
+                raise
+            if cnx is None:
+                # Fired while re-acquiring (retry) : no query running
+                raise Exception("Query timeout while acquiring a connection, timeout_ms=%s, statement=%s" % (timeout_ms, statement))
+            host = pool.connection_host(cnx)
+            cls._query_timeout(pool, cnx, timeout_ms)
+            cnx = None
+            raise Exception("Query timeout, timeout_ms=%s, host=%s, statement=%s" % (timeout_ms, host, statement))
+        finally:
+            if timer:
+                timer.close()
+            pool.connection_release(cnx)
+
+    @classmethod
+    def _read_retry(cls, conf_dict, retry):
+        """
+        Get read retry count
+        :param conf_dict: configuration dict
+        :type conf_dict: dict
+        :param retry: retry count (None : pool read_retry_count)
+        :type retry: int,None
+        :return int
+        :rtype int
+        """
+
+        if retry is None:
+            return cls._get_pool(conf_dict).read_retry_count
+        return retry
+
+    @classmethod
+    def _query_timeout(cls, pool, cnx, timeout_ms):
+        """
+        Handle a query timeout : kill the query server side, discard the connection (interrupted in the middle of a packet exchange, it cannot be reused)
+        :param pool: pysolmysql.Pool.mysql_pool.MysqlConnectionPool
+        :type pool: pysolmysql.Pool.mysql_pool.MysqlConnectionPool
+        :param cnx: pymysql.connections.Connection
+        :type cnx: pymysql.connections.Connection
+        :param timeout_ms: timeout
+        :type timeout_ms: int,float
+        """
+
+        host = pool.connection_host(cnx)
+        Meters.aii("k.db_api.query.timeout", tags={"pool": pool.pool_name, "host": str(host)})
+        pool.host_record(host, timeout_ms, False)
+        logger.warning("Query timeout, killing, pool=%s, host=%s", pool.pool_name, host)
+        pool.query_kill(cnx)
+        pool.connection_discard(cnx)
+
+    @classmethod
+    def exec_0(cls, conf_dict, statement, timeout_ms=None, retry=0, priority=None):
         """
         Execute a sql statement, returning row affected.
         :param conf_dict: configuration dict
         :type conf_dict: dict
         :param statement: statement to execute
         :type statement: str
+        :param timeout_ms: timeout (None : pool query_timeout_ms, 0 : no timeout), query killed on expiry
+        :type timeout_ms: int,float,None
+        :param retry: max retries on connection loss, for idempotent statements only (0 : disabled)
+        :type retry: int
+        :param priority: pool priority class (None : default class), see pool_priorities
+        :type priority: str,None
         :rtype: int
         :return rows affected
         """
 
-        cnx = None
-        try:
-            cnx = cls._get_pool(conf_dict).connection_acquire()
-            with closing(cnx.cursor()) as cur:
-                cur.execute(statement)
-                return cur.rowcount
-        finally:
-            cls._get_pool(conf_dict).connection_release(cnx)
+        return cls._execute(conf_dict, (statement,), fetch=False, timeout_ms=timeout_ms, retry=retry, priority=priority)
 
     @classmethod
-    def exec_n(cls, conf_dict, statement, fix_types=True):
+    def exec_n(cls, conf_dict, statement, fix_types=True, lazy=False, timeout_ms=None, retry=None, priority=None):
         """
         Execute a sql statement, returning 0..N rows
         :param conf_dict: configuration dict
@@ -137,28 +399,22 @@ class MysqlApi(object):
         :type statement: str
         :param fix_types: If true, fix data type
         :type fix_types: bool
+        :param lazy: If true, return MysqlRow (read only, dict interface, types fixed on column access), for wide rows
+        :type lazy: bool
+        :param timeout_ms: timeout (None : pool query_timeout_ms, 0 : no timeout), query killed on expiry
+        :type timeout_ms: int,float,None
+        :param retry: max retries on connection loss (None : pool read_retry_count, 0 : disabled)
+        :type retry: int,None
+        :param priority: pool priority class (None : default class), see pool_priorities
+        :type priority: str,None
         :return list of dict.
         :rtype list
         """
 
-        cnx = None
-        try:
-            cnx = cls._get_pool(conf_dict).connection_acquire()
-            with closing(cnx.cursor()) as cur:
-                cur.execute(statement)
-                rows = cur.fetchall()
-                for row in rows:
-                    logger.debug("row=%s", row)
-                    for k, v in row.items():
-                        logger.debug("k=%s, %s, %s", k, type(v), v)
-                        if fix_types:
-                            row[k] = MysqlApi._fix_type(v)
-                return rows
-        finally:
-            cls._get_pool(conf_dict).connection_release(cnx)
+        return cls._execute(conf_dict, (statement,), fetch=True, fix_types=fix_types, lazy=lazy, timeout_ms=timeout_ms, retry=cls._read_retry(conf_dict, retry), priority=priority)
 
     @classmethod
-    def exec_1(cls, conf_dict, statement, fix_types=True):
+    def exec_1(cls, conf_dict, statement, fix_types=True, lazy=False, timeout_ms=None, retry=None, priority=None):
         """
         Execute a sql statement, returning 1 row.
         Method will fail if 1 row is not returned.
@@ -169,30 +425,25 @@ class MysqlApi(object):
         :type statement: str
         :param fix_types: If true, fix data type
         :type fix_types: bool
+        :param lazy: If true, return a MysqlRow
+        :type lazy: bool
+        :param timeout_ms: timeout (None : pool query_timeout_ms, 0 : no timeout), query killed on expiry
+        :type timeout_ms: int,float,None
+        :param retry: max retries on connection loss (None : pool read_retry_count, 0 : disabled)
+        :type retry: int,None
+        :param priority: pool priority class (None : default class), see pool_priorities
+        :type priority: str,None
         :return dict
         :rtype dict
         """
 
-        cnx = None
-        try:
-            cnx = cls._get_pool(conf_dict).connection_acquire()
-            with closing(cnx.cursor()) as cur:
-                cur.execute(statement)
-                rows = cur.fetchall()
-                for row in rows:
-                    logger.debug("row=%s", row)
-                    for k, v in row.items():
-                        logger.debug("k=%s, %s, %s", k, type(v), v)
-                        if fix_types:
-                            row[k] = MysqlApi._fix_type(v)
-                if len(rows) != 1:
-                    raise Exception("Invalid row len, expecting 1, having={0}".format(len(rows)))
-                return rows[0]
-        finally:
-            cls._get_pool(conf_dict).connection_release(cnx)
+        rows = cls._execute(conf_dict, (statement,), fetch=True, fix_types=fix_types, lazy=lazy, timeout_ms=timeout_ms, retry=cls._read_retry(conf_dict, retry), priority=priority)
+        if len(rows) != 1:
+            raise Exception("Invalid row len, expecting 1, having={0}".format(len(rows)))
+        return rows[0]
 
     @classmethod
-    def exec_01(cls, conf_dict, statement, fix_types=True):
+    def exec_01(cls, conf_dict, statement, fix_types=True, lazy=False, timeout_ms=None, retry=None, priority=None):
         """
         Execute a sql statement, returning 0 or 1 row.
         Method will fail if 0 or 1 row is not returned.
@@ -202,45 +453,395 @@ class MysqlApi(object):
         :type statement: str
         :param fix_types: If true, fix data type
         :type fix_types: bool
+        :param lazy: If true, return a MysqlRow
+        :type lazy: bool
+        :param timeout_ms: timeout (None : pool query_timeout_ms, 0 : no timeout), query killed on expiry
+        :type timeout_ms: int,float,None
+        :param retry: max retries on connection loss (None : pool read_retry_count, 0 : disabled)
+        :type retry: int,None
+        :param priority: pool priority class (None : default class), see pool_priorities
+        :type priority: str,None
         :return dict, None
         :rtype dict, None
         """
 
+        rows = cls._execute(conf_dict, (statement,), fetch=True, fix_types=fix_types, lazy=lazy, timeout_ms=timeout_ms, retry=cls._read_retry(conf_dict, retry), priority=priority)
+        if len(rows) == 0:
+            return None
+        elif len(rows) != 1:
+            raise Exception("Invalid row len, expecting 1, having={0}".format(len(rows)))
+        else:
+            return rows[0]
+
+    @classmethod
+    def multi_n(cls, conf_dict, ar_statement, timeout_ms=None, retry=0, priority=None):
+        """
+        Execute multiple sql statement, reading nothing from mysql.
+        :type conf_dict: dict
+        :param ar_statement: list of statements to execute (for instance, batch of insert or whatever)
+        :type ar_statement: list
+        :param timeout_ms: timeout for all statements (None : pool query_timeout_ms, 0 : no timeout), query killed on expiry
+        :type timeout_ms: int,float,None
+        :param retry: max retries on connection loss, all statements being re-run, for idempotent statements only (0 : disabled)
+        :type retry: int
+        :param priority: pool priority class (None : default class), see pool_priorities
+        :type priority: str,None
+        """
+
+        cls._execute(conf_dict, ar_statement, fetch=False, timeout_ms=timeout_ms, retry=retry, priority=priority)
+
+    @classmethod
+    def _execute_prepared(cls, conf_dict, statement, params, fetch, priority=None):
+        """
+        Execute a server side prepared statement on a pooled connection, recording per fingerprint meters.
+        :param conf_dict: configuration dict
+        :type conf_dict: dict
+        :param statement: statement, with ? placeholders
+        :type statement: str
+        :param params: parameters
+        :type params: list,tuple,None
+        :param fetch: If true, return rows, otherwise return affected rows
+        :type fetch: bool
+        :param priority: pool priority class (None : default class), see pool_priorities
+        :type priority: str,None
+        :return list,int
+        :rtype list,int
+        """
+
+        pool = cls._get_pool(conf_dict)
         cnx = None
         try:
-            cnx = cls._get_pool(conf_dict).connection_acquire()
-            with closing(cnx.cursor()) as cur:
-                cur.execute(statement)
-                rows = cur.fetchall()
-                for row in rows:
-                    logger.debug("row=%s", row)
-                    for k, v in row.items():
-                        logger.debug("k=%s, %s, %s", k, type(v), v)
-                        if fix_types:
-                            row[k] = MysqlApi._fix_type(v)
-                if len(rows) == 0:
-                    return None
-                elif len(rows) != 1:
-                    raise Exception("Invalid row len, expecting 1, having={0}".format(len(rows)))
+            cnx = pool.connection_acquire(priority)
+            d_event = Hooks.execute_before(pool.pool_name, pool.connection_host(cnx), statement) if Hooks.EXECUTE else None
+            ms_start = SolBase.mscurrent()
+            try:
+                rows, affected, _ = pool.prepared_execute(cnx, statement, params)
+            except Exception as e:
+                MysqlFingerprint.meters_put(statement, SolBase.msdiff(ms_start), 0, e)
+                if d_event is not None:
+                    Hooks.execute_after(d_event, SolBase.msdiff(ms_start), None, e)
+                raise
+            ms = SolBase.msdiff(ms_start)
+            if d_event is not None:
+                Hooks.execute_after(d_event, ms, len(rows) if fetch and rows is not None else affected, None)
+            fp = MysqlFingerprint.meters_put(statement, ms, affected, None)
+            MysqlSlowQuery.check(conf_dict, pool, statement, fp, ms, pool.connection_host(cnx), affected, explain=False)
+            if fetch:
+                return rows if rows is not None else list()
+            return affected
+        finally:
+            pool.connection_release(cnx)
+
+    @classmethod
+    def prepared_0(cls, conf_dict, statement, params=None, priority=None):
+        """
+        Execute a statement through a server side prepared statement (binary protocol, cached per connection), returning rows affected.
+        :param conf_dict: configuration dict
+        :type conf_dict: dict
+        :param statement: statement to execute, with ? placeholders
+        :type statement: str
+        :param params: parameters
+        :type params: list,tuple,None
+        :param priority: pool priority class (None : default class), see pool_priorities
+        :type priority: str,None
+        :return rows affected
+        :rtype int
+        """
+
+        return cls._execute_prepared(conf_dict, statement, params, fetch=False, priority=priority)
+
+    @classmethod
+    def prepared_n(cls, conf_dict, statement, params=None, priority=None):
+        """
+        Execute a statement through a server side prepared statement (binary protocol, cached per connection), returning 0..N rows.
+        Values are decoded from the binary row format (no text to number parsing).
+        :param conf_dict: configuration dict
+        :type conf_dict: dict
+        :param statement: statement to execute, with ? placeholders
+        :type statement: str
+        :param params: parameters
+        :type params: list,tuple,None
+        :param priority: pool priority class (None : default class), see pool_priorities
+        :type priority: str,None
+        :return list of dict
+        :rtype list
+        """
+
+        return cls._execute_prepared(conf_dict, statement, params, fetch=True, priority=priority)
+
+    @classmethod
+    def scan(cls, conf_dict, table, key_column, columns=None, where=None, page_size=None, start_after=None, fix_types=True, lazy=False, timeout_ms=None, retry=None, priority=None):
+        """
+        Scan a table with keyset pagination (WHERE key > last ORDER BY key LIMIT page_size), yielding rows in key order.
+        Each page runs on a freshly acquired pooled connection (no connection held between pages, nor while the caller processes rows).
+        To resume, pass the key of the last processed row as start_after (see MysqlScan.key_of).
+        The key must be unique and not null (primary key, or unique index : constant cost per page).
+        :param conf_dict: configuration dict
+        :type conf_dict: dict
+        :param table: table (or db.table)
+        :type table: str
+        :param key_column: key column, or list of key columns (composite key)
+        :type key_column: str,list,tuple
+        :param columns: selected columns (None : all), key columns are added if missing
+        :type columns: list,tuple,None
+        :param where: additional condition (sql, not escaped)
+        :type where: str,None
+        :param page_size: rows per page (None : MysqlScan.PAGE_SIZE)
+        :type page_size: int,None
+        :param start_after: checkpoint, key of the last processed row (value, or tuple for a composite key), None : from start
+        :type start_after: object,None
+        :param fix_types: If true, fix data type
+        :type fix_types: bool
+        :param lazy: If true, yield MysqlRow (types fixed on column access) instead of dict
+        :type lazy: bool
+        :param timeout_ms: timeout per page (None : pool query_timeout_ms, 0 : no timeout)
+        :type timeout_ms: int,float,None
+        :param retry: max retries per page on connection loss (None : pool read_retry_count)
+        :type retry: int,None
+        :param priority: pool priority class (None : default class), see pool_priorities
+        :type priority: str,None
+        :return generator of dict (or MysqlRow)
+        :rtype collections.abc.Iterator
+        """
+
+        key_columns = MysqlScan.key_columns(key_column)
+        page_size = page_size or MysqlScan.PAGE_SIZE
+        after = None
+        if start_after is not None:
+            after = tuple(start_after) if len(key_columns) > 1 else (start_after,)
+        retry = cls._read_retry(conf_dict, retry)
+        tags = cls._get_pool(conf_dict).meters_tags
+
+        while True:
+            statement = MysqlScan.statement(table, key_columns, columns=columns, where=where, after=after, page_size=page_size)
+            rows = cls._execute(conf_dict, [statement], fetch=True, fix_types=fix_types, lazy=lazy, timeout_ms=timeout_ms, retry=retry, priority=priority)
+            Meters.aii("k.db_api.scan.page", tags=tags)
+            if not rows:
+                return
+            after = MysqlScan.key_of(rows[-1], key_columns)
+            for row in rows:
+                yield row
+            if len(rows) < page_size:
+                return
+
+    @classmethod
+    def bulk_upsert(cls, conf_dict, table, key_columns, rows, update_columns=None, update_mode="set", aggregate=False, max_rows=None, max_bytes=None, priority=None):
+        """
+        Upsert rows with chunked multi-row INSERT ... ON DUPLICATE KEY UPDATE statements (one statement per chunk).
+        :param conf_dict: configuration dict
+        :type conf_dict: dict
+        :param table: table (or db.table)
+        :type table: str
+        :param key_columns: unique key columns
+        :type key_columns: list,tuple
+        :param rows: iterable of dict (column => value), all rows with the same columns
+        :type rows: collections.abc.Iterable
+        :param update_columns: columns updated on duplicate key (None : all non key columns)
+        :type update_columns: list,tuple,None
+        :param update_mode: "set" (col=new value) or "add" (col=col+new value, counters)
+        :type update_mode: str
+        :param aggregate: If true, rows with the same key are merged client side before sending (last value for "set", sum for "add")
+        :type aggregate: bool
+        :param max_rows: max rows per statement (Galera transaction size), None : MysqlInsert.MAX_ROWS
+        :type max_rows: int,None
+        :param max_bytes: max statement size (below max_allowed_packet), None : MysqlInsert.MAX_STATEMENT_BYTES
+        :type max_bytes: int,None
+        :param priority: pool priority class (None : default class), see pool_priorities
+        :type priority: str,None
+        :return dict : rows (received), rows_sent (after aggregation), statements, affected (1 per insert, 2 per update)
+        :rtype dict
+        """
+
+        if update_mode not in ("set", "add"):
+            raise Exception("Invalid update_mode=%s, allowed=set,add" % update_mode)
+
+        d_out = {"rows": 0, "rows_sent": 0, "statements": 0, "affected": 0}
+        it = iter(rows)
+        try:
+            first = next(it)
+        except StopIteration:
+            return d_out
+
+        # Columns from the first row
+        columns = list(first.keys())
+        for k in key_columns:
+            if k not in first:
+                raise Exception("Key column not found in row, key=%s, columns=%s" % (k, columns))
+        if update_columns is None:
+            update_columns = [c for c in columns if c not in key_columns]
+
+        def _values(it_dict):
+            for d in it_dict:
+                d_out["rows"] += 1
+                yield [d[c] for c in columns]
+
+        ar_row = _values(itertools.chain((first,), it))
+
+        # Client side aggregation
+        if aggregate:
+            ar_key_idx = [columns.index(k) for k in key_columns]
+            ar_update_idx = [columns.index(c) for c in update_columns]
+            d_agg = dict()
+            for row in ar_row:
+                key = tuple(row[i] for i in ar_key_idx)
+                prev = d_agg.get(key)
+                if prev is not None and update_mode == "add":
+                    for i in ar_update_idx:
+                        row[i] = (prev[i] or 0) + (row[i] or 0)
+                d_agg[key] = row
+            ar_row = d_agg.values()
+
+        # Statement
+        if update_columns:
+            if update_mode == "add":
+                ar_update = ["{0}={0}+VALUES({0})".format(MysqlLoadData.quote_identifier(c)) for c in update_columns]
+            else:
+                ar_update = ["{0}=VALUES({0})".format(MysqlLoadData.quote_identifier(c)) for c in update_columns]
+        else:
+            ar_update = ["{0}={0}".format(MysqlLoadData.quote_identifier(key_columns[0]))]
+        prefix = MysqlInsert.prefix(table, columns)
+        suffix = " ON DUPLICATE KEY UPDATE " + ",".join(ar_update)
+
+        for statement, count in MysqlInsert.iter_statements(prefix, ar_row, len(columns), suffix=suffix, max_rows=max_rows, max_bytes=max_bytes):
+            d_out["affected"] += cls.exec_0(conf_dict, statement, priority=priority)
+            d_out["rows_sent"] += count
+            d_out["statements"] += 1
+
+        logger.debug("bulk_upsert, table=%s, out=%s", table, d_out)
+        return d_out
+
+    @classmethod
+    def load_data(cls, conf_dict, table, columns, rows_iterable, chunk_rows=None, warning_max=64, priority=None):
+        """
+        Bulk load rows through LOAD DATA LOCAL INFILE, streaming them (rows are never fully buffered).
+        Requires conf_dict["local_infile"] = True.
+        :param conf_dict: configuration dict
+        :type conf_dict: dict
+        :param table: table (or db.table)
+        :type table: str
+        :param columns: column names
+        :type columns: list,tuple
+        :param rows_iterable: iterable of rows (list or tuple of values, in columns order, None for NULL)
+        :type rows_iterable: collections.abc.Iterable
+        :param chunk_rows: If set, one LOAD DATA statement per chunk_rows rows (bounds server side transactions)
+        :type chunk_rows: int,None
+        :param warning_max: max warnings fetched (SHOW WARNINGS) per statement
+        :type warning_max: int
+        :param priority: pool priority class (None : default class), see pool_priorities
+        :type priority: str,None
+        :return dict : rows (loaded), bytes (sent), statements, warnings (count), warning_list (list of dict)
+        :rtype dict
+        """
+
+        if not conf_dict.get("local_infile"):
+            raise Exception("load_data requires local_infile=True in conf_dict")
+
+        statement = MysqlLoadData.statement(table, columns)
+        d_count = {"rows": 0, "bytes": 0}
+        d_out = {"rows": 0, "bytes": 0, "statements": 0, "warnings": 0, "warning_list": list()}
+
+        pool = cls._get_pool(conf_dict)
+        cnx = None
+        try:
+            cnx = pool.connection_acquire(priority)
+            it = iter(rows_iterable)
+            while True:
+                # Peek (no empty statement)
+                try:
+                    first = next(it)
+                except StopIteration:
+                    break
+                if chunk_rows:
+                    it_chunk = itertools.chain((first,), itertools.islice(it, chunk_rows - 1))
                 else:
-                    return rows[0]
+                    it_chunk = itertools.chain((first,), it)
+
+                ms_start = SolBase.mscurrent()
+                try:
+                    affected, warnings = pool.driver.load_data_local(cnx, statement, MysqlLoadData.iter_chunk(it_chunk, len(columns), d_count))
+                except (Exception, gevent.Timeout) as e:
+                    MysqlFingerprint.meters_put(statement, SolBase.msdiff(ms_start), 0, e)
+                    raise
+                MysqlFingerprint.meters_put(statement, SolBase.msdiff(ms_start), affected, None)
+
+                d_out["rows"] += affected
+                d_out["statements"] += 1
+                d_out["warnings"] += warnings
+                if warnings and len(d_out["warning_list"]) < warning_max:
+                    with closing(pool.driver.cursor(cnx, dict_rows=True)) as cur:
+                        cur.execute("SHOW WARNINGS LIMIT %s;" % warning_max)
+                        d_out["warning_list"].extend(cur.fetchall())
+                    d_out["warning_list"] = d_out["warning_list"][:warning_max]
+            d_out["bytes"] = d_count["bytes"]
+            logger.debug("load_data, table=%s, out=%s", table, d_out)
+            return d_out
+        except BaseException:
+            # Connection may be closed or in the middle of the LOCAL INFILE exchange (including on caller timeout or kill) : drop it
+            pool.connection_discard(cnx)
+            cnx = None
+            raise
         finally:
-            cls._get_pool(conf_dict).connection_release(cnx)
+            pool.connection_release(cnx)
 
     @classmethod
-    def multi_n(cls, conf_dict, ar_statement):
+    def export(cls, conf_dict, statement, path_or_fileobj, fmt="jsonl", compress=None, fetch_rows=1000, priority=None):
         """
-        Execute multiple sql statement, reading nothing from mysql.
+        Export a statement result to a file (jsonl or csv, optionally gzip), streaming from an unbuffered cursor (memory does not depend on row count).
+        :param conf_dict: configuration dict
         :type conf_dict: dict
-        :param ar_statement: list of statements to execute (for instance, batch of insert or whatever)
-        :type ar_statement: list
+        :param statement: statement to execute
+        :type statement: str
+        :param path_or_fileobj: file path, or binary file object (not closed)
+        :type path_or_fileobj: str,io.RawIOBase
+        :param fmt: "jsonl" (one json dict per line) or "csv" (with header)
+        :type fmt: str
+        :param compress: If true, gzip. If None, gzip if path ends with ".gz"
+        :type compress: bool,None
+        :param fetch_rows: rows fetched per batch
+        :type fetch_rows: int
+        :param priority: pool priority class (None : default class), see pool_priorities
+        :type priority: str,None
+        :return dict : rows, bytes (written to target), bytes_raw (before compression)
+        :rtype dict
         """
 
+        if fmt not in MysqlExport.FORMATS:
+            raise Exception("Invalid fmt=%s, allowed=%s" % (fmt, MysqlExport.FORMATS))
+
+        pool = cls._get_pool(conf_dict)
         cnx = None
+        cur = None
+        w = None
+        ms_start = SolBase.mscurrent()
         try:
-            cnx = cls._get_pool(conf_dict).connection_acquire()
-            with closing(cnx.cursor()) as cur:
-                for s in ar_statement:
-                    cur.execute(s)
+            cnx = pool.connection_acquire(priority)
+            cur = pool.driver.cursor(cnx, dict_rows=fmt == "jsonl", unbuffered=True)
+            cur.execute(statement)
+            w = MysqlExport(path_or_fileobj, fmt=fmt, compress=compress, columns=[d[0] for d in cur.description or ()])
+            while True:
+                rows = cur.fetchmany(fetch_rows)
+                if not rows:
+                    break
+                w.write_rows(rows)
+            cur.close()
+            d_out = w.close()
+        except BaseException as e:
+            MysqlFingerprint.meters_put(statement, SolBase.msdiff(ms_start), 0, e)
+            if w:
+                w.abort()
+            # Unread result (including on caller timeout or kill) : drop the connection (draining it could take long)
+            if cur:
+                pool.driver.cursor_abandon(cur)
+            pool.connection_discard(cnx)
+            cnx = None
+            raise
         finally:
-            cls._get_pool(conf_dict).connection_release(cnx)
+            pool.connection_release(cnx)
+
+        MysqlFingerprint.meters_put(statement, SolBase.msdiff(ms_start), d_out["rows"], None)
+        logger.debug("export, out=%s", d_out)
+        return d_out
+
+
+# Fork safety : forget pools inherited by children
+os.register_at_fork(after_in_child=MysqlApi._reset_after_fork)
@@ -0,0 +1,257 @@
+"""
+# -*- coding: utf-8 -*-
+# ===============================================================================
+#
+# Copyright (C) 2013/2025 Laurent Labatut / Laurent Champagnac
+#
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ===============================================================================
+"""
+import csv
+import gzip
+import io
+import logging
+
+# noinspection PyUnresolvedReferences
+import ujson
+
+logger = logging.getLogger(__name__)
+
+# Types dumped as is (others go through _json_value : ujson would turn a Decimal into a lossy float)
+_JSON_NATIVE = (str, int, float)
+
+
+def _json_value(v):
+    """
+    Json value for non native types (Decimal, bytes, datetime...) : str, without precision loss
+    :param v: value
+    :type v: object
+    :return str
+    :rtype str
+    """
+
+    if isinstance(v, (bytes, bytearray)):
+        return v.decode("utf-8", "replace")
+    return str(v)
+
+
+def _json_row(row):
+    """
+    Json row
+    :param row: row
+    :type row: dict
+    :return dict
+    :rtype dict
+    """
+
+    return {k: v if v is None or isinstance(v, _JSON_NATIVE) else _json_value(v) for k, v in row.items()}
+
+
+def _csv_value(v):
+    """
+    Csv value
+    :param v: value
+    :type v: object
+    :return object
+    :rtype object
+    """
+
+    if isinstance(v, (bytes, bytearray)):
+        return v.decode("utf-8", "replace")
+    return v
+
+
+class _CountingFile(object):
+    """
+    Write only file wrapper, counting bytes written
+    """
+
+    def __init__(self, f):
+        """
+        Init
+        :param f: binary file object
+        :type f: io.RawIOBase
+        """
+
+        self.f = f
+        self.bytes = 0
+
+    def write(self, b):
+        """
+        Write
+        :param b: bytes
+        :type b: bytes
+        :return int
+        :rtype int
+        """
+
+        self.f.write(b)
+        self.bytes += len(b)
+        return len(b)
+
+    def flush(self):
+        """
+        Flush
+        """
+
+        self.f.flush()
+
+
+class MysqlExport(object):
+    """
+    Streaming export writer (jsonl or csv, optionally gzip), with large buffered writes.
+
+    Rows are written by batch (write_rows), memory is bounded by the batch and BUFFER_BYTES.
+    Binary values are exported as utf-8 strings (invalid sequences replaced), other non json types as str.
+    """
+
+    # Allowed formats
+    FORMATS = ("jsonl", "csv")
+
+    # Write buffer (bytes)
+    BUFFER_BYTES = 1024 * 1024
+
+    def __init__(self, path_or_fileobj, fmt="jsonl", compress=None, columns=None):
+        """
+        Init
+        :param path_or_fileobj: file path, or binary file object (not closed by us)
+        :type path_or_fileobj: str,io.RawIOBase
+        :param fmt: "jsonl" or "csv"
+        :type fmt: str
+        :param compress: If true, gzip. If None, gzip if path ends with ".gz"
+        :type compress: bool,None
+        :param columns: column names (csv header)
+        :type columns: list,tuple,None
+        """
+
+        if fmt not in self.FORMATS:
+            raise Exception("Invalid fmt=%s, allowed=%s" % (fmt, self.FORMATS))
+
+        self.fmt = fmt
+        self.rows = 0
+        self.bytes_raw = 0
+
+        if isinstance(path_or_fileobj, str):
+            self.f_owned = open(path_or_fileobj, "wb")
+            f = self.f_owned
+            if compress is None:
+                compress = path_or_fileobj.endswith(".gz")
+        else:
+            self.f_owned = None
+            f = path_or_fileobj
+
+        self.f_count = _CountingFile(f)
+        self.f_gzip = gzip.GzipFile(fileobj=self.f_count, mode="wb") if compress else None
+
+        self.ar_buf = list()
+        self.buf_size = 0
+
+        if self.fmt == "csv":
+            self.csv_buf = io.StringIO()
+            self.csv_writer = csv.writer(self.csv_buf, lineterminator="\n")
+            if columns:
+                self.csv_writer.writerow(columns)
+                self._csv_pop()
+
+    @property
+    def bytes(self):
+        """
+        Bytes written to the target (compressed if gzip)
+        :return int
+        :rtype int
+        """
+
+        return self.f_count.bytes
+
+    def _csv_pop(self):
+        """
+        Move csv buffer content to the write buffer
+        """
+
+        self._append(self.csv_buf.getvalue().encode("utf-8"))
+        self.csv_buf.seek(0)
+        self.csv_buf.truncate()
+
+    def _append(self, b):
+        """
+        Append to the write buffer, flushing if required
+        :param b: bytes
+        :type b: bytes
+        """
+
+        self.ar_buf.append(b)
+        self.buf_size += len(b)
+        if self.buf_size >= self.BUFFER_BYTES:
+            self._flush_buffer()
+
+    def _flush_buffer(self):
+        """
+        Write the buffer
+        """
+
+        if self.buf_size == 0:
+            return
+        b = b"".join(self.ar_buf)
+        self.bytes_raw += len(b)
+        if self.f_gzip:
+            self.f_gzip.write(b)
+        else:
+            self.f_count.write(b)
+        self.ar_buf = list()
+        self.buf_size = 0
+
+    def write_rows(self, rows):
+        """
+        Write rows
+        :param rows: jsonl : list of dict, csv : list of tuple
+        :type rows: list,tuple
+        """
+
+        if self.fmt == "jsonl":
+            self._append("".join([ujson.dumps(_json_row(row), ensure_ascii=False) + "\n" for row in rows]).encode("utf-8"))
+        else:
+            self.csv_writer.writerows([[_csv_value(v) for v in row] for row in rows])
+            self._csv_pop()
+        self.rows += len(rows)
+
+    def close(self):
+        """
+        Flush and close (target file object is flushed, not closed)
+        :return dict : rows, bytes (written to target), bytes_raw (before compression)
+        :rtype dict
+        """
+
+        self._flush_buffer()
+        if self.f_gzip:
+            self.f_gzip.close()
+        if self.f_owned:
+            self.f_owned.close()
+        else:
+            self.f_count.flush()
+        return {"rows": self.rows, "bytes": self.bytes, "bytes_raw": self.bytes_raw}
+
+    def abort(self):
+        """
+        Close without flushing (on error)
+        """
+
+        # noinspection PyBroadException
+        try:
+            if self.f_owned:
+                self.f_owned.close()
+        except Exception as e:
+            logger.debug("Abort close failed, ex=%s", e)
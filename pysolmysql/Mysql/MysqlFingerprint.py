@@ -0,0 +1,149 @@
+"""
+# -*- coding: utf-8 -*-
+# ===============================================================================
+#
+# Copyright (C) 2013/2025 Laurent Labatut / Laurent Champagnac
+#
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ===============================================================================
+"""
+import logging
+import re
+from threading import Lock
+
+from pysolmeters.Meters import Meters
+
+from pysolmysql.Pool.latency_meters import LatencyMeters
+
+logger = logging.getLogger(__name__)
+
+
+class MysqlFingerprint(object):
+    """
+    Statement fingerprint (literals stripped) and per fingerprint meters.
+
+    Fingerprints are cached by statement (the cache is flushed when full).
+    The number of distinct fingerprints is bounded, above the limit statements are accounted under FINGERPRINT_OVERFLOW.
+    """
+
+    # Max distinct fingerprints
+    FINGERPRINT_MAX = 256
+
+    # Max cached statements
+    CACHE_MAX = 10000
+
+    # Fingerprint used when FINGERPRINT_MAX is reached
+    FINGERPRINT_OVERFLOW = "__overflow__"
+
+    # Lock
+    FP_LOCK = Lock()
+
+    # Statement => fingerprint
+    D_CACHE = dict()
+
+    # Fingerprint => meters tags
+    D_FINGERPRINT = dict()
+
+    # Regex (order matters)
+    _RE_COMMENT = re.compile(r"/\*.*?\*/|(?:--|#)[^\n]*", re.S)
+    _RE_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\"", re.S)
+    _RE_NUMBER = re.compile(r"(?<![\w`])[-+]?(?:0x[0-9a-fA-F]+|\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)(?![\w`])")
+    _RE_SPACE = re.compile(r"\s+")
+    _RE_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+    _RE_VALUES_LIST = re.compile(r"(values\s*\(\?\+?\))(?:\s*,\s*\(\?\+?\))+")
+
+    @classmethod
+    def reset(cls):
+        """
+        Reset cache and fingerprints
+        """
+
+        with cls.FP_LOCK:
+            cls.D_CACHE = dict()
+            cls.D_FINGERPRINT = dict()
+
+    @classmethod
+    def normalize(cls, statement):
+        """
+        Normalize a statement (no cache, no bound)
+        :param statement: str
+        :type statement: str
+        :return str
+        :rtype str
+        """
+
+        s = cls._RE_COMMENT.sub(" ", statement)
+        s = cls._RE_STRING.sub("?", s)
+        s = cls._RE_NUMBER.sub("?", s)
+        s = cls._RE_SPACE.sub(" ", s).strip().rstrip(";").strip().lower()
+        s = cls._RE_IN_LIST.sub("(?+)", s)
+        s = cls._RE_VALUES_LIST.sub(r"\1+", s)
+        return s
+
+    @classmethod
+    def get(cls, statement):
+        """
+        Get fingerprint for a statement (cached, bounded)
+        :param statement: str
+        :type statement: str
+        :return str
+        :rtype str
+        """
+
+        fp = cls.D_CACHE.get(statement)
+        if fp is not None:
+            return fp
+
+        fp = cls.normalize(statement)
+        with cls.FP_LOCK:
+            if fp not in cls.D_FINGERPRINT:
+                if len(cls.D_FINGERPRINT) >= cls.FINGERPRINT_MAX:
+                    Meters.aii("k.db_api.fp.overflow")
+                    fp = cls.FINGERPRINT_OVERFLOW
+                cls.D_FINGERPRINT[fp] = {"fp": fp}
+            if len(cls.D_CACHE) >= cls.CACHE_MAX:
+                cls.D_CACHE = dict()
+            cls.D_CACHE[statement] = fp
+        return fp
+
+    @classmethod
+    def meters_put(cls, statement, ms, rows, ex):
+        """
+        Record meters for a statement execution
+        :param statement: str
+        :type statement: str
+        :param ms: execution time in millis
+        :type ms: float
+        :param rows: rows returned or affected
+        :type rows: int
+        :param ex: Exception raised, if any
+        :type ex: Exception,None
+        :return str (fingerprint)
+        :rtype str
+        """
+
+        fp = cls.get(statement)
+        # Fingerprint may be gone meanwhile (concurrent reset)
+        tags = cls.D_FINGERPRINT.get(fp) or {"fp": fp}
+
+        Meters.aii("k.db_api.fp.count", tags=tags)
+        LatencyMeters.put("k.db_api.fp.ms", ms, tags=tags)
+        if ex is not None:
+            Meters.aii("k.db_api.fp.ex", tags=tags)
+        elif rows:
+            Meters.aii("k.db_api.fp.rows", increment_value=rows, tags=tags)
+        return fp
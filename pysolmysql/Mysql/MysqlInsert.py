@@ -0,0 +1,127 @@
+"""
+# -*- coding: utf-8 -*-
+# ===============================================================================
+#
+# Copyright (C) 2013/2025 Laurent Labatut / Laurent Champagnac
+#
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ===============================================================================
+"""
+import logging
+
+from pymysql.converters import escape_item
+
+from pysolmysql.Mysql.MysqlLoadData import MysqlLoadData
+
+logger = logging.getLogger(__name__)
+
+
+class MysqlInsert(object):
+    """
+    Multi-row INSERT statement builder, chunked by row count and statement size.
+    """
+
+    # Default max statement size (bytes, below max_allowed_packet)
+    MAX_STATEMENT_BYTES = 1024 * 1024
+
+    # Default max rows per statement
+    MAX_ROWS = 1000
+
+    @classmethod
+    def prefix(cls, table, columns, ignore=False):
+        """
+        Statement prefix : INSERT INTO table (columns) VALUES
+        :param table: table (or db.table)
+        :type table: str
+        :param columns: column names
+        :type columns: list,tuple
+        :param ignore: If true, INSERT IGNORE
+        :type ignore: bool
+        :return str
+        :rtype str
+        """
+
+        return "INSERT %sINTO %s (%s) VALUES " % (
+            "IGNORE " if ignore else "", MysqlLoadData.quote_identifier(table), ",".join(MysqlLoadData.quote_identifier(c) for c in columns))
+
+    @classmethod
+    def values(cls, row, column_count):
+        """
+        Row values literal : (v1,v2,...)
+        :param row: row values
+        :type row: list,tuple
+        :param column_count: expected value count
+        :type column_count: int
+        :return str
+        :rtype str
+        """
+
+        if len(row) != column_count:
+            raise Exception("Invalid row len, expecting=%s, having=%s" % (column_count, len(row)))
+        return "(" + ",".join([escape_item(v, "utf8") for v in row]) + ")"
+
+    @classmethod
+    def byte_len(cls, s):
+        """
+        Size of a statement part once sent (utf-8)
+        :param s: str
+        :type s: str
+        :return int
+        :rtype int
+        """
+
+        # Ascii : no encoding needed (most rows)
+        if s.isascii():
+            return len(s)
+        return len(s.encode("utf-8"))
+
+    @classmethod
+    def iter_statements(cls, prefix, rows, column_count, suffix="", max_rows=None, max_bytes=None):
+        """
+        Build multi-row statements, yielding (statement, row count). Rows are consumed lazily.
+        :param prefix: statement prefix (see prefix)
+        :type prefix: str
+        :param rows: iterable of rows
+        :type rows: collections.abc.Iterable
+        :param column_count: value count per row
+        :type column_count: int
+        :param suffix: statement suffix (ON DUPLICATE KEY UPDATE...)
+        :type suffix: str
+        :param max_rows: max rows per statement (None : MAX_ROWS)
+        :type max_rows: int,None
+        :param max_bytes: max statement size, in utf-8 bytes (None : MAX_STATEMENT_BYTES), a single larger row is sent alone
+        :type max_bytes: int,None
+        :return generator of tuple
+        :rtype collections.abc.Iterator
+        """
+
+        max_rows = max_rows or cls.MAX_ROWS
+        max_bytes = max_bytes or cls.MAX_STATEMENT_BYTES
+        base_size = cls.byte_len(prefix) + cls.byte_len(suffix) + 1
+        ar = list()
+        size = base_size
+        for row in rows:
+            v = cls.values(row, column_count)
+            v_size = cls.byte_len(v)
+            if ar and (len(ar) >= max_rows or size + v_size + 1 > max_bytes):
+                yield prefix + ",".join(ar) + suffix + ";", len(ar)
+                ar = list()
+                size = base_size
+            ar.append(v)
+            size += v_size + 1
+        if ar:
+            yield prefix + ",".join(ar) + suffix + ";", len(ar)
@@ -0,0 +1,152 @@
+"""
+# -*- coding: utf-8 -*-
+# ===============================================================================
+#
+# Copyright (C) 2013/2025 Laurent Labatut / Laurent Champagnac
+#
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ===============================================================================
+"""
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+
+class MysqlLoadData(object):
+    """
+    LOAD DATA LOCAL INFILE helpers : statement builder and streaming serializer (tab separated, backslash escaped, \\N for NULL).
+    """
+
+    # Serializer chunk size (bytes), the driver splits chunks into packets
+    CHUNK_BYTES = 64 * 1024
+
+    # File name sent to the server (content is streamed, no file is read)
+    STREAM_NAME = "pysolmysql.stream"
+
+    # Escaping
+    _RE_ESCAPE = re.compile(b"[\\\\\t\n\r\x00]")
+    _D_ESCAPE = {b"\\": b"\\\\", b"\t": b"\\t", b"\n": b"\\n", b"\r": b"\\r", b"\x00": b"\\0"}
+
+    @classmethod
+    def quote_identifier(cls, name):
+        """
+        Quote an identifier (db.table supported)
+        :param name: identifier
+        :type name: str
+        :return str
+        :rtype str
+        """
+
+        return ".".join("`%s`" % s.replace("`", "``") for s in name.split("."))
+
+    @classmethod
+    def statement(cls, table, columns):
+        """
+        Build the LOAD DATA LOCAL INFILE statement
+        :param table: table
+        :type table: str
+        :param columns: column names
+        :type columns: list,tuple
+        :return str
+        :rtype str
+        """
+
+        return ("LOAD DATA LOCAL INFILE '%s' INTO TABLE %s CHARACTER SET utf8mb4 "
+                "FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' (%s);") % (
+            cls.STREAM_NAME, cls.quote_identifier(table), ",".join(cls.quote_identifier(c) for c in columns))
+
+    @classmethod
+    def _escape(cls, b):
+        """
+        Escape bytes
+        :param b: bytes
+        :type b: bytes
+        :return bytes
+        :rtype bytes
+        """
+
+        return cls._RE_ESCAPE.sub(lambda m: cls._D_ESCAPE[m.group()], b)
+
+    @classmethod
+    def serialize_value(cls, v):
+        """
+        Serialize a value
+        :param v: value
+        :type v: object
+        :return bytes
+        :rtype bytes
+        """
+
+        if v is None:
+            return b"\\N"
+        elif isinstance(v, bool):
+            return b"1" if v else b"0"
+        elif isinstance(v, int):
+            return str(v).encode("ascii")
+        elif isinstance(v, float):
+            return repr(v).encode("ascii")
+        elif isinstance(v, (bytes, bytearray)):
+            return cls._escape(bytes(v))
+        else:
+            return cls._escape(str(v).encode("utf-8"))
+
+    @classmethod
+    def serialize_row(cls, row, column_count):
+        """
+        Serialize a row (line)
+        :param row: row values
+        :type row: list,tuple
+        :param column_count: expected value count
+        :type column_count: int
+        :return bytes
+        :rtype bytes
+        """
+
+        if len(row) != column_count:
+            raise Exception("Invalid row len, expecting=%s, having=%s" % (column_count, len(row)))
+        return b"\t".join([cls.serialize_value(v) for v in row]) + b"\n"
+
+    @classmethod
+    def iter_chunk(cls, rows, column_count, d_count):
+        """
+        Serialize rows, yielding chunks of about CHUNK_BYTES (rows are consumed lazily)
+        :param rows: iterable of rows (list or tuple of values)
+        :type rows: collections.abc.Iterable
+        :param column_count: value count per row
+        :type column_count: int
+        :param d_count: counters, "rows" and "bytes" are updated
+        :type d_count: dict
+        :return generator of bytes
+        :rtype collections.abc.Iterator
+        """
+
+        ar = list()
+        size = 0
+        for row in rows:
+            b = cls.serialize_row(row, column_count)
+            ar.append(b)
+            size += len(b)
+            d_count["rows"] += 1
+            if size >= cls.CHUNK_BYTES:
+                d_count["bytes"] += size
+                yield b"".join(ar)
+                ar = list()
+                size = 0
+        if ar:
+            d_count["bytes"] += size
+            yield b"".join(ar)
@@ -0,0 +1,255 @@
+"""
+# -*- coding: utf-8 -*-
+# ===============================================================================
+#
+# Copyright (C) 2013/2025 Laurent Labatut / Laurent Champagnac
+#
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ===============================================================================
+"""
+import logging
+import re
+
+from pysolbase.SolBase import SolBase
+from pysolmeters.Meters import Meters
+
+from pysolmysql.Pool.latency_meters import LatencyMeters
+
+logger = logging.getLogger(__name__)
+
+
+class MysqlPrometheus(object):
+    """
+    Prometheus text exposition (format 0.0.4) of pysolmysql meters (k.db_pool.*, k.db_api.*).
+
+    - meter keys are mapped to metric names : "k.db_pool.pool.maxed" => "pysolmysql_db_pool_pool_maxed"
+    - meter tags are labels (pool, host, priority...)
+    - counters get a "_total" suffix, keys in GAUGES are gauges
+    - latencies (LatencyMeters) are histograms (millis buckets, cumulative, _sum, _count)
+
+    Meters are read through public accessors (Meters.meters_to_udp_format, LatencyMeters.items).
+    Metric names and label strings are cached per meter (render cost : one pass over the meters).
+    """
+
+    # Metric name prefix
+    NAMESPACE = "pysolmysql"
+
+    # Exported meters
+    KEY_PREFIX = "k.db_"
+
+    # Meters set (or incremented and decremented) : gauges
+    GAUGES = frozenset([
+        "k.db_api.bw.queue",
+        "k.db_pool.adaptive.limit",
+        "k.db_pool.adaptive.server_load_pct",
+        "k.db_pool.base.cur_size",
+        "k.db_pool.base.max_size",
+        "k.db_pool.breaker.state",
+        "k.db_pool.budget.max",
+        "k.db_pool.budget.used",
+        "k.db_pool.hash.cur",
+        "k.db_pool.pool.idle",
+        "k.db_pool.pool.in_use",
+        "k.db_pool.pool.size",
+    ])
+
+    # Content type
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    # (meter key, sorted tags items) => (metric name, type, labels string), flushed when full
+    D_CACHE = dict()
+    CACHE_MAX = 10000
+
+    _RE_NAME = re.compile(r"[^a-zA-Z0-9_]")
+
+    @classmethod
+    def _escape(cls, v):
+        """
+        Escape a label value
+        :param v: object
+        :type v: object
+        :return str
+        :rtype str
+        """
+
+        return str(v).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+    @classmethod
+    def _describe(cls, key, tags_items, histogram):
+        """
+        Get metric name, type and labels string of a meter (cached)
+        :param key: meter key
+        :type key: str
+        :param tags_items: sorted tags items
+        :type tags_items: tuple
+        :param histogram: If true, latency histogram
+        :type histogram: bool
+        :return tuple (name, type, labels), None if not exported
+        :rtype tuple,None
+        """
+
+        cache_key = (key, tags_items)
+        d = cls.D_CACHE.get(cache_key)
+        if d is not None or cache_key in cls.D_CACHE:
+            return d
+
+        if not key.startswith(cls.KEY_PREFIX):
+            d = None
+        else:
+            name = cls.NAMESPACE + "_" + cls._RE_NAME.sub("_", key[2:])
+            if histogram:
+                t = "histogram"
+            elif key in cls.GAUGES:
+                t = "gauge"
+            else:
+                t = "counter"
+                name += "_total"
+            labels = ",".join("%s=\"%s\"" % (cls._RE_NAME.sub("_", str(k)), cls._escape(v)) for k, v in tags_items)
+            d = (name, t, labels)
+
+        if len(cls.D_CACHE) >= cls.CACHE_MAX:
+            cls.D_CACHE = dict()
+        cls.D_CACHE[cache_key] = d
+        return d
+
+    @classmethod
+    def _value(cls, v):
+        """
+        Format a value
+        :param v: int,float
+        :type v: int,float
+        :return str
+        :rtype str
+        """
+
+        if isinstance(v, float):
+            return repr(v)
+        return str(v)
+
+    @classmethod
+    def render(cls):
+        """
+        Render meters in prometheus text format
+        :return str
+        :rtype str
+        """
+
+        # Metric name => (type, lines), samples of a metric must be grouped
+        d_family = dict()
+
+        # Counters, gauges : [key, tags, value, epoch, additional tags]
+        for ar in Meters.meters_to_udp_format(send_tags=True, send_dtc=False):
+            key, d_tags, v = ar[0], ar[1], ar[2]
+            if not key.startswith(cls.KEY_PREFIX):
+                continue
+            name, t, labels = cls._describe(key, tuple(sorted(d_tags.items())), False)
+            family = d_family.get(name)
+            if family is None:
+                family = d_family[name] = (t, list())
+            family[1].append("%s{%s} %s" % (name, labels, cls._value(v)) if labels else "%s %s" % (name, cls._value(v)))
+
+        # Latencies
+        for (key, tags_items), h in LatencyMeters.items():
+            desc = cls._describe(key, tags_items, True)
+            if desc is None:
+                continue
+            name, t, labels = desc
+            family = d_family.get(name)
+            if family is None:
+                family = d_family[name] = (t, list())
+            cls._render_histogram(family[1], name, labels, h)
+
+        ar_out = list()
+        for name in sorted(d_family.keys()):
+            t, ar_line = d_family[name]
+            ar_out.append("# TYPE %s %s" % (name, t))
+            ar_out.extend(ar_line)
+        ar_out.append("")
+        return "\n".join(ar_out)
+
+    @classmethod
+    def _render_histogram(cls, ar_line, name, labels, h):
+        """
+        Render a latency histogram as cumulative buckets (le : bucket upper bound, inclusive), _sum and _count
+        :param ar_line: output lines
+        :type ar_line: list
+        :param name: metric name
+        :type name: str
+        :param labels: labels string
+        :type labels: str
+        :param h: histogram (see LatencyMeters.get)
+        :type h: list
+        """
+
+        sep = labels + "," if labels else ""
+        total = 0
+        for i, ms in enumerate(LatencyMeters.BUCKETS):
+            total += h[i]
+            ar_line.append("%s_bucket{%sle=\"%s\"} %s" % (name, sep, ms, total))
+        total += h[len(LatencyMeters.BUCKETS)]
+        ar_line.append("%s_bucket{%sle=\"+Inf\"} %s" % (name, sep, total))
+        if labels:
+            ar_line.append("%s_sum{%s} %s" % (name, labels, cls._value(float(h[-1]))))
+            ar_line.append("%s_count{%s} %s" % (name, labels, total))
+        else:
+            ar_line.append("%s_sum %s" % (name, cls._value(float(h[-1]))))
+            ar_line.append("%s_count %s" % (name, total))
+
+    @classmethod
+    def wsgi_app(cls, environ, start_response):
+        """
+        WSGI application : GET /metrics
+        :param environ: dict
+        :type environ: dict
+        :param start_response: callable
+        :type start_response: collections.abc.Callable
+        :return list of bytes
+        :rtype list
+        """
+
+        if environ.get("PATH_INFO", "/") not in ("/metrics", "/"):
+            start_response("404 Not Found", [("Content-Type", "text/plain")])
+            return [b"Not found\n"]
+
+        try:
+            buf = cls.render().encode("utf-8")
+        except Exception as e:
+            logger.warning("Render failed, ex=%s", SolBase.extostr(e))
+            start_response("500 Internal Server Error", [("Content-Type", "text/plain")])
+            return [b"Render failed\n"]
+
+        start_response("200 OK", [("Content-Type", cls.CONTENT_TYPE), ("Content-Length", str(len(buf)))])
+        return [buf]
+
+    @classmethod
+    def start_server(cls, host="0.0.0.0", port=9104):
+        """
+        Start a gevent WSGI server exposing GET /metrics (optional, render can be plugged in any web framework instead)
+        :param host: listen address
+        :type host: str
+        :param port: listen port (0 : random, see server.server_port)
+        :type port: int
+        :return gevent.pywsgi.WSGIServer (to stop : server.stop())
+        :rtype gevent.pywsgi.WSGIServer
+        """
+
+        from gevent.pywsgi import WSGIServer
+
+        server = WSGIServer((host, port), cls.wsgi_app, log=None)
+        server.start()
+        logger.info("Prometheus endpoint started, address=%s:%s/metrics", host, server.server_port)
+        return server
@@ -0,0 +1,131 @@
+"""
+# -*- coding: utf-8 -*-
+# ===============================================================================
+#
+# Copyright (C) 2013/2025 Laurent Labatut / Laurent Champagnac
+#
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ===============================================================================
+"""
+from collections.abc import Mapping
+
+
+class MysqlRow(Mapping):
+    """
+    Read only row, dict interface (row["col"], get, keys, items...), over the tuple returned by the driver.
+
+    All rows of a result set share one column map (see columns_from_description).
+    Value types are fixed (bytearray => str) when a column is accessed, not when the row is fetched.
+    """
+
+    __slots__ = ("_values", "_columns")
+
+    def __init__(self, values, columns):
+        """
+        Init
+        :param values: row values
+        :type values: tuple
+        :param columns: shared column map, (dict column => index, fix_types)
+        :type columns: tuple
+        """
+
+        self._values = values
+        self._columns = columns
+
+    @classmethod
+    def columns_from_description(cls, description, fix_types=True):
+        """
+        Build the shared column map from a cursor description
+        :param description: cursor description (tuple of tuple, name first)
+        :type description: tuple
+        :param fix_types: If true, fix data type on access
+        :type fix_types: bool
+        :return tuple
+        :rtype tuple
+        """
+
+        return {d[0]: i for i, d in enumerate(description)}, fix_types
+
+    @classmethod
+    def from_rows(cls, rows, description, fix_types=True):
+        """
+        Wrap driver tuple rows
+        :param rows: tuple rows
+        :type rows: list,tuple
+        :param description: cursor description
+        :type description: tuple,None
+        :param fix_types: If true, fix data type on access
+        :type fix_types: bool
+        :return list of MysqlRow
+        :rtype list
+        """
+
+        if not description:
+            return list()
+        columns = cls.columns_from_description(description, fix_types)
+        return [cls(values, columns) for values in rows]
+
+    def __getitem__(self, key):
+        """
+        Get a column value
+        :param key: column name
+        :type key: str
+        :return object
+        :rtype object
+        """
+
+        v = self._values[self._columns[0][key]]
+        if self._columns[1] and isinstance(v, bytearray):
+            return v.decode("utf-8")
+        return v
+
+    def __iter__(self):
+        """
+        Iterate column names
+        """
+
+        return iter(self._columns[0])
+
+    def __len__(self):
+        """
+        Column count
+        """
+
+        return len(self._values)
+
+    def __contains__(self, key):
+        """
+        Column presence
+        """
+
+        return key in self._columns[0]
+
+    def to_dict(self):
+        """
+        Get a plain dict (all columns decoded)
+        :return dict
+        :rtype dict
+        """
+
+        return dict(self.items())
+
+    def __repr__(self):
+        """
+        Repr
+        """
+
+        return "MysqlRow(%r)" % self.to_dict()
@@ -0,0 +1,115 @@
+"""
+# -*- coding: utf-8 -*-
+# ===============================================================================
+#
+# Copyright (C) 2013/2025 Laurent Labatut / Laurent Champagnac
+#
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ===============================================================================
+"""
+import logging
+
+from pymysql.converters import escape_item
+
+from pysolmysql.Mysql.MysqlLoadData import MysqlLoadData
+
+logger = logging.getLogger(__name__)
+
+
+class MysqlScan(object):
+    """
+    Keyset pagination statement builder : WHERE key > last ORDER BY key LIMIT n (constant cost per page, unlike LIMIT / OFFSET).
+
+    Key columns must be unique and not null (primary key, or unique index), composite keys are compared as row constructors.
+    """
+
+    # Default page size
+    PAGE_SIZE = 1000
+
+    @classmethod
+    def key_columns(cls, key_column):
+        """
+        Get key columns as a tuple
+        :param key_column: key column, or list of key columns (composite key)
+        :type key_column: str,list,tuple
+        :return tuple
+        :rtype tuple
+        """
+
+        if isinstance(key_column, str):
+            return key_column,
+        return tuple(key_column)
+
+    @classmethod
+    def statement(cls, table, key_columns, columns=None, where=None, after=None, page_size=None):
+        """
+        Build a page statement
+        :param table: table (or db.table)
+        :type table: str
+        :param key_columns: key columns
+        :type key_columns: tuple
+        :param columns: selected columns (None : all), key columns are added if missing
+        :type columns: list,tuple,None
+        :param where: additional condition (sql, not escaped)
+        :type where: str,None
+        :param after: last key of the previous page (tuple, one value per key column), None : first page
+        :type after: tuple,None
+        :param page_size: rows per page (None : PAGE_SIZE)
+        :type page_size: int,None
+        :return str
+        :rtype str
+        """
+
+        if columns:
+            columns = list(columns) + [k for k in key_columns if k not in columns]
+            s_columns = ",".join(MysqlLoadData.quote_identifier(c) for c in columns)
+        else:
+            s_columns = "*"
+
+        ar_where = list()
+        if where:
+            ar_where.append("(%s)" % where)
+        if after is not None:
+            if len(after) != len(key_columns):
+                raise Exception("Invalid key, expecting=%s values, having=%s" % (len(key_columns), after))
+            if len(key_columns) == 1:
+                ar_where.append("%s > %s" % (MysqlLoadData.quote_identifier(key_columns[0]), escape_item(after[0], "utf8")))
+            else:
+                ar_where.append("(%s) > (%s)" % (
+                    ",".join(MysqlLoadData.quote_identifier(k) for k in key_columns), ",".join(escape_item(v, "utf8") for v in after)))
+
+        return "SELECT %s FROM %s%s ORDER BY %s LIMIT %d;" % (
+            s_columns,
+            MysqlLoadData.quote_identifier(table),
+            " WHERE " + " AND ".join(ar_where) if ar_where else "",
+            ",".join(MysqlLoadData.quote_identifier(k) for k in key_columns),
+            page_size or cls.PAGE_SIZE,
+        )
+
+    @classmethod
+    def key_of(cls, row, key_columns):
+        """
+        Get the key of a row
+        :param row: dict (or MysqlRow)
+        :type row: dict
+        :param key_columns: key columns
+        :type key_columns: tuple
+        :return tuple
+        :rtype tuple
+        """
+
+        return tuple(row[k] for k in key_columns)
@@ -0,0 +1,133 @@
+"""
+# -*- coding: utf-8 -*-
+# ===============================================================================
+#
+# Copyright (C) 2013/2025 Laurent Labatut / Laurent Champagnac
+#
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ===============================================================================
+"""
+import logging
+import time
+from contextlib import closing
+
+import gevent
+from pysolbase.SolBase import SolBase
+from pysolmeters.Meters import Meters
+
+logger = logging.getLogger(__name__)
+
+
+class MysqlSlowQuery(object):
+    """
+    Slow query log, with optional asynchronous EXPLAIN capture (SELECT only).
+
+    Configured via conf_dict :
+    - "slow_query_ms" : threshold in millis (None or 0 : disabled)
+    - "slow_query_explain" : if True, run EXPLAIN asynchronously on a separate pooled connection (default False), skipped if the pool is at its limit
+    - "slow_query_explain_interval_sec" : minimal interval between two EXPLAIN of the same fingerprint (default 60)
+    """
+
+    # Max logged statement length
+    STATEMENT_LOG_MAX = 4096
+
+    # Fingerprint => last EXPLAIN epoch
+    D_EXPLAIN_LAST = dict()
+
+    @classmethod
+    def reset(cls):
+        """
+        Reset
+        """
+
+        cls.D_EXPLAIN_LAST = dict()
+
+    @classmethod
+    def check(cls, conf_dict, pool, statement, fp, ms, host, rows, explain=True):
+        """
+        Check an executed statement against the slow query threshold, log it and schedule EXPLAIN if required
+        :param conf_dict: configuration dict
+        :type conf_dict: dict
+        :param pool: pool used to run EXPLAIN
+        :type pool: pysolmysql.Pool.mysql_pool.MysqlConnectionPool
+        :param statement: statement executed
+        :type statement: str
+        :param fp: statement fingerprint
+        :type fp: str
+        :param ms: execution time in millis
+        :type ms: float
+        :param host: host the statement was executed on
+        :type host: str,None
+        :param rows: rows returned or affected
+        :type rows: int
+        :param explain: If false, never EXPLAIN (prepared statements : placeholders, no bound text)
+        :type explain: bool
+        :return bool (True if slow)
+        :rtype bool
+        """
+
+        slow_ms = conf_dict.get("slow_query_ms")
+        if not slow_ms or ms < slow_ms:
+            return False
+
+        Meters.aii("k.db_api.slow.count")
+        logger.warning("Slow query, ms=%.1f, host=%s, rows=%s, statement=%s", ms, host, rows, statement[:cls.STATEMENT_LOG_MAX])
+
+        # Explain, SELECT only, rate limited per fingerprint
+        if not explain or not conf_dict.get("slow_query_explain", False) or not fp.startswith("select"):
+            return True
+
+        now = time.time()
+        if now - cls.D_EXPLAIN_LAST.get(fp, 0.0) < conf_dict.get("slow_query_explain_interval_sec", 60):
+            Meters.aii("k.db_api.slow.explain_skip")
+            return True
+        # Pool at its limit : a diagnostic must not take a slot from callers
+        if pool.pool.qsize() == 0 and pool.size >= pool.limit:
+            Meters.aii("k.db_api.slow.explain_skip")
+            return True
+        cls.D_EXPLAIN_LAST[fp] = now
+
+        gevent.spawn(cls._explain, pool, statement, fp)
+        return True
+
+    @classmethod
+    def _explain(cls, pool, statement, fp):
+        """
+        Run EXPLAIN on a separate pooled connection and log the plan
+        Must not raise anything.
+        :param pool: pool
+        :type pool: pysolmysql.Pool.mysql_pool.MysqlConnectionPool
+        :param statement: statement
+        :type statement: str
+        :param fp: statement fingerprint
+        :type fp: str
+        """
+
+        cnx = None
+        try:
+            cnx = pool.connection_acquire()
+            with closing(pool.driver.cursor(cnx)) as cur:
+                cur.execute("EXPLAIN " + statement)
+                ar_plan = cur.fetchall()
+            Meters.aii("k.db_api.slow.explain")
+            for d_plan in ar_plan:
+                logger.warning("Slow query plan, fp=%s, plan=%s", fp, d_plan)
+        except Exception as e:
+            Meters.aii("k.db_api.slow.explain_ex")
+            logger.warning("Slow query explain failed, fp=%s, ex=%s", fp, SolBase.extostr(e))
+        finally:
+            pool.connection_release(cnx)
@@ -23,11 +23,20 @@
 """
 
 import logging
-from threading import Lock
+import time
 
+# noinspection PyUnresolvedReferences
+import gevent
+import ujson
 from gevent import queue
+from gevent.event import AsyncResult
+from gevent.lock import Semaphore
+from pysolbase.SolBase import SolBase
 
 from pysolmeters.Meters import Meters
+from pysolmysql.Pool.hooks import Hooks
+from pysolmysql.Pool.latency_meters import LatencyMeters
+from pysolmysql.Pool.priority_class import PriorityClass
 
 logger = logging.getLogger(__name__)
 
@@ -45,7 +54,8 @@ class DatabaseConnectionPool(object):
         """
 
         # Lock for acquire/release
-        self.pool_lock = Lock()
+        # Gevent aware : connection create/ping yield while holding it (a threading.Lock imported before monkey patching would block the hub)
+        self.pool_lock = Semaphore()
 
         # Store
         self.conf_dict = conf_dict
@@ -53,59 +63,469 @@ class DatabaseConnectionPool(object):
         # Max size
         self.max_size = self.conf_dict.get("pool_max_size", 10)
 
+        # Per process sizing (pre-forking servers) : workers x max_size must fit within the server max connections
+        max_connections = self.conf_dict.get("pool_max_connections")
+        if max_connections:
+            self.max_size = max(1, min(self.max_size, max_connections // self.conf_dict.get("pool_worker_count", 1)))
+
         # Alloc
         self.pool = queue.Queue(maxsize=self.max_size)
 
+        # Adaptive sizing : effective limit, between min_size and max_size, driven by acquire feedback (see _adaptive_check)
+        self.adaptive = self.conf_dict.get("pool_adaptive", False)
+        self.min_size = max(1, min(self.max_size, self.conf_dict.get("pool_min_size", 1)))
+        self.limit = self.min_size if self.adaptive else self.max_size
+        self.adaptive_interval_sec = self.conf_dict.get("pool_adaptive_interval_sec", 5.0)
+        self.adaptive_wait_ms = self.conf_dict.get("pool_adaptive_wait_ms", 5.0)
+        self.adaptive_server_ratio = self.conf_dict.get("pool_adaptive_server_ratio")
+        self.adaptive_backoff = False
+        self.adaptive_server_greenlet = None
+        self._adaptive_reset(time.time())
+
         # Init
         self.size = 0
 
-    def connection_acquire(self):
+        # Name (for per pool meters), default to conf_dict hash
+        self.pool_name = self.conf_dict.get("pool_name") or str(hash(ujson.dumps(self.conf_dict, sort_keys=True)))
+        self.meters_tags = {"pool": self.pool_name}
+
+        # Priority classes (optional), sorted by priority, and connection id => PriorityClass (in use connections)
+        self.ar_priority = PriorityClass.from_conf(self.pool_name, self.conf_dict["pool_priorities"], self.max_size) if self.conf_dict.get("pool_priorities") else list()
+        self.d_priority = {pc.name: pc for pc in self.ar_priority}
+        self.d_conn_priority = dict()
+
+        # Connection id => acquire millis (in use connections)
+        self.d_acquired = dict()
+
+        # Local counters (for stats)
+        self.count_acquire = 0
+        self.count_maxed = 0
+        self.count_create = 0
+
+        # Process wide connection budget (pysolmysql.Pool.connection_budget.ConnectionBudget, set by register)
+        self.budget = None
+
+        # Last acquire/release epoch (LRU eviction)
+        self.last_used = time.time()
+
+    def stats(self):
+        """
+        Get a pool stats snapshot
+        :return dict
+        :rtype dict
+        """
+
+        d = {
+            "pool_name": self.pool_name,
+            "size": self.size,
+            "max_size": self.max_size,
+            "limit": self.limit,
+            "idle": self.pool.qsize(),
+            "in_use": len(self.d_acquired),
+            "acquire": self.count_acquire,
+            "maxed": self.count_maxed,
+            "create": self.count_create,
+        }
+        if self.ar_priority:
+            d["priorities"] = {pc.name: pc.stats() for pc in self.ar_priority}
+        return d
+
+    def _meters_gauges(self):
+        """
+        Update per pool gauges
+        """
+
+        Meters.ai("k.db_pool.pool.size", tags=self.meters_tags).set(self.size)
+        Meters.ai("k.db_pool.pool.idle", tags=self.meters_tags).set(self.pool.qsize())
+        Meters.ai("k.db_pool.pool.in_use", tags=self.meters_tags).set(len(self.d_acquired))
+
+    def _adaptive_reset(self, now):
+        """
+        Start a new adaptive interval
+        :param now: epoch
+        :type now: float
+        """
+
+        self.adaptive_last = now
+        self.adaptive_wait_sum = 0.0
+        self.adaptive_wait_count = 0
+        self.adaptive_grow_count = 0
+        self.adaptive_idle_low = self.pool.qsize()
+
+    def _adaptive_set_limit(self, limit, reason):
+        """
+        Set the effective limit, closing idle connections above it
+        :param limit: new limit
+        :type limit: int
+        :param reason: reason (meters, logs)
+        :type reason: str
+        """
+
+        limit = max(self.min_size, min(self.max_size, limit))
+        if limit == self.limit:
+            return
+        Meters.aii("k.db_pool.adaptive.grow" if limit > self.limit else "k.db_pool.adaptive.shrink", tags=self.meters_tags)
+        logger.debug("Adaptive limit %s => %s, reason=%s, pool=%s", self.limit, limit, reason, self.pool_name)
+        self.limit = limit
+        Meters.ai("k.db_pool.adaptive.limit", tags=self.meters_tags).set(self.limit)
+
+        # Close idle connections above the limit
+        n = 0
+        while self.size - n > self.limit and self.pool.qsize() > 0:
+            self._connection_close(self.pool.get_nowait())
+            n += 1
+        if n > 0:
+            self._slot_release(n)
+
+    def _adaptive_grow(self):
+        """
+        Grow the effective limit now (maxed at limit), unless backing off
+        :return bool (True if a new connection can be created)
+        :rtype bool
+        """
+
+        if self.adaptive_backoff or self.limit >= self.max_size:
+            return False
+        self.adaptive_grow_count += 1
+        self._adaptive_set_limit(self.limit + max(1, self.limit // 2), "maxed")
+        return self.size < self.limit
+
+    def _adaptive_check(self):
+        """
+        Adaptive sizing, once per interval (called on acquire, under lock) :
+        - server load (optional) : read in background (see _adaptive_server_check), no grow while backing off
+        - average acquire wait at or above pool_adaptive_wait_ms : grow (x1.5)
+        - connections idle over the whole interval (and no grow) : shrink by half of them
+        """
+
+        # Idle low water mark
+        idle = self.pool.qsize()
+        if idle < self.adaptive_idle_low:
+            self.adaptive_idle_low = idle
+
+        now = time.time()
+        if now - self.adaptive_last < self.adaptive_interval_sec:
+            return
+
+        # Server load : network i/o, not under lock
+        if self.adaptive_server_ratio and self.adaptive_server_greenlet is None:
+            self.adaptive_server_greenlet = gevent.spawn(self._adaptive_server_check)
+        if self.adaptive_backoff:
+            self._adaptive_reset(now)
+            return
+
+        wait_avg = self.adaptive_wait_sum / self.adaptive_wait_count if self.adaptive_wait_count else 0.0
+        if wait_avg >= self.adaptive_wait_ms:
+            self._adaptive_set_limit(self.limit + max(1, self.limit // 2), "wait")
+        elif self.adaptive_grow_count == 0 and self.adaptive_idle_low > 0:
+            self._adaptive_set_limit(self.limit - max(1, self.adaptive_idle_low // 2), "idle")
+        self._adaptive_reset(now)
+
+    def _adaptive_server_check(self):
+        """
+        Read the server load (outside the lock) : if at or above pool_adaptive_server_ratio, back off (shrink by one, no grow until next check)
+        """
+
+        try:
+            load = self._server_load()
+            with self.pool_lock:
+                self.adaptive_backoff = load is not None and load >= self.adaptive_server_ratio
+                if self.adaptive_backoff:
+                    Meters.aii("k.db_pool.adaptive.backoff", tags=self.meters_tags)
+                    self._adaptive_set_limit(min(self.limit, self.size) - 1, "server_load")
+        finally:
+            self.adaptive_server_greenlet = None
+
+    def _connection_create_timed(self):
+        """
+        Create a connection, recording per pool create latency
+        :return object
+        :rtype object
+        """
+
+        ms_start = SolBase.mscurrent()
+        conn = self._connection_create()
+        LatencyMeters.put("k.db_pool.pool.create_ms", SolBase.msdiff(ms_start), tags=self.meters_tags)
+        self.count_create += 1
+        return conn
+
+    def _connection_ping_timed(self, conn):
+        """
+        Ping a connection, recording per pool ping latency
+        :param conn: object
+        :type conn: object
+        :return bool
+        :rtype bool
+        """
+
+        ms_start = SolBase.mscurrent()
+        b = self._connection_ping(conn)
+        LatencyMeters.put("k.db_pool.pool.ping_ms", SolBase.msdiff(ms_start), tags=self.meters_tags)
+        return b
+
+    def _connection_acquired(self, conn, ms_start, pc=None):
+        """
+        Track an acquired connection, recording per pool (and per priority class) acquire latency
+        :param conn: object
+        :type conn: object
+        :param ms_start: acquire start millis
+        :type ms_start: float
+        :param pc: priority class, if any
+        :type pc: pysolmysql.Pool.priority_class.PriorityClass,None
+        :return object
+        :rtype object
+        """
+
+        ms = SolBase.mscurrent()
+        self.last_used = ms / 1000.0
+        self.d_acquired[id(conn)] = ms
+        self.count_acquire += 1
+        self.adaptive_wait_sum += ms - ms_start
+        self.adaptive_wait_count += 1
+        LatencyMeters.put("k.db_pool.pool.acquire_ms", ms - ms_start, tags=self.meters_tags)
+        if pc is not None:
+            pc.in_use += 1
+            self.d_conn_priority[id(conn)] = pc
+            LatencyMeters.put("k.db_pool.priority.wait_ms", ms - ms_start, tags=pc.tags)
+        self._meters_gauges()
+        return conn
+
+    def _connection_released(self, conn):
+        """
+        Untrack an acquired connection (released or discarded), recording per pool hold time
+        :param conn: object
+        :type conn: object
+        """
+
+        self.last_used = time.time()
+        ms_acquire = self.d_acquired.pop(id(conn), None)
+        if ms_acquire is not None:
+            LatencyMeters.put("k.db_pool.pool.hold_ms", SolBase.msdiff(ms_acquire), tags=self.meters_tags)
+        pc = self.d_conn_priority.pop(id(conn), None)
+        if pc is not None:
+            pc.in_use -= 1
+        if Hooks.RELEASE:
+            Hooks.fire(Hooks.RELEASE, {"pool": self.pool_name, "host": self.connection_host(conn), "ms": SolBase.msdiff(ms_acquire) if ms_acquire is not None else None})
+
+    def _priority_get(self, priority):
+        """
+        Get a priority class
+        :param priority: class name (None : default class)
+        :type priority: str,None
+        :return PriorityClass,None (None if priority classes are not configured)
+        :rtype PriorityClass,None
+        """
+
+        if not self.ar_priority:
+            return None
+        pc = self.d_priority.get(priority or PriorityClass.DEFAULT)
+        if pc is None:
+            raise Exception("Unknown priority=%s, pool=%s" % (priority, self.pool_name))
+        return pc
+
+    def _priority_allowed(self, pc):
+        """
+        Check if a priority class can take one more connection, keeping the reserved connections of the other classes available
+        :param pc: PriorityClass
+        :type pc: PriorityClass
+        :return bool
+        :rtype bool
+        """
+
+        # Effective limit (adaptive sizing may have shrunk it)
+        free = self.limit - len(self.d_acquired)
+        reserved = sum(c.unmet() for c in self.ar_priority if c is not pc)
+        return free - 1 >= reserved
+
+    def _priority_handoff(self, conn):
+        """
+        Hand over a released connection to the highest priority waiter allowed to take it
+        :param conn: object
+        :type conn: object
+        :return bool (True if handed over)
+        :rtype bool
+        """
+
+        for pc in self.ar_priority:
+            if pc.waiters and self._priority_allowed(pc):
+                waiter, ms_start = pc.waiters.popleft()
+                self._connection_acquired(conn, ms_start, pc)
+                waiter.set(conn)
+                return True
+        return False
+
+    def _priority_wake(self, n):
+        """
+        Wake the highest priority waiters allowed to take a connection (slots freed, waiters retry)
+        :param n: slot count
+        :type n: int
+        """
+
+        for pc in self.ar_priority:
+            while n > 0 and pc.waiters and self._priority_allowed(pc):
+                waiter, _ = pc.waiters.popleft()
+                waiter.set(None)
+                n -= 1
+
+    def _priority_wait(self, pc, entry, ms_left):
+        """
+        Wait for a connection handed over (or a slot freed)
+        :param pc: PriorityClass
+        :type pc: PriorityClass
+        :param entry: wait queue entry (gevent.event.AsyncResult, acquire start millis)
+        :type entry: tuple
+        :param ms_left: max wait
+        :type ms_left: float
+        :return object,None (None : not handed over, retry)
+        :rtype object,None
+        """
+
+        waiter = entry[0]
+        try:
+            # wait (not get) : does not raise on expiry, a caller gevent.Timeout goes through
+            waiter.wait(timeout=ms_left / 1000.0)
+        except BaseException:
+            # Killed (or caller timeout) while waiting : give back a connection handed over meanwhile
+            with self.pool_lock:
+                if entry in pc.waiters:
+                    pc.waiters.remove(entry)
+            if waiter.ready() and waiter.value is not None:
+                self.connection_release(waiter.value)
+            raise
+
+        with self.pool_lock:
+            if waiter.ready():
+                return waiter.value
+            pc.waiters.remove(entry)
+        return None
+
+    def connection_acquire(self, priority=None):
         """
         Get a connection
         # TODO : In case client cannot release (greenlet kill) : add a spawn_later to protect pull exhaust (+ kill the connection in this case)
         # TODO : this requires a timeout by config (lets say 60 sec by default)
+        With priority classes (conf_dict["pool_priorities"]), connections reserved for other classes are not taken,
+        and the caller waits up to its class wait_ms for a connection (released connections go to the highest priority waiter first).
+        :param priority: priority class name (None : default class), ignored without priority classes
+        :type priority: str,None
         :return: object
         :rtype object
         """
 
-        with self.pool_lock:
+        if not Hooks.ACQUIRE:
+            return self._connection_acquire(priority)
+
+        ms_start = SolBase.mscurrent()
+        d_event = {"pool": self.pool_name, "host": None, "ex": None}
+        try:
+            conn = self._connection_acquire(priority)
+        except Exception as e:
+            d_event["ms"] = SolBase.msdiff(ms_start)
+            d_event["ex"] = e
+            Hooks.fire(Hooks.ACQUIRE, d_event)
+            raise
+        d_event["ms"] = SolBase.msdiff(ms_start)
+        d_event["host"] = self.connection_host(conn)
+        Hooks.fire(Hooks.ACQUIRE, d_event)
+        return conn
+
+    def _connection_acquire(self, priority):
+        """
+        Get a connection (see connection_acquire)
+        :param priority: priority class name (None : default class), ignored without priority classes
+        :type priority: str,None
+        :return: object
+        :rtype object
+        """
+
+        ms_start = SolBase.mscurrent()
+        pc = self._priority_get(priority)
+        Meters.aii("k.db_pool.base.call.connection_acquire")
+        while True:
+            with self.pool_lock:
+                conn = self._connection_take(pc, ms_start)
+                if conn is not None:
+                    return conn
+
+                # Not available : wait (priority class with wait_ms) or raise
+                ms_left = pc.wait_ms - SolBase.msdiff(ms_start) if pc else 0
+                if ms_left <= 0:
+                    Meters.aii("k.db_pool.base.pool_maxed")
+                    Meters.aii("k.db_pool.pool.maxed", tags=self.meters_tags)
+                    self.count_maxed += 1
+                    if pc is not None:
+                        pc.count_reject += 1
+                        Meters.aii("k.db_pool.priority.reject", tags=pc.tags)
+                        raise Exception("Pool maxed, size=%s, max_size=%s, limit=%s, priority=%s" % (self.size, self.max_size, self.limit, pc.name))
+                    raise Exception("Pool maxed, size=%s, max_size=%s, limit=%s" % (self.size, self.max_size, self.limit))
+                entry = (AsyncResult(), ms_start)
+                pc.waiters.append(entry)
+
+            conn = self._priority_wait(pc, entry, ms_left)
+            if conn is not None:
+                return conn
 
-            Meters.aii("k.db_pool.base.call.connection_acquire")
+    def _connection_take(self, pc, ms_start):
+        """
+        Take a connection (idle or new), under lock
+        :param pc: priority class, if any
+        :type pc: pysolmysql.Pool.priority_class.PriorityClass,None
+        :param ms_start: acquire start millis
+        :type ms_start: float
+        :return object,None (None : pool maxed, or reserved for other priority classes)
+        :rtype object,None
+        """
+
+        if self.adaptive:
+            self._adaptive_check()
 
-            if self.pool.qsize() > 0:
-                # ------------------------------
-                # GET CONNECTION FROM POOL
-                # ------------------------------
-                conn = self.pool.get()
+        if pc is not None and not self._priority_allowed(pc):
+            return None
 
-                # Ping it
-                if not self._connection_ping(conn):
+        if self.pool.qsize() > 0:
+            # ------------------------------
+            # GET CONNECTION FROM POOL
+            # ------------------------------
+            conn = self.pool.get()
+
+            # Ping it, giving back the slot on failure (BaseException : caller gevent.Timeout, kill)
+            try:
+                if not self._connection_ping_timed(conn):
                     # Failed => close it
                     self._connection_close(conn)
+                    conn = None
 
                     # Re-create a new one (we just closed a connection)
-                    conn = self._connection_create()
-
-                # Send it back
-                return conn
-            elif self.size >= self.max_size:
-                # ------------------------------
-                # POOL MAXED => ERROR
-                # ------------------------------
-                Meters.aii("k.db_pool.base.pool_maxed")
-                raise Exception("Pool maxed, size=%s, max_size=%s" % (self.size, self.max_size))
-            else:
-                # ------------------------------
-                # POOL NOT MAXED, NO CONNECTION IN POOL => NEW CONNECTION
-                # ------------------------------
-                try:
-                    conn = self._connection_create()
-                    self.size += 1
-                    Meters.aii("k.db_pool.base.cur_size", increment_value=1)
-                    Meters.ai("k.db_pool.base.max_size").set(max(Meters.aig("k.db_pool.base.max_size"), Meters.aig("k.db_pool.base.cur_size")))
-                except Exception:
-                    raise
-                return conn
+                    conn = self._connection_create_timed()
+            except BaseException:
+                if conn is not None:
+                    self._connection_close(conn)
+                self._slot_release(1)
+                raise
+
+            # Send it back
+            return self._connection_acquired(conn, ms_start, pc)
+        elif self.size >= self.limit and not (self.adaptive and self._adaptive_grow()):
+            # ------------------------------
+            # POOL MAXED
+            # ------------------------------
+            return None
+        else:
+            # ------------------------------
+            # POOL NOT MAXED, NO CONNECTION IN POOL => NEW CONNECTION
+            # ------------------------------
+            if self.budget:
+                self.budget.acquire(self)
+            try:
+                conn = self._connection_create_timed()
+            except BaseException:
+                if self.budget:
+                    self.budget.release()
+                raise
+            self.size += 1
+            Meters.aii("k.db_pool.base.cur_size", increment_value=1)
+            Meters.ai("k.db_pool.base.max_size").set(max(Meters.aig("k.db_pool.base.max_size"), Meters.aig("k.db_pool.base.cur_size")))
+            return self._connection_acquired(conn, ms_start, pc)
 
     def connection_release(self, conn):
         """
@@ -122,17 +542,61 @@ class DatabaseConnectionPool(object):
             if conn is None:
                 return
 
-            # Put it back
-            try:
-                self.pool.put(conn)
-            except queue.Full:
-                # If full, close it
-                self._connection_close(conn)
+            self._connection_released(conn)
+            self._connection_put_back(conn)
+
+    def _connection_put_back(self, conn):
+        """
+        Put a connection back in the idle queue (or hand it over to a waiter), under lock
+        :param conn: object
+        :type conn: object
+        """
+
+        # Above the adaptive limit (shrunk while in use) : close it
+        if self.size > self.limit:
+            self._connection_close(conn)
+            self._slot_release(1)
+            return
+
+        # Waiters : highest priority first
+        if self.ar_priority and self._priority_handoff(conn):
+            return
+
+        # Put it back
+        try:
+            self.pool.put(conn)
+        except queue.Full:
+            # If full, close it
+            self._connection_close(conn)
+
+        self._meters_gauges()
+
+    def connection_discard(self, conn):
+        """
+        Close a connection acquired from the pool instead of putting it back (broken or unknown state), freeing its slot
+        :param conn: object
+        :type conn: object
+        """
+
+        if conn is None:
+            return
+
+        self._connection_close(conn)
+
+        with self.pool_lock:
+            Meters.aii("k.db_pool.base.call.connection_discard")
+            self._connection_released(conn)
+            self._slot_release(1)
 
     def close_all(self):
         """
         Close all connections
         """
+
+        # Server load check running : it holds an idle connection
+        if self.adaptive_server_greenlet is not None:
+            self.adaptive_server_greenlet.kill()
+
         n = 0
         while not self.pool.empty():
             conn = self.pool.get_nowait()
@@ -141,12 +605,113 @@ class DatabaseConnectionPool(object):
 
         Meters.aii("k.db_pool.base.cur_size", increment_value=-n)
         Meters.ai("k.db_pool.base.max_size").set(max(Meters.aig("k.db_pool.base.max_size"), Meters.aig("k.db_pool.base.cur_size")))
+        if self.budget:
+            self.budget.release(self.size)
         self.size = 0
+        self.d_acquired = dict()
+        self._priority_reset()
+        self._meters_gauges()
+
+    def evict_idle_one(self):
+        """
+        Close one idle connection, if any and if the pool is not busy (connection budget eviction).
+        The budget token is NOT released (it is handed over to the evicting pool).
+        :return bool (True if a connection has been closed)
+        :rtype bool
+        """
+
+        if not self.pool_lock.acquire(blocking=False):
+            return False
+        try:
+            if self.pool.qsize() == 0:
+                return False
+            conn = self.pool.get_nowait()
+            self._connection_close(conn)
+            self.size -= 1
+            Meters.aii("k.db_pool.base.cur_size", increment_value=-1)
+            self._meters_gauges()
+            return True
+        finally:
+            self.pool_lock.release()
+
+    def _slot_release(self, n):
+        """
+        Give back connection slots (connections lost)
+        :param n: slot count
+        :type n: int
+        """
+
+        self.size -= n
+        Meters.aii("k.db_pool.base.cur_size", increment_value=-n)
+        if self.budget:
+            self.budget.release(n)
+        if self.ar_priority:
+            self._priority_wake(n)
+        self._meters_gauges()
+
+    def forget_all(self):
+        """
+        Forget all connections, without closing them on the wire.
+        To be used after a fork : connections are shared with the parent process.
+        """
+
+        n = 0
+        while not self.pool.empty():
+            conn = self.pool.get_nowait()
+            self._connection_forget(conn)
+            n += 1
+
+        Meters.aii("k.db_pool.base.cur_size", increment_value=-n)
+        if self.budget:
+            self.budget.release(self.size)
+        self.size = 0
+        self.d_acquired = dict()
+        self._priority_reset()
+
+    def _priority_reset(self):
+        """
+        Reset priority classes in use counters (all connections dropped)
+        """
+
+        self.d_conn_priority = dict()
+        for pc in self.ar_priority:
+            pc.in_use = 0
 
     # ------------------------------------------------
     # OVERRIDES
     # ------------------------------------------------
 
+    def connection_host(self, conn):
+        """
+        Return the host a connection was opened toward
+        :param conn: object
+        :type conn: object
+        :return str,None
+        :rtype str,None
+        """
+
+        return None
+
+    def _server_load(self):
+        """
+        Get the server load (adaptive sizing back off), connections used / max connections.
+        Called outside the lock (network i/o) : idle connections must be taken and put back (_connection_put_back) under lock.
+        :return float,None (None : unknown)
+        :rtype float,None
+        """
+
+        return None
+
+    def _connection_forget(self, conn):
+        """
+        Forget a connection, releasing local resources without any wire exchange.
+        Must not raise anything.
+        :param conn: object
+        :type conn: object
+        """
+
+        pass
+
     def _connection_create(self, *args, **kwargs):
         """
         Create connection
@@ -0,0 +1,130 @@
+"""
+# -*- coding: utf-8 -*-
+# ===============================================================================
+#
+# Copyright (C) 2013/2025 Laurent Labatut / Laurent Champagnac
+#
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ===============================================================================
+"""
+import logging
+
+from pysolmeters.Meters import Meters
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionBudget(object):
+    """
+    Process wide connection budget, shared across pools.
+
+    Each pool connection slot takes a token. When the budget is exhausted, an idle connection of another pool is evicted (least recently used pool first,
+    pools above their fair share first). A pool above its fair share (max_connections / pool count) cannot evict others connections.
+    """
+
+    def __init__(self, max_connections):
+        """
+        Init
+        :param max_connections: max connections, across all pools
+        :type max_connections: int
+        """
+
+        self.max_connections = max_connections
+        self.used = 0
+        self.pools = list()
+        Meters.ai("k.db_pool.budget.max").set(self.max_connections)
+        self._meters_gauges()
+
+    def _meters_gauges(self):
+        """
+        Update gauges
+        """
+
+        Meters.ai("k.db_pool.budget.used").set(self.used)
+
+    def register(self, pool):
+        """
+        Register a pool
+        :param pool: pysolmysql.Pool.base_pool.DatabaseConnectionPool
+        :type pool: pysolmysql.Pool.base_pool.DatabaseConnectionPool
+        """
+
+        if pool not in self.pools:
+            self.pools.append(pool)
+            self.used += pool.size
+            pool.budget = self
+            self._meters_gauges()
+
+    def unregister(self, pool):
+        """
+        Unregister a pool (its tokens must have been released)
+        :param pool: pysolmysql.Pool.base_pool.DatabaseConnectionPool
+        :type pool: pysolmysql.Pool.base_pool.DatabaseConnectionPool
+        """
+
+        if pool in self.pools:
+            self.pools.remove(pool)
+            pool.budget = None
+
+    def fair_share(self):
+        """
+        Get the per pool fair share
+        :return int
+        :rtype int
+        """
+
+        return max(1, self.max_connections // max(1, len(self.pools)))
+
+    def acquire(self, pool):
+        """
+        Take a token for a new connection of pool, evicting an idle connection of another pool if required.
+        Raise if the budget is exhausted.
+        :param pool: pysolmysql.Pool.base_pool.DatabaseConnectionPool
+        :type pool: pysolmysql.Pool.base_pool.DatabaseConnectionPool
+        """
+
+        if self.used < self.max_connections:
+            self.used += 1
+            self._meters_gauges()
+            return
+
+        # Tight : fairness, a pool above its share must reuse its own connections
+        fair = self.fair_share()
+        if pool.size >= fair:
+            Meters.aii("k.db_pool.budget.exhausted")
+            raise Exception("Connection budget exhausted, used=%s, max=%s, pool.size=%s, fair_share=%s" % (self.used, self.max_connections, pool.size, fair))
+
+        # Evict : pools above fair share first, then least recently used
+        ar_candidate = sorted((p for p in self.pools if p is not pool), key=lambda p: (p.size <= fair, p.last_used))
+        for p in ar_candidate:
+            if p.evict_idle_one():
+                # Token moves from p to pool
+                Meters.aii("k.db_pool.budget.evict")
+                return
+
+        Meters.aii("k.db_pool.budget.exhausted")
+        raise Exception("Connection budget exhausted, used=%s, max=%s, no idle connection to evict" % (self.used, self.max_connections))
+
+    def release(self, n=1):
+        """
+        Release tokens
+        :param n: token count
+        :type n: int
+        """
+
+        self.used = max(0, self.used - n)
+        self._meters_gauges()
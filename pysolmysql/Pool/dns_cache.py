@@ -0,0 +1,239 @@
+"""
+# -*- coding: utf-8 -*-
+# ===============================================================================
+#
+# Copyright (C) 2013/2025 Laurent Labatut / Laurent Champagnac
+#
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ===============================================================================
+"""
+import ipaddress
+import logging
+import socket
+import time
+
+import gevent
+import gevent.socket
+from pysolbase.SolBase import SolBase
+from pysolmeters.Meters import Meters
+
+from pysolmysql.Pool.latency_meters import LatencyMeters
+
+logger = logging.getLogger(__name__)
+
+
+class DnsCache(object):
+    """
+    Host name resolution cache (A / AAAA records), with a time to live and a background refresh.
+
+    - resolve returns the cached addresses, resolving on miss or expiry.
+    - past refresh_ratio of ttl_sec, the cached addresses are returned and a refresh greenlet is spawned (one per name).
+    - on resolution failure, expired addresses are still returned up to stale_sec past expiry.
+    - addresses are ordered : the last one a connection has been opened to first, failed ones last (see good, bad).
+    """
+
+    def __init__(self, tags, ttl_sec=60.0, refresh_ratio=0.8, stale_sec=300.0, resolver=None):
+        """
+        Init
+        :param tags: meters tags (pool)
+        :type tags: dict
+        :param ttl_sec: addresses time to live
+        :type ttl_sec: float
+        :param refresh_ratio: background refresh after ttl_sec * refresh_ratio
+        :type refresh_ratio: float
+        :param stale_sec: expired addresses still used on resolution failure, up to stale_sec past expiry
+        :type stale_sec: float
+        :param resolver: callable(name) returning a list of addresses (None : getaddrinfo)
+        :type resolver: collections.abc.Callable,None
+        """
+
+        self.tags = tags
+        self.ttl_sec = ttl_sec
+        self.refresh_ratio = refresh_ratio
+        self.stale_sec = stale_sec
+        self.resolver = resolver or self.getaddrinfo
+
+        # Name => [addresses, resolved epoch]
+        self.d_entry = dict()
+
+        # Name => refresh greenlet
+        self.d_refresh = dict()
+
+    @classmethod
+    def is_literal(cls, name):
+        """
+        Check if a host is an ip address (nothing to resolve)
+        :param name: str
+        :type name: str
+        :return bool
+        :rtype bool
+        """
+
+        try:
+            ipaddress.ip_address(name)
+            return True
+        except ValueError:
+            return False
+
+    @classmethod
+    def is_resolvable(cls, name):
+        """
+        Check if a host must be resolved through the cache.
+        Ip addresses, "localhost" (unix socket for mysqlclient, user@localhost account) and socket paths are passed as is to the driver.
+        :param name: str
+        :type name: str
+        :return bool
+        :rtype bool
+        """
+
+        if name == "localhost" or name.startswith("/"):
+            return False
+        return not cls.is_literal(name)
+
+    @classmethod
+    def getaddrinfo(cls, name):
+        """
+        Resolve a name (gevent resolver)
+        :param name: str
+        :type name: str
+        :return list of addresses (resolver order, no duplicates)
+        :rtype list
+        """
+
+        ar_out = list()
+        for _, _, _, _, sa in gevent.socket.getaddrinfo(name, None, 0, socket.SOCK_STREAM):
+            if sa[0] not in ar_out:
+                ar_out.append(sa[0])
+        return ar_out
+
+    def resolve(self, name):
+        """
+        Get the addresses of a name
+        :param name: str
+        :type name: str
+        :return list of addresses (preferred first)
+        :rtype list
+        """
+
+        now = time.time()
+        entry = self.d_entry.get(name)
+        if entry is not None:
+            age = now - entry[1]
+            if age < self.ttl_sec:
+                if age >= self.ttl_sec * self.refresh_ratio:
+                    self._refresh_spawn(name)
+                Meters.aii("k.db_pool.dns.hit", tags=self.tags)
+                return entry[0]
+
+        # Miss or expired
+        Meters.aii("k.db_pool.dns.miss", tags=self.tags)
+        try:
+            return self._resolve(name)
+        except Exception as e:
+            if entry is None or now - entry[1] >= self.ttl_sec + self.stale_sec:
+                raise
+            Meters.aii("k.db_pool.dns.stale", tags=self.tags)
+            logger.warning("Resolution failed, using stale addresses, name=%s, addresses=%s, ex=%s", name, entry[0], SolBase.extostr(e))
+            return entry[0]
+
+    def _resolve(self, name):
+        """
+        Resolve a name and store its addresses (keeping the order of the addresses already known)
+        :param name: str
+        :type name: str
+        :return list of addresses
+        :rtype list
+        """
+
+        ms_start = SolBase.mscurrent()
+        try:
+            ar_addr = self.resolver(name)
+        except Exception:
+            Meters.aii("k.db_pool.dns.ex", tags=self.tags)
+            raise
+        finally:
+            LatencyMeters.put("k.db_pool.dns.resolve_ms", SolBase.msdiff(ms_start), tags=self.tags)
+        if not ar_addr:
+            Meters.aii("k.db_pool.dns.ex", tags=self.tags)
+            raise Exception("No address, name=%s" % name)
+
+        entry = self.d_entry.get(name)
+        if entry is not None:
+            ar_addr = [a for a in entry[0] if a in ar_addr] + [a for a in ar_addr if a not in entry[0]]
+        self.d_entry[name] = [ar_addr, time.time()]
+        return ar_addr
+
+    def _refresh_spawn(self, name):
+        """
+        Refresh a name in background (once at a time)
+        :param name: str
+        :type name: str
+        """
+
+        if name in self.d_refresh:
+            return
+        self.d_refresh[name] = gevent.spawn(self._refresh, name)
+
+    def _refresh(self, name):
+        """
+        Refresh a name
+        :param name: str
+        :type name: str
+        """
+
+        # noinspection PyBroadException
+        try:
+            self._resolve(name)
+            Meters.aii("k.db_pool.dns.refresh", tags=self.tags)
+        except Exception as e:
+            logger.warning("Resolution refresh failed, name=%s, ex=%s", name, SolBase.extostr(e))
+        finally:
+            self.d_refresh.pop(name, None)
+
+    def good(self, name, addr):
+        """
+        A connection has been opened to an address : it goes first
+        :param name: str
+        :type name: str
+        :param addr: str
+        :type addr: str
+        """
+
+        entry = self.d_entry.get(name)
+        if entry is not None and addr in entry[0] and entry[0][0] != addr:
+            entry[0] = [addr] + [a for a in entry[0] if a != addr]
+
+    def bad(self, name, addr):
+        """
+        A connection to an address failed : it goes last
+        :param name: str
+        :type name: str
+        :param addr: str
+        :type addr: str
+        """
+
+        entry = self.d_entry.get(name)
+        if entry is not None and addr in entry[0] and entry[0][-1] != addr:
+            entry[0] = [a for a in entry[0] if a != addr] + [addr]
+
+    def close(self):
+        """
+        Stop background refreshes
+        """
+
+        gevent.killall(list(self.d_refresh.values()))
+        self.d_refresh = dict()
@@ -0,0 +1,153 @@
+"""
+# -*- coding: utf-8 -*-
+# ===============================================================================
+#
+# Copyright (C) 2013/2025 Laurent Labatut / Laurent Champagnac
+#
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ===============================================================================
+"""
+import logging
+
+from pysolbase.SolBase import SolBase
+from pysolmeters.Meters import Meters
+
+logger = logging.getLogger(__name__)
+
+
+class Hooks(object):
+    """
+    Process wide hooks, for tracing spans, audit logging or custom meters.
+
+    A hook is a callable(d_event). The same d_event is given to the before and after hooks of a statement (a before hook can store a span in it).
+    - "execute_before" : before a statement (MysqlApi), d_event : pool, host, statement
+    - "execute_after" : after a statement, d_event : pool, host, statement, ms, rowcount (None on failure), ex (None on success)
+    - "acquire" : after a connection acquire (DatabaseConnectionPool), d_event : pool, host, ms (acquire duration), ex (None on success)
+    - "release" : after a connection release or discard, called under the pool lock, d_event : pool, host (None if discarded), ms (hold duration)
+
+    Without hooks, the hot path cost is a single check (empty tuple, or EXECUTE flag).
+    Hook exceptions are logged and counted (k.db_pool.hooks.ex), never raised to the caller.
+    """
+
+    # Kind => hooks (tuples, replaced on add / remove)
+    EXECUTE_BEFORE = tuple()
+    EXECUTE_AFTER = tuple()
+    ACQUIRE = tuple()
+    RELEASE = tuple()
+
+    # True if any execute hook
+    EXECUTE = False
+
+    KINDS = ("execute_before", "execute_after", "acquire", "release")
+
+    @classmethod
+    def add(cls, kind, f):
+        """
+        Register a hook
+        :param kind: "execute_before", "execute_after", "acquire" or "release"
+        :type kind: str
+        :param f: callable(d_event)
+        :type f: collections.abc.Callable
+        """
+
+        if kind not in cls.KINDS:
+            raise Exception("Invalid hook kind=%s, allowed=%s" % (kind, cls.KINDS))
+        setattr(cls, kind.upper(), getattr(cls, kind.upper()) + (f,))
+        cls.EXECUTE = bool(cls.EXECUTE_BEFORE or cls.EXECUTE_AFTER)
+
+    @classmethod
+    def remove(cls, kind, f):
+        """
+        Unregister a hook
+        :param kind: "execute_before", "execute_after", "acquire" or "release"
+        :type kind: str
+        :param f: callable(d_event)
+        :type f: collections.abc.Callable
+        """
+
+        if kind not in cls.KINDS:
+            raise Exception("Invalid hook kind=%s, allowed=%s" % (kind, cls.KINDS))
+        setattr(cls, kind.upper(), tuple(h for h in getattr(cls, kind.upper()) if h is not f))
+        cls.EXECUTE = bool(cls.EXECUTE_BEFORE or cls.EXECUTE_AFTER)
+
+    @classmethod
+    def reset(cls):
+        """
+        Unregister all hooks
+        """
+
+        for kind in cls.KINDS:
+            setattr(cls, kind.upper(), tuple())
+        cls.EXECUTE = False
+
+    @classmethod
+    def fire(cls, ar_hook, d_event):
+        """
+        Call hooks
+        Must not raise anything.
+        :param ar_hook: hooks
+        :type ar_hook: tuple
+        :param d_event: event
+        :type d_event: dict
+        """
+
+        for f in ar_hook:
+            # noinspection PyBroadException
+            try:
+                f(d_event)
+            except Exception as e:
+                Meters.aii("k.db_pool.hooks.ex")
+                logger.warning("Hook failed, f=%s, ex=%s", f, SolBase.extostr(e))
+
+    @classmethod
+    def execute_before(cls, pool_name, host, statement):
+        """
+        Fire execute_before hooks
+        :param pool_name: pool name
+        :type pool_name: str
+        :param host: host
+        :type host: str,None
+        :param statement: statement
+        :type statement: str
+        :return dict (d_event, for execute_after)
+        :rtype dict
+        """
+
+        d_event = {"pool": pool_name, "host": host, "statement": statement}
+        if cls.EXECUTE_BEFORE:
+            cls.fire(cls.EXECUTE_BEFORE, d_event)
+        return d_event
+
+    @classmethod
+    def execute_after(cls, d_event, ms, rowcount, ex):
+        """
+        Fire execute_after hooks
+        :param d_event: event (from execute_before)
+        :type d_event: dict
+        :param ms: duration millis
+        :type ms: float
+        :param rowcount: rows fetched or affected (None on failure)
+        :type rowcount: int,None
+        :param ex: exception (None on success)
+        :type ex: BaseException,None
+        """
+
+        d_event["ms"] = ms
+        d_event["rowcount"] = rowcount
+        d_event["ex"] = ex
+        if cls.EXECUTE_AFTER:
+            cls.fire(cls.EXECUTE_AFTER, d_event)
@@ -0,0 +1,207 @@
+"""
+# -*- coding: utf-8 -*-
+# ===============================================================================
+#
+# Copyright (C) 2013/2025 Laurent Labatut / Laurent Champagnac
+#
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ===============================================================================
+"""
+import logging
+import time
+from collections import deque
+
+from pysolmeters.Meters import Meters
+
+logger = logging.getLogger(__name__)
+
+
+class HostBreaker(object):
+    """
+    Per host circuit breaker : closed, open, half-open.
+
+    - closed : calls are recorded in a rolling window (1 sec buckets). The breaker opens if, over at least min_calls calls,
+      the error rate reaches error_rate, or the p99 latency reaches latency_ms (1% of calls or more at or above latency_ms).
+    - open : the host is out of rotation for open_sec.
+    - half-open : up to probe_count connections can be opened toward the host. probe_count successful calls close the breaker, a failed (or slow) call opens it again.
+    """
+
+    STATE_CLOSED = 0
+    STATE_OPEN = 1
+    STATE_HALF_OPEN = 2
+
+    STATE_NAMES = {STATE_CLOSED: "closed", STATE_OPEN: "open", STATE_HALF_OPEN: "half_open"}
+
+    def __init__(self, tags, window_sec=10, min_calls=20, error_rate=0.5, latency_ms=None, open_sec=30.0, probe_count=3):
+        """
+        Init
+        :param tags: meters tags (pool, host)
+        :type tags: dict
+        :param window_sec: rolling window
+        :type window_sec: int
+        :param min_calls: min calls in window before tripping
+        :type min_calls: int
+        :param error_rate: error rate tripping the breaker (0..1, None : disabled)
+        :type error_rate: float,None
+        :param latency_ms: p99 latency tripping the breaker (None : disabled)
+        :type latency_ms: float,None
+        :param open_sec: open duration, before half-open
+        :type open_sec: float
+        :param probe_count: half-open probe connections, and successful calls required to close
+        :type probe_count: int
+        """
+
+        self.tags = tags
+        self.window_sec = window_sec
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.latency_ms = latency_ms
+        self.open_sec = open_sec
+        self.probe_count = probe_count
+
+        self.state = self.STATE_CLOSED
+        self.open_until = 0.0
+
+        # Rolling window : [sec, calls, errors, slow], running totals
+        self.buckets = deque()
+        self.calls = 0
+        self.errors = 0
+        self.slow = 0
+
+        # Half-open
+        self.probe_connect = 0
+        self.probe_ok = 0
+
+        Meters.ai("k.db_pool.breaker.state", tags=self.tags).set(self.state)
+
+    def _set_state(self, state, now):
+        """
+        Change state
+        :param state: int
+        :type state: int
+        :param now: epoch
+        :type now: float
+        """
+
+        logger.info("Breaker %s => %s, tags=%s", self.STATE_NAMES[self.state], self.STATE_NAMES[state], self.tags)
+        self.state = state
+        if state == self.STATE_OPEN:
+            self.open_until = now + self.open_sec
+        elif state == self.STATE_HALF_OPEN:
+            self.probe_connect = 0
+            self.probe_ok = 0
+        else:
+            self.buckets.clear()
+            self.calls = self.errors = self.slow = 0
+        Meters.aii("k.db_pool.breaker." + self.STATE_NAMES[state], tags=self.tags)
+        Meters.ai("k.db_pool.breaker.state", tags=self.tags).set(state)
+
+    def get_state(self, now=None):
+        """
+        Get state (open switches to half-open once open_sec is elapsed)
+        :param now: epoch (None : now)
+        :type now: float,None
+        :return int
+        :rtype int
+        """
+
+        if self.state == self.STATE_OPEN:
+            now = now or time.time()
+            if now >= self.open_until:
+                self._set_state(self.STATE_HALF_OPEN, now)
+        return self.state
+
+    def connect_allowed(self, now=None):
+        """
+        Check if a new connection can be opened toward the host
+        :param now: epoch (None : now)
+        :type now: float,None
+        :return bool
+        :rtype bool
+        """
+
+        state = self.get_state(now)
+        if state == self.STATE_CLOSED:
+            return True
+        elif state == self.STATE_HALF_OPEN:
+            return self.probe_connect < self.probe_count
+        return False
+
+    def connect_done(self):
+        """
+        A connection has been opened toward the host
+        """
+
+        if self.state == self.STATE_HALF_OPEN:
+            self.probe_connect += 1
+
+    def record(self, ms, ok, now=None):
+        """
+        Record a call
+        :param ms: call duration millis
+        :type ms: float
+        :param ok: False if the call failed (connection lost, timeout)
+        :type ok: bool
+        :param now: epoch (None : now)
+        :type now: float,None
+        :return bool (True if the breaker has just opened)
+        :rtype bool
+        """
+
+        now = now or time.time()
+        slow = self.latency_ms is not None and ms >= self.latency_ms
+        state = self.get_state(now)
+
+        if state == self.STATE_OPEN:
+            # In flight call on a connection opened before tripping
+            return False
+        elif state == self.STATE_HALF_OPEN:
+            if not ok or slow:
+                self._set_state(self.STATE_OPEN, now)
+                return True
+            self.probe_ok += 1
+            if self.probe_ok >= self.probe_count:
+                self._set_state(self.STATE_CLOSED, now)
+            return False
+
+        # Closed : rolling window
+        sec = int(now)
+        if not self.buckets or self.buckets[-1][0] != sec:
+            self.buckets.append([sec, 0, 0, 0])
+        b = self.buckets[-1]
+        b[1] += 1
+        self.calls += 1
+        if not ok:
+            b[2] += 1
+            self.errors += 1
+        if slow:
+            b[3] += 1
+            self.slow += 1
+        while self.buckets[0][0] <= sec - self.window_sec:
+            _, calls, errors, slow_count = self.buckets.popleft()
+            self.calls -= calls
+            self.errors -= errors
+            self.slow -= slow_count
+
+        # Trip
+        if self.calls < self.min_calls:
+            return False
+        if (self.error_rate is not None and self.errors >= self.error_rate * self.calls) \
+                or (self.latency_ms is not None and self.slow >= 0.01 * self.calls):
+            self._set_state(self.STATE_OPEN, now)
+            return True
+        return False
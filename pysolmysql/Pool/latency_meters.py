@@ -0,0 +1,97 @@
+"""
+# -*- coding: utf-8 -*-
+# ===============================================================================
+#
+# Copyright (C) 2013/2025 Laurent Labatut / Laurent Champagnac
+#
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ===============================================================================
+"""
+import logging
+from bisect import bisect_left
+
+from pysolmeters.Meters import Meters
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyMeters(object):
+    """
+    Latency meters (k.db_*.*_ms) : a pysolmeters DelayToCount, plus a histogram (bucket counts, sum) exported by MysqlPrometheus.
+
+    Histogram buckets are upper bound inclusive (prometheus "le"), DelayToCount ones are lower bound inclusive,
+    and DelayToCount does not track the sum.
+    """
+
+    # Bucket upper bounds, millis (DelayToCount default boundaries), last bucket : +Inf
+    BUCKETS = (0, 50, 100, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+    # (key, sorted tags items) => [count per bucket (len(BUCKETS) + 1), sum]
+    D_HISTOGRAM = dict()
+
+    @classmethod
+    def put(cls, key, delay_ms, tags=None):
+        """
+        Record a delay
+        :param key: meter key
+        :type key: str
+        :param delay_ms: delay, millis
+        :type delay_ms: int,float
+        :param tags: dict,None
+        :type tags: dict,None
+        """
+
+        Meters.dtci(key, delay_ms, tags=tags)
+
+        k = (key, tuple(sorted(tags.items())) if tags else ())
+        h = cls.D_HISTOGRAM.get(k)
+        if h is None:
+            h = cls.D_HISTOGRAM[k] = [0] * (len(cls.BUCKETS) + 1) + [0.0]
+        h[bisect_left(cls.BUCKETS, delay_ms)] += 1
+        h[-1] += delay_ms
+
+    @classmethod
+    def get(cls, key, tags=None):
+        """
+        Get a histogram
+        :param key: meter key
+        :type key: str
+        :param tags: dict,None
+        :type tags: dict,None
+        :return list,None : count per bucket (BUCKETS, then +Inf), then sum. None if nothing recorded
+        :rtype list,None
+        """
+
+        return cls.D_HISTOGRAM.get((key, tuple(sorted(tags.items())) if tags else ()))
+
+    @classmethod
+    def items(cls):
+        """
+        Get all histograms
+        :return list of tuple : ((key, sorted tags items), histogram)
+        :rtype list
+        """
+
+        return list(cls.D_HISTOGRAM.items())
+
+    @classmethod
+    def reset(cls):
+        """
+        Reset histograms (pysolmeters DelayToCount are reset by Meters.reset)
+        """
+
+        cls.D_HISTOGRAM = dict()
@@ -0,0 +1,714 @@
+"""
+# -*- coding: utf-8 -*-
+# ===============================================================================
+#
+# Copyright (C) 2013/2025 Laurent Labatut / Laurent Champagnac
+#
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ===============================================================================
+"""
+import logging
+import os
+
+import pymysql
+from pymysql.connections import MySQLResult
+from pymysql.constants import COMMAND, CR, SERVER_STATUS
+from pymysql.cursors import Cursor, DictCursor, SSCursor, SSDictCursor
+from pymysql.err import OperationalError
+from pysolmeters.Meters import Meters
+
+from pysolmysql.Pool.mysql_prepared import MysqlPrepared
+
+logger = logging.getLogger(__name__)
+
+# Not defined by pymysql (mysql 5.7.3+, mariadb 10.2.4+)
+COM_RESET_CONNECTION = 0x1f
+
+
+class MysqlDriver(object):
+    """
+    Mysql driver backend : connect, ping, close and forget, with consistent semantics across drivers.
+
+    Connections returned by connect :
+    - cursor() returns a dict cursor (rows are dict), cursor(conn, dict_rows=False) a tuple cursor
+    - ping does not reconnect
+    - close sends COM_QUIT, forget does not (after fork, socket shared with the parent process)
+
+    Drivers are selected by conf_dict["driver"] (default "pymysql"), see get.
+    """
+
+    # Driver name
+    NAME = None
+
+    # Session reset support (see session_reset)
+    SESSION_RESET = False
+
+    # Registry (name => driver class) and instances (name => driver)
+    D_DRIVER_CLASS = dict()
+    D_DRIVER = dict()
+
+    # Default driver
+    DEFAULT = "pymysql"
+
+    # Error codes meaning the connection (or the node) is gone, not the statement : safe to retry an idempotent statement elsewhere
+    # - CR_CONNECTION_ERROR, CR_CONN_HOST_ERROR, CR_SERVER_GONE_ERROR, CR_SERVER_LOST, CR_SERVER_LOST_EXTENDED
+    # - ER_UNKNOWN_COM_ERROR (galera node not ready), ER_SERVER_SHUTDOWN, ER_CONNECTION_KILLED
+    CONNECTION_ERRNO = frozenset((2002, 2003, 2006, 2013, 2055, 1047, 1053, 1927))
+
+    # Server error codes not caused by the statement itself : the same statement may succeed later
+    # - ER_CON_COUNT_ERROR, ER_ACCESS_DENIED_ERROR, ER_HOST_IS_BLOCKED, ER_HOST_NOT_PRIVILEGED, ER_TOO_MANY_USER_CONNECTIONS, ER_USER_LIMIT_REACHED
+    # - ER_LOCK_WAIT_TIMEOUT, ER_LOCK_DEADLOCK, ER_QUERY_INTERRUPTED, ER_OPTION_PREVENTS_STATEMENT (read only), ER_READ_ONLY_MODE
+    TRANSIENT_ERRNO = frozenset((1040, 1045, 1129, 1130, 1203, 1226, 1205, 1213, 1317, 1290, 1836))
+
+    @classmethod
+    def register(cls, driver_class):
+        """
+        Register a driver class
+        :param driver_class: MysqlDriver subclass
+        :type driver_class: type
+        :return type
+        :rtype type
+        """
+
+        cls.D_DRIVER_CLASS[driver_class.NAME] = driver_class
+        return driver_class
+
+    @classmethod
+    def get(cls, name=None):
+        """
+        Get a driver by name. Raise if the driver is unknown or not installed.
+        :param name: driver name (None : default)
+        :type name: str,None
+        :return MysqlDriver
+        :rtype MysqlDriver
+        """
+
+        if name is None:
+            name = cls.DEFAULT
+
+        d = cls.D_DRIVER.get(name)
+        if d is None:
+            if name not in cls.D_DRIVER_CLASS:
+                raise Exception("Unknown mysql driver=%s, allowed=%s" % (name, sorted(cls.D_DRIVER_CLASS.keys())))
+            d = cls.D_DRIVER_CLASS[name]()
+            cls.D_DRIVER[name] = d
+        return d
+
+    @classmethod
+    def available(cls):
+        """
+        Get installed driver names
+        :return list of str
+        :rtype list
+        """
+
+        ar_out = list()
+        for name in sorted(cls.D_DRIVER_CLASS.keys()):
+            try:
+                cls.get(name)
+                ar_out.append(name)
+            except Exception as e:
+                logger.debug("Driver not available, name=%s, ex=%s", name, e)
+        return ar_out
+
+    def connect(self, host=None, port=3306, unix_socket=None, database=None, user=None, password=None, autocommit=True, charset="utf8", local_infile=False):
+        """
+        Open a connection (host or unix_socket)
+        :param host: host
+        :type host: str,None
+        :param port: port
+        :type port: int
+        :param unix_socket: unix socket path
+        :type unix_socket: str,None
+        :param database: database
+        :type database: str,None
+        :param user: user
+        :type user: str
+        :param password: password
+        :type password: str
+        :param autocommit: autocommit
+        :type autocommit: bool
+        :param charset: charset
+        :type charset: str
+        :param local_infile: If true, allow LOAD DATA LOCAL INFILE
+        :type local_infile: bool
+        :return object
+        :rtype object
+        """
+
+        raise NotImplementedError()
+
+    def cursor(self, conn, dict_rows=True, unbuffered=False):
+        """
+        Get a cursor
+        :param conn: connection
+        :type conn: object
+        :param dict_rows: If true, rows are dict, otherwise tuple (see cursor description for columns)
+        :type dict_rows: bool
+        :param unbuffered: If true, rows are read from the server while fetched (server side cursor, the result must be fully read or the connection closed)
+        :type unbuffered: bool
+        :return object
+        :rtype object
+        """
+
+        raise NotImplementedError()
+
+    def cursor_abandon(self, cur):
+        """
+        Abandon an unbuffered cursor whose result will not be read (its connection must be closed)
+        :param cur: cursor
+        :type cur: object
+        """
+
+        pass
+
+    def ping(self, conn):
+        """
+        Ping a connection, without reconnecting. Raise on failure.
+        :param conn: connection
+        :type conn: object
+        """
+
+        conn.ping()
+
+    def is_connection_error(self, e):
+        """
+        Check if an exception raised by a statement means the connection (or the node) is gone
+        :param e: Exception
+        :type e: Exception
+        :return bool
+        :rtype bool
+        """
+
+        args = getattr(e, "args", None)
+        return bool(args) and args[0] in self.CONNECTION_ERRNO
+
+    def is_statement_error(self, e):
+        """
+        Check if an exception raised by a statement means the server rejected the statement itself (bad value, duplicate key, syntax...) : re-running it fails again
+        :param e: Exception
+        :type e: Exception
+        :return bool
+        :rtype bool
+        """
+
+        args = getattr(e, "args", None)
+        if not args or not isinstance(args[0], int) or not 1000 <= args[0] < 2000:
+            return False
+        return args[0] not in self.CONNECTION_ERRNO and args[0] not in self.TRANSIENT_ERRNO
+
+    def thread_id(self, conn):
+        """
+        Get the server thread id of a connection (KILL target)
+        :param conn: connection
+        :type conn: object
+        :return int
+        :rtype int
+        """
+
+        return conn.thread_id()
+
+    def session_dirty(self, conn, autocommit):
+        """
+        Check, without any wire exchange, if the session of a connection must be reset before reuse (open transaction, unread result, autocommit changed).
+        Drivers not exposing the session state return False.
+        :param conn: connection
+        :type conn: object
+        :param autocommit: expected autocommit
+        :type autocommit: bool
+        :return bool
+        :rtype bool
+        """
+
+        return False
+
+    def session_reset(self, conn, charset, autocommit, full=True):
+        """
+        Reset the session of a connection, restoring charset and autocommit. Raise on failure (the connection must be closed).
+        :param conn: connection
+        :type conn: object
+        :param charset: charset to restore
+        :type charset: str
+        :param autocommit: autocommit to restore
+        :type autocommit: bool
+        :param full: If true, COM_RESET_CONNECTION (transaction, session variables, temporary tables, prepared statements), otherwise ROLLBACK only
+        :type full: bool
+        """
+
+        raise Exception("Session reset not supported by driver=%s" % self.NAME)
+
+    def close(self, conn):
+        """
+        Close a connection (COM_QUIT sent)
+        :param conn: connection
+        :type conn: object
+        """
+
+        conn.close()
+
+    def forget(self, conn):
+        """
+        Forget a connection, closing our socket without sending COM_QUIT
+        :param conn: connection
+        :type conn: object
+        """
+
+        raise NotImplementedError()
+
+    def load_data_local(self, conn, statement, iter_chunk):
+        """
+        Execute a LOAD DATA LOCAL INFILE statement, streaming the file content from iter_chunk instead of reading a file.
+        :param conn: connection
+        :type conn: object
+        :param statement: LOAD DATA LOCAL INFILE statement
+        :type statement: str
+        :param iter_chunk: iterable of bytes (file content)
+        :type iter_chunk: collections.abc.Iterable
+        :return tuple (affected rows, warning count)
+        :rtype tuple
+        """
+
+        raise Exception("LOAD DATA LOCAL INFILE streaming not supported by driver=%s" % self.NAME)
+
+    def stmt_prepare(self, conn, statement):
+        """
+        Prepare a server side statement
+        :param conn: connection
+        :type conn: object
+        :param statement: sql statement (with ? placeholders)
+        :type statement: str
+        :return pysolmysql.Pool.mysql_prepared.PreparedStatement
+        :rtype pysolmysql.Pool.mysql_prepared.PreparedStatement
+        """
+
+        raise Exception("Prepared statements not supported by driver=%s" % self.NAME)
+
+    def stmt_execute(self, conn, ps, params):
+        """
+        Execute a server side prepared statement
+        :param conn: connection
+        :type conn: object
+        :param ps: pysolmysql.Pool.mysql_prepared.PreparedStatement
+        :type ps: pysolmysql.Pool.mysql_prepared.PreparedStatement
+        :param params: parameters
+        :type params: list,tuple
+        :return tuple (rows : list of dict or None if no result set, affected rows, insert id)
+        :rtype tuple
+        """
+
+        raise Exception("Prepared statements not supported by driver=%s" % self.NAME)
+
+    def stmt_close(self, conn, ps):
+        """
+        Close a server side prepared statement
+        :param conn: connection
+        :type conn: object
+        :param ps: pysolmysql.Pool.mysql_prepared.PreparedStatement
+        :type ps: pysolmysql.Pool.mysql_prepared.PreparedStatement
+        """
+
+        raise Exception("Prepared statements not supported by driver=%s" % self.NAME)
+
+
+@MysqlDriver.register
+class PymysqlDriver(MysqlDriver):
+    """
+    Pure python driver (pymysql), gevent cooperative once monkey patched
+    """
+
+    NAME = "pymysql"
+    SESSION_RESET = True
+
+    def connect(self, host=None, port=3306, unix_socket=None, database=None, user=None, password=None, autocommit=True, charset="utf8", local_infile=False):
+        """
+        Open a connection (host or unix_socket)
+        :param host: host
+        :type host: str,None
+        :param port: port
+        :type port: int
+        :param unix_socket: unix socket path
+        :type unix_socket: str,None
+        :param database: database
+        :type database: str,None
+        :param user: user
+        :type user: str
+        :param password: password
+        :type password: str
+        :param autocommit: autocommit
+        :type autocommit: bool
+        :param charset: charset
+        :type charset: str
+        :param local_infile: If true, allow LOAD DATA LOCAL INFILE
+        :type local_infile: bool
+        :return pymysql.connections.Connection
+        :rtype pymysql.connections.Connection
+        """
+
+        Meters.aii("k.db_pool.driver.connect", tags={"driver": self.NAME})
+        if unix_socket:
+            return pymysql.connect(
+                unix_socket=unix_socket,
+                database=database,
+                user=user,
+                password=password,
+                autocommit=autocommit,
+                charset=charset,
+                local_infile=local_infile,
+                cursorclass=DictCursor
+            )
+        return pymysql.connect(
+            host=host,
+            port=port,
+            database=database,
+            user=user,
+            password=password,
+            autocommit=autocommit,
+            charset=charset,
+            local_infile=local_infile,
+            cursorclass=DictCursor
+        )
+
+    def cursor(self, conn, dict_rows=True, unbuffered=False):
+        """
+        Get a cursor
+        :param conn: pymysql.connections.Connection
+        :type conn: pymysql.connections.Connection
+        :param dict_rows: If true, rows are dict, otherwise tuple (see cursor description for columns)
+        :type dict_rows: bool
+        :param unbuffered: If true, rows are read from the server while fetched (server side cursor, the result must be fully read or the connection closed)
+        :type unbuffered: bool
+        :return pymysql.cursors.Cursor
+        :rtype pymysql.cursors.Cursor
+        """
+
+        if unbuffered:
+            return conn.cursor(SSDictCursor if dict_rows else SSCursor)
+        return conn.cursor(DictCursor if dict_rows else Cursor)
+
+    def cursor_abandon(self, cur):
+        """
+        Abandon an unbuffered cursor whose result will not be read (its connection must be closed)
+        :param cur: pymysql.cursors.SSCursor
+        :type cur: pymysql.cursors.SSCursor
+        """
+
+        # pymysql would drain the result on close / gc
+        # noinspection PyProtectedMember
+        if cur._result is not None:
+            # noinspection PyProtectedMember
+            cur._result.unbuffered_active = False
+
+    def ping(self, conn):
+        """
+        Ping a connection, without reconnecting. Raise on failure.
+        :param conn: pymysql.connections.Connection
+        :type conn: pymysql.connections.Connection
+        """
+
+        conn.ping(reconnect=False)
+
+    def forget(self, conn):
+        """
+        Forget a connection, closing our socket without sending COM_QUIT
+        :param conn: pymysql.connections.Connection
+        :type conn: pymysql.connections.Connection
+        """
+
+        # noinspection PyProtectedMember
+        conn._force_close()
+
+    def is_connection_error(self, e):
+        """
+        Check if an exception raised by a statement means the connection (or the node) is gone
+        :param e: Exception
+        :type e: Exception
+        :return bool
+        :rtype bool
+        """
+
+        # InterfaceError : connection already closed locally
+        if isinstance(e, pymysql.err.InterfaceError):
+            return True
+        return isinstance(e, pymysql.err.MySQLError) and super(PymysqlDriver, self).is_connection_error(e)
+
+    def session_dirty(self, conn, autocommit):
+        """
+        Check, without any wire exchange, if the session of a connection must be reset before reuse (open transaction, unread result, autocommit changed).
+        Uses the server status of the last server reply.
+        :param conn: pymysql.connections.Connection
+        :type conn: pymysql.connections.Connection
+        :param autocommit: expected autocommit
+        :type autocommit: bool
+        :return bool
+        :rtype bool
+        """
+
+        status = conn.server_status or 0
+        if status & SERVER_STATUS.SERVER_STATUS_IN_TRANS:
+            return True
+        if bool(status & SERVER_STATUS.SERVER_STATUS_AUTOCOMMIT) != bool(autocommit):
+            return True
+        # noinspection PyProtectedMember
+        result = conn._result
+        return result is not None and (result.unbuffered_active or result.has_next)
+
+    def session_reset(self, conn, charset, autocommit, full=True):
+        """
+        Reset the session of a connection, restoring charset and autocommit. Raise on failure (the connection must be closed).
+        The reset command and the restore statement are pipelined (one round trip).
+        :param conn: pymysql.connections.Connection
+        :type conn: pymysql.connections.Connection
+        :param charset: charset to restore
+        :type charset: str
+        :param autocommit: autocommit to restore
+        :type autocommit: bool
+        :param full: If true, COM_RESET_CONNECTION (transaction, session variables, temporary tables, prepared statements), otherwise ROLLBACK only
+        :type full: bool
+        """
+
+        restore = ("SET NAMES %s, autocommit=%d" % (charset, 1 if autocommit else 0)).encode(conn.encoding)
+
+        # noinspection PyProtectedMember
+        if conn._result is not None and conn._result.unbuffered_active:
+            # Unread rows : the protocol requires them to be read before the next command
+            # noinspection PyProtectedMember
+            conn._result._finish_unbuffered_query()
+
+        # Both commands sent, then both replies read (each reply has sequence id 1)
+        if full:
+            # noinspection PyProtectedMember
+            conn._execute_command(COM_RESET_CONNECTION, b"")
+        else:
+            # noinspection PyProtectedMember
+            conn._execute_command(COMMAND.COM_QUERY, b"ROLLBACK")
+        # noinspection PyProtectedMember
+        conn._execute_command(COMMAND.COM_QUERY, restore)
+        for _ in range(2):
+            # noinspection PyProtectedMember
+            conn._next_seq_id = 1
+            # noinspection PyProtectedMember
+            conn._read_ok_packet()
+        conn.autocommit_mode = bool(autocommit)
+
+    def load_data_local(self, conn, statement, iter_chunk):
+        """
+        Execute a LOAD DATA LOCAL INFILE statement, streaming the file content from iter_chunk instead of reading a file.
+        If iter_chunk raises, the connection is closed (the server aborts the statement instead of committing a partial load).
+        :param conn: pymysql.connections.Connection
+        :type conn: pymysql.connections.Connection
+        :param statement: LOAD DATA LOCAL INFILE statement
+        :type statement: str
+        :param iter_chunk: iterable of bytes (file content)
+        :type iter_chunk: collections.abc.Iterable
+        :return tuple (affected rows, warning count)
+        :rtype tuple
+        """
+
+        # Same as pymysql Connection.query, with our own result reader
+        # noinspection PyProtectedMember
+        conn._execute_command(COMMAND.COM_QUERY, statement.encode(conn.encoding))
+        result = _StreamLoadResult(conn, iter_chunk)
+        conn._result = result
+        result.read()
+        if result.server_status is not None:
+            conn.server_status = result.server_status
+        conn._affected_rows = result.affected_rows
+        return result.affected_rows, result.warning_count
+
+    def stmt_prepare(self, conn, statement):
+        """
+        Prepare a server side statement
+        :param conn: pymysql.connections.Connection
+        :type conn: pymysql.connections.Connection
+        :param statement: sql statement (with ? placeholders)
+        :type statement: str
+        :return pysolmysql.Pool.mysql_prepared.PreparedStatement
+        :rtype pysolmysql.Pool.mysql_prepared.PreparedStatement
+        """
+
+        return MysqlPrepared.prepare(conn, statement)
+
+    def stmt_execute(self, conn, ps, params):
+        """
+        Execute a server side prepared statement
+        :param conn: pymysql.connections.Connection
+        :type conn: pymysql.connections.Connection
+        :param ps: pysolmysql.Pool.mysql_prepared.PreparedStatement
+        :type ps: pysolmysql.Pool.mysql_prepared.PreparedStatement
+        :param params: parameters
+        :type params: list,tuple
+        :return tuple (rows : list of dict or None if no result set, affected rows, insert id)
+        :rtype tuple
+        """
+
+        return MysqlPrepared.execute(conn, ps, params)
+
+    def stmt_close(self, conn, ps):
+        """
+        Close a server side prepared statement
+        :param conn: pymysql.connections.Connection
+        :type conn: pymysql.connections.Connection
+        :param ps: pysolmysql.Pool.mysql_prepared.PreparedStatement
+        :type ps: pysolmysql.Pool.mysql_prepared.PreparedStatement
+        """
+
+        MysqlPrepared.close(conn, ps)
+
+
+class _StreamLoadResult(MySQLResult):
+    """
+    pymysql result, answering the LOAD DATA LOCAL request from an iterable of bytes
+    """
+
+    def __init__(self, connection, iter_chunk):
+        """
+        Init
+        :param connection: pymysql.connections.Connection
+        :type connection: pymysql.connections.Connection
+        :param iter_chunk: iterable of bytes
+        :type iter_chunk: collections.abc.Iterable
+        """
+
+        super(_StreamLoadResult, self).__init__(connection)
+        self.iter_chunk = iter_chunk
+
+    def _read_load_local_packet(self, first_packet):
+        """
+        Send the file content, then read the OK packet
+        :param first_packet: pymysql.protocol.MysqlPacket
+        :type first_packet: pymysql.protocol.MysqlPacket
+        """
+
+        conn = self.connection
+        packet_size = min(conn.max_allowed_packet, 16 * 1024)
+        try:
+            for chunk in self.iter_chunk:
+                for i in range(0, len(chunk), packet_size):
+                    conn.write_packet(chunk[i:i + packet_size])
+        except Exception:
+            # noinspection PyProtectedMember
+            conn._force_close()
+            raise
+
+        # Empty packet : end of file
+        conn.write_packet(b"")
+        # noinspection PyProtectedMember
+        ok_packet = conn._read_packet()
+        if not ok_packet.is_ok_packet():
+            raise OperationalError(CR.CR_COMMANDS_OUT_OF_SYNC, "Commands Out of Sync")
+        # noinspection PyProtectedMember
+        self._read_ok_packet(ok_packet)
+
+
+@MysqlDriver.register
+class MysqlclientDriver(MysqlDriver):
+    """
+    C driver (mysqlclient, MySQLdb module), faster row decoding on large result sets.
+
+    WARNING : libmysqlclient io is NOT gevent cooperative, a pending query blocks the whole process (all greenlets).
+    """
+
+    NAME = "mysqlclient"
+
+    def __init__(self):
+        """
+        Init, raise if mysqlclient is not installed
+        """
+
+        try:
+            # noinspection PyUnresolvedReferences,PyPackageRequirements
+            import MySQLdb
+            # noinspection PyUnresolvedReferences,PyPackageRequirements
+            import MySQLdb.cursors
+        except ImportError as e:
+            raise Exception("Mysql driver=%s requires mysqlclient (pip install mysqlclient), ex=%s" % (self.NAME, e))
+        self.mod = MySQLdb
+
+    def connect(self, host=None, port=3306, unix_socket=None, database=None, user=None, password=None, autocommit=True, charset="utf8", local_infile=False):
+        """
+        Open a connection (host or unix_socket)
+        :param host: host
+        :type host: str,None
+        :param port: port
+        :type port: int
+        :param unix_socket: unix socket path
+        :type unix_socket: str,None
+        :param database: database
+        :type database: str,None
+        :param user: user
+        :type user: str
+        :param password: password
+        :type password: str
+        :param autocommit: autocommit
+        :type autocommit: bool
+        :param charset: charset
+        :type charset: str
+        :param local_infile: If true, allow LOAD DATA LOCAL INFILE
+        :type local_infile: bool
+        :return MySQLdb.connections.Connection
+        :rtype MySQLdb.connections.Connection
+        """
+
+        Meters.aii("k.db_pool.driver.connect", tags={"driver": self.NAME})
+        d = {
+            "user": user,
+            "passwd": password,
+            "autocommit": autocommit,
+            "charset": charset,
+            "local_infile": local_infile,
+            "cursorclass": self.mod.cursors.DictCursor,
+        }
+        if database:
+            d["db"] = database
+        if unix_socket:
+            d["unix_socket"] = unix_socket
+        else:
+            d["host"] = host
+            d["port"] = port
+        return self.mod.connect(**d)
+
+    def cursor(self, conn, dict_rows=True, unbuffered=False):
+        """
+        Get a cursor
+        :param conn: MySQLdb.connections.Connection
+        :type conn: MySQLdb.connections.Connection
+        :param dict_rows: If true, rows are dict, otherwise tuple (see cursor description for columns)
+        :type dict_rows: bool
+        :param unbuffered: If true, rows are read from the server while fetched (server side cursor, the result must be fully read or the connection closed)
+        :type unbuffered: bool
+        :return MySQLdb.cursors.BaseCursor
+        :rtype MySQLdb.cursors.BaseCursor
+        """
+
+        if unbuffered:
+            return conn.cursor(self.mod.cursors.SSDictCursor if dict_rows else self.mod.cursors.SSCursor)
+        return conn.cursor(self.mod.cursors.DictCursor if dict_rows else self.mod.cursors.Cursor)
+
+    def forget(self, conn):
+        """
+        Forget a connection, closing our socket without sending COM_QUIT.
+        libmysqlclient owns the fd : we swap it with /dev/null, so the COM_QUIT sent by close goes nowhere.
+        :param conn: MySQLdb.connections.Connection
+        :type conn: MySQLdb.connections.Connection
+        """
+
+        fd_null = os.open(os.devnull, os.O_RDWR)
+        try:
+            os.dup2(fd_null, conn.fileno())
+        finally:
+            os.close(fd_null)
+        conn.close()
@@ -21,17 +21,21 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
 # ===============================================================================
 """
-import copy
 import logging
 import random
+from collections import OrderedDict
 
+import gevent
 import pymysql
 import time
-from pymysql.cursors import DictCursor
+from pymysql.constants import ER
 from pysolbase.SolBase import SolBase
 from pysolmeters.Meters import Meters
 
 from pysolmysql.Pool.base_pool import DatabaseConnectionPool
+from pysolmysql.Pool.dns_cache import DnsCache
+from pysolmysql.Pool.host_breaker import HostBreaker
+from pysolmysql.Pool.mysql_driver import MysqlDriver
 
 logger = logging.getLogger(__name__)
 
@@ -65,8 +69,53 @@ class MysqlConnectionPool(DatabaseConnectionPool):
         "password": "your_password",
         "autocommit": True,
         "encoding": "utf8",
+        # Driver : "pymysql" (default) or "mysqlclient" (C, faster decoding, NOT gevent cooperative)
+        "driver": "pymysql",
+        # Allow LOAD DATA LOCAL INFILE (required by MysqlApi.load_data)
+        "local_infile": False,
+        # Prepared statements cached per connection (MysqlApi.prepared_n / prepared_0)
+        "prepared_cache_size": 64,
+        # Query timeout (exec_* default, None or 0 : no timeout) : KILL QUERY sent from a side connection on expiry, connection discarded
+        "query_timeout_ms": None,
+        # Read retry (exec_n, exec_1, exec_01 default, 0 : disabled) : on connection loss, the host is deactivated and the statement re-run elsewhere
+        "read_retry_count": 0,
+        # Retry budget : each successful call with retry enabled earns retry_budget_ratio token, each retry costs 1, up to retry_budget_max tokens
+        "retry_budget_ratio": 0.1,
+        "retry_budget_max": 10,
+        # Per host circuit breaker (connection loss and timeouts are errors), see pysolmysql.Pool.host_breaker.HostBreaker
+        "breaker_enabled": False,
+        "breaker_window_sec": 10,
+        "breaker_min_calls": 20,
+        "breaker_error_rate": 0.5,
+        "breaker_latency_ms": None,
+        "breaker_open_sec": 30.0,
+        "breaker_probe_count": 3,
+        # Session reset of released connections : "dirty" (open transaction, unread result, autocommit changed), "always", None (disabled)
+        # Done on next acquire, in place of the ping. Mode "reset" (COM_RESET_CONNECTION) or "rollback" (ROLLBACK only, session variables kept)
+        "session_reset": "dirty",
+        "session_reset_mode": "reset",
+        # Host names resolution cache (None or 0 : disabled), refreshed in background, stale addresses used on resolution failure up to dns_cache_stale_sec
+        # On connection errors, the other addresses of a host name are tried. "localhost" is never resolved (unix socket for mysqlclient)
+        "dns_cache_ttl_sec": None,
+        "dns_cache_stale_sec": 300.0,
+        # Adaptive sizing (optional) : effective limit between pool_min_size and pool_max_size, grown on maxed / acquire wait, shrunk on idle,
+        # backing off when the server Threads_connected / max_connections reaches pool_adaptive_server_ratio (None : not checked)
+        "pool_adaptive": False,
+        "pool_min_size": 1,
+        "pool_adaptive_interval_sec": 5.0,
+        "pool_adaptive_wait_ms": 5.0,
+        "pool_adaptive_server_ratio": 0.9,
         # Pool
         "pool_max_size": 10,
+        # Per process sizing, for pre-forking servers (optional) : max size = min(pool_max_size, pool_max_connections / pool_worker_count)
+        "pool_max_connections": 500,
+        "pool_worker_count": 16,
+        # Pool name, for per pool meters (optional, default to conf_dict hash)
+        "pool_name": "my_pool",
+        # Slow query log (None or 0 : disabled)
+        "slow_query_ms": None,
+        "slow_query_explain": False,
+        "slow_query_explain_interval_sec": 60,
     }
 
     # "unix" or "host" (not both), "host" has precedence
@@ -82,6 +131,12 @@ class MysqlConnectionPool(DatabaseConnectionPool):
         "encoding": "utf8",
     }
 
+    # KILL QUERY side connection timeout
+    KILL_TIMEOUT_MS = 5000
+
+    # Host deactivation duration
+    HOST_PRISON_SEC = 60.0
+
     def __init__(self, conf_dict):
         """
         Init
@@ -94,9 +149,43 @@ class MysqlConnectionPool(DatabaseConnectionPool):
         # Base
         super(MysqlConnectionPool, self).__init__(conf_dict)
 
+        # Driver (raise now if unknown or not installed)
+        self.driver = MysqlDriver.get(self.conf_dict.get("driver"))
+
         # Init us
         self.host_status = dict()
 
+        # Connection id => host (the one used to open it)
+        self.d_conn_host = dict()
+
+        # Connection id => OrderedDict (statement => PreparedStatement), LRU
+        self.d_conn_stmt = dict()
+        self.prepared_cache_size = self.conf_dict.get("prepared_cache_size", 64)
+
+        # Default query timeout
+        self.query_timeout_ms = self.conf_dict.get("query_timeout_ms")
+
+        # Read retry, retry budget (starts full)
+        self.read_retry_count = self.conf_dict.get("read_retry_count", 0)
+        self.retry_budget_ratio = self.conf_dict.get("retry_budget_ratio", 0.1)
+        self.retry_budget_max = self.conf_dict.get("retry_budget_max", 10)
+        self.retry_tokens = float(self.retry_budget_max)
+
+        # Session reset
+        self.session_reset = self.conf_dict.get("session_reset", "dirty")
+        if self.session_reset not in (None, False, "dirty", "always"):
+            raise Exception("Invalid session_reset=%s" % self.session_reset)
+        if self.session_reset == "always" and not self.driver.SESSION_RESET:
+            # Every reuse would fail its reset and reconnect
+            raise Exception("session_reset=always not supported by driver=%s" % self.driver.NAME)
+        session_reset_mode = self.conf_dict.get("session_reset_mode", "reset")
+        if session_reset_mode not in ("reset", "rollback"):
+            raise Exception("Invalid session_reset_mode=%s" % session_reset_mode)
+        self.session_reset_full = session_reset_mode == "reset"
+
+        # Connection ids released dirty, reset before reuse
+        self.conn_dirty = set()
+
         # Check
         if "hosts" not in self.conf_dict and "host" not in self.conf_dict and "unix" not in self.conf_dict:
             raise Exception("No server specified (hosts, host, unix not found in conf_dict")
@@ -113,62 +202,68 @@ class MysqlConnectionPool(DatabaseConnectionPool):
             for host in self.conf_dict["unix"].split(","):
                 self.host_status[host] = 0.0
 
+        # Connect parameters (host => driver connect kwargs), computed once
+        self.d_host_connect = dict()
+        for host in self.host_status.keys():
+            d_local = dict(self.conf_dict)
+            d_local.pop("hosts", None)
+            d_local["host"] = host
+            self.d_host_connect[host] = self._connect_kwargs(d_local)
+
+        # Host names resolution cache (None : resolved by the driver on each connect)
+        self.dns_cache = None
+        if self.conf_dict.get("dns_cache_ttl_sec"):
+            self.dns_cache = DnsCache(
+                tags=self.meters_tags,
+                ttl_sec=self.conf_dict["dns_cache_ttl_sec"],
+                stale_sec=self.conf_dict.get("dns_cache_stale_sec", 300.0),
+            )
+
+        # Circuit breakers (host => HostBreaker)
+        self.d_breaker = dict()
+        if self.conf_dict.get("breaker_enabled"):
+            for host in self.host_status.keys():
+                self.d_breaker[host] = HostBreaker(
+                    tags={"pool": self.pool_name, "host": host},
+                    window_sec=self.conf_dict.get("breaker_window_sec", 10),
+                    min_calls=self.conf_dict.get("breaker_min_calls", 20),
+                    error_rate=self.conf_dict.get("breaker_error_rate", 0.5),
+                    latency_ms=self.conf_dict.get("breaker_latency_ms"),
+                    open_sec=self.conf_dict.get("breaker_open_sec", 30.0),
+                    probe_count=self.conf_dict.get("breaker_probe_count", 3),
+                )
+
     # ------------------------------------------------
     # HELPERS
     # ------------------------------------------------
 
     @classmethod
-    def _get_connection(cls, conf_dict):
+    def _connect_kwargs(cls, conf_dict):
         """
-        Get a connection
+        Get the driver connect parameters from a conf_dict (host or unix socket)
         :param conf_dict: dict
         :type conf_dict: dict
-        :return: pymysql.connections.Connection
-        :rtype: pymysql.connections.Connection
+        :return dict,None (None : no server)
+        :rtype dict,None
         """
 
-        Meters.aii("k.db_pool.mysql.call._get_connection")
-
-        # DOC :
-        #     def __init__(self, host=None, user=None, password="",
-        #          database=None, port=3306, unix_socket=None,
-        #          charset='', sql_mode=None,
-        #          read_default_file=None, conv=decoders, use_unicode=None,
-        #          client_flag=0, cursorclass=Cursor, init_command=None,
-        #          connect_timeout=None, ssl=None, read_default_group=None,
-        #          compress=None, named_pipe=None, no_delay=None,
-        #          autocommit=False, db=None, passwd=None, local_infile=False,
-        #          max_allowed_packet=16*1024*1024, defer_connect=False,
-        #          auth_plugin_map={}):
-
-        logger.debug("mysql connect, server=%s:%s, unix=%s, user=%s, db=%s, enc=%s",
-                     conf_dict.get("host"), conf_dict.get("port"), conf_dict.get("unix"),
-                     conf_dict.get("user"),
-                     conf_dict.get("database"),
-                     conf_dict.get("encoding", "utf8")
-                     )
+        d = {
+            "database": conf_dict["database"],
+            "user": conf_dict["user"],
+            "password": conf_dict["password"],
+            "autocommit": conf_dict["autocommit"],
+            "charset": conf_dict.get("encoding", "utf8"),
+            "local_infile": conf_dict.get("local_infile", False),
+        }
 
         # Host
         h = conf_dict.get("host")
 
         # Unix detection (IF host startswith "/", we assume unix, even if unix not specified)
         if h and not h.startswith("/"):
-            c = pymysql.connect(
-                host=conf_dict["host"],
-                port=int(conf_dict["port"]),
-
-                db=conf_dict["database"],
-
-                user=conf_dict["user"],
-                password=conf_dict["password"],
-
-                autocommit=conf_dict["autocommit"],
-
-                charset=conf_dict.get("encoding", "utf8"),
-
-                cursorclass=DictCursor
-            )
-            return c
+            d["host"] = h
+            d["port"] = int(conf_dict["port"])
+            return d
 
         # Unix
         h = conf_dict.get("unix")
@@ -181,22 +276,369 @@ class MysqlConnectionPool(DatabaseConnectionPool):
 
         # Unix try
         if h:
-            c = pymysql.connect(
-                unix_socket=conf_dict["unix"],
+            d["unix_socket"] = h
+            return d
+
+        # Nothing
+        return None
 
-                db=conf_dict["database"],
+    @classmethod
+    def _get_connection(cls, conf_dict):
+        """
+        Get a connection, using the driver conf_dict["driver"] (default pymysql)
+        :param conf_dict: dict
+        :type conf_dict: dict
+        :return: pymysql.connections.Connection (or driver connection)
+        :rtype: pymysql.connections.Connection
+        """
 
-                user=conf_dict["user"],
-                password=conf_dict["password"],
+        Meters.aii("k.db_pool.mysql.call._get_connection")
 
-                autocommit=conf_dict["autocommit"],
+        logger.debug("mysql connect, server=%s:%s, unix=%s, user=%s, db=%s, enc=%s, driver=%s",
+                     conf_dict.get("host"), conf_dict.get("port"), conf_dict.get("unix"),
+                     conf_dict.get("user"),
+                     conf_dict.get("database"),
+                     conf_dict.get("encoding", "utf8"),
+                     conf_dict.get("driver"),
+                     )
 
-                cursorclass=DictCursor
-            )
-            return c
+        d = cls._connect_kwargs(conf_dict)
+        if d is None:
+            return None
+        return MysqlDriver.get(conf_dict.get("driver")).connect(**d)
 
-        # Nothing
-        return None
+    def _host_connect(self, host):
+        """
+        Get a connection toward a host, using its precomputed connect parameters.
+        Host names are resolved through the dns cache, each address being tried in turn on connection errors.
+        :param host: str
+        :type host: str
+        :return: pymysql.connections.Connection (or driver connection)
+        :rtype: pymysql.connections.Connection
+        """
+
+        Meters.aii("k.db_pool.mysql.call._get_connection")
+
+        d = self.d_host_connect[host]
+        if d is None:
+            return None
+        name = d.get("host")
+        if self.dns_cache is None or name is None or not DnsCache.is_resolvable(name):
+            return self.driver.connect(**d)
+
+        ar_addr = self.dns_cache.resolve(name)
+        if not ar_addr:
+            raise Exception("No address resolved, host=%s" % name)
+        for i, addr in enumerate(ar_addr):
+            logger.debug("mysql connect, host=%s, addr=%s:%s", name, addr, d["port"])
+            try:
+                conn = self.driver.connect(**dict(d, host=addr))
+            except Exception as e:
+                if not self.driver.is_connection_error(e):
+                    raise
+                self.dns_cache.bad(name, addr)
+                if i == len(ar_addr) - 1:
+                    raise
+                Meters.aii("k.db_pool.dns.failover", tags=self.meters_tags)
+                logger.warning("Connect failed, trying next address, host=%s, addr=%s, ex=%s", name, addr, SolBase.extostr(e))
+                continue
+            self.dns_cache.good(name, addr)
+            return conn
+
+    def connection_host(self, conn):
+        """
+        Return the host a connection was opened toward
+        :param conn: pymysql.connections.Connection
+        :type conn: pymysql.connections.Connection
+        :return str,None
+        :rtype str,None
+        """
+
+        return self.d_conn_host.get(id(conn))
+
+    def query_kill(self, conn):
+        """
+        Kill the query running on a connection (KILL QUERY sent from a short lived side connection toward the same host).
+        The connection itself must be discarded afterwards (protocol state unknown).
+        Must not raise anything.
+        :param conn: pymysql.connections.Connection
+        :type conn: pymysql.connections.Connection
+        :return bool (True if KILL QUERY has been sent)
+        :rtype bool
+        """
+
+        Meters.aii("k.db_pool.mysql.call.query_kill")
+
+        host = self.connection_host(conn)
+        side_conn = None
+        # noinspection PyBroadException
+        try:
+            if not host:
+                raise Exception("Unknown connection host")
+            thread_id = self.driver.thread_id(conn)
+            with gevent.Timeout(self.KILL_TIMEOUT_MS / 1000.0):
+                side_conn = self._host_connect(host)
+                cur = self.driver.cursor(side_conn, dict_rows=False)
+                try:
+                    cur.execute("KILL QUERY %d;" % thread_id)
+                finally:
+                    cur.close()
+            logger.debug("Query killed, host=%s, thread_id=%s", host, thread_id)
+            return True
+        except (Exception, gevent.Timeout) as e:
+            Meters.aii("k.db_pool.mysql.ex_kill")
+            logger.warning("Kill query failed, host=%s, ex=%s", host, SolBase.extostr(e))
+            return False
+        finally:
+            if side_conn:
+                self._connection_close(side_conn)
+
+    def prepared_execute(self, conn, statement, params):
+        """
+        Execute a server side prepared statement, prepared on first use and cached per connection (LRU)
+        :param conn: pymysql.connections.Connection
+        :type conn: pymysql.connections.Connection
+        :param statement: sql statement (with ? placeholders)
+        :type statement: str
+        :param params: parameters
+        :type params: list,tuple,None
+        :return tuple (rows : list of dict or None if no result set, affected rows, insert id)
+        :rtype tuple
+        """
+
+        d_stmt = self.d_conn_stmt.get(id(conn))
+        if d_stmt is None:
+            d_stmt = OrderedDict()
+            self.d_conn_stmt[id(conn)] = d_stmt
+
+        ps = d_stmt.get(statement)
+        if ps is not None:
+            Meters.aii("k.db_pool.prepared.hit", tags=self.meters_tags)
+            d_stmt.move_to_end(statement)
+            try:
+                return self.driver.stmt_execute(conn, ps, params)
+            except pymysql.err.MySQLError as e:
+                # Handle dropped server side (session reset...) : prepare again
+                if e.args[0] != ER.UNKNOWN_STMT_HANDLER:
+                    raise
+                logger.debug("Unknown statement handler, preparing again, statement=%s", statement)
+                del d_stmt[statement]
+
+        Meters.aii("k.db_pool.prepared.miss", tags=self.meters_tags)
+        ps = self.driver.stmt_prepare(conn, statement)
+        d_stmt[statement] = ps
+        while len(d_stmt) > self.prepared_cache_size:
+            _, ps_evict = d_stmt.popitem(last=False)
+            Meters.aii("k.db_pool.prepared.evict", tags=self.meters_tags)
+            self.driver.stmt_close(conn, ps_evict)
+        return self.driver.stmt_execute(conn, ps, params)
+
+    def prepared_invalidate(self, conn):
+        """
+        Drop the prepared statement cache of a connection (no COM_STMT_CLOSE sent)
+        :param conn: pymysql.connections.Connection
+        :type conn: pymysql.connections.Connection
+        """
+
+        self.d_conn_stmt.pop(id(conn), None)
+
+    def retry_deposit(self):
+        """
+        Earn retry budget (successful call with retry enabled)
+        """
+
+        self.retry_tokens = min(self.retry_budget_max, self.retry_tokens + self.retry_budget_ratio)
+
+    def retry_withdraw(self):
+        """
+        Spend retry budget
+        :return bool (False if exhausted, do not retry)
+        :rtype bool
+        """
+
+        if self.retry_tokens < 1.0:
+            return False
+        self.retry_tokens -= 1.0
+        return True
+
+    def host_prison(self, host):
+        """
+        Deactivate a host (connection lost on it), closing its idle connections.
+        Not done if no other host is up (single host : a transient failure must not take the pool down).
+        :param host: str
+        :type host: str
+        :return bool (True if deactivated)
+        :rtype bool
+        """
+
+        now = time.time()
+        if not any(h != host and prison < now for h, prison in self.host_status.items()):
+            return False
+
+        Meters.aii("k.db_pool.mysql.hosts.deactivate_one")
+        logger.warning("Host de-activate for %s sec, host=%s", self.HOST_PRISON_SEC, host)
+        self.host_status[host] = now + self.HOST_PRISON_SEC
+        self._host_drain(host)
+        return True
+
+    def _host_drain(self, host):
+        """
+        Close idle connections toward a host
+        :param host: str
+        :type host: str
+        """
+
+        with self.pool_lock:
+            ar_keep = list()
+            n = 0
+            while not self.pool.empty():
+                conn = self.pool.get_nowait()
+                if self.connection_host(conn) == host:
+                    self._connection_close(conn)
+                    n += 1
+                else:
+                    ar_keep.append(conn)
+            for conn in ar_keep:
+                self.pool.put_nowait(conn)
+            if n > 0:
+                self._slot_release(n)
+
+    def host_record(self, host, ms, ok):
+        """
+        Record a call toward a host (circuit breaker), deactivating the host and closing its idle connections if its breaker opens
+        :param host: str
+        :type host: str
+        :param ms: call duration millis
+        :type ms: float
+        :param ok: False if the call failed (connection lost, timeout)
+        :type ok: bool
+        """
+
+        b = self.d_breaker.get(host)
+        if b is None:
+            return
+        if b.record(ms, ok):
+            self.host_status[host] = max(self.host_status[host], b.open_until)
+            self._host_drain(host)
+
+    def _connection_acquire(self, priority):
+        """
+        Get a connection, resetting its session if it has been handed over dirty (priority wait queue, no ping)
+        :param priority: priority class name (None : default class), ignored without priority classes
+        :type priority: str,None
+        :return: pymysql.connections.Connection
+        :rtype: pymysql.connections.Connection
+        """
+
+        conn = super(MysqlConnectionPool, self)._connection_acquire(priority)
+        if id(conn) in self.conn_dirty:
+            try:
+                ok = self._session_reset(conn)
+            except BaseException:
+                # Interrupted (caller gevent.Timeout, kill) : session state unknown
+                self.connection_discard(conn)
+                raise
+            if not ok:
+                self.connection_discard(conn)
+                return self._connection_acquire(priority)
+        return conn
+
+    def connection_release(self, conn):
+        """
+        Put a connection back in the pool, closing it if its host has been deactivated meanwhile.
+        A dirty connection (see session_reset) is flagged, its session is reset on next acquire (in place of the ping).
+        :param conn: pymysql.connections.Connection
+        :type conn: pymysql.connections.Connection
+        """
+
+        if conn is not None and self.host_status.get(self.connection_host(conn), 0.0) > time.time():
+            self.connection_discard(conn)
+            return
+        if conn is not None and self.session_reset and (self.session_reset == "always" or self.driver.session_dirty(conn, self.conf_dict["autocommit"])):
+            Meters.aii("k.db_pool.session.dirty", tags=self.meters_tags)
+            self.conn_dirty.add(id(conn))
+        super(MysqlConnectionPool, self).connection_release(conn)
+
+    def _session_reset(self, conn):
+        """
+        Reset the session of a connection released dirty, restoring charset and autocommit.
+        Must not raise anything.
+        :param conn: pymysql.connections.Connection
+        :type conn: pymysql.connections.Connection
+        :return bool (False : failed, the connection must be closed)
+        :rtype bool
+        """
+
+        self.conn_dirty.discard(id(conn))
+
+        # noinspection PyBroadException
+        try:
+            self.driver.session_reset(conn, self.conf_dict.get("encoding", "utf8"), self.conf_dict["autocommit"], full=self.session_reset_full)
+        except Exception as e:
+            Meters.aii("k.db_pool.mysql.ex_session_reset")
+            logger.debug("Session reset failed, obj=%s, ex=%s", conn, SolBase.extostr(e))
+            return False
+
+        # COM_RESET_CONNECTION drops server side prepared statements
+        if self.session_reset_full:
+            self.prepared_invalidate(conn)
+        Meters.aii("k.db_pool.session.reset", tags=self.meters_tags)
+        return True
+
+    def close_all(self):
+        """
+        Close all connections, stopping dns background refreshes
+        """
+
+        super(MysqlConnectionPool, self).close_all()
+        if self.dns_cache:
+            self.dns_cache.close()
+
+    def _server_load(self):
+        """
+        Get the server load (adaptive sizing back off) : Threads_connected / max_connections, read on an idle connection.
+        Called outside the lock : the idle connection is taken and put back under lock, the status query runs without it.
+        :return float,None (None : unknown, no idle connection)
+        :rtype float,None
+        """
+
+        with self.pool_lock:
+            if self.pool.qsize() == 0:
+                return None
+            conn = self.pool.get_nowait()
+        # noinspection PyBroadException
+        try:
+            cur = self.driver.cursor(conn, dict_rows=False)
+            try:
+                cur.execute("SELECT @@max_connections;")
+                max_connections = int(cur.fetchall()[0][0])
+                cur.execute("SHOW GLOBAL STATUS LIKE 'Threads_connected';")
+                threads_connected = int(cur.fetchall()[0][1])
+            finally:
+                cur.close()
+        except Exception as e:
+            Meters.aii("k.db_pool.mysql.ex_server_load")
+            logger.debug("Server load failed, ex=%s", SolBase.extostr(e))
+            if self.driver.is_connection_error(e):
+                self._connection_close(conn)
+                with self.pool_lock:
+                    self._slot_release(1)
+                return None
+            with self.pool_lock:
+                self._connection_put_back(conn)
+            return None
+        except BaseException:
+            # Killed in the middle of the exchange (pool closed) : drop it
+            self._connection_close(conn)
+            with self.pool_lock:
+                self._slot_release(1)
+            raise
+
+        with self.pool_lock:
+            self._connection_put_back(conn)
+        load = float(threads_connected) / max(1, max_connections)
+        Meters.ai("k.db_pool.adaptive.server_load_pct", tags=self.meters_tags).set(int(load * 100))
+        return load
 
     def _get_random_host(self):
         """
@@ -205,7 +647,7 @@ class MysqlConnectionPool(DatabaseConnectionPool):
         :rtype str,bool
         """
         now = time.time()
-        hosts_up = [host for host, prison in self.host_status.items() if prison < now]
+        hosts_up = [host for host, prison in self.host_status.items() if prison < now and (host not in self.d_breaker or self.d_breaker[host].connect_allowed(now))]
         try:
             host = random.choice(hosts_up)
             return host
@@ -248,26 +690,25 @@ class MysqlConnectionPool(DatabaseConnectionPool):
 
             # This host seems up => try open a connection
             try:
-                # Build the dict for underlying _get_connection
-                d_local = copy.deepcopy(self.conf_dict)
-                if "hosts" in d_local:
-                    del d_local["hosts"]
-                d_local["host"] = host
-
                 # Open it
-                out_conn = self._get_connection(d_local)
+                out_conn = self._host_connect(host)
 
                 # Ping it (underlying base pool do NOT do it when opening connection)
                 if not self._connection_ping(out_conn):
                     raise Exception("Connection ping failed")
+
+                # Track host
+                self.d_conn_host[id(out_conn)] = host
+                if host in self.d_breaker:
+                    self.d_breaker[host].connect_done()
             except Exception as e:
                 # NOTE :
                 # - We disable the host for ALL errors (even if DatabaseError can be raised when database do not exist but when the server is up...)
 
                 # Deactivate host
                 Meters.aii("k.db_pool.mysql.hosts.deactivate_one")
-                logger.error("Host de-activate for 1 minute, host=%s, ex=%s", host, SolBase.extostr(e))
-                self.host_status[host] = time.time() + 60.0
+                logger.error("Host de-activate for %s sec, host=%s, ex=%s", self.HOST_PRISON_SEC, host, SolBase.extostr(e))
+                self.host_status[host] = time.time() + self.HOST_PRISON_SEC
                 # Kick connection
                 self._connection_close(out_conn)
 
@@ -291,10 +732,14 @@ class MysqlConnectionPool(DatabaseConnectionPool):
 
         Meters.aii("k.db_pool.mysql.call._connection_ping")
 
+        # Released dirty : the session reset replaces the ping
+        if id(conn) in self.conn_dirty:
+            return self._session_reset(conn)
+
         # noinspection PyBroadException
         try:
             # TODO : PING MODE MUST BE CONFIGURABLE
-            conn.ping(reconnect=False)
+            self.driver.ping(conn)
         except Exception as e:
             Meters.aii("k.db_pool.mysql.ex_ping")
             logger.debug("Ping failed, obj=%s, ex=%s", conn, SolBase.extostr(e))
@@ -302,6 +747,29 @@ class MysqlConnectionPool(DatabaseConnectionPool):
         else:
             return True
 
+    def _connection_forget(self, conn):
+        """
+        Forget a connection (after fork), closing our socket without sending COM_QUIT.
+        Must not raise anything.
+        :param conn: pymysql.connections.Connection
+        :type conn: pymysql.connections.Connection
+        """
+
+        Meters.aii("k.db_pool.mysql.call._connection_forget")
+
+        # Untrack host, prepared statements, session state
+        self.d_conn_host.pop(id(conn), None)
+        self.prepared_invalidate(conn)
+        self.conn_dirty.discard(id(conn))
+
+        # noinspection PyBroadException
+        try:
+            if conn:
+                self.driver.forget(conn)
+        except Exception as e:
+            Meters.aii("k.db_pool.mysql.ex_forget")
+            logger.debug("Forget exception (non fatal), ex=%s", SolBase.extostr(e))
+
     def _connection_close(self, conn):
         """
         Close a connection
@@ -312,10 +780,15 @@ class MysqlConnectionPool(DatabaseConnectionPool):
 
         Meters.aii("k.db_pool.mysql.call._connection_close")
 
+        # Untrack host, prepared statements, session state
+        self.d_conn_host.pop(id(conn), None)
+        self.prepared_invalidate(conn)
+        self.conn_dirty.discard(id(conn))
+
         # noinspection PyBroadException
         try:
             if conn:
-                conn.close()
+                self.driver.close(conn)
         except Exception as e:
             # Don't care of exception in case of closing
             Meters.aii("k.db_pool.mysql.ex_close")
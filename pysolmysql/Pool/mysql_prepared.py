@@ -0,0 +1,422 @@
+"""
+# -*- coding: utf-8 -*-
+# ===============================================================================
+#
+# Copyright (C) 2013/2025 Laurent Labatut / Laurent Champagnac
+#
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ===============================================================================
+"""
+import datetime
+import decimal
+import logging
+import struct
+
+from pymysql.constants import COMMAND, FIELD_TYPE, FLAG
+from pymysql.protocol import EOFPacketWrapper, FieldDescriptorPacket, OKPacketWrapper
+
+logger = logging.getLogger(__name__)
+
+# Binary charset (bytes, not decoded)
+CHARSET_BINARY = 63
+
+# Parameter types (type, flags)
+_T_NULL = struct.pack("<BB", FIELD_TYPE.NULL, 0)
+_T_LONGLONG = struct.pack("<BB", FIELD_TYPE.LONGLONG, 0)
+_T_ULONGLONG = struct.pack("<BB", FIELD_TYPE.LONGLONG, 0x80)
+_T_DOUBLE = struct.pack("<BB", FIELD_TYPE.DOUBLE, 0)
+_T_VAR_STRING = struct.pack("<BB", FIELD_TYPE.VAR_STRING, 0)
+_T_BLOB = struct.pack("<BB", FIELD_TYPE.BLOB, 0)
+_T_NEWDECIMAL = struct.pack("<BB", FIELD_TYPE.NEWDECIMAL, 0)
+_T_DATETIME = struct.pack("<BB", FIELD_TYPE.DATETIME, 0)
+_T_DATE = struct.pack("<BB", FIELD_TYPE.DATE, 0)
+_T_TIME = struct.pack("<BB", FIELD_TYPE.TIME, 0)
+
+_S_Q = struct.Struct("<q")
+_S_UQ = struct.Struct("<Q")
+_S_D = struct.Struct("<d")
+
+
+def lenenc(b):
+    """
+    Length encoded bytes
+    :param b: bytes
+    :type b: bytes
+    :return bytes
+    :rtype bytes
+    """
+
+    n = len(b)
+    if n < 251:
+        return struct.pack("<B", n) + b
+    elif n < 1 << 16:
+        return b"\xfc" + struct.pack("<H", n) + b
+    elif n < 1 << 24:
+        return b"\xfd" + struct.pack("<I", n)[:3] + b
+    return b"\xfe" + struct.pack("<Q", n) + b
+
+
+class PreparedStatement(object):
+    """
+    Server side prepared statement handle (valid for the connection it was prepared on)
+    """
+
+    __slots__ = ("stmt_id", "statement", "num_params", "num_columns")
+
+    def __init__(self, stmt_id, statement, num_params, num_columns):
+        """
+        Init
+        :param stmt_id: server statement id
+        :type stmt_id: int
+        :param statement: sql statement (with ? placeholders)
+        :type statement: str
+        :param num_params: parameter count
+        :type num_params: int
+        :param num_columns: column count
+        :type num_columns: int
+        """
+
+        self.stmt_id = stmt_id
+        self.statement = statement
+        self.num_params = num_params
+        self.num_columns = num_columns
+
+
+class MysqlPrepared(object):
+    """
+    Binary protocol prepared statements over pymysql connections : COM_STMT_PREPARE, COM_STMT_EXECUTE, COM_STMT_CLOSE.
+
+    Parameters are sent typed (None, bool, int, float, str, bytes, Decimal, datetime, date, timedelta, others as str).
+    Result rows are decoded from the binary row format into dict.
+    """
+
+    # ------------------------------------------------
+    # COMMANDS
+    # ------------------------------------------------
+
+    @classmethod
+    def prepare(cls, conn, statement):
+        """
+        Prepare a statement
+        :param conn: pymysql.connections.Connection
+        :type conn: pymysql.connections.Connection
+        :param statement: sql statement (with ? placeholders)
+        :type statement: str
+        :return PreparedStatement
+        :rtype PreparedStatement
+        """
+
+        # noinspection PyProtectedMember
+        conn._execute_command(COMMAND.COM_STMT_PREPARE, statement)
+        # noinspection PyProtectedMember
+        packet = conn._read_packet()
+        packet.advance(1)
+        stmt_id, num_columns, num_params = packet.read_struct("<IHH")
+
+        # Parameter and column definitions : not used (columns are sent again by each execute)
+        for n in (num_params, num_columns):
+            if n > 0:
+                for _ in range(n + 1):
+                    # noinspection PyProtectedMember
+                    conn._read_packet()
+
+        return PreparedStatement(stmt_id, statement, num_params, num_columns)
+
+    @classmethod
+    def close(cls, conn, ps):
+        """
+        Close a prepared statement (no server response)
+        :param conn: pymysql.connections.Connection
+        :type conn: pymysql.connections.Connection
+        :param ps: PreparedStatement
+        :type ps: PreparedStatement
+        """
+
+        # noinspection PyProtectedMember
+        conn._execute_command(COMMAND.COM_STMT_CLOSE, struct.pack("<I", ps.stmt_id))
+
+    @classmethod
+    def execute(cls, conn, ps, params):
+        """
+        Execute a prepared statement
+        :param conn: pymysql.connections.Connection
+        :type conn: pymysql.connections.Connection
+        :param ps: PreparedStatement
+        :type ps: PreparedStatement
+        :param params: parameters
+        :type params: list,tuple
+        :return tuple (rows : list of dict or None if no result set, affected rows, insert id)
+        :rtype tuple
+        """
+
+        params = params or ()
+        if len(params) != ps.num_params:
+            raise Exception("Invalid params len, expecting=%s, having=%s" % (ps.num_params, len(params)))
+
+        # Statement id, flags (no cursor), iteration count
+        payload = struct.pack("<IBI", ps.stmt_id, 0, 1)
+        if ps.num_params > 0:
+            payload += cls._encode_params(params, conn.encoding)
+
+        # noinspection PyProtectedMember
+        conn._execute_command(COMMAND.COM_STMT_EXECUTE, payload)
+        # noinspection PyProtectedMember
+        packet = conn._read_packet()
+
+        # No result set
+        if packet.is_ok_packet():
+            ok = OKPacketWrapper(packet)
+            conn.server_status = ok.server_status
+            return None, ok.affected_rows, ok.insert_id
+
+        # Result set : columns, EOF, binary rows, EOF
+        column_count = packet.read_length_encoded_integer()
+        # noinspection PyProtectedMember
+        ar_field = [conn._read_packet(FieldDescriptorPacket) for _ in range(column_count)]
+        # noinspection PyProtectedMember
+        conn._read_packet()
+
+        ar_name = [f.name for f in ar_field]
+        ar_decoder = [cls._decoder(f, conn.encoding) for f in ar_field]
+        bitmap_len = (column_count + 9) // 8
+        rows = list()
+        while True:
+            # noinspection PyProtectedMember
+            packet = conn._read_packet()
+            if packet.is_eof_packet():
+                conn.server_status = EOFPacketWrapper(packet).server_status
+                break
+            rows.append(cls._read_row(packet, ar_name, ar_decoder, bitmap_len))
+        return rows, len(rows), 0
+
+    # ------------------------------------------------
+    # PARAMETERS
+    # ------------------------------------------------
+
+    @classmethod
+    def _encode_params(cls, params, encoding):
+        """
+        Encode parameters : null bitmap, new params bound flag, types, values
+        :param params: parameters
+        :type params: list,tuple
+        :param encoding: connection encoding
+        :type encoding: str
+        :return bytes
+        :rtype bytes
+        """
+
+        null = bytearray((len(params) + 7) // 8)
+        ar_type = list()
+        ar_value = list()
+        for i, v in enumerate(params):
+            if v is None:
+                null[i >> 3] |= 1 << (i & 7)
+                ar_type.append(_T_NULL)
+            elif isinstance(v, bool):
+                ar_type.append(_T_LONGLONG)
+                ar_value.append(_S_Q.pack(int(v)))
+            elif isinstance(v, int):
+                if v >= 1 << 63:
+                    ar_type.append(_T_ULONGLONG)
+                    ar_value.append(_S_UQ.pack(v))
+                else:
+                    ar_type.append(_T_LONGLONG)
+                    ar_value.append(_S_Q.pack(v))
+            elif isinstance(v, float):
+                ar_type.append(_T_DOUBLE)
+                ar_value.append(_S_D.pack(v))
+            elif isinstance(v, str):
+                ar_type.append(_T_VAR_STRING)
+                ar_value.append(lenenc(v.encode(encoding)))
+            elif isinstance(v, (bytes, bytearray)):
+                ar_type.append(_T_BLOB)
+                ar_value.append(lenenc(bytes(v)))
+            elif isinstance(v, decimal.Decimal):
+                ar_type.append(_T_NEWDECIMAL)
+                ar_value.append(lenenc(str(v).encode("ascii")))
+            elif isinstance(v, datetime.datetime):
+                ar_type.append(_T_DATETIME)
+                if v.microsecond:
+                    ar_value.append(struct.pack("<BHBBBBBI", 11, v.year, v.month, v.day, v.hour, v.minute, v.second, v.microsecond))
+                else:
+                    ar_value.append(struct.pack("<BHBBBBB", 7, v.year, v.month, v.day, v.hour, v.minute, v.second))
+            elif isinstance(v, datetime.date):
+                ar_type.append(_T_DATE)
+                ar_value.append(struct.pack("<BHBB", 4, v.year, v.month, v.day))
+            elif isinstance(v, datetime.timedelta):
+                ar_type.append(_T_TIME)
+                neg = v < datetime.timedelta(0)
+                if neg:
+                    v = -v
+                hours, rem = divmod(v.seconds, 3600)
+                minutes, seconds = divmod(rem, 60)
+                ar_value.append(struct.pack("<BBIBBBI", 12, 1 if neg else 0, v.days, hours, minutes, seconds, v.microseconds))
+            else:
+                ar_type.append(_T_VAR_STRING)
+                ar_value.append(lenenc(str(v).encode(encoding)))
+
+        return bytes(null) + b"\x01" + b"".join(ar_type) + b"".join(ar_value)
+
+    # ------------------------------------------------
+    # ROWS
+    # ------------------------------------------------
+
+    @classmethod
+    def _read_row(cls, packet, ar_name, ar_decoder, bitmap_len):
+        """
+        Decode a binary row
+        :param packet: pymysql.protocol.MysqlPacket
+        :type packet: pymysql.protocol.MysqlPacket
+        :param ar_name: column names
+        :type ar_name: list
+        :param ar_decoder: column decoders
+        :type ar_decoder: list
+        :param bitmap_len: null bitmap length
+        :type bitmap_len: int
+        :return dict
+        :rtype dict
+        """
+
+        # Header, null bitmap (offset 2)
+        packet.advance(1)
+        bitmap = packet.read(bitmap_len)
+        row = dict()
+        for i, name in enumerate(ar_name):
+            bit = i + 2
+            if bitmap[bit >> 3] & (1 << (bit & 7)):
+                row[name] = None
+            else:
+                row[name] = ar_decoder[i](packet)
+        return row
+
+    @classmethod
+    def _decoder(cls, field, encoding):
+        """
+        Get the binary value decoder of a column
+        :param field: pymysql.protocol.FieldDescriptorPacket
+        :type field: pymysql.protocol.FieldDescriptorPacket
+        :param encoding: connection encoding
+        :type encoding: str
+        :return callable(packet)
+        :rtype callable
+        """
+
+        t = field.type_code
+        unsigned = field.flags & FLAG.UNSIGNED
+        if t == FIELD_TYPE.TINY:
+            return cls._struct_decoder("<B" if unsigned else "<b")
+        elif t in (FIELD_TYPE.SHORT, FIELD_TYPE.YEAR):
+            return cls._struct_decoder("<H" if unsigned else "<h")
+        elif t in (FIELD_TYPE.INT24, FIELD_TYPE.LONG):
+            return cls._struct_decoder("<I" if unsigned else "<i")
+        elif t == FIELD_TYPE.LONGLONG:
+            return cls._struct_decoder("<Q" if unsigned else "<q")
+        elif t == FIELD_TYPE.FLOAT:
+            return cls._struct_decoder("<f")
+        elif t == FIELD_TYPE.DOUBLE:
+            return cls._struct_decoder("<d")
+        elif t in (FIELD_TYPE.DECIMAL, FIELD_TYPE.NEWDECIMAL):
+            return lambda p: decimal.Decimal(p.read_length_coded_string().decode("ascii"))
+        elif t == FIELD_TYPE.DATE:
+            return cls._read_date
+        elif t in (FIELD_TYPE.DATETIME, FIELD_TYPE.TIMESTAMP):
+            return cls._read_datetime
+        elif t == FIELD_TYPE.TIME:
+            return cls._read_time
+        elif t == FIELD_TYPE.NULL:
+            return lambda p: None
+        elif field.charsetnr == CHARSET_BINARY or t == FIELD_TYPE.BIT:
+            return lambda p: p.read_length_coded_string()
+        else:
+            return lambda p: p.read_length_coded_string().decode(encoding)
+
+    @classmethod
+    def _struct_decoder(cls, fmt):
+        """
+        Fixed size decoder
+        :param fmt: struct format
+        :type fmt: str
+        :return callable(packet)
+        :rtype callable
+        """
+
+        s = struct.Struct(fmt)
+        size = s.size
+        return lambda p: s.unpack(p.read(size))[0]
+
+    @classmethod
+    def _read_date(cls, packet):
+        """
+        Date (None if zero or invalid)
+        :param packet: pymysql.protocol.MysqlPacket
+        :type packet: pymysql.protocol.MysqlPacket
+        :return datetime.date,None
+        :rtype datetime.date,None
+        """
+
+        n = packet.read_uint8()
+        if n == 0:
+            return None
+        b = packet.read(n)
+        try:
+            return datetime.date(*struct.unpack("<HBB", b[:4]))
+        except ValueError:
+            return None
+
+    @classmethod
+    def _read_datetime(cls, packet):
+        """
+        Datetime (None if zero or invalid)
+        :param packet: pymysql.protocol.MysqlPacket
+        :type packet: pymysql.protocol.MysqlPacket
+        :return datetime.datetime,None
+        :rtype datetime.datetime,None
+        """
+
+        n = packet.read_uint8()
+        if n == 0:
+            return None
+        b = packet.read(n)
+        year, month, day = struct.unpack("<HBB", b[:4])
+        hour, minute, second, microsecond = 0, 0, 0, 0
+        if n >= 7:
+            hour, minute, second = b[4], b[5], b[6]
+        if n >= 11:
+            microsecond = struct.unpack("<I", b[7:11])[0]
+        try:
+            return datetime.datetime(year, month, day, hour, minute, second, microsecond)
+        except ValueError:
+            return None
+
+    @classmethod
+    def _read_time(cls, packet):
+        """
+        Time
+        :param packet: pymysql.protocol.MysqlPacket
+        :type packet: pymysql.protocol.MysqlPacket
+        :return datetime.timedelta
+        :rtype datetime.timedelta
+        """
+
+        n = packet.read_uint8()
+        if n == 0:
+            return datetime.timedelta(0)
+        b = packet.read(n)
+        neg, days, hour, minute, second = struct.unpack("<BIBBB", b[:8])
+        microsecond = struct.unpack("<I", b[8:12])[0] if n >= 12 else 0
+        td = datetime.timedelta(days=days, hours=hour, minutes=minute, seconds=second, microseconds=microsecond)
+        return -td if neg else td
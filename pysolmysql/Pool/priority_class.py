@@ -0,0 +1,107 @@
+"""
+# -*- coding: utf-8 -*-
+# ===============================================================================
+#
+# Copyright (C) 2013/2025 Laurent Labatut / Laurent Champagnac
+#
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ===============================================================================
+"""
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class PriorityClass(object):
+    """
+    Pool priority class : connections reserved for the class, wait queue.
+
+    conf_dict["pool_priorities"] = {name: {"priority": int (lower first), "reserved": int, "wait_ms": int}}
+    """
+
+    # Implicit class for calls without priority (if not configured) : no reservation, no wait
+    DEFAULT = "default"
+
+    def __init__(self, pool_name, name, priority=0, reserved=0, wait_ms=0):
+        """
+        Init
+        :param pool_name: pool name (meters)
+        :type pool_name: str
+        :param name: class name
+        :type name: str
+        :param priority: priority, lower is served first
+        :type priority: int
+        :param reserved: connections reserved for this class (not usable by other classes)
+        :type reserved: int
+        :param wait_ms: max wait for a connection (0 : raise immediately if none available)
+        :type wait_ms: int,float
+        """
+
+        self.name = name
+        self.priority = priority
+        self.reserved = reserved
+        self.wait_ms = wait_ms
+        self.tags = {"pool": pool_name, "priority": name}
+
+        # Waiters : (gevent.event.AsyncResult, acquire start millis)
+        self.waiters = deque()
+
+        # Counters
+        self.in_use = 0
+        self.count_reject = 0
+
+    @classmethod
+    def from_conf(cls, pool_name, d_priorities, max_size):
+        """
+        Build priority classes, sorted by priority
+        :param pool_name: pool name
+        :type pool_name: str
+        :param d_priorities: conf_dict["pool_priorities"]
+        :type d_priorities: dict
+        :param max_size: pool max size
+        :type max_size: int
+        :return list of PriorityClass
+        :rtype list
+        """
+
+        ar = [cls(pool_name, name, d.get("priority", 0), d.get("reserved", 0), d.get("wait_ms", 0)) for name, d in d_priorities.items()]
+        if cls.DEFAULT not in d_priorities:
+            ar.append(cls(pool_name, cls.DEFAULT, priority=max([pc.priority for pc in ar] + [0]) + 1))
+        reserved = sum(pc.reserved for pc in ar)
+        if reserved > max_size:
+            raise Exception("Invalid pool_priorities, reserved=%s above max_size=%s" % (reserved, max_size))
+        ar.sort(key=lambda pc: pc.priority)
+        return ar
+
+    def unmet(self):
+        """
+        Get reserved connections not in use
+        :return int
+        :rtype int
+        """
+
+        return max(0, self.reserved - self.in_use)
+
+    def stats(self):
+        """
+        Get stats
+        :return dict
+        :rtype dict
+        """
+
+        return {"in_use": self.in_use, "waiting": len(self.waiters), "reserved": self.reserved, "reject": self.count_reject}
@@ -0,0 +1,169 @@
+"""
+# -*- coding: utf-8 -*-
+# ===============================================================================
+#
+# Copyright (C) 2013/2025 Laurent Labatut / Laurent Champagnac
+#
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ===============================================================================
+"""
+import argparse
+import logging
+import platform
+import time
+
+# noinspection PyUnresolvedReferences
+import ujson
+from pysolbase.SolBase import SolBase
+
+from pysolmysql.Mysql.MysqlApi import MysqlApi
+from pysolmysql.Pool.mysql_driver import MysqlDriver
+
+logger = logging.getLogger(__name__)
+
+
+class DriverBench(object):
+    """
+    Driver benchmark : rows/sec decoded by MysqlApi.exec_n, per driver, on a single greenlet (decoding cpu cost).
+    """
+
+    @classmethod
+    def run(cls, conf_dict, statement, duration_sec, driver):
+        """
+        Run one driver
+        :param conf_dict: MysqlApi configuration dict
+        :type conf_dict: dict
+        :param statement: statement (exec_n)
+        :type statement: str
+        :param duration_sec: duration in seconds
+        :type duration_sec: float
+        :param driver: driver name
+        :type driver: str
+        :return dict
+        :rtype dict
+        """
+
+        d_conf = dict(conf_dict)
+        d_conf["driver"] = driver
+        try:
+            MysqlDriver.get(driver)
+        except Exception as e:
+            logger.info("Driver skipped, driver=%s, ex=%s", driver, e)
+            return {"driver": driver, "available": False}
+
+        # Warm up (connect)
+        MysqlApi.exec_n(d_conf, statement)
+
+        count_call = 0
+        count_row = 0
+        t = time.perf_counter()
+        sec = 0.0
+        while sec < duration_sec:
+            count_row += len(MysqlApi.exec_n(d_conf, statement))
+            count_call += 1
+            sec = time.perf_counter() - t
+
+        return {
+            "driver": driver,
+            "available": True,
+            "duration_sec": round(sec, 3),
+            "calls": count_call,
+            "rows": count_row,
+            "calls_per_sec": round(count_call / sec, 2),
+            "rows_per_sec": round(count_row / sec, 2),
+        }
+
+    @classmethod
+    def run_all(cls, conf_dict, statement, duration_sec, ar_driver=None):
+        """
+        Run all drivers
+        :param conf_dict: MysqlApi configuration dict
+        :type conf_dict: dict
+        :param statement: statement (exec_n)
+        :type statement: str
+        :param duration_sec: duration in seconds, per driver
+        :type duration_sec: float
+        :param ar_driver: driver names (None : all registered)
+        :type ar_driver: list,None
+        :return dict
+        :rtype dict
+        """
+
+        ar_result = list()
+        for driver in ar_driver or sorted(MysqlDriver.D_DRIVER_CLASS.keys()):
+            d = cls.run(conf_dict, statement, duration_sec, driver)
+            logger.info("Bench, driver=%s, rows/s=%s", driver, d.get("rows_per_sec"))
+            ar_result.append(d)
+
+        return {
+            "bench": "driver",
+            "epoch": time.time(),
+            "python": platform.python_version(),
+            "machine": platform.node(),
+            "statement": statement,
+            "results": ar_result,
+        }
+
+
+def main(ar_args=None):
+    """
+    Entry point : python -m pysolmysql.bench.driver_bench
+    :param ar_args: list,None
+    :type ar_args: list,None
+    """
+
+    parser = argparse.ArgumentParser(description="pysolmysql driver benchmark (rows/sec)")
+    parser.add_argument("--conf", help="json file, MysqlApi conf_dict")
+    parser.add_argument("--stub", action="store_true", help="run against an in-process mysql stub server (no database)")
+    parser.add_argument("--rows", type=int, default=1000, help="stub result set rows")
+    parser.add_argument("--columns", type=int, default=10, help="stub result set columns")
+    parser.add_argument("--statement", default="SELECT * FROM information_schema.COLUMNS LIMIT 1000;")
+    parser.add_argument("--driver", action="append", help="driver, can be repeated (default : all)")
+    parser.add_argument("--duration-sec", type=float, default=5.0)
+    parser.add_argument("--out", default="bench_driver.json", help="json output file")
+    args = parser.parse_args(ar_args)
+
+    SolBase.voodoo_init()
+    SolBase.logging_init(log_level="INFO", force_reset=True)
+
+    stub = None
+    if args.stub:
+        from pysolmysql.bench.mysql_stub import MysqlStubServer
+        stub = MysqlStubServer(result_rows=args.rows, result_columns=args.columns)
+        stub.start()
+        conf_dict = stub.conf_dict()
+    elif args.conf:
+        with open(args.conf, "r") as f:
+            conf_dict = ujson.loads(f.read())
+    else:
+        parser.error("--conf or --stub required")
+        return
+
+    try:
+        d = DriverBench.run_all(conf_dict, args.statement, args.duration_sec, args.driver)
+    finally:
+        MysqlApi.reset_pools()
+        if stub:
+            stub.stop()
+
+    with open(args.out, "w") as f:
+        f.write(ujson.dumps(d, indent=2))
+    logger.info("Bench written, out=%s", args.out)
+
+
+if __name__ == "__main__":
+    main()
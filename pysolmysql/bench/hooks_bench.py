@@ -0,0 +1,193 @@
+"""
+# -*- coding: utf-8 -*-
+# ===============================================================================
+#
+# Copyright (C) 2013/2025 Laurent Labatut / Laurent Champagnac
+#
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ===============================================================================
+"""
+import argparse
+import logging
+import platform
+import time
+import timeit
+
+# noinspection PyUnresolvedReferences
+import ujson
+from pysolbase.SolBase import SolBase
+
+from pysolmysql.Mysql.MysqlApi import MysqlApi
+from pysolmysql.Pool.hooks import Hooks
+from pysolmysql.bench.pool_bench import MockConnectionPool
+
+logger = logging.getLogger(__name__)
+
+
+class HooksBench(object):
+    """
+    Hooks overhead benchmark, single greenlet :
+    - pool : acquire / release cycle over a MockConnectionPool (no latency)
+    - api : MysqlApi.exec_n cycle (against conf_dict, a stub server by default)
+    each with hooks disabled, then with no-op hooks registered, plus the cost of the disabled check itself.
+    """
+
+    @classmethod
+    def _noop(cls, d_event):
+        """
+        No-op hook
+        :param d_event: dict
+        :type d_event: dict
+        """
+
+        pass
+
+    @classmethod
+    def _hooks_enable(cls):
+        """
+        Register no-op hooks, all kinds
+        """
+
+        for kind in Hooks.KINDS:
+            Hooks.add(kind, cls._noop)
+
+    @classmethod
+    def _measure(cls, f, iterations, repeat):
+        """
+        Measure f, best of repeat
+        :param f: callable
+        :type f: collections.abc.Callable
+        :param iterations: calls per run
+        :type iterations: int
+        :param repeat: runs
+        :type repeat: int
+        :return float (micros per call)
+        :rtype float
+        """
+
+        best = None
+        for _ in range(repeat):
+            t = time.perf_counter()
+            for _ in range(iterations):
+                f()
+            sec = time.perf_counter() - t
+            best = sec if best is None else min(best, sec)
+        return round(best / iterations * 1000000.0, 3)
+
+    @classmethod
+    def run(cls, conf_dict=None, iterations=10000, repeat=3, statement="SELECT 1;"):
+        """
+        Run
+        :param conf_dict: MysqlApi configuration dict (None : api cycle not measured)
+        :type conf_dict: dict,None
+        :param iterations: calls per run
+        :type iterations: int
+        :param repeat: runs (best kept)
+        :type repeat: int
+        :param statement: statement (exec_n)
+        :type statement: str
+        :return dict
+        :rtype dict
+        """
+
+        Hooks.reset()
+        pool = MockConnectionPool({"pool_max_size": 1, "pool_name": "bench_hooks"})
+
+        def _pool_cycle():
+            pool.connection_release(pool.connection_acquire())
+
+        def _api_cycle():
+            MysqlApi.exec_n(conf_dict, statement)
+
+        d_out = {
+            "bench": "hooks",
+            "epoch": time.time(),
+            "python": platform.python_version(),
+            "machine": platform.node(),
+            "iterations": iterations,
+        }
+        try:
+            # Disabled check cost (one per hook point)
+            d_out["check_ns"] = round(min(timeit.repeat("if Hooks.ACQUIRE: pass", globals={"Hooks": Hooks}, number=iterations * 10, repeat=repeat)) / (iterations * 10) * 1000000000.0, 3)
+
+            # Pool cycle : 2 hook points (acquire, release)
+            _pool_cycle()
+            d_out["pool_us_disabled"] = cls._measure(_pool_cycle, iterations, repeat)
+            cls._hooks_enable()
+            d_out["pool_us_enabled"] = cls._measure(_pool_cycle, iterations, repeat)
+            Hooks.reset()
+            d_out["pool_check_pct"] = round(2 * d_out["check_ns"] / 1000.0 / d_out["pool_us_disabled"] * 100.0, 4)
+
+            # Api cycle : 3 hook points (acquire, execute, release)
+            if conf_dict:
+                _api_cycle()
+                api_iterations = max(1, iterations // 10)
+                d_out["api_us_disabled"] = cls._measure(_api_cycle, api_iterations, repeat)
+                cls._hooks_enable()
+                d_out["api_us_enabled"] = cls._measure(_api_cycle, api_iterations, repeat)
+                Hooks.reset()
+                d_out["api_check_pct"] = round(3 * d_out["check_ns"] / 1000.0 / d_out["api_us_disabled"] * 100.0, 4)
+        finally:
+            Hooks.reset()
+            pool.close_all()
+
+        return d_out
+
+
+def main(ar_args=None):
+    """
+    Entry point : python -m pysolmysql.bench.hooks_bench
+    :param ar_args: list,None
+    :type ar_args: list,None
+    """
+
+    parser = argparse.ArgumentParser(description="pysolmysql hooks overhead benchmark")
+    parser.add_argument("--conf", help="json file, MysqlApi conf_dict (default : in-process mysql stub server)")
+    parser.add_argument("--iterations", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", default="bench_hooks.json", help="json output file")
+    args = parser.parse_args(ar_args)
+
+    SolBase.voodoo_init()
+    SolBase.logging_init(log_level="INFO", force_reset=True)
+
+    stub = None
+    if args.conf:
+        with open(args.conf, "r") as f:
+            conf_dict = ujson.loads(f.read())
+    else:
+        from pysolmysql.bench.mysql_stub import MysqlStubServer
+        stub = MysqlStubServer()
+        stub.start()
+        conf_dict = stub.conf_dict()
+
+    try:
+        d = HooksBench.run(conf_dict, iterations=args.iterations, repeat=args.repeat)
+    finally:
+        MysqlApi.reset_pools()
+        if stub:
+            stub.stop()
+
+    logger.info("Bench, check=%s ns, pool=%s/%s us (%s%%), api=%s/%s us (%s%%)",
+                d["check_ns"], d["pool_us_disabled"], d["pool_us_enabled"], d["pool_check_pct"], d["api_us_disabled"], d["api_us_enabled"], d["api_check_pct"])
+    with open(args.out, "w") as f:
+        f.write(ujson.dumps(d, indent=2))
+    logger.info("Bench written, out=%s", args.out)
+
+
+if __name__ == "__main__":
+    main()
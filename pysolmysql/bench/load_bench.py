@@ -0,0 +1,237 @@
+"""
+# -*- coding: utf-8 -*-
+# ===============================================================================
+#
+# Copyright (C) 2013/2025 Laurent Labatut / Laurent Champagnac
+#
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ===============================================================================
+"""
+import argparse
+import logging
+import random
+import sys
+import time
+
+import gevent
+# noinspection PyUnresolvedReferences
+import ujson
+from gevent.event import Event
+from pysolbase.SolBase import SolBase
+from pysolmeters.Meters import Meters
+
+from pysolmysql.Mysql.MysqlApi import MysqlApi
+from pysolmysql.bench.pool_bench import percentile
+
+logger = logging.getLogger(__name__)
+
+
+class LoadBench(object):
+    """
+    Load test : greenlets loop on a weighted statement mix through MysqlApi, for a given duration.
+
+    Statement mix is a list of dict :
+    - "statement" : sql statement
+    - "weight" : relative weight (default 1)
+    - "method" : MysqlApi method, exec_0, exec_n, exec_1 or exec_01 (default exec_n)
+    """
+
+    # Max latency samples kept (reservoir sampling above)
+    SAMPLE_MAX = 200000
+
+    # Allowed methods
+    METHODS = ("exec_0", "exec_n", "exec_1", "exec_01")
+
+    @classmethod
+    def run(cls, conf_dict, ar_mix, greenlet_count, duration_sec):
+        """
+        Run
+        :param conf_dict: MysqlApi configuration dict
+        :type conf_dict: dict
+        :param ar_mix: statement mix
+        :type ar_mix: list
+        :param greenlet_count: greenlet count
+        :type greenlet_count: int
+        :param duration_sec: duration in seconds
+        :type duration_sec: float
+        :return dict
+        :rtype dict
+        """
+
+        # Build the mix
+        ar_call = list()
+        ar_weight = list()
+        for d in ar_mix:
+            method = d.get("method", "exec_n")
+            if method not in cls.METHODS:
+                raise Exception("Invalid method=%s, allowed=%s" % (method, cls.METHODS))
+            ar_call.append((getattr(MysqlApi, method), d["statement"]))
+            ar_weight.append(d.get("weight", 1))
+
+        stop_event = Event()
+        ar_sample = list()
+        d_count = {"ok": 0, "ex": 0, "maxed": 0}
+        rnd = random.Random()
+
+        def _worker():
+            while not stop_event.is_set():
+                f, statement = rnd.choices(ar_call, ar_weight)[0]
+                t = time.perf_counter()
+                try:
+                    f(conf_dict, statement)
+                    d_count["ok"] += 1
+                except Exception as e:
+                    if "Pool maxed" in str(e):
+                        d_count["maxed"] += 1
+                        # Do not spin on a maxed pool
+                        gevent.sleep(0.001)
+                        continue
+                    d_count["ex"] += 1
+                    logger.debug("Ex=%s", SolBase.extostr(e))
+                    continue
+                ms = (time.perf_counter() - t) * 1000.0
+
+                # Reservoir sampling
+                n = d_count["ok"]
+                if n <= cls.SAMPLE_MAX:
+                    ar_sample.append(ms)
+                else:
+                    idx = rnd.randrange(n)
+                    if idx < cls.SAMPLE_MAX:
+                        ar_sample[idx] = ms
+
+        ms_start = SolBase.mscurrent()
+        ar_greenlet = [gevent.spawn(_worker) for _ in range(greenlet_count)]
+        gevent.sleep(duration_sec)
+        stop_event.set()
+        gevent.joinall(ar_greenlet, timeout=60.0)
+        gevent.killall(ar_greenlet)
+        sec = SolBase.msdiff(ms_start) / 1000.0
+
+        ar_sample.sort()
+        return {
+            "bench": "load",
+            "epoch": time.time(),
+            "greenlet_count": greenlet_count,
+            "pool_max_size": conf_dict.get("pool_max_size", 10),
+            "duration_sec": round(sec, 3),
+            "ok": d_count["ok"],
+            "ex": d_count["ex"],
+            "pool_maxed": d_count["maxed"],
+            "qps": round(d_count["ok"] / sec, 2),
+            "ms_p50": percentile(ar_sample, 50),
+            "ms_p95": percentile(ar_sample, 95),
+            "ms_p99": percentile(ar_sample, 99),
+            "ms_max": ar_sample[-1] if ar_sample else None,
+            "pools": MysqlApi.pool_stats(),
+            "meters": cls.meters_counters(),
+        }
+
+    @classmethod
+    def meters_counters(cls):
+        """
+        Get pysolmysql meters counters
+        :return list of dict (key, tags, value)
+        :rtype list
+        """
+
+        ar_out = list()
+        for ar in Meters.meters_to_udp_format(send_dtc=False):
+            if ar[0].startswith("k.db_"):
+                ar_out.append({"key": ar[0], "tags": ar[1], "value": ar[2]})
+        ar_out.sort(key=lambda d: (d["key"], ujson.dumps(d["tags"], sort_keys=True)))
+        return ar_out
+
+
+def main(ar_args=None):
+    """
+    Entry point : python -m pysolmysql.bench
+    :param ar_args: list,None
+    :type ar_args: list,None
+    """
+
+    parser = argparse.ArgumentParser(prog="python -m pysolmysql.bench", description="pysolmysql load test")
+    parser.add_argument("--conf", help="json file, MysqlApi conf_dict (overrides connection arguments)")
+    parser.add_argument("--hosts", default="localhost", help="comma separated hosts")
+    parser.add_argument("--port", type=int, default=3306)
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--database", default=None)
+    parser.add_argument("--stub", action="store_true", help="run against an in-process mysql stub server (no database)")
+    parser.add_argument("--statement", action="append", help="statement (exec_n), can be repeated")
+    parser.add_argument("--mix", help="json file, statement mix : list of {statement, weight, method}")
+    parser.add_argument("--greenlets", type=int, default=10)
+    parser.add_argument("--duration-sec", type=float, default=10.0)
+    parser.add_argument("--pool-max-size", type=int, default=None, help="overrides conf_dict pool_max_size")
+    parser.add_argument("--out", default=None, help="json output file (default : stdout)")
+    args = parser.parse_args(ar_args)
+
+    SolBase.voodoo_init()
+    if args.out:
+        SolBase.logging_init(log_level="INFO", force_reset=True)
+    else:
+        # Json on stdout : logs go to stderr, keeping stdout machine readable
+        SolBase.logging_init(log_level="INFO", force_reset=True, log_to_console=False)
+        logging.getLogger().addHandler(logging.StreamHandler(sys.stderr))
+
+    # Mix
+    ar_mix = list()
+    if args.mix:
+        with open(args.mix, "r") as f:
+            ar_mix.extend(ujson.loads(f.read()))
+    for s in args.statement or list():
+        ar_mix.append({"statement": s})
+    if len(ar_mix) == 0:
+        ar_mix.append({"statement": "SELECT 1;"})
+
+    # Conf
+    stub = None
+    if args.stub:
+        from pysolmysql.bench.mysql_stub import MysqlStubServer
+        stub = MysqlStubServer()
+        stub.start()
+        conf_dict = stub.conf_dict()
+    elif args.conf:
+        with open(args.conf, "r") as f:
+            conf_dict = ujson.loads(f.read())
+    else:
+        conf_dict = {
+            "hosts": args.hosts.split(","),
+            "port": args.port,
+            "database": args.database,
+            "user": args.user,
+            "password": args.password,
+            "autocommit": True,
+        }
+    if args.pool_max_size is not None:
+        conf_dict["pool_max_size"] = args.pool_max_size
+
+    try:
+        d = LoadBench.run(conf_dict, ar_mix, args.greenlets, args.duration_sec)
+    finally:
+        MysqlApi.reset_pools()
+        if stub:
+            stub.stop()
+
+    logger.info("Load test, qps=%s, p50/p95/p99/max=%s/%s/%s/%s ms, ex=%s, pool_maxed=%s",
+                d["qps"], d["ms_p50"], d["ms_p95"], d["ms_p99"], d["ms_max"], d["ex"], d["pool_maxed"])
+    buf = ujson.dumps(d, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(buf)
+    else:
+        print(buf)
@@ -0,0 +1,947 @@
+"""
+# -*- coding: utf-8 -*-
+# ===============================================================================
+#
+# Copyright (C) 2013/2025 Laurent Labatut / Laurent Champagnac
+#
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ===============================================================================
+"""
+import datetime
+import decimal
+import logging
+import os
+import re
+import struct
+from collections import deque
+
+import gevent
+from gevent.event import Event
+from gevent.server import StreamServer
+from pymysql import _auth
+from pysolbase.SolBase import SolBase
+
+logger = logging.getLogger(__name__)
+
+# Capabilities
+CLIENT_LONG_PASSWORD = 1
+CLIENT_FOUND_ROWS = 1 << 1
+CLIENT_LONG_FLAG = 1 << 2
+CLIENT_CONNECT_WITH_DB = 1 << 3
+CLIENT_LOCAL_FILES = 1 << 7
+CLIENT_PROTOCOL_41 = 1 << 9
+CLIENT_TRANSACTIONS = 1 << 13
+CLIENT_SECURE_CONNECTION = 1 << 15
+CLIENT_MULTI_STATEMENTS = 1 << 16
+CLIENT_MULTI_RESULTS = 1 << 17
+CLIENT_PLUGIN_AUTH = 1 << 19
+
+# Server status
+SERVER_STATUS_IN_TRANS = 1
+SERVER_STATUS_AUTOCOMMIT = 2
+
+# Commands
+COM_QUIT = 0x01
+COM_INIT_DB = 0x02
+COM_QUERY = 0x03
+COM_PING = 0x0e
+COM_STMT_PREPARE = 0x16
+COM_STMT_EXECUTE = 0x17
+COM_STMT_CLOSE = 0x19
+COM_RESET_CONNECTION = 0x1f
+
+# Column types
+FIELD_TYPE_DOUBLE = 5
+FIELD_TYPE_NULL = 6
+FIELD_TYPE_LONGLONG = 8
+FIELD_TYPE_DATE = 10
+FIELD_TYPE_TIME = 11
+FIELD_TYPE_DATETIME = 12
+FIELD_TYPE_NEWDECIMAL = 246
+FIELD_TYPE_BLOB = 252
+FIELD_TYPE_VAR_STRING = 253
+
+# Charsets
+CHARSET_UTF8 = 33
+CHARSET_BINARY = 63
+
+
+def lenenc_int(i):
+    """
+    Length encoded integer
+    :param i: int
+    :type i: int
+    :return bytes
+    :rtype bytes
+    """
+
+    if i < 251:
+        return struct.pack("<B", i)
+    elif i < 1 << 16:
+        return b"\xfc" + struct.pack("<H", i)
+    elif i < 1 << 24:
+        return b"\xfd" + struct.pack("<I", i)[:3]
+    else:
+        return b"\xfe" + struct.pack("<Q", i)
+
+
+def lenenc_read(data, i):
+    """
+    Read a length encoded integer
+    :param data: bytes
+    :type data: bytes
+    :param i: offset
+    :type i: int
+    :return tuple (int, new offset)
+    :rtype tuple
+    """
+
+    b = data[i]
+    if b < 251:
+        return b, i + 1
+    elif b == 0xfc:
+        return struct.unpack("<H", data[i + 1:i + 3])[0], i + 3
+    elif b == 0xfd:
+        return struct.unpack("<I", data[i + 1:i + 4] + b"\x00")[0], i + 4
+    else:
+        return struct.unpack("<Q", data[i + 1:i + 9])[0], i + 9
+
+
+def lenenc_str(b):
+    """
+    Length encoded string
+    :param b: bytes
+    :type b: bytes
+    :return bytes
+    :rtype bytes
+    """
+
+    return lenenc_int(len(b)) + b
+
+
+class StubResult(object):
+    """
+    Stub query result : a result set (columns, rows), an OK (affected_rows, insert_id) or an error (errno, message)
+    """
+
+    def __init__(self, columns=None, rows=None, affected_rows=0, insert_id=0, errno=None, message=""):
+        """
+        Init
+        :param columns: column names (result set)
+        :type columns: list,None
+        :param rows: list of tuples (result set), values can be None, int, float, bytes, str
+        :type rows: list,None
+        :param affected_rows: affected rows (ok)
+        :type affected_rows: int
+        :param insert_id: last insert id (ok)
+        :type insert_id: int
+        :param errno: error number (error)
+        :type errno: int,None
+        :param message: error message (error)
+        :type message: str
+        """
+
+        self.columns = columns
+        self.rows = rows if rows is not None else list()
+        self.affected_rows = affected_rows
+        self.insert_id = insert_id
+        self.errno = errno
+        self.message = message
+
+
+class StubConnection(object):
+    """
+    Stub server side connection state
+    """
+
+    def __init__(self, thread_id, sock):
+        """
+        Init
+        :param thread_id: int
+        :type thread_id: int
+        :param sock: socket
+        :type sock: socket.socket
+        """
+
+        self.thread_id = thread_id
+        self.sock = sock
+        self.user = None
+        self.database = None
+        self.status = SERVER_STATUS_AUTOCOMMIT
+        self.seq = 0
+        self.client_flags = 0
+
+        # Prepared statements : id => [statement, param count, param types]
+        self.d_stmt = dict()
+        self.stmt_seq = 0
+        self.last_params = None
+
+        # Set by KILL QUERY, interrupts SELECT SLEEP(n)
+        self.kill_event = Event()
+
+
+class MysqlStubServer(object):
+    """
+    In-process server speaking enough of the mysql protocol for pymysql (gevent based).
+
+    Supported : handshake (mysql_native_password), COM_QUERY (text result sets, LOAD DATA LOCAL INFILE), COM_PING, COM_INIT_DB, COM_RESET_CONNECTION, COM_QUIT,
+    COM_STMT_PREPARE / COM_STMT_EXECUTE / COM_STMT_CLOSE (binary result sets, parameters interpolated in the statement before the rules below).
+
+    Queries are answered by "responder" (callable(statement, StubConnection) returning a StubResult or None), then by default rules :
+    - SELECT SLEEP(n) : sleep n seconds, return 1 row (error 1317 if interrupted by KILL QUERY)
+    - KILL QUERY id : interrupt the SELECT SLEEP(n) of connection id, KILL [CONNECTION] id : close connection id
+    - SELECT, SHOW, EXPLAIN : synthetic result set of result_rows x result_columns
+    - LOAD DATA LOCAL INFILE : file content requested from the client and stored in ar_load_data, affected rows = line count
+    - others : OK, affected_rows
+    - autocommit and transactions (BEGIN, START TRANSACTION, COMMIT, ROLLBACK) are tracked in server status
+
+    Latency and failures can be injected :
+    - connect_latency_ms, query_latency_ms
+    - refuse_connect : reject handshakes (access denied)
+    - fail_query_count : next N queries return an error
+    - drop_query_count : next N queries close the connection (lost connection)
+    - kill_connections() : close all client connections
+    """
+
+    SERVER_VERSION = b"5.7.99-pysolmysql-stub"
+
+    def __init__(self, host="127.0.0.1", port=0, user=None, password=None, databases=None, result_rows=1, result_columns=1, affected_rows=1):
+        """
+        Init
+        :param host: listen address
+        :type host: str
+        :param port: listen port (0 : random)
+        :type port: int
+        :param user: expected user (None : any)
+        :type user: str,None
+        :param password: expected password (None : any)
+        :type password: str,None
+        :param databases: known databases (None : any)
+        :type databases: list,None
+        :param result_rows: synthetic result set rows
+        :type result_rows: int
+        :param result_columns: synthetic result set columns
+        :type result_columns: int
+        :param affected_rows: affected rows for non result set statements
+        :type affected_rows: int
+        """
+
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.databases = databases
+        self.result_rows = result_rows
+        self.result_columns = result_columns
+        self.affected_rows = affected_rows
+
+        # Injection
+        self.responder = None
+        self.connect_latency_ms = 0.0
+        self.query_latency_ms = 0.0
+        self.refuse_connect = False
+        self.fail_query_count = 0
+        self.drop_query_count = 0
+
+        # Stats
+        self.count_connect = 0
+        self.count_query = 0
+        self.count_ping = 0
+        self.count_quit = 0
+        self.count_prepare = 0
+        self.count_execute = 0
+        self.count_stmt_close = 0
+        self.count_kill = 0
+        self.count_reset = 0
+        self.ar_statement = deque(maxlen=1000)
+        self.ar_load_data = list()
+        self.load_data_warnings = 0
+
+        # Internal
+        self._server = None
+        self._thread_id = 0
+        self.d_connection = dict()
+
+        # Synthetic result set cache
+        self._synthetic = None
+
+    # ------------------------------------------------
+    # START / STOP
+    # ------------------------------------------------
+
+    def start(self):
+        """
+        Start (port is updated if random)
+        """
+
+        self._server = StreamServer((self.host, self.port), self._handle)
+        self._server.start()
+        self.port = self._server.server_port
+        logger.debug("Stub started, host=%s, port=%s", self.host, self.port)
+
+    def stop(self):
+        """
+        Stop, closing all client connections
+        """
+
+        if self._server:
+            self._server.stop(timeout=1)
+            self._server = None
+        self.kill_connections()
+
+    def kill_connections(self):
+        """
+        Close all client connections
+        """
+
+        for c in list(self.d_connection.values()):
+            SolBase.safe_close_socket(c.sock)
+        self.d_connection = dict()
+
+    def conf_dict(self, **kwargs):
+        """
+        Get a MysqlApi conf_dict toward us
+        :param kwargs: additional entries
+        :type kwargs: object
+        :return dict
+        :rtype dict
+        """
+
+        d = {
+            "hosts": [self.host],
+            "port": self.port,
+            "database": None,
+            "user": self.user or "stub",
+            "password": self.password or "stub",
+            "autocommit": True,
+        }
+        d.update(kwargs)
+        return d
+
+    # ------------------------------------------------
+    # PACKETS
+    # ------------------------------------------------
+
+    @classmethod
+    def _read_exact(cls, sock, n):
+        """
+        Read exactly n bytes
+        :param sock: socket.socket
+        :type sock: socket.socket
+        :param n: int
+        :type n: int
+        :return bytes,None
+        :rtype bytes,None
+        """
+
+        ar = list()
+        while n > 0:
+            b = sock.recv(n)
+            if not b:
+                return None
+            ar.append(b)
+            n -= len(b)
+        return b"".join(ar)
+
+    def _read_packet(self, c):
+        """
+        Read a packet
+        :param c: StubConnection
+        :type c: StubConnection
+        :return bytes,None
+        :rtype bytes,None
+        """
+
+        header = self._read_exact(c.sock, 4)
+        if header is None:
+            return None
+        length = header[0] + (header[1] << 8) + (header[2] << 16)
+        c.seq = (header[3] + 1) % 256
+        if length == 0:
+            return b""
+        return self._read_exact(c.sock, length)
+
+    @classmethod
+    def _packet(cls, c, payload):
+        """
+        Build a packet
+        :param c: StubConnection
+        :type c: StubConnection
+        :param payload: bytes
+        :type payload: bytes
+        :return bytes
+        :rtype bytes
+        """
+
+        b = struct.pack("<I", len(payload))[:3] + struct.pack("<B", c.seq) + payload
+        c.seq = (c.seq + 1) % 256
+        return b
+
+    def _send(self, c, *ar_payload):
+        """
+        Send packets
+        :param c: StubConnection
+        :type c: StubConnection
+        :param ar_payload: payloads
+        :type ar_payload: bytes
+        """
+
+        c.sock.sendall(b"".join(self._packet(c, p) for p in ar_payload))
+
+    @classmethod
+    def _ok(cls, c, affected_rows=0, insert_id=0, warnings=0):
+        """
+        OK payload
+        :param c: StubConnection
+        :type c: StubConnection
+        :return bytes
+        :rtype bytes
+        """
+
+        return b"\x00" + lenenc_int(affected_rows) + lenenc_int(insert_id) + struct.pack("<HH", c.status, warnings)
+
+    @classmethod
+    def _eof(cls, c):
+        """
+        EOF payload
+        :param c: StubConnection
+        :type c: StubConnection
+        :return bytes
+        :rtype bytes
+        """
+
+        return b"\xfe" + struct.pack("<HH", 0, c.status)
+
+    @classmethod
+    def _err(cls, errno, message, sql_state=b"HY000"):
+        """
+        ERR payload
+        :param errno: int
+        :type errno: int
+        :param message: str
+        :type message: str
+        :return bytes
+        :rtype bytes
+        """
+
+        return b"\xff" + struct.pack("<H", errno) + b"#" + sql_state + message.encode("utf-8")
+
+    @classmethod
+    def _column_type(cls, value):
+        """
+        Column type guessed from a sample value
+        :param value: sample value
+        :type value: object
+        :return tuple (charset, type, length)
+        :rtype tuple
+        """
+
+        if isinstance(value, bool) or isinstance(value, int):
+            return CHARSET_BINARY, FIELD_TYPE_LONGLONG, 20
+        elif isinstance(value, float):
+            return CHARSET_BINARY, FIELD_TYPE_DOUBLE, 22
+        elif isinstance(value, decimal.Decimal):
+            return CHARSET_BINARY, FIELD_TYPE_NEWDECIMAL, 67
+        elif isinstance(value, (bytes, bytearray)):
+            return CHARSET_BINARY, FIELD_TYPE_BLOB, 65535
+        else:
+            return CHARSET_UTF8, FIELD_TYPE_VAR_STRING, 765
+
+    @classmethod
+    def _column_def(cls, name, value):
+        """
+        Column definition payload, type guessed from a sample value
+        :param name: column name
+        :type name: str
+        :param value: sample value
+        :type value: object
+        :return bytes
+        :rtype bytes
+        """
+
+        charset, col_type, length = cls._column_type(value)
+        b_name = name.encode("utf-8")
+        return (lenenc_str(b"def") + lenenc_str(b"") + lenenc_str(b"") + lenenc_str(b"") + lenenc_str(b_name) + lenenc_str(b_name)
+                + b"\x0c" + struct.pack("<HIBHBxx", charset, length, col_type, 0, 0))
+
+    @classmethod
+    def _row(cls, row):
+        """
+        Text protocol row payload
+        :param row: tuple
+        :type row: tuple
+        :return bytes
+        :rtype bytes
+        """
+
+        ar = list()
+        for v in row:
+            if v is None:
+                ar.append(b"\xfb")
+            elif isinstance(v, bool):
+                ar.append(lenenc_str(b"1" if v else b"0"))
+            elif isinstance(v, (bytes, bytearray)):
+                ar.append(lenenc_str(bytes(v)))
+            elif isinstance(v, float):
+                ar.append(lenenc_str(repr(v).encode("ascii")))
+            else:
+                ar.append(lenenc_str(str(v).encode("utf-8")))
+        return b"".join(ar)
+
+    @classmethod
+    def _binary_row(cls, row, ar_type):
+        """
+        Binary protocol row payload
+        :param row: tuple
+        :type row: tuple
+        :param ar_type: column types
+        :type ar_type: list
+        :return bytes
+        :rtype bytes
+        """
+
+        null = bytearray((len(row) + 9) // 8)
+        ar = list()
+        for i, v in enumerate(row):
+            if v is None:
+                null[(i + 2) >> 3] |= 1 << ((i + 2) & 7)
+            elif ar_type[i] == FIELD_TYPE_LONGLONG:
+                ar.append(struct.pack("<q", int(v)))
+            elif ar_type[i] == FIELD_TYPE_DOUBLE:
+                ar.append(struct.pack("<d", float(v)))
+            elif isinstance(v, (bytes, bytearray)):
+                ar.append(lenenc_str(bytes(v)))
+            else:
+                ar.append(lenenc_str(str(v).encode("utf-8")))
+        return b"\x00" + bytes(null) + b"".join(ar)
+
+    def _send_result(self, c, r, binary=False):
+        """
+        Send a StubResult
+        :param c: StubConnection
+        :type c: StubConnection
+        :param r: StubResult
+        :type r: StubResult
+        :param binary: If true, binary protocol rows (prepared statements)
+        :type binary: bool
+        """
+
+        if r.errno:
+            self._send(c, self._err(r.errno, r.message))
+        elif r.columns is None:
+            self._send(c, self._ok(c, r.affected_rows, r.insert_id))
+        else:
+            ar = [lenenc_int(len(r.columns))]
+            ar_type = list()
+            for idx, name in enumerate(r.columns):
+                sample = None
+                for row in r.rows:
+                    if row[idx] is not None:
+                        sample = row[idx]
+                        break
+                ar.append(self._column_def(name, sample))
+                ar_type.append(self._column_type(sample)[1])
+            ar.append(self._eof(c))
+            for row in r.rows:
+                ar.append(self._binary_row(row, ar_type) if binary else self._row(row))
+            ar.append(self._eof(c))
+            self._send(c, *ar)
+
+    # ------------------------------------------------
+    # QUERIES
+    # ------------------------------------------------
+
+    _RE_SLEEP = re.compile(r"^\s*select\s+sleep\(\s*([0-9.]+)\s*\)", re.I)
+    _RE_KILL = re.compile(r"^\s*kill\s+(query\s+|connection\s+)?([0-9]+)", re.I)
+    _RE_AUTOCOMMIT = re.compile(r"^\s*set\s+(?:.*,\s*)?autocommit\s*=\s*([01])", re.I)
+    _RE_BEGIN = re.compile(r"^\s*(begin|start\s+transaction)", re.I)
+    _RE_END = re.compile(r"^\s*(commit|rollback)", re.I)
+    _RE_RESULT_SET = re.compile(r"^\s*(select|show|explain)\b", re.I)
+    _RE_LOAD_LOCAL = re.compile(r"^\s*load\s+data\s+local\s+infile\s+'([^']*)'", re.I)
+
+    def _synthetic_result(self):
+        """
+        Synthetic result set (cached)
+        :return StubResult
+        :rtype StubResult
+        """
+
+        key = (self.result_rows, self.result_columns)
+        if self._synthetic is None or self._synthetic[0] != key:
+            columns = ["col_%s" % i for i in range(self.result_columns)]
+            rows = [tuple("v_%s_%s" % (r, i) for i in range(self.result_columns)) for r in range(self.result_rows)]
+            self._synthetic = (key, StubResult(columns=columns, rows=rows))
+        return self._synthetic[1]
+
+    def _query(self, c, statement):
+        """
+        Process a query
+        :param c: StubConnection
+        :type c: StubConnection
+        :param statement: str
+        :type statement: str
+        :return StubResult
+        :rtype StubResult
+        """
+
+        if self.responder:
+            r = self.responder(statement, c)
+            if r is not None:
+                return r
+
+        m = self._RE_SLEEP.match(statement)
+        if m:
+            c.kill_event.clear()
+            if c.kill_event.wait(float(m.group(1))):
+                return StubResult(errno=1317, message="Query execution was interrupted")
+            return StubResult(columns=[statement.strip().rstrip(";")[7:].strip()], rows=[(0,)])
+
+        m = self._RE_KILL.match(statement)
+        if m:
+            self.count_kill += 1
+            target = self.d_connection.get(int(m.group(2)))
+            if target is None:
+                return StubResult(errno=1094, message="Unknown thread id: %s" % m.group(2))
+            if m.group(1) and m.group(1).strip().lower() == "query":
+                target.kill_event.set()
+            else:
+                SolBase.safe_close_socket(target.sock)
+            return StubResult()
+
+        m = self._RE_AUTOCOMMIT.match(statement)
+        if m:
+            if m.group(1) == "1":
+                c.status = (c.status | SERVER_STATUS_AUTOCOMMIT) & ~SERVER_STATUS_IN_TRANS
+            else:
+                c.status &= ~SERVER_STATUS_AUTOCOMMIT
+            return StubResult()
+        if self._RE_BEGIN.match(statement):
+            c.status |= SERVER_STATUS_IN_TRANS
+            return StubResult()
+        if self._RE_END.match(statement):
+            c.status &= ~SERVER_STATUS_IN_TRANS
+            return StubResult()
+
+        if self._RE_RESULT_SET.match(statement):
+            return self._synthetic_result()
+
+        if not c.status & SERVER_STATUS_AUTOCOMMIT:
+            c.status |= SERVER_STATUS_IN_TRANS
+        return StubResult(affected_rows=self.affected_rows)
+
+    def _load_local(self, c, file_name):
+        """
+        Process a LOAD DATA LOCAL INFILE : request the file, read it until the empty packet
+        :param c: StubConnection
+        :type c: StubConnection
+        :param file_name: file name
+        :type file_name: str
+        """
+
+        if not c.client_flags & CLIENT_LOCAL_FILES:
+            self._send(c, self._err(1148, "The used command is not allowed with this MySQL version", b"42000"))
+            return
+
+        self._send(c, b"\xfb" + file_name.encode("utf-8"))
+        ar = list()
+        while True:
+            data = self._read_packet(c)
+            if data is None:
+                raise Exception("Lost connection during LOAD DATA")
+            if len(data) == 0:
+                break
+            ar.append(data)
+        buf = b"".join(ar)
+        self.ar_load_data.append(buf)
+        self._send(c, self._ok(c, affected_rows=buf.count(b"\n"), warnings=self.load_data_warnings))
+
+    # ------------------------------------------------
+    # HANDLER
+    # ------------------------------------------------
+
+    def _handshake(self, c):
+        """
+        Handshake
+        :param c: StubConnection
+        :type c: StubConnection
+        :return bool
+        :rtype bool
+        """
+
+        if self.connect_latency_ms > 0.0:
+            gevent.sleep(self.connect_latency_ms / 1000.0)
+
+        salt = os.urandom(20).replace(b"\x00", b"\x01")
+        caps = (CLIENT_LONG_PASSWORD | CLIENT_FOUND_ROWS | CLIENT_LONG_FLAG | CLIENT_CONNECT_WITH_DB | CLIENT_LOCAL_FILES | CLIENT_PROTOCOL_41
+                | CLIENT_TRANSACTIONS | CLIENT_SECURE_CONNECTION | CLIENT_MULTI_STATEMENTS | CLIENT_MULTI_RESULTS | CLIENT_PLUGIN_AUTH)
+        payload = (b"\x0a" + self.SERVER_VERSION + b"\x00" + struct.pack("<I", c.thread_id) + salt[:8] + b"\x00"
+                   + struct.pack("<HBHHB", caps & 0xffff, CHARSET_UTF8, c.status, caps >> 16, 21) + b"\x00" * 10
+                   + salt[8:] + b"\x00" + b"mysql_native_password\x00")
+        c.seq = 0
+        self._send(c, payload)
+
+        data = self._read_packet(c)
+        if not data:
+            return False
+        client_flags = struct.unpack("<I", data[:4])[0]
+        c.client_flags = client_flags
+        i = 32
+        end = data.index(b"\x00", i)
+        c.user = data[i:end].decode("utf-8")
+        i = end + 1
+        auth_len = data[i]
+        auth = data[i + 1:i + 1 + auth_len]
+        i += 1 + auth_len
+        if client_flags & CLIENT_CONNECT_WITH_DB and i < len(data):
+            end = data.index(b"\x00", i)
+            c.database = data[i:end].decode("utf-8") or None
+
+        if self.refuse_connect or (self.user is not None and c.user != self.user) \
+                or (self.password is not None and auth != _auth.scramble_native_password(self.password.encode("utf-8"), salt)):
+            self._send(c, self._err(1045, "Access denied for user '%s'" % c.user, b"28000"))
+            return False
+        if c.database and self.databases is not None and c.database not in self.databases:
+            self._send(c, self._err(1049, "Unknown database '%s'" % c.database, b"42000"))
+            return False
+
+        self._send(c, self._ok(c))
+        return True
+
+    def _handle(self, sock, address):
+        """
+        Handle a client connection
+        :param sock: socket.socket
+        :type sock: socket.socket
+        :param address: tuple
+        :type address: tuple
+        """
+
+        self._thread_id += 1
+        c = StubConnection(self._thread_id, sock)
+        self.d_connection[c.thread_id] = c
+        try:
+            if not self._handshake(c):
+                return
+            self.count_connect += 1
+
+            while True:
+                data = self._read_packet(c)
+                if data is None or len(data) == 0:
+                    return
+                self._command(c, data[0], data[1:])
+        except Exception as e:
+            logger.debug("Stub connection over, ex=%s", SolBase.extostr(e))
+        finally:
+            self.d_connection.pop(c.thread_id, None)
+            SolBase.safe_close_socket(sock)
+
+    def _command(self, c, cmd, data):
+        """
+        Process a command
+        :param c: StubConnection
+        :type c: StubConnection
+        :param cmd: command
+        :type cmd: int
+        :param data: command data
+        :type data: bytes
+        """
+
+        if cmd == COM_QUIT:
+            self.count_quit += 1
+            raise Exception("COM_QUIT")
+        elif cmd == COM_PING:
+            self.count_ping += 1
+            self._send(c, self._ok(c))
+        elif cmd == COM_INIT_DB:
+            c.database = data.decode("utf-8")
+            self._send(c, self._ok(c))
+        elif cmd == COM_RESET_CONNECTION:
+            self.count_reset += 1
+            c.status = SERVER_STATUS_AUTOCOMMIT
+            c.d_stmt = dict()
+            self._send(c, self._ok(c))
+        elif cmd == COM_QUERY:
+            statement = data.decode("utf-8")
+            self.count_query += 1
+            self.ar_statement.append(statement)
+            if not self._inject(c):
+                return
+
+            m = self._RE_LOAD_LOCAL.match(statement)
+            if m:
+                self._load_local(c, m.group(1))
+                return
+
+            self._send_result(c, self._query(c, statement))
+        elif cmd == COM_STMT_PREPARE:
+            self._stmt_prepare(c, data.decode("utf-8"))
+        elif cmd == COM_STMT_EXECUTE:
+            self._stmt_execute(c, data)
+        elif cmd == COM_STMT_CLOSE:
+            self.count_stmt_close += 1
+            c.d_stmt.pop(struct.unpack("<I", data[:4])[0], None)
+        else:
+            self._send(c, self._err(1047, "Unknown command %s" % cmd, b"08S01"))
+
+    def _inject(self, c):
+        """
+        Apply injected drop, latency, failure
+        :param c: StubConnection
+        :type c: StubConnection
+        :return bool (False : failure sent, stop processing)
+        :rtype bool
+        """
+
+        if self.drop_query_count > 0:
+            self.drop_query_count -= 1
+            raise Exception("Injected drop")
+        if self.query_latency_ms > 0.0:
+            gevent.sleep(self.query_latency_ms / 1000.0)
+        if self.fail_query_count > 0:
+            self.fail_query_count -= 1
+            self._send(c, self._err(1105, "Injected failure"))
+            return False
+        return True
+
+    # ------------------------------------------------
+    # PREPARED STATEMENTS
+    # ------------------------------------------------
+
+    def _stmt_prepare(self, c, statement):
+        """
+        COM_STMT_PREPARE (placeholders : ? count, no column definitions sent)
+        :param c: StubConnection
+        :type c: StubConnection
+        :param statement: str
+        :type statement: str
+        """
+
+        self.count_prepare += 1
+        num_params = statement.count("?")
+        c.stmt_seq += 1
+        c.d_stmt[c.stmt_seq] = [statement, num_params, None]
+
+        ar = [b"\x00" + struct.pack("<IHHxH", c.stmt_seq, 0, num_params, 0)]
+        if num_params > 0:
+            ar.extend(self._column_def("?", None) for _ in range(num_params))
+            ar.append(self._eof(c))
+        self._send(c, *ar)
+
+    @classmethod
+    def _param_read(cls, data, i, t, flags):
+        """
+        Read a binary parameter value
+        :param data: bytes
+        :type data: bytes
+        :param i: offset
+        :type i: int
+        :param t: type
+        :type t: int
+        :param flags: type flags
+        :type flags: int
+        :return tuple (value, new offset)
+        :rtype tuple
+        """
+
+        if t == FIELD_TYPE_LONGLONG:
+            return struct.unpack("<Q" if flags & 0x80 else "<q", data[i:i + 8])[0], i + 8
+        elif t == FIELD_TYPE_DOUBLE:
+            return struct.unpack("<d", data[i:i + 8])[0], i + 8
+        elif t in (FIELD_TYPE_DATETIME, FIELD_TYPE_DATE):
+            n = data[i]
+            b = data[i + 1:i + 1 + n] + b"\x00" * (11 - n)
+            year, month, day, hour, minute, second, microsecond = struct.unpack("<HBBBBBI", b)
+            if t == FIELD_TYPE_DATE:
+                return datetime.date(year, month, day), i + 1 + n
+            return datetime.datetime(year, month, day, hour, minute, second, microsecond), i + 1 + n
+        elif t == FIELD_TYPE_TIME:
+            n = data[i]
+            b = data[i + 1:i + 1 + n] + b"\x00" * (12 - n)
+            neg, days, hour, minute, second, microsecond = struct.unpack("<BIBBBI", b)
+            td = datetime.timedelta(days=days, hours=hour, minutes=minute, seconds=second, microseconds=microsecond)
+            return -td if neg else td, i + 1 + n
+        else:
+            n, i = lenenc_read(data, i)
+            b = data[i:i + n]
+            if t == FIELD_TYPE_BLOB:
+                return b, i + n
+            elif t == FIELD_TYPE_NEWDECIMAL:
+                return decimal.Decimal(b.decode("ascii")), i + n
+            return b.decode("utf-8"), i + n
+
+    @classmethod
+    def _param_literal(cls, v):
+        """
+        Sql literal of a parameter
+        :param v: value
+        :type v: object
+        :return str
+        :rtype str
+        """
+
+        if v is None:
+            return "NULL"
+        elif isinstance(v, (int, float, decimal.Decimal)):
+            return str(v)
+        elif isinstance(v, bytes):
+            return "X'%s'" % v.hex()
+        return "'%s'" % str(v).replace("\\", "\\\\").replace("'", "\\'")
+
+    def _stmt_execute(self, c, data):
+        """
+        COM_STMT_EXECUTE : parameters are interpolated, then the statement is processed as a query (binary result set)
+        :param c: StubConnection
+        :type c: StubConnection
+        :param data: bytes
+        :type data: bytes
+        """
+
+        self.count_execute += 1
+        stmt_id = struct.unpack("<I", data[:4])[0]
+        if stmt_id not in c.d_stmt:
+            self._send(c, self._err(1243, "Unknown prepared statement handler (%s) given to mysqld_stmt_execute" % stmt_id))
+            return
+        stmt = c.d_stmt[stmt_id]
+        statement, num_params = stmt[0], stmt[1]
+
+        # Parameters
+        ar_param = list()
+        if num_params > 0:
+            i = 9
+            null = data[i:i + (num_params + 7) // 8]
+            i += len(null)
+            if data[i] == 1:
+                stmt[2] = [(data[i + 1 + 2 * k], data[i + 2 + 2 * k]) for k in range(num_params)]
+                i += 1 + 2 * num_params
+            else:
+                i += 1
+            for k in range(num_params):
+                if null[k >> 3] & (1 << (k & 7)):
+                    ar_param.append(None)
+                else:
+                    v, i = self._param_read(data, i, stmt[2][k][0], stmt[2][k][1])
+                    ar_param.append(v)
+        c.last_params = ar_param
+
+        # Interpolate
+        ar = statement.split("?")
+        statement = ar[0] + "".join(self._param_literal(v) + s for v, s in zip(ar_param, ar[1:]))
+        self.ar_statement.append(statement)
+        if not self._inject(c):
+            return
+
+        self._send_result(c, self._query(c, statement), binary=True)
@@ -0,0 +1,300 @@
+"""
+# -*- coding: utf-8 -*-
+# ===============================================================================
+#
+# Copyright (C) 2013/2025 Laurent Labatut / Laurent Champagnac
+#
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ===============================================================================
+"""
+import argparse
+import logging
+import platform
+import time
+
+import gevent
+# noinspection PyUnresolvedReferences
+import ujson
+from gevent.event import Event
+from pysolbase.SolBase import SolBase
+
+from pysolmysql.Pool.base_pool import DatabaseConnectionPool
+
+logger = logging.getLogger(__name__)
+
+
+def percentile(ar, p):
+    """
+    Get percentile from a SORTED list (nearest rank)
+    :param ar: sorted list
+    :type ar: list
+    :param p: percentile (0-100)
+    :type p: float
+    :return float,None
+    :rtype float,None
+    """
+
+    if len(ar) == 0:
+        return None
+    idx = int(round(p / 100.0 * (len(ar) - 1)))
+    return ar[idx]
+
+
+class MockConnection(object):
+    """
+    Mock connection
+    """
+
+    def __init__(self, conn_id):
+        """
+        Init
+        :param conn_id: int
+        :type conn_id: int
+        """
+
+        self.conn_id = conn_id
+        self.closed = False
+
+
+class MockConnectionPool(DatabaseConnectionPool):
+    """
+    Pool over mock connections, with configurable latencies (gevent sleeps).
+
+    conf_dict :
+    - "mock_connect_ms" : connect latency
+    - "mock_ping_ms" : ping latency
+    """
+
+    def __init__(self, conf_dict):
+        """
+        Init
+        :param conf_dict: dict
+        :type conf_dict: dict
+        """
+
+        super(MockConnectionPool, self).__init__(conf_dict)
+
+        self.connect_sec = self.conf_dict.get("mock_connect_ms", 0.0) / 1000.0
+        self.ping_sec = self.conf_dict.get("mock_ping_ms", 0.0) / 1000.0
+        self.conn_seq = 0
+
+    def _connection_create(self):
+        """
+        Create
+        :return MockConnection
+        :rtype MockConnection
+        """
+
+        if self.connect_sec > 0.0:
+            gevent.sleep(self.connect_sec)
+        self.conn_seq += 1
+        return MockConnection(self.conn_seq)
+
+    def _connection_ping(self, conn):
+        """
+        Ping
+        :param conn: MockConnection
+        :type conn: MockConnection
+        :return bool
+        :rtype bool
+        """
+
+        if self.ping_sec > 0.0:
+            gevent.sleep(self.ping_sec)
+        return not conn.closed
+
+    def _connection_close(self, conn):
+        """
+        Close
+        :param conn: MockConnection
+        :type conn: MockConnection
+        """
+
+        if conn:
+            conn.closed = True
+
+
+class PoolBench(object):
+    """
+    Offline pool benchmark : greenlets loop on acquire / query (sleep) / release over a MockConnectionPool.
+    """
+
+    @classmethod
+    def run(cls, greenlet_count, pool_max_size, duration_ms=1000, connect_ms=0.0, ping_ms=0.0, query_ms=0.0, pool_class=MockConnectionPool):
+        """
+        Run one bench
+        :param greenlet_count: greenlet count
+        :type greenlet_count: int
+        :param pool_max_size: pool max size
+        :type pool_max_size: int
+        :param duration_ms: run duration in millis
+        :type duration_ms: int
+        :param connect_ms: mock connect latency
+        :type connect_ms: float
+        :param ping_ms: mock ping latency
+        :type ping_ms: float
+        :param query_ms: mock query latency (connection hold time)
+        :type query_ms: float
+        :param pool_class: pool class
+        :type pool_class: type
+        :return dict
+        :rtype dict
+        """
+
+        pool = pool_class({
+            "pool_max_size": pool_max_size,
+            "pool_name": "bench",
+            "mock_connect_ms": connect_ms,
+            "mock_ping_ms": ping_ms,
+        })
+        query_sec = query_ms / 1000.0
+        stop_event = Event()
+        ar_wait = list()
+        d_count = {"ok": 0, "maxed": 0, "ex": 0}
+
+        def _worker():
+            while not stop_event.is_set():
+                t = time.perf_counter()
+                try:
+                    conn = pool.connection_acquire()
+                except Exception as e:
+                    if "Pool maxed" in str(e):
+                        d_count["maxed"] += 1
+                    else:
+                        d_count["ex"] += 1
+                    gevent.sleep(0)
+                    continue
+                ar_wait.append((time.perf_counter() - t) * 1000.0)
+                try:
+                    gevent.sleep(query_sec)
+                finally:
+                    pool.connection_release(conn)
+                d_count["ok"] += 1
+
+        ms_start = SolBase.mscurrent()
+        ar_greenlet = [gevent.spawn(_worker) for _ in range(greenlet_count)]
+        gevent.sleep(duration_ms / 1000.0)
+        stop_event.set()
+        gevent.joinall(ar_greenlet, timeout=30.0)
+        gevent.killall(ar_greenlet)
+        sec = SolBase.msdiff(ms_start) / 1000.0
+
+        ar_wait.sort()
+        d_out = {
+            "greenlet_count": greenlet_count,
+            "pool_max_size": pool_max_size,
+            "connect_ms": connect_ms,
+            "ping_ms": ping_ms,
+            "query_ms": query_ms,
+            "duration_sec": round(sec, 3),
+            "ops": d_count["ok"],
+            "ops_per_sec": round(d_count["ok"] / sec, 2),
+            "maxed": d_count["maxed"],
+            "ex": d_count["ex"],
+            "acquire_ms_p50": percentile(ar_wait, 50),
+            "acquire_ms_p99": percentile(ar_wait, 99),
+            "acquire_ms_max": ar_wait[-1] if ar_wait else None,
+            "pool": pool.stats(),
+        }
+        pool.close_all()
+        return d_out
+
+    @classmethod
+    def run_matrix(cls, ar_greenlet_count, ar_pool_max_size, **kwargs):
+        """
+        Run bench for all greenlet count / pool max size combinations
+        :param ar_greenlet_count: list of greenlet count
+        :type ar_greenlet_count: list
+        :param ar_pool_max_size: list of pool max size
+        :type ar_pool_max_size: list
+        :param kwargs: forwarded to run
+        :type kwargs: object
+        :return dict
+        :rtype dict
+        """
+
+        ar_result = list()
+        for greenlet_count in ar_greenlet_count:
+            for pool_max_size in ar_pool_max_size:
+                d = cls.run(greenlet_count, pool_max_size, **kwargs)
+                logger.info("Bench, g=%s, max=%s, ops/s=%s, maxed=%s, p50=%s, p99=%s",
+                            greenlet_count, pool_max_size, d["ops_per_sec"], d["maxed"], d["acquire_ms_p50"], d["acquire_ms_p99"])
+                ar_result.append(d)
+
+        return {
+            "bench": "pool",
+            "epoch": time.time(),
+            "python": platform.python_version(),
+            "machine": platform.node(),
+            "results": ar_result,
+        }
+
+    @classmethod
+    def write_json(cls, d, file_name):
+        """
+        Write bench output to a json file
+        :param d: dict
+        :type d: dict
+        :param file_name: str
+        :type file_name: str
+        """
+
+        with open(file_name, "w") as f:
+            f.write(ujson.dumps(d, indent=2))
+
+
+def _int_list(s):
+    """
+    Parse a comma separated int list
+    :param s: str
+    :type s: str
+    :return list
+    :rtype list
+    """
+
+    return [int(x) for x in s.split(",") if x]
+
+
+def main(ar_args=None):
+    """
+    Entry point : python -m pysolmysql.bench.pool_bench
+    :param ar_args: list,None
+    :type ar_args: list,None
+    """
+
+    parser = argparse.ArgumentParser(description="pysolmysql offline pool benchmark")
+    parser.add_argument("--greenlets", type=_int_list, default=[1, 10, 100], help="comma separated greenlet counts")
+    parser.add_argument("--pool-max-size", type=_int_list, default=[1, 10, 100], help="comma separated pool max sizes")
+    parser.add_argument("--duration-ms", type=int, default=2000)
+    parser.add_argument("--connect-ms", type=float, default=5.0)
+    parser.add_argument("--ping-ms", type=float, default=0.2)
+    parser.add_argument("--query-ms", type=float, default=1.0)
+    parser.add_argument("--out", default="bench_pool.json", help="json output file")
+    args = parser.parse_args(ar_args)
+
+    SolBase.voodoo_init()
+    SolBase.logging_init(log_level="INFO", force_reset=True)
+
+    d = PoolBench.run_matrix(
+        args.greenlets, args.pool_max_size,
+        duration_ms=args.duration_ms, connect_ms=args.connect_ms, ping_ms=args.ping_ms, query_ms=args.query_ms)
+    PoolBench.write_json(d, args.out)
+    logger.info("Bench written, out=%s", args.out)
+
+
+if __name__ == "__main__":
+    main()
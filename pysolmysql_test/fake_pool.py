@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+# ===============================================================================
+#
+# Copyright (C) 2013/2025 Laurent Labatut / Laurent Champagnac
+#
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ===============================================================================
+"""
+
+# Imports
+from pysolmysql.Pool.base_pool import DatabaseConnectionPool
+
+
+class FakeConnectionPool(DatabaseConnectionPool):
+    """
+    Fake pool, connections are plain objects
+    """
+
+    def _connection_create(self):
+        """
+        Create
+        """
+        return object()
+
+    def _connection_ping(self, conn):
+        """
+        Ping
+        """
+        return True
+
+    def _connection_close(self, conn):
+        """
+        Close
+        """
+        pass
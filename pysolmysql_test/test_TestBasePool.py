@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+"""
+# ===============================================================================
+#
+# Copyright (C) 2013/2025 Laurent Labatut / Laurent Champagnac
+#
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ===============================================================================
+"""
+
+# Imports
+import logging
+import unittest
+
+import gevent
+from pysolbase.SolBase import SolBase
+from pysolmeters.DelayToCount import DelayToCount
+from pysolmeters.Meters import Meters
+
+from pysolmysql.Mysql.MysqlApi import MysqlApi
+from pysolmysql.Pool.mysql_pool import MysqlConnectionPool
+from pysolmysql.bench.mysql_stub import MysqlStubServer, StubResult
+from pysolmysql_test.fake_pool import FakeConnectionPool
+
+logger = logging.getLogger(__name__)
+SolBase.voodoo_init()
+SolBase.logging_init(log_level='INFO', force_reset=True)
+
+
+class TestBasePool(unittest.TestCase):
+    """
+    Test description
+    """
+
+    # noinspection PyPep8Naming
+    def setUp(self):
+        """
+        Setup
+        """
+
+        MysqlApi.reset_pools()
+        Meters.reset()
+
+    def test_pool_stats(self):
+        """
+        Test
+        """
+
+        pool = FakeConnectionPool({"pool_max_size": 2, "pool_name": "p1"})
+        tags = {"pool": "p1"}
+
+        c1 = pool.connection_acquire()
+        c2 = pool.connection_acquire()
+        try:
+            pool.connection_acquire()
+            self.fail("Must raise")
+        except Exception as e:
+            self.assertIn("Pool maxed", str(e))
+
+        d = pool.stats()
+        self.assertEqual(d["pool_name"], "p1")
+        self.assertEqual(d["size"], 2)
+        self.assertEqual(d["idle"], 0)
+        self.assertEqual(d["in_use"], 2)
+        self.assertEqual(d["maxed"], 1)
+        self.assertEqual(Meters.aig("k.db_pool.pool.in_use", tags=tags), 2)
+        self.assertEqual(Meters.aig("k.db_pool.pool.maxed", tags=tags), 1)
+
+        pool.connection_release(c1)
+        pool.connection_release(c2)
+        pool.connection_release(pool.connection_acquire())
+
+        d = pool.stats()
+        self.assertEqual(d["size"], 2)
+        self.assertEqual(d["idle"], 2)
+        self.assertEqual(d["in_use"], 0)
+        self.assertEqual(d["acquire"], 3)
+        self.assertEqual(d["create"], 2)
+        self.assertEqual(Meters.aig("k.db_pool.pool.idle", tags=tags), 2)
+        self.assertEqual(Meters.aig("k.db_pool.pool.in_use", tags=tags), 0)
+
+        # Histograms (DelayToCountSafe.to_dict does not return, go through the base class)
+        for k, count in [("k.db_pool.pool.acquire_ms", 3), ("k.db_pool.pool.hold_ms", 3), ("k.db_pool.pool.create_ms", 2), ("k.db_pool.pool.ping_ms", 1)]:
+            d = DelayToCount.to_dict(Meters.dtc(k, tags=tags))
+            self.assertEqual(sum(d.values()), count)
+
+    def test_pool_name_default(self):
+        """
+        Test
+        """
+
+        d_conf = {"pool_max_size": 2}
+        pool = FakeConnectionPool(d_conf)
+        self.assertEqual(pool.pool_name, MysqlApi._get_pool_hash(d_conf))
+
+    def test_pool_lock_cooperative(self):
+        """
+        Test
+        """
+
+        class SlowPool(FakeConnectionPool):
+            """
+            Connection create yields while holding the pool lock
+            """
+
+            def _connection_create(self):
+                """
+                Create
+                """
+                SolBase.sleep(20)
+                return object()
+
+        # Pool lock : greenlets contending while a create yields (a lock not gevent aware would block the hub)
+        pool = SlowPool({"pool_max_size": 5})
+        ar_g = [gevent.spawn(pool.connection_acquire) for _ in range(5)]
+        gevent.joinall(ar_g, timeout=5.0)
+        self.assertTrue(all(g.successful() for g in ar_g))
+        self.assertEqual(pool.size, 5)
+
+        # MysqlApi registry lock : same
+        def _hold():
+            with MysqlApi.POOL_LOCK:
+                SolBase.sleep(50)
+
+        g = gevent.spawn(_hold)
+        gevent.sleep(0)
+        with MysqlApi.POOL_LOCK:
+            self.assertTrue(g.dead)
+
+    def test_mysql_api_pool_stats(self):
+        """
+        Test
+        """
+
+        d_conf = {"pool_max_size": 2, "pool_name": "p1"}
+        MysqlApi.D_POOL_INSTANCES[MysqlApi._get_pool_hash(d_conf)] = FakeConnectionPool(d_conf)
+
+        d = MysqlApi.pool_stats()
+        self.assertEqual(len(d), 1)
+        self.assertEqual(d[MysqlApi._get_pool_hash(d_conf)]["pool_name"], "p1")
+
+    def test_pool_max_size_per_process(self):
+        """
+        Test
+        """
+
+        self.assertEqual(FakeConnectionPool({"pool_max_size": 20}).max_size, 20)
+        self.assertEqual(FakeConnectionPool({"pool_max_size": 20, "pool_max_connections": 100, "pool_worker_count": 10}).max_size, 10)
+        self.assertEqual(FakeConnectionPool({"pool_max_size": 5, "pool_max_connections": 100, "pool_worker_count": 10}).max_size, 5)
+        self.assertEqual(FakeConnectionPool({"pool_max_size": 5, "pool_max_connections": 10, "pool_worker_count": 100}).max_size, 1)
+
+    def test_pool_adaptive(self):
+        """
+        Test
+        """
+
+        # Off : limit is max size
+        self.assertEqual(FakeConnectionPool({"pool_max_size": 20}).limit, 20)
+
+        pool = FakeConnectionPool({"pool_max_size": 10, "pool_name": "p1", "pool_adaptive": True, "pool_min_size": 2, "pool_adaptive_interval_sec": 3600})
+        tags = {"pool": "p1"}
+        self.assertEqual(pool.limit, 2)
+
+        # Maxed at limit : grow (x1.5), up to max size
+        ar = [pool.connection_acquire() for _ in range(10)]
+        self.assertEqual(pool.size, 10)
+        self.assertEqual(pool.limit, 10)
+        self.assertEqual(pool.stats()["limit"], 10)
+        self.assertEqual(Meters.aig("k.db_pool.adaptive.grow", tags=tags), 5)
+        self.assertEqual(Meters.aig("k.db_pool.adaptive.limit", tags=tags), 10)
+        try:
+            pool.connection_acquire()
+            self.fail("Must raise")
+        except Exception as e:
+            self.assertIn("Pool maxed", str(e))
+        for c in ar:
+            pool.connection_release(c)
+
+        # Idle over the interval : shrink by half of the idle low water mark, idle connections above limit closed
+        pool.adaptive_last = 0.0
+        pool.adaptive_grow_count = 0
+        pool.adaptive_idle_low = 8
+        c = pool.connection_acquire()
+        self.assertEqual(pool.limit, 6)
+        self.assertEqual(pool.size, 6)
+        self.assertEqual(Meters.aig("k.db_pool.adaptive.shrink", tags=tags), 1)
+
+        # Acquire wait : grow
+        pool.adaptive_last = 0.0
+        pool.adaptive_wait_sum = 100.0
+        pool.adaptive_wait_count = 1
+        pool.connection_release(c)
+        c = pool.connection_acquire()
+        self.assertEqual(pool.limit, 9)
+
+        # Shrunk while in use : closed on release
+        pool.connection_release(c)
+        ar = [pool.connection_acquire() for _ in range(4)]
+        pool._adaptive_set_limit(1, "test")
+        self.assertEqual(pool.limit, 2)
+        self.assertEqual(pool.size, 4)
+        for c in ar:
+            pool.connection_release(c)
+        self.assertEqual(pool.size, 2)
+        self.assertEqual(pool.stats()["idle"], 2)
+
+    def test_pool_adaptive_server_load(self):
+        """
+        Test
+        """
+
+        stub = MysqlStubServer()
+        stub.start()
+        try:
+            d_load = {"threads": 50, "latency_ms": 0}
+
+            def _responder(statement, c):
+                if statement.startswith("SELECT @@max_connections"):
+                    return StubResult(columns=["@@max_connections"], rows=[(100,)])
+                elif statement.startswith("SHOW GLOBAL STATUS"):
+                    SolBase.sleep(d_load["latency_ms"])
+                    return StubResult(columns=["Variable_name", "Value"], rows=[("Threads_connected", str(d_load["threads"]))])
+                return None
+
+            stub.responder = _responder
+            pool = MysqlConnectionPool(stub.conf_dict(pool_name="p2", pool_max_size=10, pool_adaptive=True, pool_min_size=1, pool_adaptive_server_ratio=0.9))
+            tags = {"pool": "p2"}
+            ar = [pool.connection_acquire() for _ in range(3)]
+            for c in ar:
+                pool.connection_release(c)
+            self.assertEqual(pool.limit, 3)
+
+            # Below ratio : no back off (read in background, pool lock not held during the status query)
+            d_load["latency_ms"] = 300
+            pool.adaptive_last = 0.0
+            pool.connection_release(pool.connection_acquire())
+            self.assertIsNotNone(pool.adaptive_server_greenlet)
+            ms_start = SolBase.mscurrent()
+            pool.connection_release(pool.connection_acquire())
+            self.assertLess(SolBase.msdiff(ms_start), 100)
+            pool.adaptive_server_greenlet.join()
+            self.assertIsNone(pool.adaptive_server_greenlet)
+            self.assertEqual(pool.stats()["idle"], 3)
+            self.assertFalse(pool.adaptive_backoff)
+            self.assertEqual(Meters.aig("k.db_pool.adaptive.server_load_pct", tags=tags), 50)
+
+            # Above ratio : shrink, no grow until next check
+            d_load["threads"] = 95
+            d_load["latency_ms"] = 0
+            pool.adaptive_last = 0.0
+            ar = [pool.connection_acquire()]
+            pool.adaptive_server_greenlet.join()
+            self.assertTrue(pool.adaptive_backoff)
+            self.assertEqual(pool.limit, 2)
+            self.assertEqual(Meters.aig("k.db_pool.adaptive.backoff", tags=tags), 1)
+            ar.append(pool.connection_acquire())
+            try:
+                pool.connection_acquire()
+                self.fail("Must raise")
+            except Exception as e:
+                self.assertIn("Pool maxed", str(e))
+            for c in ar:
+                pool.connection_release(c)
+            pool.close_all()
+        finally:
+            stub.stop()
@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+"""
+# ===============================================================================
+#
+# Copyright (C) 2013/2025 Laurent Labatut / Laurent Champagnac
+#
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ===============================================================================
+"""
+
+# Imports
+import logging
+import unittest
+
+import gevent
+from pysolbase.SolBase import SolBase
+from pysolmeters.DelayToCount import DelayToCount
+from pysolmeters.Meters import Meters
+
+from pysolmysql.Mysql.BufferedWriter import BufferedWriter
+from pysolmysql.Mysql.MysqlApi import MysqlApi
+from pysolmysql.Mysql.MysqlInsert import MysqlInsert
+from pysolmysql.bench.mysql_stub import MysqlStubServer, StubResult
+
+logger = logging.getLogger(__name__)
+SolBase.voodoo_init()
+SolBase.logging_init(log_level='INFO', force_reset=True)
+
+
+# noinspection PyBroadException,SqlNoDataSourceInspection,SqlResolve
+class TestBufferedWriter(unittest.TestCase):
+    """
+    Test description
+    """
+
+    # noinspection PyPep8Naming
+    def setUp(self):
+        """
+        Setup
+        """
+
+        MysqlApi.reset_pools()
+        Meters.reset()
+
+        self.stub = MysqlStubServer()
+        self.stub.start()
+        self.d_conf = self.stub.conf_dict()
+
+    # noinspection PyPep8Naming
+    def tearDown(self):
+        """
+        Setup (called on destroy)
+        """
+
+        BufferedWriter.stop_all()
+        self.stub.stop()
+        MysqlApi.reset_pools()
+
+    def _inserts(self):
+        """
+        Get INSERT statements received
+        """
+
+        return [s for s in self.stub.ar_statement if s.startswith("INSERT")]
+
+    # noinspection PyUnusedLocal
+    def _insert_drop(self, statement, c):
+        """
+        Responder : INSERT statements lose the connection
+        """
+
+        if statement.startswith("INSERT"):
+            raise Exception("Injected drop")
+        return None
+
+    def test_insert_builder(self):
+        """
+        Test
+        """
+
+        prefix = MysqlInsert.prefix("db.t1", ["a", "b"])
+        self.assertEqual(prefix, "INSERT INTO `db`.`t1` (`a`,`b`) VALUES ")
+        ar = list(MysqlInsert.iter_statements(prefix, [(1, "x'y"), (2, None), (3, b"\x00")], 2, max_rows=2))
+        self.assertEqual(ar, [
+            ("INSERT INTO `db`.`t1` (`a`,`b`) VALUES (1,'x\\'y'),(2,NULL);", 2),
+            ("INSERT INTO `db`.`t1` (`a`,`b`) VALUES (3,_binary X'00');", 1),
+        ])
+
+        # Size bound
+        ar = list(MysqlInsert.iter_statements(prefix, [(i, "x" * 100) for i in range(10)], 2, max_bytes=len(prefix) + 250))
+        self.assertEqual([n for _, n in ar], [2, 2, 2, 2, 2])
+        self.assertTrue(all(len(s) <= len(prefix) + 250 for s, _ in ar))
+
+        # Size bound in utf-8 bytes (multibyte rows : 2 rows of 300 bytes do not fit)
+        ar = list(MysqlInsert.iter_statements(prefix, [(i, "\u20ac" * 100) for i in range(10)], 2, max_bytes=len(prefix) + 500))
+        self.assertEqual([n for _, n in ar], [1] * 10)
+        self.assertTrue(all(len(s.encode("utf-8")) <= len(prefix) + 500 for s, _ in ar))
+        ar = list(MysqlInsert.iter_statements(prefix, [(i, "\u20ac" * 100) for i in range(10)], 2, max_bytes=len(prefix) + 700))
+        self.assertEqual([n for _, n in ar], [2, 2, 2, 2, 2])
+        self.assertTrue(all(len(s.encode("utf-8")) <= len(prefix) + 700 for s, _ in ar))
+
+        try:
+            list(MysqlInsert.iter_statements(prefix, [(1,)], 2))
+            self.fail("Must raise")
+        except Exception as e:
+            self.assertIn("Invalid row len", str(e))
+
+    def test_writer(self):
+        """
+        Test
+        """
+
+        w = BufferedWriter(self.d_conf, "t1", ["id", "v"], max_rows=10, flush_interval_ms=60000)
+
+        # Size threshold : all pending rows flushed, by max_rows
+        for i in range(25):
+            w.put((i, "v%s" % i))
+        SolBase.sleep(100)
+        ar = self._inserts()
+        self.assertEqual(len(ar), 3)
+        self.assertTrue(ar[2].endswith("(24,'v24');"))
+        self.assertEqual(w.pending(), 0)
+
+        # Stop : flush
+        w.put((25, "v25"))
+        w.stop()
+        self.assertEqual(len(self._inserts()), 4)
+        self.assertEqual(Meters.aig("k.db_api.bw.rows", tags={"writer": "t1"}), 26)
+        self.assertEqual(Meters.aig("k.db_api.bw.queue", tags={"writer": "t1"}), 0)
+        d = DelayToCount.to_dict(Meters.dtc("k.db_api.bw.flush_ms", tags={"writer": "t1"}))
+        self.assertEqual(sum(d.values()), Meters.aig("k.db_api.bw.flush", tags={"writer": "t1"}))
+
+        # Time threshold
+        w = BufferedWriter(self.d_conf, "t1", ["id", "v"], name="w2", max_rows=1000, flush_interval_ms=50)
+        w.put((1, "a"))
+        w.put((2, "b"))
+        SolBase.sleep(200)
+        self.assertEqual(len(self._inserts()), 5)
+        self.assertEqual(w.pending(), 0)
+
+        # Many greenlets
+        ar_g = [gevent.spawn(w.put, (i, "g")) for i in range(500)]
+        gevent.joinall(ar_g)
+        w.stop()
+        self.assertEqual(Meters.aig("k.db_api.bw.rows", tags={"writer": "w2"}), 502)
+        self.assertEqual(len(BufferedWriter.L_WRITER), 0)
+
+    def test_writer_backpressure(self):
+        """
+        Test
+        """
+
+        w = BufferedWriter(self.d_conf, "t1", ["id"], max_rows=100, queue_max=5, put_timeout_ms=0)
+        for i in range(5):
+            w.put((i,))
+        try:
+            w.put((6,))
+            self.fail("Must raise")
+        except Exception as e:
+            self.assertIn("queue full", str(e))
+        self.assertEqual(Meters.aig("k.db_api.bw.full", tags={"writer": "t1"}), 1)
+
+        try:
+            w.put((1, 2))
+            self.fail("Must raise")
+        except Exception as e:
+            self.assertIn("Invalid row len", str(e))
+
+        # Blocking put : waits for the flush
+        w.put_timeout_ms = None
+        w.flush_interval_ms = 20
+        g = gevent.spawn(w.put, (7,))
+        g.join(timeout=2.0)
+        self.assertTrue(g.successful())
+        SolBase.sleep(100)
+        self.assertEqual(Meters.aig("k.db_api.bw.rows", tags={"writer": "t1"}), 6)
+
+        # Queue gauge follows put (not only flushes)
+        w.put_timeout_ms = 0
+        w.flush_interval_ms = 60000
+        SolBase.sleep(100)
+        w.put((8,))
+        w.put((9,))
+        self.assertEqual(Meters.aig("k.db_api.bw.queue", tags={"writer": "t1"}), 2)
+
+        # Failed flush at stop (connection lost) : retried, not lost
+        self.stub.drop_query_count = 1
+        w.retry_backoff_ms = 10
+        w.stop()
+        self.assertEqual(Meters.aig("k.db_api.bw.retry", tags={"writer": "t1"}), 1)
+        self.assertEqual(Meters.aig("k.db_api.bw.lost", tags={"writer": "t1"}), 0)
+        self.assertEqual(Meters.aig("k.db_api.bw.rows", tags={"writer": "t1"}), 8)
+
+    def test_writer_retry(self):
+        """
+        Test
+        """
+
+        w = BufferedWriter(self.d_conf, "t1", ["id"], max_rows=2, flush_interval_ms=20, queue_max=10, put_timeout_ms=0, retry_max=2, retry_backoff_ms=200)
+
+        # Warm up (pooled connection)
+        w.put((-1,))
+        SolBase.sleep(200)
+        self.assertEqual(Meters.aig("k.db_api.bw.rows", tags={"writer": "t1"}), 1)
+
+        # Outage : draining stops after the first failed batch, queue fills up (backpressure)
+        self.stub.responder = self._insert_drop
+        for i in range(4):
+            w.put((i,))
+        SolBase.sleep(60)
+        self.assertEqual(Meters.aig("k.db_api.bw.flush_ex", tags={"writer": "t1"}), 1)
+        self.assertEqual(w.pending(), 4)
+        for i in range(4, 12):
+            w.put((i,))
+        self.assertEqual(Meters.aig("k.db_api.bw.queue", tags={"writer": "t1"}), 10)
+        try:
+            w.put((12,))
+            self.fail("Must raise")
+        except Exception as e:
+            self.assertIn("queue full", str(e))
+        self.assertEqual(Meters.aig("k.db_api.bw.lost", tags={"writer": "t1"}), 0)
+
+        # Retries exhausted (after 200 + 400 ms backoff) : first batch lost, next one kept for retry
+        SolBase.sleep(700)
+        self.assertEqual(Meters.aig("k.db_api.bw.retry", tags={"writer": "t1"}), 3)
+        self.assertEqual(Meters.aig("k.db_api.bw.lost", tags={"writer": "t1"}), 2)
+        self.assertEqual(w.pending(), 10)
+
+        # Recovery : everything else sent
+        self.stub.responder = None
+        SolBase.sleep(400)
+        self.assertEqual(w.pending(), 0)
+        self.assertEqual(Meters.aig("k.db_api.bw.rows", tags={"writer": "t1"}), 11)
+        self.assertEqual(Meters.aig("k.db_api.bw.lost", tags={"writer": "t1"}), 2)
+        w.stop()
+
+    def test_writer_rejected(self):
+        """
+        Test
+        """
+
+        # noinspection PyUnusedLocal
+        def _responder(statement, c):
+            if statement.startswith("INSERT") and "'bad'" in statement:
+                return StubResult(errno=1406, message="Data too long for column 'v' at row 1")
+            if statement.startswith("INSERT") and "'lock'" in statement and ar_lock:
+                ar_lock.pop()
+                return StubResult(errno=1213, message="Deadlock found when trying to get lock")
+            return None
+
+        ar_lock = list()
+        self.stub.responder = _responder
+        w = BufferedWriter(self.d_conf, "t1", ["id", "v"], max_rows=10, flush_interval_ms=60000, retry_backoff_ms=10)
+
+        # Rejected row : not retried, rows sent one by one, only the rejected one lost
+        for i in range(5):
+            w.put((i, "bad" if i == 2 else "ok"))
+        w.flush()
+        self.assertEqual(len(self._inserts()), 6)
+        self.assertEqual(w.pending(), 0)
+        self.assertEqual(Meters.aig("k.db_api.bw.rows", tags={"writer": "t1"}), 4)
+        self.assertEqual(Meters.aig("k.db_api.bw.rejected", tags={"writer": "t1"}), 1)
+        self.assertEqual(Meters.aig("k.db_api.bw.lost", tags={"writer": "t1"}), 1)
+        self.assertEqual(Meters.aig("k.db_api.bw.retry", tags={"writer": "t1"}), 0)
+
+        # Single row statement rejected : lost, draining goes on
+        w.put((5, "bad"))
+        w.flush()
+        w.put((6, "ok"))
+        w.flush()
+        self.assertEqual(len(self._inserts()), 8)
+        self.assertEqual(Meters.aig("k.db_api.bw.rows", tags={"writer": "t1"}), 5)
+        self.assertEqual(Meters.aig("k.db_api.bw.lost", tags={"writer": "t1"}), 2)
+
+        # Deadlock : not the rows fault, retried
+        ar_lock.append(1)
+        w.put((7, "lock"))
+        w.stop()
+        self.assertEqual(Meters.aig("k.db_api.bw.retry", tags={"writer": "t1"}), 1)
+        self.assertEqual(Meters.aig("k.db_api.bw.rows", tags={"writer": "t1"}), 6)
+        self.assertEqual(Meters.aig("k.db_api.bw.lost", tags={"writer": "t1"}), 2)
+        self.assertEqual(Meters.aig("k.db_api.bw.flush_ex", tags={"writer": "t1"}), 1)
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+# ===============================================================================
+#
+# Copyright (C) 2013/2025 Laurent Labatut / Laurent Champagnac
+#
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ===============================================================================
+"""
+
+# Imports
+import logging
+import unittest
+
+import gevent
+from pysolbase.SolBase import SolBase
+from pysolmeters.Meters import Meters
+
+from pysolmysql.Mysql.MysqlApi import MysqlApi
+from pysolmysql.Pool.connection_budget import ConnectionBudget
+from pysolmysql.bench.mysql_stub import MysqlStubServer
+from pysolmysql.bench.pool_bench import MockConnectionPool
+
+logger = logging.getLogger(__name__)
+SolBase.voodoo_init()
+SolBase.logging_init(log_level='INFO', force_reset=True)
+
+
+# noinspection SqlNoDataSourceInspection,SqlResolve
+class TestConnectionBudget(unittest.TestCase):
+    """
+    Test description
+    """
+
+    # noinspection PyPep8Naming
+    def setUp(self):
+        """
+        Setup
+        """
+
+        MysqlApi.reset_pools()
+        Meters.reset()
+
+    # noinspection PyPep8Naming
+    def tearDown(self):
+        """
+        Setup (called on destroy)
+        """
+
+        MysqlApi.set_connection_budget(None)
+        MysqlApi.POOL_IDLE_EVICT_SEC = 600
+        MysqlApi.reset_pools()
+
+    def test_budget(self):
+        """
+        Test
+        """
+
+        budget = ConnectionBudget(4)
+        p1 = MockConnectionPool({"pool_max_size": 10, "pool_name": "p1"})
+        p2 = MockConnectionPool({"pool_max_size": 10, "pool_name": "p2"})
+        budget.register(p1)
+        budget.register(p2)
+        self.assertEqual(budget.fair_share(), 2)
+
+        # p1 : 3 connections, idle
+        ar = [p1.connection_acquire() for _ in range(0, 3)]
+        for c in ar:
+            p1.connection_release(c)
+        self.assertEqual(budget.used, 3)
+
+        # p2 : 1 connection, budget full
+        c1 = p2.connection_acquire()
+        self.assertEqual(budget.used, 4)
+        self.assertEqual(Meters.aig("k.db_pool.budget.used"), 4)
+
+        # p2 : below fair share, evict one p1 idle connection
+        c2 = p2.connection_acquire()
+        self.assertEqual(budget.used, 4)
+        self.assertEqual(p1.size, 2)
+        self.assertEqual(p2.size, 2)
+        self.assertEqual(Meters.aig("k.db_pool.budget.evict"), 1)
+
+        # p2 : at fair share, must fail
+        try:
+            p2.connection_acquire()
+            self.fail("Must raise")
+        except Exception as e:
+            self.assertIn("Connection budget exhausted", str(e))
+        self.assertEqual(Meters.aig("k.db_pool.budget.exhausted"), 1)
+        self.assertEqual(p2.size, 2)
+
+        # Release, reuse, no new token
+        p2.connection_release(c1)
+        p2.connection_release(c2)
+        p2.connection_release(p2.connection_acquire())
+        self.assertEqual(budget.used, 4)
+
+        # Close all : tokens back
+        p1.close_all()
+        self.assertEqual(budget.used, 2)
+        p2.close_all()
+        self.assertEqual(budget.used, 0)
+
+    def test_budget_mysql_api(self):
+        """
+        Test
+        """
+
+        stub = MysqlStubServer()
+        stub.start()
+        try:
+            MysqlApi.set_connection_budget(2)
+            d_conf1 = stub.conf_dict(pool_name="p1")
+            d_conf2 = stub.conf_dict(pool_name="p2")
+
+            MysqlApi.exec_n(d_conf1, "SELECT 1;")
+            MysqlApi.exec_n(d_conf2, "SELECT 1;")
+            self.assertEqual(MysqlApi.CONNECTION_BUDGET.used, 2)
+            self.assertEqual(len(MysqlApi.CONNECTION_BUDGET.pools), 2)
+
+            # Budget full, p1 at fair share : must fail
+            pool1 = MysqlApi._get_pool(d_conf1)
+            c = pool1.connection_acquire()
+            try:
+                pool1.connection_acquire()
+                self.fail("Must raise")
+            except Exception as e:
+                self.assertIn("Connection budget exhausted", str(e))
+            finally:
+                pool1.connection_release(c)
+
+            MysqlApi.reset_pools()
+            self.assertEqual(MysqlApi.CONNECTION_BUDGET.used, 0)
+            self.assertEqual(len(MysqlApi.CONNECTION_BUDGET.pools), 0)
+        finally:
+            stub.stop()
+
+    def test_evict_idle_pools(self):
+        """
+        Test
+        """
+
+        stub = MysqlStubServer()
+        stub.start()
+        try:
+            MysqlApi.POOL_IDLE_EVICT_SEC = 60
+            d_conf1 = stub.conf_dict(pool_name="p1")
+            d_conf2 = stub.conf_dict(pool_name="p2")
+
+            MysqlApi.exec_n(d_conf1, "SELECT 1;")
+            pool1 = MysqlApi._get_pool(d_conf1)
+            pool1.last_used -= 120
+
+            # Alloc p2 : p1 evicted
+            MysqlApi.exec_n(d_conf2, "SELECT 1;")
+            self.assertEqual(len(MysqlApi.D_POOL_INSTANCES), 1)
+            self.assertEqual(Meters.aig("k.db_pool.hash.cur"), 1)
+            self.assertEqual(Meters.aig("k.db_pool.hash.evict"), 1)
+            self.assertEqual(pool1.size, 0)
+
+            # p1 re-allocated on demand
+            MysqlApi.exec_n(d_conf1, "SELECT 1;")
+            self.assertEqual(len(MysqlApi.D_POOL_INSTANCES), 2)
+        finally:
+            stub.stop()
+
+    def test_evict_idle_pools_race(self):
+        """
+        Test
+        """
+
+        stub = MysqlStubServer()
+        stub.start()
+        try:
+            MysqlApi.POOL_IDLE_EVICT_SEC = 60
+            MysqlApi.set_connection_budget(10)
+            d_conf1 = stub.conf_dict(pool_name="p1")
+            pool1 = MysqlApi._get_pool(d_conf1)
+
+            # Fetched (about to acquire) : not idle, even if its last acquire is old
+            pool1.last_used -= 120
+            self.assertIs(MysqlApi._get_pool(d_conf1), pool1)
+            MysqlApi._get_pool(stub.conf_dict(pool_name="p2"))
+            self.assertIn(pool1, MysqlApi.D_POOL_INSTANCES.values())
+
+            # Connection being created (not yet acquired) : not evicted
+            stub.connect_latency_ms = 200
+            g = gevent.spawn(MysqlApi.exec_n, d_conf1, "SELECT 1;")
+            SolBase.sleep(50)
+            self.assertEqual(len(pool1.d_acquired), 0)
+            pool1.last_used -= 120
+            MysqlApi._get_pool(stub.conf_dict(pool_name="p3"))
+            self.assertIn(pool1, MysqlApi.D_POOL_INSTANCES.values())
+            g.join()
+            self.assertTrue(g.successful())
+            self.assertEqual(pool1.stats()["idle"], 1)
+            self.assertEqual(MysqlApi.CONNECTION_BUDGET.used, 1)
+            self.assertEqual(Meters.aig("k.db_pool.hash.evict"), 0)
+        finally:
+            stub.stop()
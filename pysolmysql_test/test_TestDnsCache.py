@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""
+# ===============================================================================
+#
+# Copyright (C) 2013/2025 Laurent Labatut / Laurent Champagnac
+#
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ===============================================================================
+"""
+# Imports
+import logging
+import time
+import unittest
+
+from pysolbase.SolBase import SolBase
+from pysolmeters.Meters import Meters
+
+from pysolmysql.Mysql.MysqlApi import MysqlApi
+from pysolmysql.Pool.dns_cache import DnsCache
+from pysolmysql.bench.mysql_stub import MysqlStubServer
+
+logger = logging.getLogger(__name__)
+SolBase.voodoo_init()
+SolBase.logging_init(log_level='INFO', force_reset=True)
+
+
+# noinspection PyBroadException,SqlNoDataSourceInspection,SqlResolve
+class TestDnsCache(unittest.TestCase):
+    """
+    Test description
+    """
+
+    # noinspection PyPep8Naming
+    def setUp(self):
+        """
+        Setup
+        """
+
+        MysqlApi.reset_pools()
+        Meters.reset()
+
+        self.d_record = {"db.local": ["10.0.0.1", "10.0.0.2"]}
+        self.count_resolve = 0
+
+    # noinspection PyPep8Naming
+    def tearDown(self):
+        """
+        Setup (called on destroy)
+        """
+
+        MysqlApi.reset_pools()
+
+    def _resolver(self, name):
+        """
+        Fake resolver
+        """
+
+        self.count_resolve += 1
+        if name not in self.d_record:
+            raise Exception("Name not found, name=%s" % name)
+        return list(self.d_record[name])
+
+    def test_dns_cache(self):
+        """
+        Test
+        """
+
+        tags = {"pool": "p1"}
+        dns = DnsCache(tags=tags, ttl_sec=0.5, refresh_ratio=0.5, stale_sec=0.5, resolver=self._resolver)
+
+        # Miss, then hit
+        self.assertEqual(dns.resolve("db.local"), ["10.0.0.1", "10.0.0.2"])
+        self.assertEqual(dns.resolve("db.local"), ["10.0.0.1", "10.0.0.2"])
+        self.assertEqual(self.count_resolve, 1)
+        self.assertEqual(Meters.aig("k.db_pool.dns.miss", tags=tags), 1)
+        self.assertEqual(Meters.aig("k.db_pool.dns.hit", tags=tags), 1)
+
+        # Failed address goes last, connected one first
+        dns.bad("db.local", "10.0.0.1")
+        self.assertEqual(dns.resolve("db.local"), ["10.0.0.2", "10.0.0.1"])
+        dns.good("db.local", "10.0.0.1")
+        self.assertEqual(dns.resolve("db.local"), ["10.0.0.1", "10.0.0.2"])
+
+        # Past refresh ratio : cached addresses returned, refreshed in background (order kept, new addresses last)
+        self.d_record["db.local"] = ["10.0.0.3", "10.0.0.2", "10.0.0.1"]
+        SolBase.sleep(300)
+        self.assertEqual(dns.resolve("db.local"), ["10.0.0.1", "10.0.0.2"])
+        SolBase.sleep(50)
+        self.assertEqual(self.count_resolve, 2)
+        self.assertEqual(Meters.aig("k.db_pool.dns.refresh", tags=tags), 1)
+        self.assertEqual(dns.resolve("db.local"), ["10.0.0.1", "10.0.0.2", "10.0.0.3"])
+
+        # Expired, resolution failure : stale addresses up to stale_sec
+        del self.d_record["db.local"]
+        SolBase.sleep(600)
+        self.assertEqual(dns.resolve("db.local"), ["10.0.0.1", "10.0.0.2", "10.0.0.3"])
+        self.assertEqual(Meters.aig("k.db_pool.dns.stale", tags=tags), 1)
+        SolBase.sleep(500)
+        try:
+            dns.resolve("db.local")
+            self.fail("Must raise")
+        except Exception as e:
+            self.assertIn("Name not found", str(e))
+
+        # Literals
+        self.assertTrue(DnsCache.is_literal("127.0.0.1"))
+        self.assertTrue(DnsCache.is_literal("::1"))
+        self.assertFalse(DnsCache.is_literal("localhost"))
+        self.assertFalse(DnsCache.is_resolvable("localhost"))
+        self.assertFalse(DnsCache.is_resolvable("/var/run/mysqld/mysqld.sock"))
+        self.assertFalse(DnsCache.is_resolvable("127.0.0.1"))
+        self.assertTrue(DnsCache.is_resolvable("db.local"))
+
+        # Real resolver
+        self.assertIn("127.0.0.1", DnsCache.getaddrinfo("localhost"))
+        dns.close()
+
+    def test_dns_failover(self):
+        """
+        Test
+        """
+
+        stub = MysqlStubServer()
+        stub.start()
+        try:
+            d_conf = stub.conf_dict(pool_name="p1")
+            d_conf["hosts"] = ["db.local"]
+            d_conf["dns_cache_ttl_sec"] = 60.0
+            pool = MysqlApi._get_pool(d_conf)
+            self.assertEqual(pool.d_host_connect["db.local"]["host"], "db.local")
+            self.assertEqual(pool.d_host_connect["db.local"]["port"], stub.port)
+
+            # First address refused, second one is the stub
+            self.d_record["db.local"] = ["127.0.0.2", "127.0.0.1"]
+            pool.dns_cache.resolver = self._resolver
+            self.assertEqual(len(MysqlApi.exec_n(d_conf, "SELECT 1;")), 1)
+            self.assertEqual(Meters.aig("k.db_pool.dns.failover", tags={"pool": "p1"}), 1)
+            self.assertEqual(pool.dns_cache.resolve("db.local"), ["127.0.0.1", "127.0.0.2"])
+
+            # Next connect : working address first, resolved once
+            MysqlApi.reset_pools()
+            pool2 = MysqlApi._get_pool(d_conf)
+            pool2.dns_cache = pool.dns_cache
+            self.assertEqual(len(MysqlApi.exec_n(d_conf, "SELECT 1;")), 1)
+            self.assertEqual(Meters.aig("k.db_pool.dns.failover", tags={"pool": "p1"}), 1)
+            self.assertEqual(self.count_resolve, 1)
+
+            # Disabled
+            MysqlApi.reset_pools()
+            d_conf["hosts"] = ["127.0.0.1"]
+            d_conf["dns_cache_ttl_sec"] = None
+            self.assertIsNone(MysqlApi._get_pool(d_conf).dns_cache)
+            self.assertEqual(len(MysqlApi.exec_n(d_conf, "SELECT 1;")), 1)
+        finally:
+            stub.stop()
+
+    def test_dns_localhost(self):
+        """
+        Test
+        """
+
+        stub = MysqlStubServer()
+        stub.start()
+        try:
+            # Disabled by default
+            d_conf = stub.conf_dict(pool_name="p1")
+            self.assertIsNone(MysqlApi._get_pool(d_conf).dns_cache)
+
+            # Enabled : localhost passed as is to the driver
+            MysqlApi.reset_pools()
+            d_conf["hosts"] = ["localhost"]
+            d_conf["dns_cache_ttl_sec"] = 60.0
+            pool = MysqlApi._get_pool(d_conf)
+            pool.dns_cache.resolver = self._resolver
+            ar_host = list()
+            connect = pool.driver.connect
+
+            def _connect(**kwargs):
+                ar_host.append(kwargs["host"])
+                return connect(**kwargs)
+
+            pool.driver.connect = _connect
+            try:
+                self.assertEqual(len(MysqlApi.exec_n(d_conf, "SELECT 1;")), 1)
+            finally:
+                del pool.driver.connect
+            self.assertEqual(ar_host, ["localhost"])
+            self.assertEqual(self.count_resolve, 0)
+            self.assertEqual(Meters.aig("k.db_pool.dns.miss", tags={"pool": "p1"}), 0)
+        finally:
+            stub.stop()
+
+    def test_dns_failover_exhausted(self):
+        """
+        Test
+        """
+
+        stub = MysqlStubServer()
+        stub.start()
+        try:
+            d_conf = stub.conf_dict(pool_name="p1")
+            d_conf["hosts"] = ["db.local"]
+            d_conf["dns_cache_ttl_sec"] = 60.0
+            pool = MysqlApi._get_pool(d_conf)
+            pool.dns_cache.resolver = self._resolver
+            pool.HOST_PRISON_SEC = 5.0
+
+            # All addresses refused : each one goes last
+            self.d_record["db.local"] = ["127.0.0.3", "127.0.0.2"]
+            try:
+                pool._host_connect("db.local")
+                self.fail("Must raise")
+            except Exception as e:
+                self.assertTrue(pool.driver.is_connection_error(e))
+            self.assertEqual(pool.dns_cache.resolve("db.local"), ["127.0.0.3", "127.0.0.2"])
+            self.assertEqual(Meters.aig("k.db_pool.dns.failover", tags={"pool": "p1"}), 1)
+
+            # Host deactivated for HOST_PRISON_SEC
+            try:
+                MysqlApi.exec_n(d_conf, "SELECT 1;")
+                self.fail("Must raise")
+            except Exception as e:
+                self.assertIn("No mysql host available", str(e))
+            self.assertLessEqual(pool.host_status["db.local"], time.time() + 5.0)
+
+            # Nothing resolved : explicit error
+            pool.dns_cache.resolve = lambda name: list()
+            try:
+                pool._host_connect("db.local")
+                self.fail("Must raise")
+            except Exception as e:
+                self.assertIn("No address resolved, host=db.local", str(e))
+        finally:
+            stub.stop()
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+# ===============================================================================
+#
+# Copyright (C) 2013/2025 Laurent Labatut / Laurent Champagnac
+#
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ===============================================================================
+"""
+# Imports
+import logging
+import unittest
+
+from pysolbase.SolBase import SolBase
+from pysolmeters.Meters import Meters
+
+from pysolmysql.Mysql.MysqlApi import MysqlApi
+from pysolmysql.Pool.hooks import Hooks
+from pysolmysql.bench.hooks_bench import HooksBench
+from pysolmysql.bench.mysql_stub import MysqlStubServer, StubResult
+
+logger = logging.getLogger(__name__)
+SolBase.voodoo_init()
+SolBase.logging_init(log_level='INFO', force_reset=True)
+
+
+# noinspection PyBroadException,SqlNoDataSourceInspection,SqlResolve
+class TestHooks(unittest.TestCase):
+    """
+    Test description
+    """
+
+    # noinspection PyPep8Naming
+    def setUp(self):
+        """
+        Setup
+        """
+
+        MysqlApi.reset_pools()
+        Meters.reset()
+        Hooks.reset()
+
+        self.stub = MysqlStubServer()
+        self.stub.start()
+        self.d_conf = self.stub.conf_dict(pool_name="p1")
+        self.ar_event = list()
+
+    # noinspection PyPep8Naming
+    def tearDown(self):
+        """
+        Setup (called on destroy)
+        """
+
+        Hooks.reset()
+        self.stub.stop()
+        MysqlApi.reset_pools()
+
+    def _hook(self, kind):
+        """
+        Get a hook recording (kind, event copy)
+        """
+
+        def _f(d_event):
+            if kind == "execute_before":
+                d_event["span"] = "s1"
+            self.ar_event.append((kind, dict(d_event)))
+
+        return _f
+
+    def test_hooks(self):
+        """
+        Test
+        """
+
+        for kind in Hooks.KINDS:
+            Hooks.add(kind, self._hook(kind))
+        self.assertTrue(Hooks.EXECUTE)
+
+        # Execute
+        MysqlApi.exec_n(self.d_conf, "SELECT 1;")
+        self.assertEqual([e[0] for e in self.ar_event], ["acquire", "execute_before", "execute_after", "release"])
+        d = self.ar_event[0][1]
+        self.assertEqual(d["pool"], "p1")
+        self.assertEqual(d["host"], "127.0.0.1")
+        self.assertIsNone(d["ex"])
+        self.assertGreaterEqual(d["ms"], 0)
+        d = self.ar_event[2][1]
+        self.assertEqual(d["statement"], "SELECT 1;")
+        self.assertEqual(d["host"], "127.0.0.1")
+        self.assertEqual(d["rowcount"], 1)
+        self.assertIsNone(d["ex"])
+        self.assertEqual(d["span"], "s1")
+        self.assertGreaterEqual(d["ms"], 0)
+        self.assertGreaterEqual(self.ar_event[3][1]["ms"], 0)
+
+        # Failure
+        self.ar_event = list()
+        self.stub.responder = lambda statement, c: StubResult(errno=1064, message="Syntax error") if "BAD" in statement else None
+        try:
+            MysqlApi.exec_0(self.d_conf, "BAD;")
+            self.fail("Must raise")
+        except Exception:
+            pass
+        d = self.ar_event[2][1]
+        self.assertEqual(d["statement"], "BAD;")
+        self.assertIsNone(d["rowcount"])
+        self.assertIn("Syntax error", str(d["ex"]))
+
+        # Prepared
+        self.ar_event = list()
+        MysqlApi.prepared_0(self.d_conf, "UPDATE t1 SET a=?;", [1])
+        self.assertEqual(self.ar_event[2][1]["rowcount"], 1)
+
+        # Acquire failure
+        self.ar_event = list()
+        self.stub.refuse_connect = True
+        self.stub.kill_connections()
+        SolBase.sleep(50)
+        d_conf = dict(self.d_conf, pool_name="p2")
+        try:
+            MysqlApi.exec_n(d_conf, "SELECT 1;")
+            self.fail("Must raise")
+        except Exception:
+            pass
+        self.assertEqual(self.ar_event[0][0], "acquire")
+        self.assertIsNotNone(self.ar_event[0][1]["ex"])
+
+    def test_hooks_failure_remove(self):
+        """
+        Test
+        """
+
+        def _raise(d_event):
+            raise Exception("Hook failure, d_event=%s" % d_event)
+
+        # Hook failures are not raised
+        Hooks.add("execute_after", _raise)
+        Hooks.add("release", _raise)
+        self.assertEqual(len(MysqlApi.exec_n(self.d_conf, "SELECT 1;")), 1)
+        self.assertEqual(Meters.aig("k.db_pool.hooks.ex"), 2)
+
+        # Remove
+        Hooks.remove("execute_after", _raise)
+        self.assertFalse(Hooks.EXECUTE)
+        self.assertEqual(len(Hooks.RELEASE), 1)
+        Hooks.remove("release", _raise)
+        self.assertEqual(Hooks.RELEASE, tuple())
+
+        # Invalid
+        try:
+            Hooks.add("nope", _raise)
+            self.fail("Must raise")
+        except Exception as e:
+            self.assertIn("Invalid hook kind", str(e))
+
+    def test_hooks_bench(self):
+        """
+        Test
+        """
+
+        d = HooksBench.run(self.d_conf, iterations=1000, repeat=1)
+        logger.info("d=%s", d)
+        self.assertGreater(d["check_ns"], 0)
+        self.assertGreater(d["pool_us_disabled"], 0)
+        self.assertGreater(d["pool_us_enabled"], 0)
+        self.assertGreater(d["api_us_disabled"], 0)
+        self.assertLess(d["pool_check_pct"], 100.0)
+        self.assertEqual(Hooks.ACQUIRE, tuple())
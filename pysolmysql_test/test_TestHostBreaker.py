@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+# ===============================================================================
+#
+# Copyright (C) 2013/2025 Laurent Labatut / Laurent Champagnac
+#
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ===============================================================================
+"""
+# Imports
+import logging
+import time
+import unittest
+
+from pysolbase.SolBase import SolBase
+from pysolmeters.Meters import Meters
+
+from pysolmysql.Mysql.MysqlApi import MysqlApi
+from pysolmysql.Pool.host_breaker import HostBreaker
+from pysolmysql.bench.mysql_stub import MysqlStubServer
+
+logger = logging.getLogger(__name__)
+SolBase.voodoo_init()
+SolBase.logging_init(log_level='INFO', force_reset=True)
+
+
+# noinspection PyBroadException,SqlNoDataSourceInspection,SqlResolve
+class TestHostBreaker(unittest.TestCase):
+    """
+    Test description
+    """
+
+    # noinspection PyPep8Naming
+    def setUp(self):
+        """
+        Setup
+        """
+
+        MysqlApi.reset_pools()
+        Meters.reset()
+
+        self.stub = MysqlStubServer()
+        self.stub.start()
+
+        # Connection drops on our statements only
+        self.drop_count = 0
+        self.stub.responder = self._responder
+
+    # noinspection PyPep8Naming
+    def tearDown(self):
+        """
+        Setup (called on destroy)
+        """
+
+        self.stub.stop()
+        MysqlApi.reset_pools()
+
+    def _responder(self, statement, c):
+        """
+        Responder : drop the connection while drop_count > 0
+        """
+
+        if self.drop_count > 0 and statement.startswith("SELECT 1"):
+            self.drop_count -= 1
+            raise Exception("Test drop")
+        return None
+
+    def test_breaker_error_rate(self):
+        """
+        Test
+        """
+
+        tags = {"pool": "p", "host": "h"}
+        b = HostBreaker(tags, window_sec=10, min_calls=4, error_rate=0.5, open_sec=5.0, probe_count=2)
+        now = 1000.0
+
+        # Below min calls
+        self.assertFalse(b.record(1.0, False, now))
+        self.assertFalse(b.record(1.0, False, now))
+        self.assertFalse(b.record(1.0, True, now))
+        self.assertEqual(b.get_state(now), HostBreaker.STATE_CLOSED)
+
+        # Out of window
+        self.assertFalse(b.record(1.0, False, now + 10))
+        self.assertEqual((b.calls, b.errors), (1, 1))
+        self.assertFalse(b.record(1.0, True, now + 10))
+        self.assertFalse(b.record(1.0, True, now + 11))
+        self.assertFalse(b.record(1.0, True, now + 11))
+        self.assertFalse(b.record(1.0, False, now + 12))
+        self.assertTrue(b.record(1.0, False, now + 12))
+        self.assertEqual((b.calls, b.errors), (6, 3))
+        self.assertEqual(b.get_state(now + 12), HostBreaker.STATE_OPEN)
+        self.assertFalse(b.connect_allowed(now + 12))
+        self.assertEqual(Meters.aig("k.db_pool.breaker.open", tags=tags), 1)
+        self.assertEqual(Meters.aig("k.db_pool.breaker.state", tags=tags), HostBreaker.STATE_OPEN)
+
+        # Half-open : probe connections bounded, a failure opens again
+        now += 17
+        self.assertTrue(b.connect_allowed(now))
+        self.assertEqual(b.get_state(now), HostBreaker.STATE_HALF_OPEN)
+        b.connect_done()
+        b.connect_done()
+        self.assertFalse(b.connect_allowed(now))
+        self.assertTrue(b.record(1.0, False, now))
+        self.assertEqual(b.get_state(now), HostBreaker.STATE_OPEN)
+
+        # Half-open : probes ok, closed
+        now += 5
+        self.assertTrue(b.connect_allowed(now))
+        self.assertFalse(b.record(1.0, True, now))
+        self.assertEqual(b.get_state(now), HostBreaker.STATE_HALF_OPEN)
+        self.assertFalse(b.record(1.0, True, now))
+        self.assertEqual(b.get_state(now), HostBreaker.STATE_CLOSED)
+        self.assertEqual(b.calls, 0)
+        self.assertEqual(Meters.aig("k.db_pool.breaker.open", tags=tags), 2)
+        self.assertEqual(Meters.aig("k.db_pool.breaker.half_open", tags=tags), 2)
+        self.assertEqual(Meters.aig("k.db_pool.breaker.closed", tags=tags), 1)
+
+    def test_breaker_latency(self):
+        """
+        Test
+        """
+
+        b = HostBreaker({"pool": "p", "host": "h"}, min_calls=100, error_rate=None, latency_ms=500.0, probe_count=1)
+        now = 1000.0
+
+        # p99 below threshold
+        for _ in range(99):
+            self.assertFalse(b.record(10.0, True, now))
+        # 1% at threshold
+        self.assertTrue(b.record(600.0, True, now))
+
+        # Slow probe : opens again
+        now += b.open_sec
+        self.assertTrue(b.record(600.0, True, now))
+        now += b.open_sec
+        self.assertFalse(b.record(10.0, True, now))
+        self.assertEqual(b.get_state(now), HostBreaker.STATE_CLOSED)
+
+    def test_breaker_pool(self):
+        """
+        Test
+        """
+
+        d_conf = self.stub.conf_dict(hosts=["127.0.0.1", "localhost"], pool_name="p1", breaker_enabled=True, breaker_min_calls=2, breaker_open_sec=0.5, breaker_probe_count=1)
+        pool = MysqlApi._get_pool(d_conf)
+
+        # Open connections toward both hosts
+        ar = [pool.connection_acquire() for _ in range(4)]
+        ar_host = [pool.connection_host(c) for c in ar]
+        while len(set(ar_host)) < 2:
+            ar.append(pool.connection_acquire())
+            ar_host.append(pool.connection_host(ar[-1]))
+        for c in ar[1:]:
+            pool.connection_release(c)
+        host = ar_host[0]
+        other = "localhost" if host == "127.0.0.1" else "127.0.0.1"
+
+        # Trip : idle connections toward host closed, host out of rotation
+        pool.host_record(host, 1.0, False)
+        pool.host_record(host, 1.0, False)
+        self.assertGreater(pool.host_status[host], time.time())
+        self.assertTrue(all(pool.connection_host(c) == other for c in list(pool.pool.queue)))
+        for _ in range(10):
+            self.assertEqual(pool._get_random_host(), other)
+
+        # In use connection toward host : closed on release
+        size = pool.size
+        pool.connection_release(ar[0])
+        self.assertEqual(pool.size, size - 1)
+        self.assertEqual(Meters.aig("k.db_pool.breaker.state", tags={"pool": "p1", "host": host}), HostBreaker.STATE_OPEN)
+
+        # Half-open : one probe connection allowed
+        SolBase.sleep(600)
+        self.assertTrue(pool.d_breaker[host].connect_allowed())
+        pool.d_breaker[host].connect_done()
+        for _ in range(10):
+            self.assertEqual(pool._get_random_host(), other)
+        pool.host_record(host, 1.0, True)
+        self.assertEqual(pool.d_breaker[host].get_state(), HostBreaker.STATE_CLOSED)
+
+    def test_breaker_api(self):
+        """
+        Test
+        """
+
+        d_conf = self.stub.conf_dict(pool_name="p2", breaker_enabled=True, breaker_min_calls=4, breaker_error_rate=0.5)
+        MysqlApi.exec_n(d_conf, "SELECT 1;")
+        MysqlApi.exec_n(d_conf, "SELECT 1;")
+
+        # Connection losses : trip, host out of rotation
+        self.drop_count = 2
+        for _ in range(2):
+            try:
+                MysqlApi.exec_n(d_conf, "SELECT 1;")
+                self.fail("Must raise")
+            except Exception as e:
+                self.assertIn("Lost connection", str(e))
+        self.assertEqual(Meters.aig("k.db_pool.breaker.open", tags={"pool": "p2", "host": "127.0.0.1"}), 1)
+        try:
+            MysqlApi.exec_n(d_conf, "SELECT 1;")
+            self.fail("Must raise")
+        except Exception as e:
+            self.assertIn("No mysql host available", str(e))
+
+        # Disabled : no breaker
+        d_conf = self.stub.conf_dict(pool_name="p3")
+        self.assertEqual(MysqlApi._get_pool(d_conf).d_breaker, dict())
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+# ===============================================================================
+#
+# Copyright (C) 2013/2025 Laurent Labatut / Laurent Champagnac
+#
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ===============================================================================
+"""
+
+# Imports
+import io
+import logging
+import os
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+# noinspection PyUnresolvedReferences
+import ujson
+
+from pysolbase.SolBase import SolBase
+from pysolmeters.Meters import Meters
+
+from pysolmysql.Mysql.MysqlApi import MysqlApi
+from pysolmysql.bench.load_bench import LoadBench, main
+from pysolmysql.bench.mysql_stub import MysqlStubServer
+
+logger = logging.getLogger(__name__)
+SolBase.voodoo_init()
+SolBase.logging_init(log_level='INFO', force_reset=True)
+
+
+# noinspection SqlNoDataSourceInspection,SqlResolve
+class TestLoadBench(unittest.TestCase):
+    """
+    Test description
+    """
+
+    # noinspection PyPep8Naming
+    def setUp(self):
+        """
+        Setup
+        """
+
+        MysqlApi.reset_pools()
+        Meters.reset()
+
+        self.stub = MysqlStubServer()
+        self.stub.start()
+
+    # noinspection PyPep8Naming
+    def tearDown(self):
+        """
+        Setup (called on destroy)
+        """
+
+        self.stub.stop()
+        MysqlApi.reset_pools()
+
+    def test_load_bench(self):
+        """
+        Test
+        """
+
+        d_conf = self.stub.conf_dict(pool_max_size=5)
+        ar_mix = [
+            {"statement": "SELECT * FROM t1 WHERE id=1;", "weight": 3},
+            {"statement": "UPDATE t1 SET v=1 WHERE id=1;", "method": "exec_0"},
+        ]
+        d = LoadBench.run(d_conf, ar_mix, greenlet_count=5, duration_sec=0.5)
+        logger.info("d=%s", d)
+
+        self.assertGreater(d["ok"], 0)
+        self.assertEqual(d["ex"], 0)
+        self.assertEqual(d["pool_maxed"], 0)
+        self.assertGreater(d["qps"], 0)
+        self.assertLessEqual(d["ms_p50"], d["ms_p99"])
+        self.assertLessEqual(d["ms_p99"], d["ms_max"])
+
+        d_meters = {(m["key"], m["tags"].get("fp")): m["value"] for m in d["meters"]}
+        self.assertEqual(
+            d_meters[("k.db_api.fp.count", "select * from t1 where id=?")] + d_meters[("k.db_api.fp.count", "update t1 set v=? where id=?")],
+            d["ok"])
+
+        # Invalid method
+        try:
+            LoadBench.run(d_conf, [{"statement": "SELECT 1", "method": "zzz"}], greenlet_count=1, duration_sec=0.1)
+            self.fail("Must raise")
+        except Exception as e:
+            self.assertIn("Invalid method", str(e))
+
+    def test_load_bench_cli(self):
+        """
+        Test
+        """
+
+        file_name = os.path.join(tempfile.mkdtemp(), "load.json")
+        main(["--stub", "--greenlets", "2", "--duration-sec", "0.2", "--statement", "SELECT 1;", "--out", file_name])
+        with open(file_name, "r") as f:
+            d = ujson.loads(f.read())
+        self.assertEqual(d["bench"], "load")
+        self.assertGreater(d["ok"], 0)
+
+        # Stdout : json only, logs to stderr
+        try:
+            bio = io.StringIO()
+            with redirect_stdout(bio):
+                main(["--stub", "--greenlets", "2", "--duration-sec", "0.2", "--statement", "SELECT 1;"])
+            d = ujson.loads(bio.getvalue())
+            self.assertEqual(d["bench"], "load")
+            ar_stream = [getattr(h, "stream", None) for h in logging.getLogger().handlers]
+            self.assertNotIn(sys.__stdout__, ar_stream)
+            self.assertIn(sys.stderr, ar_stream)
+        finally:
+            SolBase.logging_init(log_level='INFO', force_reset=True)
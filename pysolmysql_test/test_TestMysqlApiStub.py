@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+"""
+# ===============================================================================
+#
+# Copyright (C) 2013/2025 Laurent Labatut / Laurent Champagnac
+#
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ===============================================================================
+"""
+
+# Imports
+import logging
+import os
+import unittest
+
+import gevent
+from pymysql import OperationalError
+
+from pysolbase.SolBase import SolBase
+from pysolmeters.Meters import Meters
+
+from pysolmysql.Mysql.MysqlApi import MysqlApi
+from pysolmysql.bench.mysql_stub import MysqlStubServer, StubResult
+
+logger = logging.getLogger(__name__)
+SolBase.voodoo_init()
+SolBase.logging_init(log_level='INFO', force_reset=True)
+
+
+# noinspection PyBroadException,SqlNoDataSourceInspection,SqlResolve
+class TestMysqlApiStub(unittest.TestCase):
+    """
+    MysqlApi end to end tests, against an in-process mysql stub server (no database required)
+    """
+
+    # noinspection PyPep8Naming
+    def setUp(self):
+        """
+        Setup
+        """
+
+        MysqlApi.reset_pools()
+        Meters.reset()
+
+        self.stub = MysqlStubServer(password="root", databases=["mysql", "pysolmysql_test"])
+        self.stub.start()
+
+    # noinspection PyPep8Naming
+    def tearDown(self):
+        """
+        Setup (called on destroy)
+        """
+
+        self.stub.stop()
+        MysqlApi.reset_pools()
+
+    def test_mysql_api(self):
+        """
+        Test
+        """
+
+        d_conf = self.stub.conf_dict(password="root")
+
+        # exec_n
+        self.stub.result_rows = 3
+        self.stub.result_columns = 2
+        ar = MysqlApi.exec_n(d_conf, "SELECT col_0, col_1 FROM t1;")
+        self.assertEqual(len(ar), 3)
+        self.assertEqual(ar[2], {"col_0": "v_2_0", "col_1": "v_2_1"})
+
+        # exec_1, 3 records (must fail)
+        try:
+            MysqlApi.exec_1(d_conf, "SELECT col_0 FROM t1;")
+            self.fail("Must raise")
+        except Exception as e:
+            self.assertIn("Invalid row len", str(e))
+
+        # exec_01, 3 records (must fail)
+        try:
+            MysqlApi.exec_01(d_conf, "SELECT col_0 FROM t1;")
+            self.fail("Must raise")
+        except Exception as e:
+            self.assertIn("Invalid row len", str(e))
+
+        # exec_n, no return (should be ok)
+        self.stub.result_rows = 0
+        ar = MysqlApi.exec_n(d_conf, "SELECT col_0 FROM t1 WHERE col_0='zzz';")
+        self.assertEqual(len(ar), 0)
+
+        # exec_01, 0 records (must be ok)
+        self.assertIsNone(MysqlApi.exec_01(d_conf, "SELECT col_0 FROM t1 WHERE col_0='zzz';"))
+
+        # exec_1, typed values
+        self.stub.responder = lambda statement, c: StubResult(columns=["i", "s", "n", "b"], rows=[(12, u"string_utf8_Ř", None, b"bin")]) if "FROM t2" in statement else None
+        d = MysqlApi.exec_1(d_conf, "SELECT i, s, n, b FROM t2;")
+        self.assertEqual(d, {"i": 12, "s": u"string_utf8_Ř", "n": None, "b": b"bin"})
+
+        # exec_0
+        self.stub.affected_rows = 2
+        self.assertEqual(MysqlApi.exec_0(d_conf, "DELETE FROM t1 WHERE col_0 IN ('a', 'b');"), 2)
+
+        # multi_n
+        self.assertIsNone(MysqlApi.multi_n(d_conf, ["INSERT INTO t1 VALUES ('a');", "INSERT INTO t1 VALUES ('b');"]))
+        self.assertEqual(list(self.stub.ar_statement)[-2:], ["INSERT INTO t1 VALUES ('a');", "INSERT INTO t1 VALUES ('b');"])
+
+        # Server error
+        self.stub.fail_query_count = 1
+        try:
+            MysqlApi.exec_n(d_conf, "SELECT col_0 FROM t1;")
+            self.fail("Must raise")
+        except OperationalError as e:
+            logger.debug("Expected ex=%s", SolBase.extostr(e))
+        self.assertEqual(Meters.aig("k.db_api.fp.ex", tags={"fp": "select col_0 from t1"}), 1)
+
+    def test_pool_basic(self):
+        """
+        Test pool, basic
+        """
+
+        d_conf = self.stub.conf_dict(password="root")
+
+        for _ in range(0, 10):
+            MysqlApi.exec_1(d_conf, "SELECT col_0 FROM t1 LIMIT 1;")
+
+        # Check it
+        self.assertEqual(Meters.aig("k.db_pool.hash.cur"), 1)
+
+        self.assertEqual(Meters.aig("k.db_pool.base.cur_size"), 1)
+        self.assertEqual(Meters.aig("k.db_pool.base.call.connection_acquire"), 10)
+        self.assertEqual(Meters.aig("k.db_pool.base.call.connection_release"), 10)
+
+        self.assertEqual(Meters.aig("k.db_pool.mysql.call.__init"), 1)
+        self.assertEqual(Meters.aig("k.db_pool.mysql.call._connection_create"), 1)
+        self.assertEqual(Meters.aig("k.db_pool.mysql.call._get_connection"), 1)
+        self.assertEqual(Meters.aig("k.db_pool.mysql.call._connection_ping"), 10)
+
+        self.assertEqual(self.stub.count_connect, 1)
+        self.assertEqual(self.stub.count_ping, 10)
+
+    def test_pool_bad_db(self):
+        """
+        Test pool, bad database, all hosts disabled
+        """
+
+        d_conf = self.stub.conf_dict(password="root", database="no_db")
+
+        try:
+            MysqlApi.exec_1(d_conf, "SELECT col_0 FROM t1 LIMIT 1;")
+            self.fail("Must raise")
+        except Exception as e:
+            logger.debug("Expected ex=%s", SolBase.extostr(e))
+
+        self.assertEqual(Meters.aig("k.db_pool.base.cur_size"), 0)
+        self.assertEqual(Meters.aig("k.db_pool.mysql.hosts.deactivate_one"), 1)
+        self.assertEqual(Meters.aig("k.db_pool.mysql.hosts.all_down"), 1)
+
+    def test_pool_failover(self):
+        """
+        Test pool, one host down
+        """
+
+        # 127.0.0.2 : nothing listening on our port
+        d_conf = self.stub.conf_dict(password="root", hosts=["127.0.0.2", self.stub.host], pool_max_size=4)
+
+        # Open 4 connections, at most one host disabled
+        ar_cnx = list()
+        pool = MysqlApi._get_pool(d_conf)
+        for _ in range(0, 4):
+            ar_cnx.append(pool.connection_acquire())
+        for cnx in ar_cnx:
+            self.assertEqual(pool.connection_host(cnx), self.stub.host)
+            pool.connection_release(cnx)
+
+        self.assertLessEqual(Meters.aig("k.db_pool.mysql.hosts.deactivate_one"), 1)
+        self.assertEqual(Meters.aig("k.db_pool.mysql.hosts.all_down"), 0)
+        self.assertEqual(self.stub.count_connect, 4)
+
+        # Kill server side connections : pings fail, connections are re-created
+        self.stub.kill_connections()
+        for _ in range(0, 4):
+            MysqlApi.exec_1(d_conf, "SELECT col_0 FROM t1 LIMIT 1;")
+        self.assertGreaterEqual(Meters.aig("k.db_pool.mysql.ex_ping"), 1)
+        self.assertGreaterEqual(self.stub.count_connect, 5)
+
+    def test_pool_maxed(self):
+        """
+        Test pool, maxed
+        """
+
+        d_conf = self.stub.conf_dict(password="root", pool_max_size=2)
+
+        ar_greenlet = [gevent.spawn(MysqlApi.exec_1, d_conf, "SELECT SLEEP(0.1);") for _ in range(0, 3)]
+        gevent.joinall(ar_greenlet, timeout=5.0)
+        self.assertEqual(len([g for g in ar_greenlet if g.successful()]), 2)
+        self.assertEqual(Meters.aig("k.db_pool.base.pool_maxed"), 1)
+
+    def test_bench_exec_n_rows(self):
+        """
+        Test
+        """
+
+        d_conf = self.stub.conf_dict(password="root")
+        self.stub.result_rows = 1000
+        self.stub.result_columns = 10
+
+        count = 0
+        dt = SolBase.mscurrent()
+        while SolBase.msdiff(dt) < 1000.0:
+            count += len(MysqlApi.exec_n(d_conf, "SELECT * FROM t1;"))
+        logger.info("exec_n, rows/sec=%s", round(count / (SolBase.msdiff(dt) / 1000.0), 2))
+        self.assertGreater(count, 0)
+
+    def test_fork_reset(self):
+        """
+        Test fork detection (pid change), inherited connections are forgotten, not closed
+        """
+
+        d_conf = self.stub.conf_dict(password="root")
+        MysqlApi.exec_1(d_conf, "SELECT col_0 FROM t1 LIMIT 1;")
+        pool = MysqlApi._get_pool(d_conf)
+        cnx = pool.pool.queue[0]
+
+        # Simulate a fork
+        MysqlApi.POOL_PID = -1
+        self.assertIsNot(MysqlApi._get_pool(d_conf), pool)
+        self.assertEqual(MysqlApi.POOL_PID, os.getpid())
+        self.assertEqual(Meters.aig("k.db_pool.hash.fork_reset"), 1)
+        self.assertEqual(Meters.aig("k.db_pool.mysql.call._connection_forget"), 1)
+        self.assertEqual(Meters.aig("k.db_pool.mysql.call._connection_close"), 0)
+        self.assertEqual(pool.size, 0)
+        self.assertFalse(cnx.open)
+
+        # No COM_QUIT sent
+        gevent.sleep(0.05)
+        self.assertEqual(self.stub.count_quit, 0)
+
+        # New pool, new connection
+        MysqlApi.exec_1(d_conf, "SELECT col_0 FROM t1 LIMIT 1;")
+        self.assertEqual(self.stub.count_connect, 2)
+
+    def test_fork(self):
+        """
+        Test real fork : child uses its own connections, parent connections are not disturbed
+        """
+
+        d_conf = self.stub.conf_dict(password="root")
+        MysqlApi.exec_1(d_conf, "SELECT col_0 FROM t1 LIMIT 1;")
+
+        pid = os.fork()
+        if pid == 0:
+            # Child
+            rc = 1
+            try:
+                if len(MysqlApi.D_POOL_INSTANCES) == 0 and Meters.aig("k.db_pool.hash.fork_reset") == 1:
+                    MysqlApi.exec_1(d_conf, "SELECT col_0 FROM t1 LIMIT 1;")
+                    rc = 0
+            finally:
+                os._exit(rc)
+
+        # Parent : wait for child (non blocking, the stub server runs in our hub)
+        rc = None
+        for _ in range(0, 500):
+            wpid, status = os.waitpid(pid, os.WNOHANG)
+            if wpid == pid:
+                rc = os.WEXITSTATUS(status)
+                break
+            gevent.sleep(0.01)
+        self.assertEqual(rc, 0)
+
+        # Our connection is still usable
+        MysqlApi.exec_1(d_conf, "SELECT col_0 FROM t1 LIMIT 1;")
+        self.assertEqual(Meters.aig("k.db_pool.mysql.ex_ping"), 0)
+        self.assertEqual(Meters.aig("k.db_pool.mysql.call._connection_create"), 1)
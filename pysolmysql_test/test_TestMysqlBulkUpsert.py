@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+# ===============================================================================
+#
+# Copyright (C) 2013/2025 Laurent Labatut / Laurent Champagnac
+#
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ===============================================================================
+"""
+# Imports
+import logging
+import unittest
+
+from pysolbase.SolBase import SolBase
+from pysolmeters.Meters import Meters
+
+from pysolmysql.Mysql.MysqlApi import MysqlApi
+from pysolmysql.bench.mysql_stub import MysqlStubServer, StubResult
+
+logger = logging.getLogger(__name__)
+SolBase.voodoo_init()
+SolBase.logging_init(log_level='INFO', force_reset=True)
+
+
+# noinspection PyBroadException,SqlNoDataSourceInspection,SqlResolve
+class TestMysqlBulkUpsert(unittest.TestCase):
+    """
+    Test description
+    """
+
+    # noinspection PyPep8Naming
+    def setUp(self):
+        """
+        Setup
+        """
+
+        MysqlApi.reset_pools()
+        Meters.reset()
+
+        self.stub = MysqlStubServer()
+        self.stub.start()
+        self.d_conf = self.stub.conf_dict()
+
+    # noinspection PyPep8Naming
+    def tearDown(self):
+        """
+        Setup (called on destroy)
+        """
+
+        self.stub.stop()
+        MysqlApi.reset_pools()
+
+    def _inserts(self):
+        """
+        Get INSERT statements received
+        """
+
+        return [s for s in self.stub.ar_statement if s.startswith("INSERT")]
+
+    def test_upsert(self):
+        """
+        Test
+        """
+
+        # Affected : 1 per insert, 2 per update, from the server
+        self.stub.responder = lambda s, c: StubResult(affected_rows=s.count("),(") + 2) if s.startswith("INSERT") else None
+
+        rows = [{"id": i, "name": "n%s" % i, "v": i} for i in range(5)]
+        d = MysqlApi.bulk_upsert(self.d_conf, "db.t1", ["id"], rows, max_rows=2)
+        self.assertEqual(d, {"rows": 5, "rows_sent": 5, "statements": 3, "affected": 3 + 3 + 2})
+        ar = self._inserts()
+        self.assertEqual(len(ar), 3)
+        self.assertEqual(ar[0], "INSERT INTO `db`.`t1` (`id`,`name`,`v`) VALUES (0,'n0',0),(1,'n1',1) ON DUPLICATE KEY UPDATE `name`=VALUES(`name`),`v`=VALUES(`v`);")
+        self.assertTrue(ar[2].startswith("INSERT INTO `db`.`t1` (`id`,`name`,`v`) VALUES (4,'n4',4) ON"))
+
+        # Explicit update columns, add mode
+        self.stub.ar_statement = list()
+        MysqlApi.bulk_upsert(self.d_conf, "t1", ["id"], rows[:1], update_columns=["v"], update_mode="add")
+        self.assertEqual(self._inserts(), ["INSERT INTO `t1` (`id`,`name`,`v`) VALUES (0,'n0',0) ON DUPLICATE KEY UPDATE `v`=`v`+VALUES(`v`);"])
+
+        # Key only : no op update
+        self.stub.ar_statement = list()
+        MysqlApi.bulk_upsert(self.d_conf, "t1", ["id"], [{"id": 1}])
+        self.assertEqual(self._inserts(), ["INSERT INTO `t1` (`id`) VALUES (1) ON DUPLICATE KEY UPDATE `id`=`id`;"])
+
+        # Empty
+        self.stub.ar_statement = list()
+        d = MysqlApi.bulk_upsert(self.d_conf, "t1", ["id"], [])
+        self.assertEqual(d, {"rows": 0, "rows_sent": 0, "statements": 0, "affected": 0})
+        self.assertEqual(self._inserts(), [])
+
+        # Size bound
+        d = MysqlApi.bulk_upsert(self.d_conf, "t1", ["id"], [{"id": i, "v": "x" * 100} for i in range(10)], max_bytes=400)
+        self.assertGreater(d["statements"], 1)
+        self.assertTrue(all(len(s) <= 400 for s in self._inserts()))
+
+    def test_upsert_aggregate(self):
+        """
+        Test
+        """
+
+        rows = [
+            {"k1": "a", "k2": 1, "hits": 1, "bytes": 10},
+            {"k1": "b", "k2": 1, "hits": 1, "bytes": None},
+            {"k1": "a", "k2": 1, "hits": 2, "bytes": 20},
+            {"k1": "a", "k2": 2, "hits": 1, "bytes": 30},
+        ]
+
+        # Add : summed
+        d = MysqlApi.bulk_upsert(self.d_conf, "t1", ["k1", "k2"], rows, update_mode="add", aggregate=True)
+        self.assertEqual(d["rows"], 4)
+        self.assertEqual(d["rows_sent"], 3)
+        self.assertEqual(d["statements"], 1)
+        self.assertIn("VALUES ('a',1,3,30),('b',1,1,NULL),('a',2,1,30) ON DUPLICATE KEY UPDATE `hits`=`hits`+VALUES(`hits`),`bytes`=`bytes`+VALUES(`bytes`);", self._inserts()[0])
+
+        # Set : last wins
+        self.stub.ar_statement = list()
+        d = MysqlApi.bulk_upsert(self.d_conf, "t1", ["k1", "k2"], rows, aggregate=True)
+        self.assertEqual(d["rows_sent"], 3)
+        self.assertIn("VALUES ('a',1,2,20),('b',1,1,NULL),('a',2,1,30) ON", self._inserts()[0])
+
+    def test_upsert_invalid(self):
+        """
+        Test
+        """
+
+        for kwargs, msg in (
+                ({"update_mode": "xxx"}, "Invalid update_mode"),
+                ({}, "Key column not found"),
+        ):
+            try:
+                MysqlApi.bulk_upsert(self.d_conf, "t1", ["zz"], [{"id": 1}], **kwargs)
+                self.fail("Must raise")
+            except Exception as e:
+                self.assertIn(msg, str(e))
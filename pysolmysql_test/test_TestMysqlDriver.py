@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+# ===============================================================================
+#
+# Copyright (C) 2013/2025 Laurent Labatut / Laurent Champagnac
+#
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ===============================================================================
+"""
+
+# Imports
+import logging
+import unittest
+
+from pysolbase.SolBase import SolBase
+from pysolmeters.Meters import Meters
+
+from pysolmysql.Mysql.MysqlApi import MysqlApi
+from pysolmysql.Pool.mysql_driver import MysqlDriver, PymysqlDriver
+from pysolmysql.Pool.mysql_pool import MysqlConnectionPool
+from pysolmysql.bench.driver_bench import DriverBench
+from pysolmysql.bench.mysql_stub import MysqlStubServer
+
+logger = logging.getLogger(__name__)
+SolBase.voodoo_init()
+SolBase.logging_init(log_level='INFO', force_reset=True)
+
+
+# noinspection PyBroadException,SqlNoDataSourceInspection,SqlResolve
+class TestMysqlDriver(unittest.TestCase):
+    """
+    Driver backends, against an in-process mysql stub server (no database required)
+    """
+
+    # noinspection PyPep8Naming
+    def setUp(self):
+        """
+        Setup
+        """
+
+        MysqlApi.reset_pools()
+        Meters.reset()
+
+        self.stub = MysqlStubServer(result_rows=50, result_columns=4)
+        self.stub.start()
+
+    # noinspection PyPep8Naming
+    def tearDown(self):
+        """
+        Setup (called on destroy)
+        """
+
+        self.stub.stop()
+        MysqlApi.reset_pools()
+
+    def test_driver_get(self):
+        """
+        Test
+        """
+
+        self.assertIsInstance(MysqlDriver.get(), PymysqlDriver)
+        self.assertIs(MysqlDriver.get("pymysql"), MysqlDriver.get())
+        self.assertIn("pymysql", MysqlDriver.available())
+
+        # Unknown driver : pool init must fail
+        try:
+            MysqlConnectionPool(self.stub.conf_dict(driver="nope"))
+            self.fail("Must raise")
+        except Exception as e:
+            self.assertIn("Unknown mysql driver", str(e))
+
+        # mysqlclient : available or clear error
+        try:
+            MysqlDriver.get("mysqlclient")
+            self.assertIn("mysqlclient", MysqlDriver.available())
+        except Exception as e:
+            self.assertIn("requires mysqlclient", str(e))
+            self.assertNotIn("mysqlclient", MysqlDriver.available())
+
+    def test_driver_pool(self):
+        """
+        Test
+        """
+
+        pool = MysqlConnectionPool(self.stub.conf_dict(driver="pymysql"))
+        conn = pool.connection_acquire()
+        self.assertTrue(pool._connection_ping(conn))
+
+        # Dict cursor
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1;")
+            rows = cur.fetchall()
+        self.assertEqual(len(rows), 50)
+        self.assertEqual(rows[0]["col_3"], "v_0_3")
+        pool.connection_release(conn)
+
+        # Close : COM_QUIT, ping fails after
+        pool._connection_close(conn)
+        self.assertFalse(pool._connection_ping(conn))
+        SolBase.sleep(100)
+        self.assertEqual(self.stub.count_quit, 1)
+        self.assertEqual(Meters.aig("k.db_pool.driver.connect", tags={"driver": "pymysql"}), 1)
+
+        # Forget : no COM_QUIT
+        conn = pool._connection_create()
+        pool._connection_forget(conn)
+        SolBase.sleep(100)
+        self.assertEqual(self.stub.count_quit, 1)
+
+    def test_driver_bench(self):
+        """
+        Test
+        """
+
+        d = DriverBench.run_all(self.stub.conf_dict(), "SELECT 1;", 0.2, ["pymysql", "mysqlclient"])
+        self.assertEqual(d["bench"], "driver")
+        d_result = {r["driver"]: r for r in d["results"]}
+        self.assertTrue(d_result["pymysql"]["available"])
+        self.assertGreater(d_result["pymysql"]["rows_per_sec"], 0)
+        self.assertEqual(d_result["pymysql"]["rows"], d_result["pymysql"]["calls"] * 50)
+        self.assertIn("available", d_result["mysqlclient"])
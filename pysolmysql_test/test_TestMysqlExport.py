@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+# ===============================================================================
+#
+# Copyright (C) 2013/2025 Laurent Labatut / Laurent Champagnac
+#
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ===============================================================================
+"""
+
+# Imports
+import csv
+import datetime
+import decimal
+import gzip
+import io
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+import gevent
+# noinspection PyUnresolvedReferences
+import ujson
+from pysolbase.SolBase import SolBase
+from pysolmeters.Meters import Meters
+
+from pysolmysql.Mysql.MysqlApi import MysqlApi
+from pysolmysql.Mysql.MysqlExport import MysqlExport
+from pysolmysql.bench.mysql_stub import MysqlStubServer, StubResult
+
+logger = logging.getLogger(__name__)
+SolBase.voodoo_init()
+SolBase.logging_init(log_level='INFO', force_reset=True)
+
+
+# noinspection PyBroadException,SqlNoDataSourceInspection,SqlResolve
+class TestMysqlExport(unittest.TestCase):
+    """
+    Test description
+    """
+
+    # noinspection PyPep8Naming
+    def setUp(self):
+        """
+        Setup
+        """
+
+        MysqlApi.reset_pools()
+        Meters.reset()
+
+        self.stub = MysqlStubServer(result_rows=5000, result_columns=3)
+        self.stub.start()
+        self.d_conf = self.stub.conf_dict()
+        self.dir_name = tempfile.mkdtemp()
+        self.buffer_bytes = MysqlExport.BUFFER_BYTES
+
+    # noinspection PyPep8Naming
+    def tearDown(self):
+        """
+        Setup (called on destroy)
+        """
+
+        MysqlExport.BUFFER_BYTES = self.buffer_bytes
+        shutil.rmtree(self.dir_name, ignore_errors=True)
+        self.stub.stop()
+        MysqlApi.reset_pools()
+
+    def test_export_jsonl(self):
+        """
+        Test
+        """
+
+        # Multiple buffer flushes
+        MysqlExport.BUFFER_BYTES = 4096
+
+        file_name = os.path.join(self.dir_name, "out.jsonl")
+        d = MysqlApi.export(self.d_conf, "SELECT * FROM t1;", file_name, fetch_rows=700)
+        self.assertEqual(d["rows"], 5000)
+        self.assertEqual(d["bytes"], os.path.getsize(file_name))
+        self.assertEqual(d["bytes"], d["bytes_raw"])
+        with open(file_name, "r") as f:
+            ar = [ujson.loads(line) for line in f]
+        self.assertEqual(len(ar), 5000)
+        self.assertEqual(ar[4999], {"col_0": "v_4999_0", "col_1": "v_4999_1", "col_2": "v_4999_2"})
+
+        # Gzip (auto)
+        file_name = os.path.join(self.dir_name, "out.jsonl.gz")
+        d_gz = MysqlApi.export(self.d_conf, "SELECT * FROM t1;", file_name)
+        self.assertEqual(d_gz["rows"], 5000)
+        self.assertEqual(d_gz["bytes_raw"], d["bytes_raw"])
+        self.assertEqual(d_gz["bytes"], os.path.getsize(file_name))
+        self.assertLess(d_gz["bytes"], d_gz["bytes_raw"])
+        with gzip.open(file_name, "rt") as f:
+            self.assertEqual(len(f.readlines()), 5000)
+
+        # Connection reusable
+        self.assertEqual(len(MysqlApi.exec_n(self.d_conf, "SELECT 1;")), 5000)
+        self.assertEqual(self.stub.count_connect, 1)
+
+    def test_export_csv(self):
+        """
+        Test
+        """
+
+        self.stub.responder = lambda statement, c: StubResult(columns=["a", "b", "c"], rows=[(1, None, b"x,\"y"), (2, "z\nw", b"\xff")]) \
+            if "t2" in statement else None
+
+        bio = io.BytesIO()
+        d = MysqlApi.export(self.d_conf, "SELECT * FROM t2;", bio, fmt="csv")
+        self.assertEqual(d["rows"], 2)
+        self.assertEqual(d["bytes"], len(bio.getvalue()))
+        ar = list(csv.reader(io.StringIO(bio.getvalue().decode("utf-8"))))
+        self.assertEqual(ar, [["a", "b", "c"], ["1", "", "x,\"y"], ["2", "z\nw", "�"]])
+
+        # Jsonl, binary
+        bio = io.BytesIO()
+        MysqlApi.export(self.d_conf, "SELECT * FROM t2;", bio, compress=True)
+        ar = [ujson.loads(line) for line in gzip.decompress(bio.getvalue()).decode("utf-8").splitlines()]
+        self.assertEqual(ar[0], {"a": 1, "b": None, "c": "x,\"y"})
+
+    def test_export_jsonl_types(self):
+        """
+        Test
+        """
+
+        # Decimal : exact (ujson would dump a lossy float)
+        self.stub.responder = lambda statement, c: StubResult(columns=["id", "amount"], rows=[(1, decimal.Decimal("12345678901234567890.12")), (2, None)]) \
+            if "t3" in statement else None
+
+        bio = io.BytesIO()
+        d = MysqlApi.export(self.d_conf, "SELECT * FROM t3;", bio)
+        self.assertEqual(d["rows"], 2)
+        ar = [ujson.loads(line) for line in bio.getvalue().decode("utf-8").splitlines()]
+        self.assertEqual(ar, [{"id": 1, "amount": "12345678901234567890.12"}, {"id": 2, "amount": None}])
+
+        # Other non native types
+        bio = io.BytesIO()
+        w = MysqlExport(bio, fmt="jsonl")
+        w.write_rows([{"d": datetime.datetime(2024, 1, 2, 3, 4, 5), "b": b"x\xff", "f": 1.5, "t": True}])
+        w.close()
+        self.assertEqual(ujson.loads(bio.getvalue()), {"d": "2024-01-02 03:04:05", "b": "x\ufffd", "f": 1.5, "t": True})
+
+    def test_export_error(self):
+        """
+        Test
+        """
+
+        try:
+            MysqlApi.export(self.d_conf, "SELECT * FROM t1;", io.BytesIO(), fmt="xml")
+            self.fail("Must raise")
+        except Exception as e:
+            self.assertIn("Invalid fmt", str(e))
+
+        # Failure while streaming : connection dropped
+        class _FailingFile(io.BytesIO):
+            def write(self, b):
+                raise IOError("disk full")
+
+        MysqlExport.BUFFER_BYTES = 1024
+        try:
+            MysqlApi.export(self.d_conf, "SELECT * FROM t1;", _FailingFile())
+            self.fail("Must raise")
+        except IOError as e:
+            self.assertIn("disk full", str(e))
+        pool = list(MysqlApi.D_POOL_INSTANCES.values())[0]
+        self.assertEqual(pool.size, 0)
+        self.assertEqual(len(pool.d_acquired), 0)
+
+        self.assertEqual(len(MysqlApi.exec_n(self.d_conf, "SELECT 1;")), 5000)
+
+        # Caller timeout while streaming : connection dropped too (unread result never given back to the pool)
+        class _SlowFile(io.BytesIO):
+            def write(self, b):
+                SolBase.sleep(50)
+                return super(_SlowFile, self).write(b)
+
+        try:
+            with gevent.Timeout(0.2):
+                MysqlApi.export(self.d_conf, "SELECT * FROM t1;", _SlowFile())
+            self.fail("Must raise")
+        except gevent.Timeout:
+            pass
+        self.assertEqual(pool.size, 0)
+        self.assertEqual(len(pool.d_acquired), 0)
+        self.assertEqual(len(MysqlApi.exec_n(self.d_conf, "SELECT 1;")), 5000)
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+# ===============================================================================
+#
+# Copyright (C) 2013/2025 Laurent Labatut / Laurent Champagnac
+#
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ===============================================================================
+"""
+
+# Imports
+import logging
+import unittest
+
+from pysolbase.SolBase import SolBase
+from pysolmeters.DelayToCount import DelayToCount
+from pysolmeters.Meters import Meters
+
+from pysolmysql.Mysql.MysqlFingerprint import MysqlFingerprint
+
+logger = logging.getLogger(__name__)
+SolBase.voodoo_init()
+SolBase.logging_init(log_level='INFO', force_reset=True)
+
+
+# noinspection SqlNoDataSourceInspection,SqlResolve
+class TestMysqlFingerprint(unittest.TestCase):
+    """
+    Test description
+    """
+
+    # noinspection PyPep8Naming
+    def setUp(self):
+        """
+        Setup
+        """
+
+        MysqlFingerprint.reset()
+        Meters.reset()
+
+    # noinspection PyPep8Naming
+    def tearDown(self):
+        """
+        Setup (called on destroy)
+        """
+
+        MysqlFingerprint.FINGERPRINT_MAX = 256
+        MysqlFingerprint.reset()
+
+    def test_normalize(self):
+        """
+        Test
+        """
+
+        self.assertEqual(
+            MysqlFingerprint.normalize("SELECT *  FROM t1 WHERE a='x''y' AND b=12 and c in (1,2, 3) -- comment"),
+            "select * from t1 where a=? and b=? and c in (?+)")
+        self.assertEqual(
+            MysqlFingerprint.normalize('insert into t2 (a, b) values (1, "a"),(2, "b");'),
+            "insert into t2 (a, b) values (?+)+")
+        self.assertEqual(
+            MysqlFingerprint.normalize("/* hint */ select x-1, 0x1F, 1.5e3 from t3 where z = -4"),
+            "select x-?, ?, ? from t3 where z = ?")
+
+        # Same fingerprint for different literals
+        self.assertEqual(
+            MysqlFingerprint.get("SELECT * FROM t1 WHERE id=1;"),
+            MysqlFingerprint.get("select * from t1 where id=2"))
+
+    def test_bounded(self):
+        """
+        Test
+        """
+
+        MysqlFingerprint.FINGERPRINT_MAX = 2
+
+        self.assertEqual(MysqlFingerprint.get("select a from t1"), "select a from t1")
+        self.assertEqual(MysqlFingerprint.get("select b from t1"), "select b from t1")
+        self.assertEqual(MysqlFingerprint.get("select c from t1"), MysqlFingerprint.FINGERPRINT_OVERFLOW)
+        self.assertEqual(MysqlFingerprint.get("select a from t1 where 1=1"), MysqlFingerprint.FINGERPRINT_OVERFLOW)
+        self.assertEqual(Meters.aig("k.db_api.fp.overflow"), 2)
+
+        # Cached statements do not count again
+        self.assertEqual(MysqlFingerprint.get("select c from t1"), MysqlFingerprint.FINGERPRINT_OVERFLOW)
+        self.assertEqual(Meters.aig("k.db_api.fp.overflow"), 2)
+
+    def test_meters_put(self):
+        """
+        Test
+        """
+
+        fp = MysqlFingerprint.meters_put("select * from t1 where id=1", 12.0, 1, None)
+        MysqlFingerprint.meters_put("select * from t1 where id=2", 600.0, 3, None)
+        MysqlFingerprint.meters_put("select * from t1 where id=3", 1.0, 0, Exception("test"))
+
+        tags = {"fp": fp}
+        self.assertEqual(Meters.aig("k.db_api.fp.count", tags=tags), 3)
+        self.assertEqual(Meters.aig("k.db_api.fp.rows", tags=tags), 4)
+        self.assertEqual(Meters.aig("k.db_api.fp.ex", tags=tags), 1)
+
+        # DelayToCountSafe.to_dict does not return, go through the base class
+        d = DelayToCount.to_dict(Meters.dtc("k.db_api.fp.ms", tags=tags))
+        self.assertEqual(d["k.db_api.fp.ms|0-50"], 2)
+        self.assertEqual(d["k.db_api.fp.ms|500-1000"], 1)
+
+        # Fingerprints dropped after the lookup (concurrent reset) : no failure
+        MysqlFingerprint.D_FINGERPRINT = dict()
+        self.assertEqual(MysqlFingerprint.meters_put("select * from t1 where id=1", 1.0, 1, None), fp)
+        self.assertEqual(Meters.aig("k.db_api.fp.count", tags=tags), 4)
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+# ===============================================================================
+#
+# Copyright (C) 2013/2025 Laurent Labatut / Laurent Champagnac
+#
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ===============================================================================
+"""
+
+# Imports
+import datetime
+import logging
+import unittest
+
+import gevent
+from pysolbase.SolBase import SolBase
+from pysolmeters.Meters import Meters
+
+from pysolmysql.Mysql.MysqlApi import MysqlApi
+from pysolmysql.Mysql.MysqlFingerprint import MysqlFingerprint
+from pysolmysql.Mysql.MysqlLoadData import MysqlLoadData
+from pysolmysql.bench.mysql_stub import MysqlStubServer
+
+logger = logging.getLogger(__name__)
+SolBase.voodoo_init()
+SolBase.logging_init(log_level='INFO', force_reset=True)
+
+
+# noinspection PyBroadException,SqlNoDataSourceInspection,SqlResolve
+class TestMysqlLoadData(unittest.TestCase):
+    """
+    Test description
+    """
+
+    # noinspection PyPep8Naming
+    def setUp(self):
+        """
+        Setup
+        """
+
+        MysqlApi.reset_pools()
+        Meters.reset()
+
+        self.stub = MysqlStubServer()
+        self.stub.start()
+
+    # noinspection PyPep8Naming
+    def tearDown(self):
+        """
+        Setup (called on destroy)
+        """
+
+        self.stub.stop()
+        MysqlApi.reset_pools()
+
+    def test_serialize(self):
+        """
+        Test
+        """
+
+        self.assertEqual(MysqlLoadData.serialize_value(None), b"\\N")
+        self.assertEqual(MysqlLoadData.serialize_value(True), b"1")
+        self.assertEqual(MysqlLoadData.serialize_value(12), b"12")
+        self.assertEqual(MysqlLoadData.serialize_value(1.5), b"1.5")
+        self.assertEqual(MysqlLoadData.serialize_value("a\tb\nc\\d\re\x00f"), b"a\\tb\\nc\\\\d\\re\\0f")
+        self.assertEqual(MysqlLoadData.serialize_value("\\N"), b"\\\\N")
+        self.assertEqual(MysqlLoadData.serialize_value("éà"), "éà".encode("utf-8"))
+        self.assertEqual(MysqlLoadData.serialize_value(b"\x00\xff"), b"\\0\xff")
+        self.assertEqual(MysqlLoadData.serialize_value(datetime.datetime(2020, 1, 2, 3, 4, 5)), b"2020-01-02 03:04:05")
+
+        self.assertEqual(MysqlLoadData.serialize_row((1, None, "x"), 3), b"1\t\\N\tx\n")
+        try:
+            MysqlLoadData.serialize_row((1, 2), 3)
+            self.fail("Must raise")
+        except Exception as e:
+            self.assertIn("Invalid row len", str(e))
+
+        self.assertEqual(
+            MysqlLoadData.statement("db.t`1", ["a", "b"]),
+            "LOAD DATA LOCAL INFILE 'pysolmysql.stream' INTO TABLE `db`.`t``1` CHARACTER SET utf8mb4 "
+            "FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' (`a`,`b`);")
+
+    def test_load_data(self):
+        """
+        Test
+        """
+
+        d_conf = self.stub.conf_dict(local_infile=True)
+
+        # Opt-in required
+        try:
+            MysqlApi.load_data(self.stub.conf_dict(), "t1", ["a"], [(1,)])
+            self.fail("Must raise")
+        except Exception as e:
+            self.assertIn("local_infile", str(e))
+
+        # Nothing
+        d = MysqlApi.load_data(d_conf, "t1", ["a"], iter(()))
+        self.assertEqual(d["rows"], 0)
+        self.assertEqual(d["statements"], 0)
+
+        # Generator, chunked
+        def _rows():
+            for i in range(5000):
+                yield i, "v\t%s" % i, None
+
+        d = MysqlApi.load_data(d_conf, "t1", ["id", "v", "n"], _rows(), chunk_rows=2000)
+        self.assertEqual(d["rows"], 5000)
+        self.assertEqual(d["statements"], 3)
+        self.assertEqual(d["warnings"], 0)
+        self.assertEqual(len(self.stub.ar_load_data), 3)
+        buf = b"".join(self.stub.ar_load_data)
+        self.assertEqual(d["bytes"], len(buf))
+        ar_line = buf.split(b"\n")[:-1]
+        self.assertEqual(len(ar_line), 5000)
+        self.assertEqual(ar_line[1234], b"1234\tv\\t1234\t\\N")
+        fp = MysqlFingerprint.get(MysqlLoadData.statement("t1", ["id", "v", "n"]))
+        self.assertEqual(Meters.aig("k.db_api.fp.rows", tags={"fp": fp}), 5000)
+
+        # Warnings
+        self.stub.load_data_warnings = 2
+        d = MysqlApi.load_data(d_conf, "t1", ["a"], [(1,), (2,)])
+        self.assertEqual(d["rows"], 2)
+        self.assertEqual(d["warnings"], 2)
+        self.assertEqual(len(d["warning_list"]), 1)
+
+    def test_load_data_abort(self):
+        """
+        Test
+        """
+
+        d_conf = self.stub.conf_dict(local_infile=True)
+
+        def _rows():
+            for i in range(100000):
+                if i == 50000:
+                    raise Exception("Source failure")
+                yield i,
+
+        try:
+            MysqlApi.load_data(d_conf, "t1", ["a"], _rows())
+            self.fail("Must raise")
+        except Exception as e:
+            self.assertIn("Source failure", str(e))
+
+        # Connection dropped : the server never got the end of file (no partial load)
+        SolBase.sleep(100)
+        self.assertEqual(len(self.stub.ar_load_data), 0)
+
+        # Connection discarded (not given back to the pool)
+        d_stat = MysqlApi._get_pool(d_conf).stats()
+        self.assertEqual(d_stat["size"], 0)
+        self.assertEqual(d_stat["in_use"], 0)
+
+        # Pool still usable for regular statements
+        self.stub.result_rows = 2
+        self.stub.result_columns = 1
+        ar = MysqlApi.exec_n(d_conf, "SELECT col_0 FROM t1;")
+        self.assertEqual(len(ar), 2)
+
+        # Next call re-connects
+        d = MysqlApi.load_data(d_conf, "t1", ["a"], [(1,)])
+        self.assertEqual(d["rows"], 1)
+
+        # Caller timeout in the middle of the exchange : connection discarded too
+        def _rows_slow():
+            for i in range(100000):
+                if i == 50000:
+                    SolBase.sleep(500)
+                yield i,
+
+        try:
+            with gevent.Timeout(0.2):
+                MysqlApi.load_data(d_conf, "t1", ["a"], _rows_slow())
+            self.fail("Must raise")
+        except gevent.Timeout:
+            pass
+        d_stat = MysqlApi._get_pool(d_conf).stats()
+        self.assertEqual(d_stat["size"], 0)
+        self.assertEqual(d_stat["in_use"], 0)
+        d = MysqlApi.load_data(d_conf, "t1", ["a"], [(1,)])
+        self.assertEqual(d["rows"], 1)
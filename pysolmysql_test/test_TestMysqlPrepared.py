@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+# ===============================================================================
+#
+# Copyright (C) 2013/2025 Laurent Labatut / Laurent Champagnac
+#
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ===============================================================================
+"""
+
+# Imports
+import datetime
+import decimal
+import logging
+import struct
+import unittest
+
+from pymysql.constants import FIELD_TYPE, FLAG
+from pymysql.protocol import MysqlPacket
+from pysolbase.SolBase import SolBase
+from pysolmeters.Meters import Meters
+
+from pysolmysql.Mysql.MysqlApi import MysqlApi
+from pysolmysql.Pool.mysql_prepared import MysqlPrepared, CHARSET_BINARY
+from pysolmysql.bench.mysql_stub import MysqlStubServer, StubResult
+
+logger = logging.getLogger(__name__)
+SolBase.voodoo_init()
+SolBase.logging_init(log_level='INFO', force_reset=True)
+
+
+class FakeField(object):
+    """
+    Column definition
+    """
+
+    def __init__(self, type_code, flags=0, charsetnr=33):
+        """
+        Init
+        """
+
+        self.type_code = type_code
+        self.flags = flags
+        self.charsetnr = charsetnr
+
+
+# noinspection PyBroadException,SqlNoDataSourceInspection,SqlResolve
+class TestMysqlPrepared(unittest.TestCase):
+    """
+    Test description
+    """
+
+    # noinspection PyPep8Naming
+    def setUp(self):
+        """
+        Setup
+        """
+
+        MysqlApi.reset_pools()
+        Meters.reset()
+
+        self.stub = MysqlStubServer()
+        self.stub.start()
+        self.d_conf = self.stub.conf_dict()
+
+    # noinspection PyPep8Naming
+    def tearDown(self):
+        """
+        Setup (called on destroy)
+        """
+
+        self.stub.stop()
+        MysqlApi.reset_pools()
+
+    def _decode(self, field, b):
+        """
+        Decode one value
+        """
+
+        return MysqlPrepared._decoder(field, "utf8")(MysqlPacket(b, "utf8"))
+
+    def test_decoders(self):
+        """
+        Test
+        """
+
+        self.assertEqual(self._decode(FakeField(FIELD_TYPE.TINY), b"\xff"), -1)
+        self.assertEqual(self._decode(FakeField(FIELD_TYPE.TINY, FLAG.UNSIGNED), b"\xff"), 255)
+        self.assertEqual(self._decode(FakeField(FIELD_TYPE.SHORT), struct.pack("<h", -300)), -300)
+        self.assertEqual(self._decode(FakeField(FIELD_TYPE.LONG, FLAG.UNSIGNED), struct.pack("<I", 4000000000)), 4000000000)
+        self.assertEqual(self._decode(FakeField(FIELD_TYPE.LONGLONG), struct.pack("<q", -5)), -5)
+        self.assertEqual(self._decode(FakeField(FIELD_TYPE.DOUBLE), struct.pack("<d", 1.25)), 1.25)
+        self.assertAlmostEqual(self._decode(FakeField(FIELD_TYPE.FLOAT), struct.pack("<f", 1.5)), 1.5)
+        self.assertEqual(self._decode(FakeField(FIELD_TYPE.NEWDECIMAL), b"\x041.50"), decimal.Decimal("1.50"))
+        self.assertEqual(self._decode(FakeField(FIELD_TYPE.VAR_STRING), b"\x02\xc3\xa9"), "é")
+        self.assertEqual(self._decode(FakeField(FIELD_TYPE.BLOB, charsetnr=CHARSET_BINARY), b"\x02\x00\xff"), b"\x00\xff")
+        self.assertEqual(self._decode(FakeField(FIELD_TYPE.DATE), b"\x04" + struct.pack("<HBB", 2020, 1, 2)), datetime.date(2020, 1, 2))
+        self.assertIsNone(self._decode(FakeField(FIELD_TYPE.DATE), b"\x00"))
+        self.assertEqual(self._decode(FakeField(FIELD_TYPE.DATETIME), b"\x0b" + struct.pack("<HBBBBBI", 2020, 1, 2, 3, 4, 5, 6)),
+                         datetime.datetime(2020, 1, 2, 3, 4, 5, 6))
+        self.assertEqual(self._decode(FakeField(FIELD_TYPE.DATETIME), b"\x04" + struct.pack("<HBB", 2020, 1, 2)), datetime.datetime(2020, 1, 2))
+        self.assertEqual(self._decode(FakeField(FIELD_TYPE.TIME), b"\x08" + struct.pack("<BIBBB", 1, 1, 2, 3, 4)),
+                         -datetime.timedelta(days=1, hours=2, minutes=3, seconds=4))
+
+    def test_prepared(self):
+        """
+        Test
+        """
+
+        # Params round trip (stub decodes and interpolates them)
+        ar_param = [None, True, -12, 1 << 63, 1.5, "a'b", b"\x00\xff", decimal.Decimal("1.25"),
+                    datetime.datetime(2020, 1, 2, 3, 4, 5, 6), datetime.datetime(2020, 1, 2, 3, 4, 5), datetime.date(2020, 1, 2),
+                    -datetime.timedelta(days=1, seconds=3, microseconds=5)]
+        n = MysqlApi.prepared_0(self.d_conf, "UPDATE t1 SET " + ",".join("c%s=?" % i for i in range(len(ar_param))) + ";", ar_param)
+        self.assertEqual(n, 1)
+        c = list(self.stub.d_connection.values())[0]
+        ar_param[1] = 1
+        self.assertEqual(c.last_params, ar_param)
+        self.assertEqual(self.stub.ar_statement[-1][:30], "UPDATE t1 SET c0=NULL,c1=1,c2=")
+
+        # Binary rows
+        self.stub.responder = lambda statement, c_: StubResult(columns=["i", "f", "s", "b", "n"], rows=[(1, 1.5, "é", b"\x00", None), (2, 2.5, "x", b"y", None)]) \
+            if "t2" in statement else None
+        ar = MysqlApi.prepared_n(self.d_conf, "SELECT * FROM t2 WHERE id=?;", (1,))
+        self.assertEqual(ar, [{"i": 1, "f": 1.5, "s": "é", "b": b"\x00", "n": None}, {"i": 2, "f": 2.5, "s": "x", "b": b"y", "n": None}])
+        self.assertEqual(self.stub.ar_statement[-1], "SELECT * FROM t2 WHERE id=1;")
+        self.assertEqual(MysqlApi.prepared_n(self.d_conf, "DELETE FROM t3;"), [])
+
+        # Params check
+        try:
+            MysqlApi.prepared_n(self.d_conf, "SELECT * FROM t2 WHERE id=?;", (1, 2))
+            self.fail("Must raise")
+        except Exception as e:
+            self.assertIn("Invalid params len", str(e))
+
+        # Server error
+        self.stub.fail_query_count = 1
+        try:
+            MysqlApi.prepared_n(self.d_conf, "SELECT * FROM t2 WHERE id=?;", (1,))
+            self.fail("Must raise")
+        except Exception as e:
+            self.assertIn("Injected failure", str(e))
+        self.assertEqual(len(MysqlApi.prepared_n(self.d_conf, "SELECT * FROM t2 WHERE id=?;", (1,))), 2)
+
+    def test_prepared_cache(self):
+        """
+        Test
+        """
+
+        d_conf = self.stub.conf_dict(prepared_cache_size=2)
+
+        # Hit
+        for i in range(3):
+            MysqlApi.prepared_n(d_conf, "SELECT * FROM t1 WHERE id=?;", (i,))
+        self.assertEqual(self.stub.count_prepare, 1)
+        self.assertEqual(self.stub.count_execute, 3)
+        pool = list(MysqlApi.D_POOL_INSTANCES.values())[0]
+        self.assertEqual(Meters.aig("k.db_pool.prepared.hit", tags=pool.meters_tags), 2)
+        self.assertEqual(Meters.aig("k.db_pool.prepared.miss", tags=pool.meters_tags), 1)
+
+        # LRU
+        MysqlApi.prepared_n(d_conf, "SELECT * FROM t2 WHERE id=?;", (1,))
+        MysqlApi.prepared_n(d_conf, "SELECT * FROM t1 WHERE id=?;", (1,))
+        MysqlApi.prepared_n(d_conf, "SELECT * FROM t3 WHERE id=?;", (1,))
+        self.assertEqual(self.stub.count_prepare, 3)
+        self.assertEqual(self.stub.count_stmt_close, 1)
+        self.assertEqual(list(list(pool.d_conn_stmt.values())[0].keys()), ["SELECT * FROM t1 WHERE id=?;", "SELECT * FROM t3 WHERE id=?;"])
+        SolBase.sleep(50)
+        c = list(self.stub.d_connection.values())[0]
+        self.assertEqual(len(c.d_stmt), 2)
+
+        # Dropped server side : prepared again transparently
+        c.d_stmt = dict()
+        MysqlApi.prepared_n(d_conf, "SELECT * FROM t1 WHERE id=?;", (1,))
+        self.assertEqual(self.stub.count_prepare, 4)
+
+        # Connection replaced : cache invalidated
+        self.stub.kill_connections()
+        SolBase.sleep(50)
+        MysqlApi.prepared_n(d_conf, "SELECT * FROM t1 WHERE id=?;", (1,))
+        self.assertEqual(self.stub.count_connect, 2)
+        self.assertEqual(self.stub.count_prepare, 5)
+        self.assertEqual(len(pool.d_conn_stmt), 1)
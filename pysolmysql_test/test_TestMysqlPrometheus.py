@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+# ===============================================================================
+#
+# Copyright (C) 2013/2025 Laurent Labatut / Laurent Champagnac
+#
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ===============================================================================
+"""
+# Imports
+import logging
+import unittest
+
+import gevent.socket
+from pysolbase.SolBase import SolBase
+from pysolmeters.DelayToCount import DelayToCount
+from pysolmeters.Meters import Meters
+
+from pysolmysql.Mysql.MysqlApi import MysqlApi
+from pysolmysql.Mysql.MysqlPrometheus import MysqlPrometheus
+from pysolmysql.Pool.latency_meters import LatencyMeters
+from pysolmysql.bench.mysql_stub import MysqlStubServer
+
+logger = logging.getLogger(__name__)
+SolBase.voodoo_init()
+SolBase.logging_init(log_level='INFO', force_reset=True)
+
+
+# noinspection PyBroadException,SqlNoDataSourceInspection,SqlResolve
+class TestMysqlPrometheus(unittest.TestCase):
+    """
+    Test description
+    """
+
+    # noinspection PyPep8Naming
+    def setUp(self):
+        """
+        Setup
+        """
+
+        MysqlApi.reset_pools()
+        Meters.reset()
+        LatencyMeters.reset()
+
+    # noinspection PyPep8Naming
+    def tearDown(self):
+        """
+        Setup (called on destroy)
+        """
+
+        MysqlApi.reset_pools()
+
+    def test_render(self):
+        """
+        Test
+        """
+
+        Meters.aii("k.db_pool.pool.maxed", increment_value=2, tags={"pool": "p1"})
+        Meters.aii("k.db_pool.pool.maxed", tags={"pool": "p2"})
+        Meters.aii("k.db_api.retry", tags={"pool": "p1", "host": "db\"1\\"})
+        Meters.ai("k.db_pool.pool.size", tags={"pool": "p1"}).set(4)
+        Meters.ai("k.db_pool.budget.used").set(3)
+        Meters.aii("k.other.key")
+        for ms in (10, 50, 60, 70.5, 200000):
+            LatencyMeters.put("k.db_pool.pool.acquire_ms", ms, tags={"pool": "p1"})
+        LatencyMeters.put("k.db_pool.dns.resolve_ms", 1.5)
+
+        buf = MysqlPrometheus.render()
+        logger.info("Render=\n%s", buf)
+        ar_line = buf.split("\n")
+
+        # Counters
+        self.assertIn("# TYPE pysolmysql_db_pool_pool_maxed_total counter", ar_line)
+        self.assertIn("pysolmysql_db_pool_pool_maxed_total{pool=\"p1\"} 2", ar_line)
+        self.assertIn("pysolmysql_db_pool_pool_maxed_total{pool=\"p2\"} 1", ar_line)
+        self.assertEqual(len([s for s in ar_line if s.startswith("# TYPE pysolmysql_db_pool_pool_maxed_total")]), 1)
+
+        # Labels sorted, escaped
+        self.assertIn("pysolmysql_db_api_retry_total{host=\"db\\\"1\\\\\",pool=\"p1\"} 1", ar_line)
+
+        # Gauges
+        self.assertIn("# TYPE pysolmysql_db_pool_pool_size gauge", ar_line)
+        self.assertIn("pysolmysql_db_pool_pool_size{pool=\"p1\"} 4", ar_line)
+        self.assertIn("pysolmysql_db_pool_budget_used 3", ar_line)
+
+        # Histogram : cumulative, upper bound inclusive, sum
+        self.assertIn("# TYPE pysolmysql_db_pool_pool_acquire_ms histogram", ar_line)
+        self.assertIn("pysolmysql_db_pool_pool_acquire_ms_bucket{pool=\"p1\",le=\"0\"} 0", ar_line)
+        self.assertIn("pysolmysql_db_pool_pool_acquire_ms_bucket{pool=\"p1\",le=\"50\"} 2", ar_line)
+        self.assertIn("pysolmysql_db_pool_pool_acquire_ms_bucket{pool=\"p1\",le=\"100\"} 4", ar_line)
+        self.assertIn("pysolmysql_db_pool_pool_acquire_ms_bucket{pool=\"p1\",le=\"60000\"} 4", ar_line)
+        self.assertIn("pysolmysql_db_pool_pool_acquire_ms_bucket{pool=\"p1\",le=\"+Inf\"} 5", ar_line)
+        self.assertIn("pysolmysql_db_pool_pool_acquire_ms_sum{pool=\"p1\"} 200190.5", ar_line)
+        self.assertIn("pysolmysql_db_pool_pool_acquire_ms_count{pool=\"p1\"} 5", ar_line)
+        self.assertIn("pysolmysql_db_pool_dns_resolve_ms_bucket{le=\"50\"} 1", ar_line)
+        self.assertIn("pysolmysql_db_pool_dns_resolve_ms_sum 1.5", ar_line)
+        self.assertIn("pysolmysql_db_pool_dns_resolve_ms_count 1", ar_line)
+
+        # DelayToCount still fed
+        self.assertEqual(sum(DelayToCount.to_dict(Meters.dtc("k.db_pool.pool.acquire_ms", tags={"pool": "p1"})).values()), 5)
+
+        # Others skipped
+        self.assertNotIn("other", buf)
+
+        # Cached : same output, values updated
+        Meters.aii("k.db_pool.pool.maxed", tags={"pool": "p2"})
+        self.assertIn("pysolmysql_db_pool_pool_maxed_total{pool=\"p2\"} 2", MysqlPrometheus.render().split("\n"))
+
+    def test_endpoint(self):
+        """
+        Test
+        """
+
+        stub = MysqlStubServer()
+        stub.start()
+        server = MysqlPrometheus.start_server(host="127.0.0.1", port=0)
+        try:
+            d_conf = stub.conf_dict(pool_name="p1")
+            MysqlApi.exec_n(d_conf, "SELECT 1;")
+
+            def _get(path):
+                sock = gevent.socket.create_connection(("127.0.0.1", server.server_port))
+                try:
+                    sock.sendall(("GET %s HTTP/1.0\r\nHost: localhost\r\n\r\n" % path).encode("ascii"))
+                    ar = list()
+                    while True:
+                        b = sock.recv(65536)
+                        if not b:
+                            break
+                        ar.append(b)
+                    return b"".join(ar).decode("utf-8")
+                finally:
+                    sock.close()
+
+            buf = _get("/metrics")
+            self.assertTrue(buf.startswith("HTTP/1.1 200"))
+            self.assertIn("text/plain; version=0.0.4", buf)
+            self.assertIn("pysolmysql_db_pool_pool_in_use{pool=\"p1\"} 0", buf)
+            self.assertIn("pysolmysql_db_pool_pool_acquire_ms_count{pool=\"p1\"} 1", buf)
+            self.assertIn("pysolmysql_db_pool_pool_acquire_ms_sum{pool=\"p1\"} ", buf)
+
+            self.assertTrue(_get("/nope").startswith("HTTP/1.1 404"))
+        finally:
+            server.stop()
+            stub.stop()
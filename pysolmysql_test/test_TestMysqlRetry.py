@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+# ===============================================================================
+#
+# Copyright (C) 2013/2025 Laurent Labatut / Laurent Champagnac
+#
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ===============================================================================
+"""
+# Imports
+import logging
+import time
+import unittest
+
+from pysolbase.SolBase import SolBase
+from pysolmeters.Meters import Meters
+
+from pysolmysql.Mysql.MysqlApi import MysqlApi
+from pysolmysql.bench.mysql_stub import MysqlStubServer
+
+logger = logging.getLogger(__name__)
+SolBase.voodoo_init()
+SolBase.logging_init(log_level='INFO', force_reset=True)
+
+
+# noinspection PyBroadException,SqlNoDataSourceInspection,SqlResolve
+class TestMysqlRetry(unittest.TestCase):
+    """
+    Test description
+    """
+
+    # noinspection PyPep8Naming
+    def setUp(self):
+        """
+        Setup
+        """
+
+        MysqlApi.reset_pools()
+        Meters.reset()
+
+        self.stub = MysqlStubServer()
+        self.stub.start()
+
+        # Connection drops on our statements only (connect statements untouched)
+        self.drop_count = 0
+        self.stub.responder = self._responder
+
+        # Two hosts toward the stub
+        self.d_conf = self.stub.conf_dict(hosts=["127.0.0.1", "localhost"], pool_name="p1", read_retry_count=2)
+
+    # noinspection PyPep8Naming
+    def tearDown(self):
+        """
+        Setup (called on destroy)
+        """
+
+        self.stub.stop()
+        MysqlApi.reset_pools()
+
+    def _responder(self, statement, c):
+        """
+        Responder : drop the connection (exception in the stub handler) while drop_count > 0
+        """
+
+        if self.drop_count > 0 and statement.startswith(("SELECT 1", "UPDATE")):
+            self.drop_count -= 1
+            raise Exception("Test drop")
+        return None
+
+    def test_retry_read(self):
+        """
+        Test
+        """
+
+        pool = MysqlApi._get_pool(self.d_conf)
+        MysqlApi.exec_n(self.d_conf, "SELECT 1;")
+        host = pool.connection_host(pool.pool.queue[0])
+
+        # Connection lost : host deactivated, statement re-run on the other host
+        self.drop_count = 1
+        self.assertEqual(len(MysqlApi.exec_n(self.d_conf, "SELECT 1;")), 1)
+        self.assertEqual(Meters.aig("k.db_api.retry", tags={"pool": "p1", "host": host}), 1)
+        self.assertGreater(pool.host_status[host], time.time())
+        self.assertEqual(pool.size, 1)
+        self.assertNotEqual(pool.connection_host(pool.pool.queue[0]), host)
+
+        # Other host lost too : no prison (last host up), retried on a new connection
+        self.drop_count = 1
+        self.assertIsNotNone(MysqlApi.exec_1(self.d_conf, "SELECT 1;"))
+        self.assertEqual(Meters.aig("k.db_pool.mysql.hosts.deactivate_one"), 1)
+
+        # Bounded attempts
+        self.drop_count = 3
+        try:
+            MysqlApi.exec_01(self.d_conf, "SELECT 1;")
+            self.fail("Must raise")
+        except Exception as e:
+            self.assertTrue(pool.driver.is_connection_error(e))
+        self.assertEqual(pool.size, 0)
+
+        # Statement errors : not retried
+        MysqlApi.exec_n(self.d_conf, "SELECT 1;")
+        self.stub.fail_query_count = 1
+        try:
+            MysqlApi.exec_n(self.d_conf, "SELECT 1;")
+            self.fail("Must raise")
+        except Exception as e:
+            self.assertIn("Injected failure", str(e))
+        self.assertEqual(Meters.aig("k.db_api.retry", tags={"pool": "p1", "host": "127.0.0.1"}) + Meters.aig("k.db_api.retry", tags={"pool": "p1", "host": "localhost"}), 4)
+        self.assertEqual(pool.size, 1)
+
+    def test_retry_opt_in(self):
+        """
+        Test
+        """
+
+        d_conf = self.stub.conf_dict(pool_name="p2")
+
+        # Reads : off by default
+        self.drop_count = 1
+        try:
+            MysqlApi.exec_n(d_conf, "SELECT 1;")
+            self.fail("Must raise")
+        except Exception as e:
+            self.assertIn("Lost connection", str(e))
+        self.assertEqual(MysqlApi._get_pool(d_conf).size, 0)
+
+        # Per call
+        self.drop_count = 1
+        self.assertEqual(len(MysqlApi.exec_n(d_conf, "SELECT 1;", retry=1)), 1)
+
+        # Writes : only if marked idempotent
+        self.drop_count = 1
+        try:
+            MysqlApi.exec_0(self.d_conf, "UPDATE t1 SET a=1;")
+            self.fail("Must raise")
+        except Exception as e:
+            self.assertIn("Lost connection", str(e))
+        self.drop_count = 1
+        self.assertEqual(MysqlApi.exec_0(self.d_conf, "UPDATE t1 SET a=1;", retry=1), 1)
+        self.drop_count = 1
+        MysqlApi.multi_n(self.d_conf, ["UPDATE t1 SET a=1;", "UPDATE t1 SET a=2;"], retry=1)
+        self.assertEqual([s for s in self.stub.ar_statement if s.startswith("UPDATE")][-2:], ["UPDATE t1 SET a=1;", "UPDATE t1 SET a=2;"])
+
+    def test_retry_budget(self):
+        """
+        Test
+        """
+
+        d_conf = self.stub.conf_dict(pool_name="p3", read_retry_count=1, retry_budget_max=1, retry_budget_ratio=0.5)
+        pool = MysqlApi._get_pool(d_conf)
+
+        # Budget spent
+        self.drop_count = 1
+        MysqlApi.exec_n(d_conf, "SELECT 1;")
+        self.assertEqual(pool.retry_tokens, 0.5)
+
+        # Exhausted
+        self.drop_count = 1
+        try:
+            MysqlApi.exec_n(d_conf, "SELECT 1;")
+            self.fail("Must raise")
+        except Exception as e:
+            self.assertIn("Lost connection", str(e))
+        self.assertEqual(Meters.aig("k.db_api.retry.budget_exhausted", tags={"pool": "p3"}), 1)
+
+        # Earned back by successful calls
+        MysqlApi.exec_n(d_conf, "SELECT 1;")
+        self.drop_count = 1
+        MysqlApi.exec_n(d_conf, "SELECT 1;")
+        self.assertEqual(Meters.aig("k.db_api.retry", tags={"pool": "p3", "host": "127.0.0.1"}), 2)
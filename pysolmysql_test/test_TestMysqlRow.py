@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+# ===============================================================================
+#
+# Copyright (C) 2013/2025 Laurent Labatut / Laurent Champagnac
+#
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ===============================================================================
+"""
+
+# Imports
+import logging
+import sys
+import unittest
+
+from pysolbase.SolBase import SolBase
+from pysolmeters.Meters import Meters
+
+from pysolmysql.Mysql.MysqlApi import MysqlApi
+from pysolmysql.Mysql.MysqlRow import MysqlRow
+from pysolmysql.bench.mysql_stub import MysqlStubServer
+
+logger = logging.getLogger(__name__)
+SolBase.voodoo_init()
+SolBase.logging_init(log_level='INFO', force_reset=True)
+
+
+# noinspection PyBroadException,SqlNoDataSourceInspection,SqlResolve
+class TestMysqlRow(unittest.TestCase):
+    """
+    Test description
+    """
+
+    # noinspection PyPep8Naming
+    def setUp(self):
+        """
+        Setup
+        """
+
+        MysqlApi.reset_pools()
+        Meters.reset()
+
+    # noinspection PyPep8Naming
+    def tearDown(self):
+        """
+        Setup (called on destroy)
+        """
+
+        MysqlApi.reset_pools()
+
+    def test_row(self):
+        """
+        Test
+        """
+
+        description = (("a", 253), ("b", 3), ("c", 252))
+        ar = MysqlRow.from_rows([("x", 1, bytearray(b"z")), ("y", 2, None)], description)
+        self.assertEqual(len(ar), 2)
+
+        # Shared column map
+        self.assertIs(ar[0]._columns, ar[1]._columns)
+
+        # Dict interface
+        r = ar[0]
+        self.assertEqual(r["a"], "x")
+        self.assertEqual(r["b"], 1)
+        self.assertEqual(r["c"], "z")
+        self.assertEqual(r.get("c"), "z")
+        self.assertIsNone(r.get("nope"))
+        self.assertIn("a", r)
+        self.assertNotIn("nope", r)
+        self.assertEqual(len(r), 3)
+        self.assertEqual(list(r.keys()), ["a", "b", "c"])
+        self.assertEqual(list(r.items()), [("a", "x"), ("b", 1), ("c", "z")])
+        self.assertEqual(r, {"a": "x", "b": 1, "c": "z"})
+        self.assertEqual(r.to_dict(), {"a": "x", "b": 1, "c": "z"})
+        self.assertIsNone(ar[1]["c"])
+        try:
+            _ = r["nope"]
+            self.fail("Must raise")
+        except KeyError:
+            pass
+
+        # No fix
+        ar = MysqlRow.from_rows([("x", 1, bytearray(b"z"))], description, fix_types=False)
+        self.assertEqual(ar[0]["c"], bytearray(b"z"))
+
+        # No result set
+        self.assertEqual(MysqlRow.from_rows((), None), [])
+
+        # Slots
+        try:
+            r.foo = 1
+            self.fail("Must raise")
+        except AttributeError:
+            pass
+
+    def test_row_memory(self):
+        """
+        Test
+        """
+
+        description = tuple(("col_%s" % i, 253) for i in range(40))
+        values = tuple("v_%s" % i for i in range(40))
+        r = MysqlRow.from_rows([values], description)[0]
+        d = dict(zip([x[0] for x in description], values))
+
+        # Per row : slots object + value tuple (column map is shared), versus dict
+        size_row = sys.getsizeof(r) + sys.getsizeof(r._values)
+        size_dict = sys.getsizeof(d)
+        logger.info("Row memory, row=%s, dict=%s", size_row, size_dict)
+        self.assertLess(size_row * 1.5, size_dict)
+
+    def test_exec_lazy(self):
+        """
+        Test
+        """
+
+        stub = MysqlStubServer(result_rows=3, result_columns=40)
+        stub.start()
+        try:
+            d_conf = stub.conf_dict()
+
+            ar = MysqlApi.exec_n(d_conf, "SELECT * FROM t1;", lazy=True)
+            self.assertEqual(len(ar), 3)
+            self.assertIsInstance(ar[0], MysqlRow)
+            self.assertEqual(ar[2]["col_39"], "v_2_39")
+            self.assertEqual(ar[0], MysqlApi.exec_n(d_conf, "SELECT * FROM t1;")[0])
+
+            stub.result_rows = 1
+            r = MysqlApi.exec_1(d_conf, "SELECT * FROM t1;", lazy=True)
+            self.assertEqual(r["col_0"], "v_0_0")
+            r = MysqlApi.exec_01(d_conf, "SELECT * FROM t1;", lazy=True)
+            self.assertEqual(r["col_1"], "v_0_1")
+
+            # Non result set statements are not impacted
+            self.assertEqual(MysqlApi.exec_0(d_conf, "DELETE FROM t1;"), 1)
+            self.assertEqual(Meters.aig("k.db_api.fp.rows", tags={"fp": "select * from t1"}), 8)
+        finally:
+            stub.stop()
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+# ===============================================================================
+#
+# Copyright (C) 2013/2025 Laurent Labatut / Laurent Champagnac
+#
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ===============================================================================
+"""
+# Imports
+import logging
+import re
+import unittest
+
+from pysolbase.SolBase import SolBase
+from pysolmeters.Meters import Meters
+
+from pysolmysql.Mysql.MysqlApi import MysqlApi
+from pysolmysql.Mysql.MysqlScan import MysqlScan
+from pysolmysql.bench.mysql_stub import MysqlStubServer, StubResult
+
+logger = logging.getLogger(__name__)
+SolBase.voodoo_init()
+SolBase.logging_init(log_level='INFO', force_reset=True)
+
+
+# noinspection PyBroadException,SqlNoDataSourceInspection,SqlResolve
+class TestMysqlScan(unittest.TestCase):
+    """
+    Test description
+    """
+
+    _RE_PAGE = re.compile(r"FROM `t1`(?: WHERE (?:\(.*?\) AND )?`id` > ([0-9]+))?.* LIMIT ([0-9]+);")
+
+    # noinspection PyPep8Naming
+    def setUp(self):
+        """
+        Setup
+        """
+
+        MysqlApi.reset_pools()
+        Meters.reset()
+
+        self.stub = MysqlStubServer()
+        self.stub.start()
+        self.stub.responder = self._responder
+        self.d_conf = self.stub.conf_dict(pool_name="p1")
+
+        # Table t1 : id 1..25, v = id * 10
+        self.ar_id = list(range(1, 26))
+        self.ar_in_use = list()
+
+    # noinspection PyPep8Naming
+    def tearDown(self):
+        """
+        Setup (called on destroy)
+        """
+
+        self.stub.stop()
+        MysqlApi.reset_pools()
+
+    def _responder(self, statement, c):
+        """
+        Serve t1 pages
+        """
+
+        m = self._RE_PAGE.search(statement)
+        if not m:
+            return None
+        after = int(m.group(1)) if m.group(1) else 0
+        ar = [i for i in self.ar_id if i > after][:int(m.group(2))]
+        return StubResult(columns=["id", "v"], rows=[(i, i * 10) for i in ar])
+
+    def test_statement(self):
+        """
+        Test
+        """
+
+        self.assertEqual(MysqlScan.statement("t1", ("id",), page_size=10), "SELECT * FROM `t1` ORDER BY `id` LIMIT 10;")
+        self.assertEqual(
+            MysqlScan.statement("db.t1", ("id",), columns=["v"], where="v > 0", after=(5,), page_size=10),
+            "SELECT `v`,`id` FROM `db`.`t1` WHERE (v > 0) AND `id` > 5 ORDER BY `id` LIMIT 10;")
+        self.assertEqual(
+            MysqlScan.statement("t1", ("a", "b"), after=("x'y", 2)),
+            "SELECT * FROM `t1` WHERE (`a`,`b`) > ('x\\'y',2) ORDER BY `a`,`b` LIMIT 1000;")
+        self.assertEqual(MysqlScan.key_columns("id"), ("id",))
+        self.assertEqual(MysqlScan.key_of({"a": 1, "b": 2, "c": 3}, ("a", "b")), (1, 2))
+        try:
+            MysqlScan.statement("t1", ("a", "b"), after=(1,))
+            self.fail("Must raise")
+        except Exception as e:
+            self.assertIn("Invalid key", str(e))
+
+    def test_scan(self):
+        """
+        Test
+        """
+
+        pool = MysqlApi._get_pool(self.d_conf)
+
+        # Full scan : all rows once, in order, no connection held while rows are processed
+        ar = list()
+        for row in MysqlApi.scan(self.d_conf, "t1", "id", columns=["id", "v"], page_size=10):
+            self.assertEqual(pool.stats()["in_use"], 0)
+            ar.append(row["id"])
+        self.assertEqual(ar, self.ar_id)
+        self.assertEqual(Meters.aig("k.db_api.scan.page", tags={"pool": "p1"}), 3)
+        self.assertTrue(any(s.endswith("`id` > 20 ORDER BY `id` LIMIT 10;") for s in self.stub.ar_statement))
+        self.assertFalse(any("OFFSET" in s for s in self.stub.ar_statement))
+
+        # Page size multiple of row count : one empty page
+        Meters.reset()
+        self.assertEqual(len(list(MysqlApi.scan(self.d_conf, "t1", "id", page_size=5))), 25)
+        self.assertEqual(Meters.aig("k.db_api.scan.page", tags={"pool": "p1"}), 6)
+
+        # Resume from a checkpoint, lazy rows
+        ar = [row["v"] for row in MysqlApi.scan(self.d_conf, "t1", "id", page_size=10, start_after=18, lazy=True)]
+        self.assertEqual(ar, [i * 10 for i in range(19, 26)])
+
+        # Interrupted then resumed : nothing lost, nothing twice
+        ar = list()
+        for row in MysqlApi.scan(self.d_conf, "t1", "id", page_size=4):
+            ar.append(row["id"])
+            if len(ar) == 6:
+                break
+        for row in MysqlApi.scan(self.d_conf, "t1", "id", page_size=4, start_after=ar[-1]):
+            ar.append(row["id"])
+        self.assertEqual(ar, self.ar_id)
+
+        # Empty
+        self.ar_id = list()
+        self.assertEqual(list(MysqlApi.scan(self.d_conf, "t1", "id", where="v > 0")), list())
+        self.assertEqual(pool.stats()["in_use"], 0)
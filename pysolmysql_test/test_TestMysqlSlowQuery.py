@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+# ===============================================================================
+#
+# Copyright (C) 2013/2025 Laurent Labatut / Laurent Champagnac
+#
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ===============================================================================
+"""
+
+# Imports
+import logging
+import unittest
+
+from gevent import queue
+from pysolbase.SolBase import SolBase
+from pysolmeters.Meters import Meters
+
+from pysolmysql.Mysql.MysqlApi import MysqlApi
+from pysolmysql.Mysql.MysqlSlowQuery import MysqlSlowQuery
+from pysolmysql.bench.mysql_stub import MysqlStubServer
+
+logger = logging.getLogger(__name__)
+SolBase.voodoo_init()
+SolBase.logging_init(log_level='INFO', force_reset=True)
+
+
+class FakeCursor(object):
+    """
+    Fake cursor
+    """
+
+    def __init__(self, ar_executed):
+        """
+        Init
+        """
+        self.ar_executed = ar_executed
+
+    def execute(self, statement):
+        """
+        Execute
+        """
+        self.ar_executed.append(statement)
+
+    def fetchall(self):
+        """
+        Fetch
+        """
+        return [{"id": 1, "select_type": "SIMPLE"}]
+
+    def close(self):
+        """
+        Close
+        """
+        pass
+
+
+class FakePool(object):
+    """
+    Fake pool (and driver)
+    """
+
+    def __init__(self):
+        """
+        Init
+        """
+        self.ar_executed = list()
+        self.release_count = 0
+        self.driver = self
+        self.pool = queue.Queue()
+        self.size = 0
+        self.limit = 10
+
+    def connection_acquire(self):
+        """
+        Acquire
+        """
+        return self
+
+    def connection_release(self, conn):
+        """
+        Release
+        """
+        self.release_count += 1
+
+    def cursor(self, conn, dict_rows=True, unbuffered=False):
+        """
+        Cursor
+        """
+        return FakeCursor(self.ar_executed)
+
+
+# noinspection SqlNoDataSourceInspection,SqlResolve
+class TestMysqlSlowQuery(unittest.TestCase):
+    """
+    Test description
+    """
+
+    # noinspection PyPep8Naming
+    def setUp(self):
+        """
+        Setup
+        """
+
+        MysqlSlowQuery.reset()
+        Meters.reset()
+
+    def test_slow_query(self):
+        """
+        Test
+        """
+
+        pool = FakePool()
+        d_conf = {"slow_query_ms": 100}
+        statement = "SELECT * FROM t1 WHERE id=1"
+        fp = "select * from t1 where id=?"
+
+        # Disabled
+        self.assertFalse(MysqlSlowQuery.check(dict(), pool, statement, fp, 5000.0, "localhost", 1))
+
+        # Below threshold
+        self.assertFalse(MysqlSlowQuery.check(d_conf, pool, statement, fp, 50.0, "localhost", 1))
+        self.assertEqual(Meters.aig("k.db_api.slow.count"), 0)
+
+        # Above threshold, no explain
+        self.assertTrue(MysqlSlowQuery.check(d_conf, pool, statement, fp, 150.0, "localhost", 1))
+        self.assertEqual(Meters.aig("k.db_api.slow.count"), 1)
+        self.assertEqual(len(pool.ar_executed), 0)
+
+    def test_slow_query_explain(self):
+        """
+        Test
+        """
+
+        pool = FakePool()
+        d_conf = {"slow_query_ms": 100, "slow_query_explain": True}
+        statement = "SELECT * FROM t1 WHERE id=1"
+        fp = "select * from t1 where id=?"
+
+        # Pool at its limit : skipped
+        pool.size = 10
+        self.assertTrue(MysqlSlowQuery.check(d_conf, pool, statement, fp, 150.0, "localhost", 1))
+        SolBase.sleep(10)
+        self.assertEqual(len(pool.ar_executed), 0)
+        self.assertEqual(Meters.aig("k.db_api.slow.explain_skip"), 1)
+        pool.size = 1
+
+        # Explain (async, separate connection)
+        self.assertTrue(MysqlSlowQuery.check(d_conf, pool, statement, fp, 150.0, "localhost", 1))
+        self.assertEqual(len(pool.ar_executed), 0)
+        SolBase.sleep(10)
+        self.assertEqual(pool.ar_executed, ["EXPLAIN " + statement])
+        self.assertEqual(pool.release_count, 1)
+        self.assertEqual(Meters.aig("k.db_api.slow.explain"), 1)
+
+        # Rate limited
+        self.assertTrue(MysqlSlowQuery.check(d_conf, pool, "SELECT * FROM t1 WHERE id=2", fp, 150.0, "localhost", 1))
+        SolBase.sleep(10)
+        self.assertEqual(len(pool.ar_executed), 1)
+        self.assertEqual(Meters.aig("k.db_api.slow.explain_skip"), 2)
+
+        # Not a select
+        self.assertTrue(MysqlSlowQuery.check(d_conf, pool, "DELETE FROM t1", "delete from t1", 150.0, "localhost", 1))
+        SolBase.sleep(10)
+        self.assertEqual(len(pool.ar_executed), 1)
+
+        # Prepared statement (placeholders) : never explained
+        self.assertTrue(MysqlSlowQuery.check(d_conf, pool, "SELECT * FROM t2 WHERE id=?", "select * from t2 where id=?", 150.0, "localhost", 1, explain=False))
+        SolBase.sleep(10)
+        self.assertEqual(len(pool.ar_executed), 1)
+
+    def test_slow_query_explain_stub(self):
+        """
+        Test
+        """
+
+        stub = MysqlStubServer()
+        stub.query_latency_ms = 20
+        stub.start()
+        try:
+            d_conf = stub.conf_dict(slow_query_ms=10, slow_query_explain=True)
+            self.assertEqual(len(MysqlApi.exec_n(d_conf, "SELECT col_0 FROM t1 WHERE id=1;", timeout_ms=30)), 1)
+
+            # Explained asynchronously (caller timeout not involved), on a separate connection
+            self.assertNotIn("EXPLAIN SELECT col_0 FROM t1 WHERE id=1;", stub.ar_statement)
+            SolBase.sleep(200)
+            self.assertIn("EXPLAIN SELECT col_0 FROM t1 WHERE id=1;", stub.ar_statement)
+            self.assertEqual(Meters.aig("k.db_api.slow.explain"), 1)
+            self.assertEqual(MysqlApi._get_pool(d_conf).stats()["in_use"], 0)
+        finally:
+            stub.stop()
+            MysqlApi.reset_pools()
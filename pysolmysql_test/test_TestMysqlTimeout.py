@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+# ===============================================================================
+#
+# Copyright (C) 2013/2025 Laurent Labatut / Laurent Champagnac
+#
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ===============================================================================
+"""
+# Imports
+import logging
+import unittest
+
+import gevent
+from pysolbase.SolBase import SolBase
+from pysolmeters.Meters import Meters
+
+from pysolmysql.Mysql.MysqlApi import MysqlApi
+from pysolmysql.Mysql.MysqlFingerprint import MysqlFingerprint
+from pysolmysql.bench.mysql_stub import MysqlStubServer
+
+logger = logging.getLogger(__name__)
+SolBase.voodoo_init()
+SolBase.logging_init(log_level='INFO', force_reset=True)
+
+
+# noinspection PyBroadException,SqlNoDataSourceInspection,SqlResolve
+class TestMysqlTimeout(unittest.TestCase):
+    """
+    Test description
+    """
+
+    # noinspection PyPep8Naming
+    def setUp(self):
+        """
+        Setup
+        """
+
+        MysqlApi.reset_pools()
+        Meters.reset()
+
+        self.stub = MysqlStubServer()
+        self.stub.start()
+        self.d_conf = self.stub.conf_dict(pool_name="p1")
+
+    # noinspection PyPep8Naming
+    def tearDown(self):
+        """
+        Setup (called on destroy)
+        """
+
+        self.stub.stop()
+        MysqlApi.reset_pools()
+
+    def _assert_timeout(self, f):
+        """
+        Call f, check it raises a query timeout quickly
+        """
+
+        ms_start = SolBase.mscurrent()
+        try:
+            f()
+            self.fail("Must raise")
+        except Exception as e:
+            self.assertIn("Query timeout", str(e))
+        self.assertLess(SolBase.msdiff(ms_start), 2000)
+
+    def test_timeout_call(self):
+        """
+        Test
+        """
+
+        # No timeout
+        self.assertEqual(len(MysqlApi.exec_n(self.d_conf, "SELECT SLEEP(0.05);", timeout_ms=1000)), 1)
+        self.assertEqual(self.stub.count_kill, 0)
+
+        # Timeout : killed server side, connection discarded
+        self._assert_timeout(lambda: MysqlApi.exec_n(self.d_conf, "SELECT SLEEP(5);", timeout_ms=200))
+        self.assertEqual(self.stub.count_kill, 1)
+        self.assertTrue(any(s.startswith("KILL QUERY ") for s in self.stub.ar_statement))
+        self.assertEqual(Meters.aig("k.db_api.query.timeout", tags={"pool": "p1", "host": "127.0.0.1"}), 1)
+        self.assertEqual(Meters.aig("k.db_pool.mysql.ex_kill"), 0)
+        d = MysqlApi._get_pool(self.d_conf).stats()
+        self.assertEqual(d["size"], 0)
+        self.assertEqual(d["in_use"], 0)
+
+        # Side connection closed, killed connection gone
+        SolBase.sleep(100)
+        self.assertEqual(len(self.stub.d_connection), 0)
+
+        # Pool still usable
+        self.assertEqual(MysqlApi.exec_0(self.d_conf, "UPDATE t1 SET a=1;"), 1)
+
+        # Fingerprint error recorded
+        tags = MysqlFingerprint.D_FINGERPRINT[MysqlFingerprint.get("SELECT SLEEP(5);")]
+        self.assertEqual(Meters.aig("k.db_api.fp.ex", tags=tags), 1)
+
+    def test_timeout_acquire(self):
+        """
+        Test
+        """
+
+        MysqlApi.set_connection_budget(10)
+        try:
+            pool = MysqlApi._get_pool(self.d_conf)
+
+            # Connection lost, retry re-connects slowly : timeout fires while creating the connection
+            def _responder(statement, c):
+                if statement.startswith("SELECT 1"):
+                    self.stub.connect_latency_ms = 1000.0
+                    raise Exception("Test drop")
+                return None
+
+            self.stub.responder = _responder
+            ms_start = SolBase.mscurrent()
+            try:
+                MysqlApi.exec_n(self.d_conf, "SELECT 1;", timeout_ms=200, retry=1)
+                self.fail("Must raise")
+            except Exception as e:
+                self.assertIn("Query timeout while acquiring a connection", str(e))
+            self.assertLess(SolBase.msdiff(ms_start), 900)
+            self.assertEqual(self.stub.count_kill, 0)
+
+            # Nothing leaked : slot and budget given back
+            self.assertEqual(pool.size, 0)
+            self.assertEqual(pool.stats()["in_use"], 0)
+            self.assertEqual(MysqlApi.CONNECTION_BUDGET.used, 0)
+
+            # Slow ping on an idle connection : same
+            self.stub.responder = None
+            self.stub.connect_latency_ms = 0.0
+            MysqlApi.exec_n(self.d_conf, "SELECT 2;")
+            self.assertEqual(pool.size, 1)
+            pool.conn_dirty.add(id(pool.pool.queue[0]))
+            self.stub.query_latency_ms = 1000.0
+            try:
+                with gevent.Timeout(0.2):
+                    pool.connection_acquire()
+                self.fail("Must raise")
+            except gevent.Timeout:
+                pass
+            self.assertEqual(pool.size, 0)
+            self.assertEqual(pool.stats()["in_use"], 0)
+            self.assertEqual(MysqlApi.CONNECTION_BUDGET.used, 0)
+        finally:
+            MysqlApi.set_connection_budget(None)
+
+    def test_timeout_pool_default(self):
+        """
+        Test
+        """
+
+        d_conf = self.stub.conf_dict(pool_name="p2", query_timeout_ms=200)
+
+        self._assert_timeout(lambda: MysqlApi.exec_1(d_conf, "SELECT SLEEP(5);"))
+        self._assert_timeout(lambda: MysqlApi.multi_n(d_conf, ["SELECT 1;", "SELECT SLEEP(5);"]))
+        self.assertEqual(self.stub.count_kill, 2)
+        self.assertEqual(Meters.aig("k.db_api.query.timeout", tags={"pool": "p2", "host": "127.0.0.1"}), 2)
+
+        # Explicit 0 : no timeout
+        self.assertEqual(len(MysqlApi.exec_n(d_conf, "SELECT SLEEP(0.3);", timeout_ms=0)), 1)
+
+    def test_timeout_kill_failure(self):
+        """
+        Test
+        """
+
+        # Side connection refused : connection discarded anyway
+        MysqlApi.exec_n(self.d_conf, "SELECT 1;")
+        self.stub.refuse_connect = True
+        self._assert_timeout(lambda: MysqlApi.exec_n(self.d_conf, "SELECT SLEEP(1);", timeout_ms=200))
+        self.assertEqual(self.stub.count_kill, 0)
+        self.assertEqual(Meters.aig("k.db_pool.mysql.ex_kill"), 1)
+        self.assertEqual(MysqlApi._get_pool(self.d_conf).stats()["size"], 0)
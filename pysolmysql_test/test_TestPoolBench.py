@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+# ===============================================================================
+#
+# Copyright (C) 2013/2025 Laurent Labatut / Laurent Champagnac
+#
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ===============================================================================
+"""
+
+# Imports
+import logging
+import os
+import tempfile
+import unittest
+
+# noinspection PyUnresolvedReferences
+import ujson
+
+from pysolbase.SolBase import SolBase
+from pysolmeters.Meters import Meters
+
+from pysolmysql.bench.pool_bench import PoolBench, percentile
+
+logger = logging.getLogger(__name__)
+SolBase.voodoo_init()
+SolBase.logging_init(log_level='INFO', force_reset=True)
+
+
+class TestPoolBench(unittest.TestCase):
+    """
+    Test description
+    """
+
+    # noinspection PyPep8Naming
+    def setUp(self):
+        """
+        Setup
+        """
+
+        Meters.reset()
+
+    def test_percentile(self):
+        """
+        Test
+        """
+
+        self.assertIsNone(percentile([], 50))
+        ar = list(range(0, 101))
+        self.assertEqual(percentile(ar, 50), 50)
+        self.assertEqual(percentile(ar, 99), 99)
+        self.assertEqual(percentile(ar, 100), 100)
+
+    def test_bench_not_maxed(self):
+        """
+        Test
+        """
+
+        d = PoolBench.run(greenlet_count=10, pool_max_size=20, duration_ms=300, connect_ms=5.0, ping_ms=0.1, query_ms=1.0)
+        logger.info("d=%s", d)
+        self.assertGreater(d["ops"], 0)
+        self.assertEqual(d["maxed"], 0)
+        self.assertEqual(d["ex"], 0)
+        self.assertLessEqual(d["pool"]["size"], 10)
+        self.assertEqual(d["pool"]["in_use"], 0)
+        self.assertLessEqual(d["acquire_ms_p50"], d["acquire_ms_p99"])
+
+    def test_bench_maxed(self):
+        """
+        Test
+        """
+
+        d = PoolBench.run(greenlet_count=50, pool_max_size=5, duration_ms=300, connect_ms=5.0, ping_ms=0.1, query_ms=5.0)
+        logger.info("d=%s", d)
+        self.assertGreater(d["ops"], 0)
+        self.assertGreater(d["maxed"], 0)
+        self.assertEqual(d["pool"]["size"], 5)
+
+    def test_bench_matrix_json(self):
+        """
+        Test
+        """
+
+        d = PoolBench.run_matrix([1, 4], [2], duration_ms=100)
+        self.assertEqual(len(d["results"]), 2)
+
+        file_name = os.path.join(tempfile.mkdtemp(), "bench.json")
+        PoolBench.write_json(d, file_name)
+        with open(file_name, "r") as f:
+            d_read = ujson.loads(f.read())
+        self.assertEqual(d_read["bench"], "pool")
+        self.assertEqual(d_read["results"][1]["greenlet_count"], 4)
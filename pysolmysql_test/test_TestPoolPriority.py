@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+"""
+# ===============================================================================
+#
+# Copyright (C) 2013/2025 Laurent Labatut / Laurent Champagnac
+#
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ===============================================================================
+"""
+# Imports
+import logging
+import unittest
+
+import gevent
+from pysolbase.SolBase import SolBase
+from pysolmeters.DelayToCount import DelayToCount
+from pysolmeters.Meters import Meters
+
+from pysolmysql.Mysql.MysqlApi import MysqlApi
+from pysolmysql.bench.mysql_stub import MysqlStubServer
+from pysolmysql_test.fake_pool import FakeConnectionPool
+
+logger = logging.getLogger(__name__)
+SolBase.voodoo_init()
+SolBase.logging_init(log_level='INFO', force_reset=True)
+
+
+# noinspection PyBroadException,SqlNoDataSourceInspection,SqlResolve
+class TestPoolPriority(unittest.TestCase):
+    """
+    Test description
+    """
+
+    # noinspection PyPep8Naming
+    def setUp(self):
+        """
+        Setup
+        """
+
+        MysqlApi.reset_pools()
+        Meters.reset()
+
+        self.d_conf = {
+            "pool_max_size": 4,
+            "pool_name": "p1",
+            "pool_priorities": {
+                "interactive": {"priority": 0, "reserved": 2, "wait_ms": 2000},
+                "batch": {"priority": 10, "reserved": 0, "wait_ms": 2000},
+            },
+        }
+
+    def _acquire_later(self, pool, priority, d_out):
+        """
+        Spawn an acquire, result stored in d_out[priority]
+        """
+
+        def _run():
+            try:
+                d_out[priority] = pool.connection_acquire(priority)
+            except Exception as e:
+                d_out[priority] = e
+
+        g = gevent.spawn(_run)
+        gevent.sleep(0)
+        return g
+
+    def test_priority_reserved(self):
+        """
+        Test
+        """
+
+        pool = FakeConnectionPool(self.d_conf)
+
+        # Batch : cannot take reserved connections
+        ar_batch = [pool.connection_acquire("batch"), pool.connection_acquire("batch")]
+        self.assertEqual(pool.d_priority["batch"].in_use, 2)
+
+        # Default class (implicit) : no wait
+        try:
+            pool.connection_acquire()
+            self.fail("Must raise")
+        except Exception as e:
+            self.assertIn("Pool maxed", str(e))
+            self.assertIn("priority=default", str(e))
+        self.assertEqual(Meters.aig("k.db_pool.priority.reject", tags={"pool": "p1", "priority": "default"}), 1)
+
+        # Interactive : reserved connections available
+        ar_inter = [pool.connection_acquire("interactive"), pool.connection_acquire("interactive")]
+        d = pool.stats()["priorities"]
+        self.assertEqual(d["interactive"], {"in_use": 2, "waiting": 0, "reserved": 2, "reject": 0})
+        self.assertEqual(d["batch"]["in_use"], 2)
+
+        # Full : batch waits first, then interactive
+        d_out = dict()
+        g_batch = self._acquire_later(pool, "batch", d_out)
+        g_inter = self._acquire_later(pool, "interactive", d_out)
+        self.assertEqual(pool.stats()["priorities"]["batch"]["waiting"], 1)
+
+        # Release : highest priority served first
+        pool.connection_release(ar_batch.pop())
+        g_inter.join(timeout=1)
+        self.assertIsNotNone(d_out["interactive"])
+        self.assertNotIsInstance(d_out["interactive"], Exception)
+        self.assertNotIn("batch", d_out)
+        ar_inter.append(d_out["interactive"])
+
+        # Release interactive : batch allowed (interactive reservation met)
+        pool.connection_release(ar_inter.pop())
+        g_batch.join(timeout=1)
+        self.assertNotIsInstance(d_out["batch"], Exception)
+        ar_batch.append(d_out["batch"])
+        self.assertEqual(pool.d_priority["batch"].in_use, 2)
+        self.assertEqual(pool.d_priority["interactive"].in_use, 2)
+
+        # Wait times recorded (handed over)
+        for name, count in (("batch", 3), ("interactive", 3)):
+            d = DelayToCount.to_dict(Meters.dtc("k.db_pool.priority.wait_ms", tags={"pool": "p1", "priority": name}))
+            self.assertEqual(sum(d.values()), count)
+
+        for c in ar_batch + ar_inter:
+            pool.connection_release(c)
+        self.assertEqual(pool.stats()["in_use"], 0)
+        self.assertEqual(pool.stats()["idle"], 4)
+
+    def test_priority_wait_timeout(self):
+        """
+        Test
+        """
+
+        self.d_conf["pool_priorities"]["batch"]["wait_ms"] = 100
+        pool = FakeConnectionPool(self.d_conf)
+        ar = [pool.connection_acquire("batch"), pool.connection_acquire("batch")]
+
+        ms_start = SolBase.mscurrent()
+        try:
+            pool.connection_acquire("batch")
+            self.fail("Must raise")
+        except Exception as e:
+            self.assertIn("Pool maxed", str(e))
+        self.assertGreaterEqual(SolBase.msdiff(ms_start), 90)
+        self.assertEqual(pool.stats()["priorities"]["batch"], {"in_use": 2, "waiting": 0, "reserved": 0, "reject": 1})
+        self.assertEqual(Meters.aig("k.db_pool.priority.reject", tags={"pool": "p1", "priority": "batch"}), 1)
+
+        # Slot freed (discard) : waiter wakes up and creates a connection
+        d_out = dict()
+        g = self._acquire_later(pool, "interactive", d_out)
+        g2 = self._acquire_later(pool, "interactive", d_out)
+        g3 = self._acquire_later(pool, "interactive", d_out)
+        gevent.joinall([g, g2])
+        self.assertEqual(pool.size, 4)
+        self.assertEqual(pool.stats()["priorities"]["interactive"]["waiting"], 1)
+        pool.connection_discard(ar.pop())
+        g3.join(timeout=1)
+        self.assertNotIsInstance(d_out["interactive"], Exception)
+        self.assertEqual(pool.size, 4)
+        self.assertEqual(pool.d_priority["interactive"].in_use, 3)
+
+    def test_priority_wait_outer_timeout(self):
+        """
+        Test
+        """
+
+        pool = FakeConnectionPool(self.d_conf)
+        ar = [pool.connection_acquire("batch"), pool.connection_acquire("batch")]
+
+        # Caller timeout shorter than wait_ms : must go through the priority wait
+        ms_start = SolBase.mscurrent()
+        try:
+            with gevent.Timeout(0.2):
+                pool.connection_acquire("batch")
+            self.fail("Must raise")
+        except gevent.Timeout:
+            pass
+        self.assertLess(SolBase.msdiff(ms_start), 1000)
+        self.assertEqual(pool.stats()["priorities"]["batch"]["waiting"], 0)
+        self.assertEqual(pool.stats()["priorities"]["batch"]["in_use"], 2)
+
+        # Pool still usable
+        pool.connection_release(ar.pop())
+        cnx = pool.connection_acquire("batch")
+        self.assertIsNotNone(cnx)
+
+    def test_priority_adaptive_limit(self):
+        """
+        Test
+        """
+
+        # Adaptive limit below max size (backing off : no grow) : reserved connections kept within the limit
+        self.d_conf.update({"pool_max_size": 8, "pool_adaptive": True, "pool_min_size": 4})
+        pool = FakeConnectionPool(self.d_conf)
+        pool.adaptive_backoff = True
+        self.assertEqual(pool.limit, 4)
+        ar = [pool.connection_acquire(), pool.connection_acquire()]
+        try:
+            pool.connection_acquire()
+            self.fail("Must raise")
+        except Exception as e:
+            self.assertIn("Pool maxed", str(e))
+            self.assertIn("priority=default", str(e))
+
+        ar.extend([pool.connection_acquire("interactive"), pool.connection_acquire("interactive")])
+        self.assertEqual(pool.size, 4)
+        for c in ar:
+            pool.connection_release(c)
+
+    def test_priority_conf(self):
+        """
+        Test
+        """
+
+        # Unknown
+        pool = FakeConnectionPool(self.d_conf)
+        try:
+            pool.connection_acquire("xxx")
+            self.fail("Must raise")
+        except Exception as e:
+            self.assertIn("Unknown priority", str(e))
+
+        # Not configured : ignored
+        pool = FakeConnectionPool({"pool_max_size": 2})
+        pool.connection_release(pool.connection_acquire("batch"))
+        self.assertNotIn("priorities", pool.stats())
+
+        # Reserved above max size
+        self.d_conf["pool_priorities"]["batch"]["reserved"] = 3
+        try:
+            FakeConnectionPool(self.d_conf)
+            self.fail("Must raise")
+        except Exception as e:
+            self.assertIn("Invalid pool_priorities", str(e))
+
+    def test_priority_api(self):
+        """
+        Test
+        """
+
+        stub = MysqlStubServer()
+        stub.start()
+        try:
+            d_conf = stub.conf_dict(**self.d_conf)
+            MysqlApi.exec_n(d_conf, "SELECT 1;", priority="batch")
+            MysqlApi.exec_0(d_conf, "UPDATE t1 SET a=1;", priority="interactive")
+            MysqlApi.prepared_n(d_conf, "SELECT ?;", [1], priority="batch")
+            d = MysqlApi._get_pool(d_conf).stats()["priorities"]
+            self.assertEqual(d["batch"]["in_use"], 0)
+            for name, count in (("batch", 2), ("interactive", 1)):
+                d = DelayToCount.to_dict(Meters.dtc("k.db_pool.priority.wait_ms", tags={"pool": "p1", "priority": name}))
+                self.assertEqual(sum(d.values()), count)
+        finally:
+            stub.stop()
+            MysqlApi.reset_pools()
@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""
+# ===============================================================================
+#
+# Copyright (C) 2013/2025 Laurent Labatut / Laurent Champagnac
+#
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+# ===============================================================================
+"""
+# Imports
+import logging
+import unittest
+
+import gevent
+from pysolbase.SolBase import SolBase
+from pysolmeters.Meters import Meters
+
+from pysolmysql.Mysql.MysqlApi import MysqlApi
+from pysolmysql.Pool.mysql_driver import MysqlDriver, PymysqlDriver
+from pysolmysql.bench.mysql_stub import MysqlStubServer, SERVER_STATUS_AUTOCOMMIT
+
+logger = logging.getLogger(__name__)
+SolBase.voodoo_init()
+SolBase.logging_init(log_level='INFO', force_reset=True)
+
+
+# noinspection PyBroadException,SqlNoDataSourceInspection,SqlResolve
+class TestSessionReset(unittest.TestCase):
+    """
+    Test description
+    """
+
+    # noinspection PyPep8Naming
+    def setUp(self):
+        """
+        Setup
+        """
+
+        MysqlApi.reset_pools()
+        Meters.reset()
+
+        self.stub = MysqlStubServer()
+        self.stub.start()
+        self.d_conf = self.stub.conf_dict(pool_name="p1")
+
+    # noinspection PyPep8Naming
+    def tearDown(self):
+        """
+        Setup (called on destroy)
+        """
+
+        self.stub.stop()
+        MysqlApi.reset_pools()
+
+    def _status(self):
+        """
+        Get the server status of the (single) stub connection
+        """
+
+        self.assertEqual(len(self.stub.d_connection), 1)
+        return list(self.stub.d_connection.values())[0].status
+
+    def test_session_reset_dirty(self):
+        """
+        Test
+        """
+
+        pool = MysqlApi._get_pool(self.d_conf)
+
+        # Clean : no reset, ping on acquire (and on connect)
+        MysqlApi.exec_n(self.d_conf, "SELECT 1;")
+        MysqlApi.exec_n(self.d_conf, "SELECT 1;")
+        self.assertEqual(self.stub.count_reset, 0)
+        self.assertEqual(self.stub.count_ping, 2)
+        self.assertEqual(len(pool.conn_dirty), 0)
+
+        # Transaction left open : flagged on release, reset on next acquire (in place of the ping)
+        MysqlApi.exec_0(self.d_conf, "BEGIN;")
+        self.assertEqual(Meters.aig("k.db_pool.session.dirty", tags={"pool": "p1"}), 1)
+        self.assertEqual(len(pool.conn_dirty), 1)
+        self.assertEqual(self.stub.count_reset, 0)
+
+        MysqlApi.exec_n(self.d_conf, "SELECT 1;")
+        self.assertEqual(self.stub.count_reset, 1)
+        self.assertEqual(self.stub.count_ping, 3)
+        self.assertIn("SET NAMES utf8, autocommit=1", self.stub.ar_statement)
+        self.assertEqual(self._status(), SERVER_STATUS_AUTOCOMMIT)
+        self.assertEqual(Meters.aig("k.db_pool.session.reset", tags={"pool": "p1"}), 1)
+        self.assertEqual(len(pool.conn_dirty), 0)
+
+        # Autocommit changed : restored
+        MysqlApi.exec_0(self.d_conf, "SET autocommit=0;")
+        MysqlApi.exec_n(self.d_conf, "SELECT 1;")
+        self.assertEqual(self.stub.count_reset, 2)
+        self.assertEqual(self._status(), SERVER_STATUS_AUTOCOMMIT)
+
+        # Same connection all along
+        self.assertEqual(self.stub.count_connect, 1)
+        self.assertEqual(Meters.aig("k.db_pool.mysql.ex_session_reset"), 0)
+
+    def test_session_reset_prepared(self):
+        """
+        Test
+        """
+
+        # COM_RESET_CONNECTION drops prepared statements : cache invalidated
+        MysqlApi.prepared_n(self.d_conf, "SELECT ?;", [1])
+        MysqlApi.exec_0(self.d_conf, "BEGIN;")
+        MysqlApi.prepared_n(self.d_conf, "SELECT ?;", [1])
+        self.assertEqual(self.stub.count_reset, 1)
+        self.assertEqual(self.stub.count_prepare, 2)
+
+    def test_session_reset_rollback(self):
+        """
+        Test
+        """
+
+        self.d_conf["session_reset_mode"] = "rollback"
+
+        # ROLLBACK only, prepared statements kept
+        MysqlApi.prepared_n(self.d_conf, "SELECT ?;", [1])
+        MysqlApi.exec_0(self.d_conf, "SET autocommit=0;")
+        MysqlApi.exec_0(self.d_conf, "UPDATE t1 SET a=1;")
+        MysqlApi.prepared_n(self.d_conf, "SELECT ?;", [1])
+        self.assertEqual(self.stub.count_reset, 0)
+        self.assertIn("ROLLBACK", self.stub.ar_statement)
+        self.assertEqual(self._status(), SERVER_STATUS_AUTOCOMMIT)
+        self.assertEqual(self.stub.count_prepare, 1)
+        self.assertEqual(Meters.aig("k.db_pool.session.reset", tags={"pool": "p1"}), 1)
+
+    def test_session_reset_always_disabled(self):
+        """
+        Test
+        """
+
+        # Always : every reuse is a reset
+        self.d_conf["session_reset"] = "always"
+        for _ in range(3):
+            MysqlApi.exec_n(self.d_conf, "SELECT 1;")
+        self.assertEqual(self.stub.count_reset, 2)
+        self.assertEqual(self.stub.count_ping, 1)
+
+        # Disabled : connection reused as is
+        MysqlApi.reset_pools()
+        self.stub.count_reset = 0
+        self.d_conf["session_reset"] = None
+        MysqlApi.exec_0(self.d_conf, "BEGIN;")
+        MysqlApi.exec_n(self.d_conf, "SELECT 1;")
+        self.assertEqual(self.stub.count_reset, 0)
+
+        # Invalid
+        self.d_conf["session_reset"] = "never"
+        try:
+            MysqlApi.exec_n(self.d_conf, "SELECT 1;")
+            self.fail("Must raise")
+        except Exception as e:
+            self.assertIn("Invalid session_reset", str(e))
+
+    def test_session_reset_unsupported(self):
+        """
+        Test
+        """
+
+        class NoResetDriver(PymysqlDriver):
+            """
+            Driver without session reset
+            """
+
+            NAME = "test_noreset"
+            SESSION_RESET = False
+
+        MysqlDriver.register(NoResetDriver)
+        try:
+            self.d_conf["driver"] = "test_noreset"
+
+            # Always : rejected
+            self.d_conf["session_reset"] = "always"
+            try:
+                MysqlApi.exec_n(self.d_conf, "SELECT 1;")
+                self.fail("Must raise")
+            except Exception as e:
+                self.assertIn("not supported by driver=test_noreset", str(e))
+
+            # Dirty : connection reused
+            self.d_conf["session_reset"] = "dirty"
+            for _ in range(3):
+                MysqlApi.exec_n(self.d_conf, "SELECT 1;")
+            self.assertEqual(self.stub.count_connect, 1)
+            self.assertEqual(self.stub.count_reset, 0)
+        finally:
+            MysqlDriver.D_DRIVER_CLASS.pop(NoResetDriver.NAME, None)
+            MysqlDriver.D_DRIVER.pop(NoResetDriver.NAME, None)
+
+    def test_session_reset_failure(self):
+        """
+        Test
+        """
+
+        # Reset failure : connection closed, new one opened
+        MysqlApi.exec_0(self.d_conf, "BEGIN;")
+        self.stub.kill_connections()
+        SolBase.sleep(50)
+        self.assertEqual(len(MysqlApi.exec_n(self.d_conf, "SELECT 1;")), 1)
+        self.assertEqual(Meters.aig("k.db_pool.mysql.ex_session_reset"), 1)
+        self.assertEqual(self.stub.count_connect, 2)
+        self.assertEqual(self._status(), SERVER_STATUS_AUTOCOMMIT)
+        d = MysqlApi._get_pool(self.d_conf).stats()
+        self.assertEqual(d["size"], 1)
+        self.assertEqual(d["in_use"], 0)
+
+    def test_session_reset_handover(self):
+        """
+        Test
+        """
+
+        # Pool of 1, priority wait queue : a connection released dirty is handed over without ping, reset after hand over
+        self.d_conf["pool_max_size"] = 1
+        self.d_conf["pool_priorities"] = {"batch": {"priority": 10, "reserved": 0, "wait_ms": 2000}}
+        pool = MysqlApi._get_pool(self.d_conf)
+
+        conn = pool.connection_acquire("batch")
+        cur = pool.driver.cursor(conn)
+        cur.execute("BEGIN;")
+        cur.close()
+
+        g = gevent.spawn(pool.connection_acquire, "batch")
+        SolBase.sleep(50)
+        pool.connection_release(conn)
+        conn2 = g.get(timeout=2.0)
+        self.assertIs(conn2, conn)
+        self.assertEqual(self.stub.count_reset, 1)
+        self.assertEqual(self._status(), SERVER_STATUS_AUTOCOMMIT)
+        pool.connection_release(conn2)
+        self.assertEqual(len(pool.conn_dirty), 0)